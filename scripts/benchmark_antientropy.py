@@ -0,0 +1,86 @@
+from __future__ import annotations
+
+import argparse
+import json
+import tempfile
+import time
+from pathlib import Path
+
+from kvstore.antientropy import AntiEntropy
+from kvstore.config import ClusterConfig, NodeConfig
+from kvstore.engine import KVEngine
+from kvstore.protocol import encode_message
+
+
+def build_pair(base: Path, keys: int, differing: int, value_size: int) -> dict[int, KVEngine]:
+    engines = {node_id: KVEngine(str(base / f"node_{node_id}"), node_id=node_id) for node_id in (1, 2)}
+    version = engines[1].next_version()
+    value = "v" * value_size
+    items = [[f"key_{idx}", value] for idx in range(keys)]
+    for engine in engines.values():
+        engine.apply_replication("bulk_set", {"items": items, "version": version})
+    newer = engines[2].next_version()
+    step = max(1, keys // differing)
+    engines[2].apply_batch(
+        [("set", {"key": f"key_{idx}", "value": "changed", "version": newer}) for idx in range(0, keys, step)][:differing]
+    )
+    return engines
+
+
+def run(keys: int, differing: int, depth: int, value_size: int) -> dict:
+    with tempfile.TemporaryDirectory() as tmp:
+        engines = build_pair(Path(tmp), keys, differing, value_size)
+        nodes = {node_id: NodeConfig(node_id, "127.0.0.1", 0) for node_id in engines}
+        sides: dict[int, AntiEntropy] = {}
+
+        def loopback(node: NodeConfig, payload: dict) -> dict:
+            if payload["op"] == "replicate_batch":
+                events = [(event["op"], event["payload"]) for event in payload["events"]]
+                return {"status": "ok", "applied": engines[node.node_id].apply_batch(events)}
+            return sides[node.node_id].handle(payload)
+
+        for node_id, engine in engines.items():
+            config = ClusterConfig(
+                node_id=node_id,
+                host="127.0.0.1",
+                port=0,
+                data_dir=tmp,
+                peers=[node for other, node in nodes.items() if other != node_id],
+                merkle_depth=depth,
+            )
+            sides[node_id] = AntiEntropy(config, engine, transport=loopback)
+
+        full_snapshot_bytes = len(encode_message({"op": "snapshot", "data": engines[2].snapshot()}))
+        start = time.perf_counter()
+        stats = sides[1].sync_with(nodes[2])
+        duration = time.perf_counter() - start
+        converged = engines[1].versions() == engines[2].versions()
+
+    return {
+        "keys": keys,
+        "differing": differing,
+        "depth": depth,
+        "sync_bytes": stats["bytes"],
+        "full_snapshot_bytes": full_snapshot_bytes,
+        "rounds": stats["rounds"],
+        "buckets": stats["buckets"],
+        "pulled": stats["pulled"],
+        "duration_s": round(duration, 3),
+        "converged": converged,
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Merkle anti-entropy bandwidth benchmark")
+    parser.add_argument("--keys", type=int, default=1_000_000)
+    parser.add_argument("--differing", type=int, default=100)
+    parser.add_argument("--depths", type=int, nargs="+", default=[10, 12, 14, 16])
+    parser.add_argument("--value-size", type=int, default=32)
+    args = parser.parse_args()
+
+    for depth in args.depths:
+        print(json.dumps(run(args.keys, args.differing, depth, args.value_size)))
+
+
+if __name__ == "__main__":
+    main()
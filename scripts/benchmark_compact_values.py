@@ -0,0 +1,75 @@
+from __future__ import annotations
+
+import argparse
+import gc
+import json
+import random
+import tempfile
+import time
+import tracemalloc
+from typing import Any, Dict
+
+from kvstore.engine import KVEngine
+from kvstore.storage import StorageEngine
+
+
+def make_value(idx: int, kind: str, distinct: int) -> Any:
+    if kind == "int" or (kind == "mixed" and idx % 2 == 0):
+        return idx % distinct
+    return f"s{idx % distinct}"
+
+
+def measure(data_dir: str, keys: int, compact: bool, reads: int) -> Dict[str, Any]:
+    gc.collect()
+    tracemalloc.start()
+    engine = KVEngine(data_dir, compact_values=compact)
+    engine.wait_for_indexes()
+    gc.collect()
+    used = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    stats = engine.memory_stats()
+
+    rng = random.Random(1)
+    names = [f"key:{rng.randrange(keys):09d}" for _ in range(reads)]
+    begin = time.perf_counter()
+    for name in names:
+        engine.get(name)
+    get_ns = (time.perf_counter() - begin) / reads * 1e9
+    begin = time.perf_counter()
+    engine.search_by_value("s1")
+    search_ms = (time.perf_counter() - begin) * 1e3
+    engine.close()
+    return {
+        "layout": "compact" if compact else "dict",
+        "bytes_per_key": round(used / keys, 1),
+        "estimated_bytes_per_key": round(stats["used_bytes"] / keys, 1),
+        "get_ns": round(get_ns),
+        "search_by_value_ms": round(search_ms, 2),
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Bytes per key and access cost: dict-backed versus compact values")
+    parser.add_argument("--keys", type=int, nargs="+", default=[200_000])
+    parser.add_argument("--values", choices=["int", "str", "mixed"], default="mixed", help="Small ints, short strings or both")
+    parser.add_argument(
+        "--distinct", type=int, default=1000, help="Distinct values; each costs a secondary index postings list"
+    )
+    parser.add_argument("--layouts", nargs="+", choices=["dict", "compact"], default=["dict", "compact"])
+    parser.add_argument("--reads", type=int, default=100_000)
+    args = parser.parse_args()
+
+    for keys in args.keys:
+        with tempfile.TemporaryDirectory() as tmp:
+            data = {f"key:{idx:09d}": make_value(idx, args.values, args.distinct) for idx in range(keys)}
+            StorageEngine(tmp).save_snapshot(data, versions={key: (1 << 24) + idx for idx, key in enumerate(data)})
+            del data
+            # Build and checkpoint the indexes once, so every layout measures a restart that restores them.
+            KVEngine(tmp).close()
+            for layout in args.layouts:
+                result = measure(tmp, keys, layout == "compact", args.reads)
+                print(json.dumps({"keys": keys, "values": args.values, "distinct": args.distinct, **result}))
+
+
+if __name__ == "__main__":
+    main()
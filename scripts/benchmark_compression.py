@@ -0,0 +1,80 @@
+from __future__ import annotations
+
+import argparse
+import io
+import json
+import random
+import time
+import zlib
+from typing import Any, Dict
+
+from kvstore.protocol import encode_frame, read_frame
+
+
+def payloads(rng: random.Random, items: int, dim: int) -> Dict[str, Dict[str, Any]]:
+    words = ["order", "user", "shipped", "pending", "warehouse", "berlin", "paris", "express", "standard"]
+    docs = [
+        [f"order:{idx:08d}", {"text": " ".join(rng.choice(words) for _ in range(12)), "qty": rng.randint(1, 9), "status": rng.choice(words)}]
+        for idx in range(items)
+    ]
+    return {
+        "bulk_set": {"op": "bulk_set", "items": docs},
+        "replicate_batch": {
+            "op": "replicate_batch",
+            "events": [{"op": "set", "payload": {"key": key, "value": value, "version": idx << 16}} for idx, (key, value) in enumerate(docs)],
+        },
+        "scan_result": {"status": "ok", "result": docs},
+        "vector_search_result": {
+            "status": "ok",
+            "result": [{"key": f"doc:{rng.randrange(10**6)}", "score": rng.random()} for _ in range(items)],
+        },
+        "add_vector_batch": {
+            "op": "bulk_set",
+            "items": [[f"vec:{idx}", {"vector": [rng.uniform(-1, 1) for _ in range(dim)]}] for idx in range(items // 10)],
+        },
+    }
+
+
+def run(name: str, payload: Dict[str, Any], threshold: int, iterations: int, bandwidth_mbps: float) -> dict:
+    plain = encode_frame(payload)
+    packed = encode_frame(payload, compress_above=threshold)
+    assert read_frame(io.BytesIO(packed)) == read_frame(io.BytesIO(plain))
+    body = bytes(plain[4:])
+    start = time.perf_counter()
+    for _ in range(iterations):
+        compressed = zlib.compress(body, 1)
+    compress_ms = (time.perf_counter() - start) / iterations * 1000
+    start = time.perf_counter()
+    for _ in range(iterations):
+        zlib.decompress(compressed)
+    decompress_ms = (time.perf_counter() - start) / iterations * 1000
+
+    saved = len(plain) - len(packed)
+    link_ms = saved * 8 / (bandwidth_mbps * 1e6) * 1000
+    return {
+        "payload": name,
+        "bytes": len(plain),
+        "compressed_bytes": len(packed),
+        "ratio": round(len(plain) / len(packed), 2),
+        "compress_cpu_ms": round(compress_ms, 3),
+        "decompress_cpu_ms": round(decompress_ms, 3),
+        f"link_ms_saved_at_{bandwidth_mbps:g}mbps": round(link_ms, 3),
+        "net_ms_saved": round(link_ms - compress_ms - decompress_ms, 3),
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Bytes saved and CPU cost of zlib frame compression")
+    parser.add_argument("--items", type=int, default=1000)
+    parser.add_argument("--dim", type=int, default=64)
+    parser.add_argument("--threshold", type=int, default=1024)
+    parser.add_argument("--iterations", type=int, default=20)
+    parser.add_argument("--bandwidth-mbps", type=float, default=100.0, help="Link speed used to convert bytes saved to time")
+    args = parser.parse_args()
+
+    for name, payload in payloads(random.Random(1), args.items, args.dim).items():
+        print(json.dumps(run(name, payload, args.threshold, args.iterations, args.bandwidth_mbps)))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,115 @@
+from __future__ import annotations
+
+import argparse
+import json
+import os
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+import kvstore
+from kvstore.client import KVClient
+from kvstore.config import NodeConfig
+
+
+def free_port() -> int:
+    sock = socket.socket()
+    sock.bind(("127.0.0.1", 0))
+    port = sock.getsockname()[1]
+    sock.close()
+    return port
+
+
+def wait_for_server(host: str, port: int, timeout: float = 10.0) -> None:
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        try:
+            with socket.create_connection((host, port), timeout=1.0):
+                return
+        except OSError:
+            time.sleep(0.1)
+    raise SystemExit(f"Server {host}:{port} did not become ready in time")
+
+
+def start_cluster(base: Path, size: int, heartbeat_interval: float) -> tuple[list[NodeConfig], list[subprocess.Popen]]:
+    nodes = [NodeConfig(node_id, "127.0.0.1", free_port()) for node_id in range(1, size + 1)]
+    env = dict(os.environ, PYTHONPATH=str(Path(kvstore.__file__).resolve().parents[1]))
+    processes = []
+    for node in nodes:
+        peers = [{"node_id": p.node_id, "host": p.host, "port": p.port} for p in nodes if p.node_id != node.node_id]
+        command = [
+            sys.executable, "-m", "kvstore.cli",
+            "--host", node.host, "--port", str(node.port), "--node-id", str(node.node_id),
+            "--data-dir", str(base / f"node_{node.node_id}"),
+            "--role", "primary" if node.node_id == 1 else "secondary",
+            "--heartbeat-interval", str(heartbeat_interval), "--anti-entropy-interval", "0",
+            "--peers", json.dumps(peers),
+        ]
+        processes.append(subprocess.Popen(command, env=env))
+    for node in nodes:
+        wait_for_server(node.host, node.port)
+    return nodes, processes
+
+
+def traffic(nodes: list[NodeConfig]) -> tuple[int, int]:
+    connects = total_bytes = 0
+    for node in nodes:
+        for peer in KVClient(node.host, node.port).request({"op": "detector_stats"})["result"].values():
+            connects += peer["connects"]
+            total_bytes += peer["bytes_sent"] + peer["bytes_received"]
+    return connects, total_bytes
+
+
+def run(size: int, heartbeat_interval: float, election_interval: float, window: float) -> dict:
+    with tempfile.TemporaryDirectory() as tmp:
+        nodes, processes = start_cluster(Path(tmp), size, heartbeat_interval)
+        try:
+            time.sleep(2 * heartbeat_interval)
+            connects_before, bytes_before = traffic(nodes)
+            time.sleep(window)
+            connects_after, bytes_after = traffic(nodes)
+
+            processes[0].kill()
+            processes[0].wait()
+            killed = time.perf_counter()
+            survivors = nodes[1:]
+            failover = None
+            while failover is None and time.perf_counter() - killed < 30:
+                for node in survivors:
+                    if KVClient(node.host, node.port).request({"op": "who_is_primary"}).get("role") == "primary":
+                        failover = time.perf_counter() - killed
+                        break
+                time.sleep(0.005)
+        finally:
+            for process in processes:
+                if process.poll() is None:
+                    process.terminate()
+                    process.wait(timeout=5)
+    return {
+        "nodes": size,
+        "heartbeat_interval_s": heartbeat_interval,
+        "failover_s": None if failover is None else round(failover, 3),
+        "connections_per_s": round((connects_after - connects_before) / window, 2),
+        "heartbeat_bytes_per_s": round((bytes_after - bytes_before) / window, 1),
+        # Previous elector: every secondary opened a connection to every peer each election interval.
+        "polling_connections_per_s": round((size - 1) * (size - 1) / election_interval, 1),
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Failover time and background traffic of the heartbeat failure detector")
+    parser.add_argument("--sizes", type=int, nargs="+", default=[3, 5, 9])
+    parser.add_argument("--heartbeat-interval", type=float, default=1.0)
+    parser.add_argument("--election-interval", type=float, default=0.5)
+    parser.add_argument("--window", type=float, default=5.0, help="Seconds of idle traffic to measure")
+    args = parser.parse_args()
+
+    for size in args.sizes:
+        print(json.dumps(run(size, args.heartbeat_interval, args.election_interval, args.window)))
+
+
+if __name__ == "__main__":
+    main()
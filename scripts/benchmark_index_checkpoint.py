@@ -0,0 +1,71 @@
+from __future__ import annotations
+
+import argparse
+import json
+import os
+import random
+import tempfile
+import time
+
+from kvstore.engine import KVEngine
+from kvstore.storage import StorageEngine
+
+
+def build(data_dir: str, docs: int, words: int, vocabulary: int, dim: int) -> None:
+    rng = random.Random(1)
+    vocab = [f"term{idx}" for idx in range(vocabulary)]
+    data = {f"doc:{idx:08d}": {"text": " ".join(rng.choice(vocab) for _ in range(words))} for idx in range(docs)}
+    data.update({f"tag:{idx:08d}": f"tag{idx % 100}" for idx in range(docs // 10)})
+    data.update({f"vec:{idx:08d}": {"vector": [rng.uniform(-1, 1) for _ in range(dim)]} for idx in range(docs // 10)})
+    StorageEngine(data_dir).save_snapshot(data, versions={key: 1 << 24 for key in data})
+
+
+def restart(data_dir: str, background: bool) -> dict:
+    start = time.perf_counter()
+    engine = KVEngine(data_dir, background_index_rebuild=background)
+    serving = time.perf_counter() - start
+    engine.get("doc:00000000")
+    engine.wait_for_indexes()
+    searchable = time.perf_counter() - start
+    assert engine.search_text("term1")
+    return {"serving_s": round(serving, 2), "searchable_s": round(searchable, 2)}
+
+
+def write_latency(data_dir: str, writes: int) -> dict:
+    engine = KVEngine(data_dir)
+    engine.wait_for_indexes()
+    start = time.perf_counter()
+    for idx in range(writes):
+        engine.set(f"doc:{idx:08d}", {"text": f"rewritten term{idx}"})
+    elapsed = time.perf_counter() - start
+    engine.close()
+    return {"set_ms": round(elapsed / writes * 1e3, 1)}
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Restart time: rebuilding indexes versus loading the index checkpoint")
+    parser.add_argument("--docs", type=int, default=200_000)
+    parser.add_argument("--words", type=int, default=30, help="Words per document")
+    parser.add_argument("--vocabulary", type=int, default=5000)
+    parser.add_argument("--dim", type=int, default=32)
+    parser.add_argument("--writes", type=int, default=20, help="Sets timed after the restarts; each rewrites the snapshot")
+    parser.add_argument("--no-fsync", action="store_true", help="Skip fsync, leaving serialization cost only")
+    args = parser.parse_args()
+    if args.no_fsync:
+        os.fsync = lambda fd: None
+
+    with tempfile.TemporaryDirectory() as tmp:
+        build(tmp, args.docs, args.words, args.vocabulary, args.dim)
+        index_file = os.path.join(tmp, "indexes.snap")
+        for name, background in (("rebuild", False), ("background_rebuild", True), ("checkpoint", False)):
+            if name != "checkpoint" and os.path.exists(index_file):
+                os.remove(index_file)
+            result = restart(tmp, background)
+            size = os.path.getsize(index_file) / 2**20 if os.path.exists(index_file) else 0.0
+            print(json.dumps({"docs": args.docs, "startup": name, **result, "index_file_mb": round(size, 1)}))
+        if args.writes:
+            print(json.dumps({"docs": args.docs, "writes": args.writes, **write_latency(tmp, args.writes)}))
+
+
+if __name__ == "__main__":
+    main()
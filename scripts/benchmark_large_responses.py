@@ -0,0 +1,125 @@
+from __future__ import annotations
+
+import argparse
+import cProfile
+import io
+import json
+import pstats
+import random
+import socket
+import socketserver
+import tempfile
+import threading
+import time
+from typing import Callable, Dict, List
+
+from kvstore.client import KVClient
+from kvstore.config import ClusterConfig
+from kvstore.protocol import ProtocolError, decode_message, encode_message
+from kvstore.server import KVRequestHandler, KVServer
+
+
+def free_port() -> int:
+    sock = socket.socket()
+    sock.bind(("127.0.0.1", 0))
+    port = sock.getsockname()[1]
+    sock.close()
+    return port
+
+
+class LegacyHandler(socketserver.StreamRequestHandler):
+    """The previous handler: readline, decode, one write per response."""
+
+    def handle(self) -> None:
+        while True:
+            raw = self.rfile.readline()
+            if not raw:
+                return
+            try:
+                request = decode_message(raw)
+            except ProtocolError:
+                return
+            self.wfile.write(encode_message(self.server.handle_request(request)))
+
+
+class LegacyClient(KVClient):
+    """The previous client read loop: 4 KiB ``recv`` calls joined by ``buffer += chunk``."""
+
+    def _request(self, payload: dict) -> dict:
+        with socket.create_connection((self.host, self.port), timeout=self.timeout) as sock:
+            sock.sendall(encode_message(payload))
+            buffer = b""
+            while not buffer.endswith(b"\n"):
+                chunk = sock.recv(4096)
+                if not chunk:
+                    break
+                buffer += chunk
+        return decode_message(buffer)
+
+
+def measure(call: Callable[[], object], repeats: int) -> Dict[str, float]:
+    samples: List[float] = []
+    for _ in range(repeats):
+        start = time.perf_counter()
+        call()
+        samples.append(time.perf_counter() - start)
+    samples.sort()
+    return {"p50_ms": round(samples[len(samples) // 2] * 1000, 2), "max_ms": round(samples[-1] * 1000, 2)}
+
+
+def profile(call: Callable[[], object], repeats: int, top: int) -> List[str]:
+    profiler = cProfile.Profile()
+    profiler.enable()
+    for _ in range(repeats):
+        call()
+    profiler.disable()
+    stream = io.StringIO()
+    pstats.Stats(profiler, stream=stream).sort_stats("tottime").print_stats(top)
+    return [line.strip() for line in stream.getvalue().splitlines() if "(" in line and "ncalls" not in line][:top]
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Large scan / vector_search responses: buffered server and client versus the old loops")
+    parser.add_argument("--keys", type=int, default=50000)
+    parser.add_argument("--value-size", type=int, default=100)
+    parser.add_argument("--scan-limits", type=int, nargs="+", default=[1000, 10000, 50000])
+    parser.add_argument("--vectors", type=int, default=5000)
+    parser.add_argument("--dim", type=int, default=32)
+    parser.add_argument("--top-k", type=int, default=2000)
+    parser.add_argument("--repeats", type=int, default=10)
+    parser.add_argument("--profile", action="store_true", help="Print the client-side cProfile top functions per run")
+    args = parser.parse_args()
+
+    rng = random.Random(1)
+    with tempfile.TemporaryDirectory() as tmp:
+        config = ClusterConfig(node_id=1, host="127.0.0.1", port=free_port(), data_dir=tmp, anti_entropy_interval=0.0)
+        server = KVServer(config)
+        threading.Thread(target=server.start, daemon=True).start()
+        time.sleep(0.2)
+        loader = KVClient(config.host, config.port, timeout=60.0)
+        for start in range(0, args.keys, 5000):
+            loader.bulk_set([(f"key:{idx:08d}", "v" * args.value_size) for idx in range(start, min(args.keys, start + 5000))])
+        loader.bulk_set([(f"vec:{idx}", {"vector": [rng.uniform(-1, 1) for _ in range(args.dim)]}) for idx in range(args.vectors)])
+        query = [rng.uniform(-1, 1) for _ in range(args.dim)]
+
+        try:
+            for variant in ("legacy", "buffered"):
+                legacy = variant == "legacy"
+                server.RequestHandlerClass = LegacyHandler if legacy else KVRequestHandler
+                client = (LegacyClient if legacy else KVClient)(config.host, config.port, timeout=60.0)
+                workloads: Dict[str, Callable[[], object]] = {
+                    f"scan_{limit}": (lambda limit=limit: client.scan("key:", limit=limit)) for limit in args.scan_limits
+                }
+                workloads[f"vector_search_top{args.top_k}"] = lambda: client.vector_search(query, top_k=args.top_k)
+                for name, call in workloads.items():
+                    call()
+                    result = {"variant": variant, "workload": name, **measure(call, args.repeats)}
+                    if args.profile:
+                        result["profile"] = profile(call, args.repeats, 8)
+                    print(json.dumps(result))
+        finally:
+            server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,139 @@
+from __future__ import annotations
+
+import argparse
+import json
+import os
+import random
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+from collections.abc import Mapping
+from pathlib import Path
+from typing import Any, Dict, Iterator
+
+import kvstore
+from kvstore.client import KVClient
+from kvstore.storage import StorageEngine
+
+
+def free_port() -> int:
+    sock = socket.socket()
+    sock.bind(("127.0.0.1", 0))
+    port = sock.getsockname()[1]
+    sock.close()
+    return port
+
+
+class Synthetic(Mapping):
+    """``keys`` generated records, so the snapshot can be written without holding them in memory."""
+
+    def __init__(self, keys: int, value_size: int, versions: bool = False) -> None:
+        self.keys_count = keys
+        self.value_size = value_size
+        self.versions = versions
+
+    def _index(self, key: str) -> int:
+        if not key.startswith("user:"):
+            raise KeyError(key)
+        idx = int(key[5:])
+        if not 0 <= idx < self.keys_count:
+            raise KeyError(key)
+        return idx
+
+    def __getitem__(self, key: str) -> Any:
+        idx = self._index(key)
+        if self.versions:
+            return (1 << 24) + idx
+        return {"name": f"user-{idx}", "bio": "x" * self.value_size, "n": idx}
+
+    def __contains__(self, key: object) -> bool:
+        return isinstance(key, str) and key.startswith("user:") and 0 <= int(key[5:]) < self.keys_count
+
+    def __iter__(self) -> Iterator[str]:
+        return (f"user:{idx:09d}" for idx in range(self.keys_count))
+
+    def __len__(self) -> int:
+        return self.keys_count
+
+
+def memory_kb(pid: int) -> Dict[str, int]:
+    fields: Dict[str, int] = {}
+    with open(f"/proc/{pid}/status", "r", encoding="utf-8") as handle:
+        for line in handle:
+            name, _, rest = line.partition(":")
+            if name in ("VmRSS", "RssAnon", "RssFile"):
+                fields[name] = int(rest.split()[0])
+    return fields
+
+
+def start_node(data_dir: Path, lazy: bool, value_cache: int) -> tuple[subprocess.Popen, int, float]:
+    port = free_port()
+    env = dict(os.environ, PYTHONPATH=str(Path(kvstore.__file__).resolve().parents[1]))
+    command = [
+        sys.executable, "-m", "kvstore.cli", "--port", str(port), "--data-dir", str(data_dir),
+        "--anti-entropy-interval", "0", "--value-cache", str(value_cache),
+    ]
+    if lazy:
+        command.append("--lazy-values")
+    start = time.perf_counter()
+    process = subprocess.Popen(command, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    client = KVClient("127.0.0.1", port, timeout=5.0)
+    while True:
+        try:
+            client.get("user:000000000")
+            return process, port, time.perf_counter() - start
+        except OSError:
+            if process.poll() is not None:
+                raise RuntimeError("node exited during startup")
+            time.sleep(0.05)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Time to first request and memory: eager snapshot load versus lazily decoded values")
+    parser.add_argument("--keys", type=int, nargs="+", default=[1_000_000])
+    parser.add_argument("--value-size", type=int, default=64)
+    parser.add_argument("--layouts", nargs="+", choices=["eager", "lazy"], default=["eager", "lazy"])
+    parser.add_argument("--value-cache", type=int, default=0)
+    parser.add_argument("--reads", type=int, default=10000, help="Random gets after startup, to show the cost of warm values")
+    args = parser.parse_args()
+
+    rng = random.Random(1)
+    for keys in args.keys:
+        for layout in args.layouts:
+            lazy = layout == "lazy"
+            with tempfile.TemporaryDirectory() as tmp:
+                storage = StorageEngine(tmp, lazy_values=lazy)
+                storage.save_snapshot(Synthetic(keys, args.value_size), versions=Synthetic(keys, 0, versions=True))
+                file_mb = os.path.getsize(os.path.join(tmp, "data.snap")) / 2**20
+                process, port, ttfr = start_node(Path(tmp), lazy, args.value_cache)
+                try:
+                    started = memory_kb(process.pid)
+                    client = KVClient("127.0.0.1", port)
+                    begin = time.perf_counter()
+                    for _ in range(args.reads):
+                        client.get(f"user:{rng.randrange(keys):09d}")
+                    get_us = (time.perf_counter() - begin) / args.reads * 1e6
+                    warmed = memory_kb(process.pid)
+                finally:
+                    process.terminate()
+                    process.wait()
+            print(
+                json.dumps(
+                    {
+                        "keys": keys,
+                        "layout": layout,
+                        "file_mb": round(file_mb, 1),
+                        "time_to_first_request_s": round(ttfr, 2),
+                        "rss_mb": round(started["VmRSS"] / 1024, 1),
+                        "anon_mb": round(started["RssAnon"] / 1024, 1),
+                        "get_us": round(get_us, 1),
+                        f"anon_mb_after_{args.reads}_gets": round(warmed["RssAnon"] / 1024, 1),
+                    }
+                )
+            )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,364 @@
+from __future__ import annotations
+
+import argparse
+import contextlib
+import gc
+import json
+import os
+import random
+import sys
+import tempfile
+import time
+import tracemalloc
+from typing import Any, Callable, Dict, List, Tuple
+from unittest import mock
+
+from datastore.backup_manager import JournalEntry, PersistenceEngine
+from datastore.lookup_tables import EmbeddingIndex, FullTextIndex, ValueIndex
+from datastore.memory_engine import DatastoreCore
+from kvstore.engine import KVEngine
+from kvstore.indexing import InvertedIndex, SecondaryIndex, VectorIndex
+from kvstore.storage import StorageEngine, WALEntry
+
+# A case builds its fixture with ``setup(stack, args)`` and returns the operation to
+# time, called with the iteration number. ``cost`` divides --iterations for cases
+# that fsync or scan everything, so every case takes a comparable time.
+Setup = Callable[[contextlib.ExitStack, argparse.Namespace], Callable[[int], Any]]
+CASES: Dict[str, Tuple[Setup, int]] = {}
+
+
+def case(name: str, cost: int = 1) -> Callable[[Setup], Setup]:
+    def register(setup: Setup) -> Setup:
+        CASES[name] = (setup, cost)
+        return setup
+
+    return register
+
+
+def vector(rng: random.Random, dim: int) -> List[float]:
+    return [rng.gauss(0, 1) for _ in range(dim)]
+
+
+def dataset(args: argparse.Namespace) -> List[Tuple[str, Any]]:
+    """Text documents, tagged string values and embeddings, like the search benchmarks."""
+    rng = random.Random(args.seed)
+    items: List[Tuple[str, Any]] = [(f"doc:{idx:08d}", {"text": f"word{idx % 500} body common"}) for idx in range(args.keys)]
+    items += [(f"tag:{idx:08d}", f"value{idx % 100}") for idx in range(args.keys)]
+    items += [(f"vec:{idx:08d}", {"vector": vector(rng, args.dim)}) for idx in range(args.vectors)]
+    return items
+
+
+def loaded(stack: contextlib.ExitStack, args: argparse.Namespace, engine_type: type) -> Any:
+    tmp = stack.enter_context(tempfile.TemporaryDirectory())
+    engine = engine_type(tmp)
+    if hasattr(engine, "close"):
+        stack.callback(engine.close)
+    engine.bulk_set(dataset(args))
+    return engine
+
+
+# kvstore
+
+
+@case("kvstore.engine.get")
+def _(stack: contextlib.ExitStack, args: argparse.Namespace) -> Callable[[int], Any]:
+    engine = loaded(stack, args, KVEngine)
+    return lambda i: engine.get(f"doc:{i % args.keys:08d}")
+
+
+@case("kvstore.engine.set", cost=20)
+def _(stack: contextlib.ExitStack, args: argparse.Namespace) -> Callable[[int], Any]:
+    engine = loaded(stack, args, KVEngine)
+    return lambda i: engine.set(f"doc:{i % args.keys:08d}", {"text": f"word{i % 500} rewritten"})
+
+
+@case("kvstore.engine.search_text")
+def _(stack: contextlib.ExitStack, args: argparse.Namespace) -> Callable[[int], Any]:
+    engine = loaded(stack, args, KVEngine)
+    return lambda i: engine.search_text(f"word{i % 500}")
+
+
+@case("kvstore.engine.search_by_value")
+def _(stack: contextlib.ExitStack, args: argparse.Namespace) -> Callable[[int], Any]:
+    engine = loaded(stack, args, KVEngine)
+    return lambda i: engine.search_by_value(f"value{i % 100}")
+
+
+@case("kvstore.engine.vector_search", cost=200)
+def _(stack: contextlib.ExitStack, args: argparse.Namespace) -> Callable[[int], Any]:
+    engine = loaded(stack, args, KVEngine)
+    query = vector(random.Random(args.seed + 1), args.dim)
+    return lambda i: engine.vector_search(query, top_k=10)
+
+
+@case("kvstore.storage.append_wal", cost=20)
+def _(stack: contextlib.ExitStack, args: argparse.Namespace) -> Callable[[int], Any]:
+    storage = StorageEngine(stack.enter_context(tempfile.TemporaryDirectory()))
+    return lambda i: storage.append_wal(WALEntry(op="set", data={"key": f"doc:{i}", "value": {"text": "body"}, "version": i}))
+
+
+@case("kvstore.storage.save_snapshot", cost=500)
+def _(stack: contextlib.ExitStack, args: argparse.Namespace) -> Callable[[int], Any]:
+    storage = StorageEngine(stack.enter_context(tempfile.TemporaryDirectory()))
+    data = dict(dataset(args))
+    versions = {key: 1 for key in data}
+    return lambda i: storage.save_snapshot(data, versions=versions)
+
+
+@case("kvstore.index.secondary.add_remove")
+def _(stack: contextlib.ExitStack, args: argparse.Namespace) -> Callable[[int], Any]:
+    index = SecondaryIndex()
+    for idx in range(args.keys):
+        index.add(f"tag:{idx}", f"value{idx % 100}")
+
+    def op(i: int) -> None:
+        index.add("tag:new", f"value{i % 100}")
+        index.remove("tag:new", f"value{i % 100}")
+
+    return op
+
+
+@case("kvstore.index.inverted.add_remove")
+def _(stack: contextlib.ExitStack, args: argparse.Namespace) -> Callable[[int], Any]:
+    index = InvertedIndex()
+    for idx in range(args.keys):
+        index.add_document(f"doc:{idx}", f"word{idx % 500} body common")
+
+    def op(i: int) -> None:
+        index.add_document("doc:new", f"word{i % 500} body")
+        index.remove_document("doc:new", f"word{i % 500} body")
+
+    return op
+
+
+@case("kvstore.index.inverted.search")
+def _(stack: contextlib.ExitStack, args: argparse.Namespace) -> Callable[[int], Any]:
+    index = InvertedIndex()
+    for idx in range(args.keys):
+        index.add_document(f"doc:{idx}", f"word{idx % 500} body common")
+    return lambda i: index.search(f"word{i % 500}")
+
+
+@case("kvstore.index.vector.add_remove")
+def _(stack: contextlib.ExitStack, args: argparse.Namespace) -> Callable[[int], Any]:
+    index = VectorIndex()
+    embedding = vector(random.Random(args.seed), args.dim)
+
+    def op(i: int) -> None:
+        index.add_vector(f"vec:{i}", embedding)
+        index.remove_vector(f"vec:{i}")
+
+    return op
+
+
+# datastore
+
+
+@case("datastore.engine.get")
+def _(stack: contextlib.ExitStack, args: argparse.Namespace) -> Callable[[int], Any]:
+    engine = loaded(stack, args, DatastoreCore)
+    return lambda i: engine.get(f"doc:{i % args.keys:08d}")
+
+
+@case("datastore.engine.set", cost=500)
+def _(stack: contextlib.ExitStack, args: argparse.Namespace) -> Callable[[int], Any]:
+    # Every datastore write rewrites the whole snapshot, hence the cost.
+    engine = loaded(stack, args, DatastoreCore)
+    return lambda i: engine.set(f"doc:{i % args.keys:08d}", {"text": f"word{i % 500} rewritten"})
+
+
+@case("datastore.engine.search_text")
+def _(stack: contextlib.ExitStack, args: argparse.Namespace) -> Callable[[int], Any]:
+    engine = loaded(stack, args, DatastoreCore)
+    return lambda i: engine.search_text(f"word{i % 500}")
+
+
+@case("datastore.engine.search_by_value")
+def _(stack: contextlib.ExitStack, args: argparse.Namespace) -> Callable[[int], Any]:
+    engine = loaded(stack, args, DatastoreCore)
+    return lambda i: engine.search_by_value(f"value{i % 100}")
+
+
+@case("datastore.engine.vector_search", cost=200)
+def _(stack: contextlib.ExitStack, args: argparse.Namespace) -> Callable[[int], Any]:
+    engine = loaded(stack, args, DatastoreCore)
+    query = vector(random.Random(args.seed + 1), args.dim)
+    return lambda i: engine.vector_search(query, top_k=10)
+
+
+@case("datastore.storage.append_wal", cost=20)
+def _(stack: contextlib.ExitStack, args: argparse.Namespace) -> Callable[[int], Any]:
+    persistence = PersistenceEngine(stack.enter_context(tempfile.TemporaryDirectory()))
+    return lambda i: persistence.append_journal(JournalEntry(op="set", data={"key": f"doc:{i}", "value": {"text": "body"}}))
+
+
+@case("datastore.storage.save_snapshot", cost=500)
+def _(stack: contextlib.ExitStack, args: argparse.Namespace) -> Callable[[int], Any]:
+    persistence = PersistenceEngine(stack.enter_context(tempfile.TemporaryDirectory()))
+    data = dict(dataset(args))
+    return lambda i: persistence.save_snapshot(data)
+
+
+@case("datastore.index.secondary.add_remove")
+def _(stack: contextlib.ExitStack, args: argparse.Namespace) -> Callable[[int], Any]:
+    index = ValueIndex()
+    for idx in range(args.keys):
+        index.add(f"tag:{idx}", f"value{idx % 100}")
+
+    def op(i: int) -> None:
+        index.add("tag:new", f"value{i % 100}")
+        index.remove("tag:new", f"value{i % 100}")
+
+    return op
+
+
+@case("datastore.index.inverted.add_remove")
+def _(stack: contextlib.ExitStack, args: argparse.Namespace) -> Callable[[int], Any]:
+    index = FullTextIndex()
+    for idx in range(args.keys):
+        index.add_document(f"doc:{idx}", f"word{idx % 500} body common")
+
+    def op(i: int) -> None:
+        index.add_document("doc:new", f"word{i % 500} body")
+        index.remove_document("doc:new", f"word{i % 500} body")
+
+    return op
+
+
+@case("datastore.index.inverted.search")
+def _(stack: contextlib.ExitStack, args: argparse.Namespace) -> Callable[[int], Any]:
+    index = FullTextIndex()
+    for idx in range(args.keys):
+        index.add_document(f"doc:{idx}", f"word{idx % 500} body common")
+    return lambda i: index.search(f"word{i % 500}")
+
+
+@case("datastore.index.vector.add_remove")
+def _(stack: contextlib.ExitStack, args: argparse.Namespace) -> Callable[[int], Any]:
+    index = EmbeddingIndex()
+    embedding = vector(random.Random(args.seed), args.dim)
+
+    def op(i: int) -> None:
+        index.add_vector(f"vec:{i}", embedding)
+        index.remove_vector(f"vec:{i}")
+
+    return op
+
+
+def time_op(op: Callable[[int], Any], iterations: int, repeats: int) -> float:
+    """Best ns/op over ``repeats`` runs; the garbage collector is off while timing."""
+    best = float("inf")
+    gc.disable()
+    try:
+        for _ in range(repeats):
+            start = time.perf_counter_ns()
+            for i in range(iterations):
+                op(i)
+            best = min(best, (time.perf_counter_ns() - start) / iterations)
+    finally:
+        gc.enable()
+    return best
+
+
+def allocations(op: Callable[[int], Any], iterations: int) -> Dict[str, float]:
+    """Blocks and bytes still allocated after ``iterations`` calls, and the transient peak, per op.
+
+    tracemalloc sees net allocations, so a call that frees everything it allocated
+    shows zero retained blocks; ``peak_bytes_per_op`` catches its temporaries.
+    """
+    gc.collect()
+    tracemalloc.start()
+    try:
+        before = tracemalloc.take_snapshot()
+        base, _ = tracemalloc.get_traced_memory()
+        tracemalloc.reset_peak()
+        for i in range(iterations):
+            op(i)
+        _, peak = tracemalloc.get_traced_memory()
+        after = tracemalloc.take_snapshot()
+    finally:
+        tracemalloc.stop()
+    ignore = [tracemalloc.Filter(False, tracemalloc.__file__)]
+    diff = after.filter_traces(ignore).compare_to(before.filter_traces(ignore), "filename")
+    return {
+        "retained_blocks_per_op": round(sum(stat.count_diff for stat in diff) / iterations, 2),
+        "retained_bytes_per_op": round(sum(stat.size_diff for stat in diff) / iterations, 1),
+        "peak_bytes_per_op": round((peak - base) / iterations, 1),
+    }
+
+
+def run_case(name: str, args: argparse.Namespace) -> Dict[str, Any]:
+    setup, cost = CASES[name]
+    iterations = max(1, args.iterations // cost)
+    with contextlib.ExitStack() as stack:
+        op = setup(stack, args)
+        for i in range(min(iterations, 100)):
+            op(i)  # warm caches and lazily built state
+        result: Dict[str, Any] = {"case": name, "iterations": iterations}
+        result["ns_per_op"] = round(time_op(op, iterations, args.repeats), 1)
+        result.update(allocations(op, max(1, min(iterations, args.alloc_iterations))))
+    return result
+
+
+def compare(baseline: Dict[str, Any], candidate: Dict[str, Any], threshold: float) -> List[Dict[str, Any]]:
+    rows = []
+    for name in sorted(set(baseline["results"]) | set(candidate["results"])):
+        old, new = baseline["results"].get(name), candidate["results"].get(name)
+        if old is None or new is None:
+            rows.append({"case": name, "only_in": "baseline" if new is None else "candidate"})
+            continue
+        change = (new["ns_per_op"] / old["ns_per_op"] - 1) * 100 if old["ns_per_op"] else 0.0
+        rows.append({
+            "case": name,
+            "ns_per_op": [old["ns_per_op"], new["ns_per_op"]],
+            "change_pct": round(change, 1),
+            "retained_bytes_per_op": [old["retained_bytes_per_op"], new["retained_bytes_per_op"]],
+            "verdict": "slower" if change > threshold else "faster" if change < -threshold else "same",
+        })
+    return rows
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="In-process microbenchmarks of engines, storage and indexes, without TCP")
+    parser.add_argument("--cases", nargs="*", default=[], help="Substrings selecting cases; all by default")
+    parser.add_argument("--list", action="store_true", help="Print case names and exit")
+    parser.add_argument("--iterations", type=int, default=20_000, help="Calls per timing run, divided by each case's cost")
+    parser.add_argument("--repeats", type=int, default=3, help="Timing runs per case; the fastest is reported")
+    parser.add_argument("--alloc-iterations", type=int, default=1000, help="Calls traced by tracemalloc per case")
+    parser.add_argument("--no-fsync", action="store_true", help="Replace os.fsync with a no-op to isolate CPU cost")
+    parser.add_argument("--keys", type=int, default=10_000, help="Documents and tagged values loaded before each case")
+    parser.add_argument("--vectors", type=int, default=1000)
+    parser.add_argument("--dim", type=int, default=64)
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--output", help="Also write the run to this JSON file, for --compare")
+    parser.add_argument("--compare", nargs=2, metavar=("BASELINE", "CANDIDATE"), help="Diff two saved runs instead of running")
+    parser.add_argument("--threshold", type=float, default=10.0, help="Percent change in ns/op reported as slower or faster")
+    args = parser.parse_args()
+
+    if args.list:
+        print("\n".join(CASES))
+        return
+    if args.compare:
+        runs = []
+        for path in args.compare:
+            with open(path, "r", encoding="utf-8") as handle:
+                runs.append(json.load(handle))
+        for row in compare(runs[0], runs[1], args.threshold):
+            print(json.dumps(row))
+        return
+
+    names = [name for name in CASES if not args.cases or any(part in name for part in args.cases)]
+    meta = {"python": sys.version.split()[0], "cpus": os.cpu_count(), "fsync": not args.no_fsync, "keys": args.keys}
+    print(json.dumps(meta), flush=True)
+    results: Dict[str, Dict[str, Any]] = {}
+    with mock.patch("os.fsync", lambda fd: None) if args.no_fsync else contextlib.nullcontext():
+        for name in names:
+            results[name] = run_case(name, args)
+            print(json.dumps(results[name]), flush=True)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as handle:
+            json.dump({"meta": meta, "results": results}, handle, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,129 @@
+from __future__ import annotations
+
+import argparse
+import json
+import os
+import socket
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from pathlib import Path
+
+import kvstore
+from kvstore.client import PartitionedKVClient
+from kvstore.config import NodeConfig
+from kvstore.storage import StorageEngine
+
+
+def free_port() -> int:
+    sock = socket.socket()
+    sock.bind(("127.0.0.1", 0))
+    port = sock.getsockname()[1]
+    sock.close()
+    return port
+
+
+def wait_for_server(host: str, port: int, timeout: float = 10.0) -> None:
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        try:
+            with socket.create_connection((host, port), timeout=1.0):
+                return
+        except OSError:
+            time.sleep(0.1)
+    raise SystemExit(f"Server {host}:{port} did not become ready in time")
+
+
+def rss_kib(pid: int) -> int:
+    try:
+        with open(f"/proc/{pid}/status", "r", encoding="utf-8") as handle:
+            for line in handle:
+                if line.startswith("VmRSS:"):
+                    return int(line.split()[1])
+    except OSError:
+        pass
+    return 0
+
+
+def stored_keys(data_dir: Path) -> int:
+    if not data_dir.exists():
+        return 0
+    return len(StorageEngine(str(data_dir)).load())
+
+
+def start_cluster(base: Path, count: int, replication_factor: int) -> tuple[list[NodeConfig], list[subprocess.Popen]]:
+    nodes = [NodeConfig(node_id, "127.0.0.1", free_port()) for node_id in range(1, count + 1)]
+    env = dict(os.environ, PYTHONPATH=str(Path(kvstore.__file__).resolve().parents[1]))
+    processes = []
+    for node in nodes:
+        peers = [{"node_id": p.node_id, "host": p.host, "port": p.port} for p in nodes if p.node_id != node.node_id]
+        command = [
+            sys.executable, "-m", "kvstore.cli",
+            "--host", node.host, "--port", str(node.port), "--node-id", str(node.node_id),
+            "--data-dir", str(base / f"node_{node.node_id}"), "--mode", "dynamo",
+            "--replication-factor", str(replication_factor), "--peers", json.dumps(peers),
+        ]
+        processes.append(subprocess.Popen(command, env=env))
+    for node in nodes:
+        wait_for_server(node.host, node.port)
+    return nodes, processes
+
+
+def run(count: int, nodes_count: int, replication_factor: int, threads: int, value_size: int) -> dict:
+    with tempfile.TemporaryDirectory() as tmp:
+        base = Path(tmp)
+        nodes, processes = start_cluster(base, nodes_count, replication_factor)
+        baseline = [rss_kib(process.pid) for process in processes]
+        value = "x" * value_size
+        per_thread = count // threads
+
+        def worker(offset: int) -> None:
+            client = PartitionedKVClient(nodes, replication_factor=replication_factor)
+            for idx in range(offset, offset + per_thread):
+                client.set(f"k{idx}", value)
+
+        workers = [threading.Thread(target=worker, args=(n * per_thread,)) for n in range(threads)]
+        start = time.perf_counter()
+        for thread in workers:
+            thread.start()
+        for thread in workers:
+            thread.join()
+        duration = time.perf_counter() - start
+        time.sleep(0.5)
+
+        rss = [rss_kib(process.pid) for process in processes]
+        for process in processes:
+            process.terminate()
+            process.wait(timeout=5)
+        keys = [stored_keys(base / f"node_{node.node_id}") for node in nodes]
+
+    writes = per_thread * threads
+    return {
+        "nodes": nodes_count,
+        "replication_factor": replication_factor,
+        "writes": writes,
+        "duration_s": round(duration, 3),
+        "throughput_ops": round(writes / duration, 1),
+        "keys_per_node": keys,
+        "rss_growth_kib_per_node": [after - before for before, after in zip(baseline, rss)],
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Dynamo partitioning benchmark (aggregate throughput, per-node memory)")
+    parser.add_argument("--nodes", type=int, nargs="+", default=[3, 6])
+    parser.add_argument("--replication-factor", type=int, default=2)
+    parser.add_argument("--count", type=int, default=2000)
+    parser.add_argument("--threads", type=int, default=8)
+    parser.add_argument("--value-size", type=int, default=64)
+    args = parser.parse_args()
+
+    for nodes_count in args.nodes:
+        result = run(args.count, nodes_count, args.replication_factor, args.threads, args.value_size)
+        print(json.dumps(result))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,113 @@
+from __future__ import annotations
+
+import argparse
+import io
+import json
+import random
+import socket
+import tempfile
+import threading
+import time
+from typing import Any, Callable, Dict, Tuple
+
+from kvstore.client import KVClient
+from kvstore.config import ClusterConfig
+from kvstore.protocol import Float32Array, decode_message, encode_frame, encode_message, read_frame
+from kvstore.server import KVServer
+
+
+def free_port() -> int:
+    sock = socket.socket()
+    sock.bind(("127.0.0.1", 0))
+    port = sock.getsockname()[1]
+    sock.close()
+    return port
+
+
+def messages(dim: int, value_size: int, top_k: int) -> Dict[str, Tuple[dict, dict]]:
+    rng = random.Random(1)
+    value = {"text": "x" * value_size, "n": 42, "tags": ["a", "b", "c"]}
+    hits = [{"key": f"doc:{idx}", "score": rng.random()} for idx in range(top_k)]
+    return {
+        "get": ({"op": "get", "key": "user:12345"}, {"status": "ok", "result": value}),
+        "set": ({"op": "set", "key": "user:12345", "value": value}, {"status": "ok"}),
+        "vector_search": (
+            {"op": "vector_search", "vector": Float32Array(rng.uniform(-1, 1) for _ in range(dim)), "top_k": top_k},
+            {"status": "ok", "result": hits},
+        ),
+    }
+
+
+def codec_cost(request: dict, response: dict, binary: bool, iterations: int) -> dict:
+    if binary:
+        encode: Callable[[dict], bytes] = encode_frame
+        decode: Callable[[bytes], Any] = lambda raw: read_frame(io.BytesIO(raw))
+    else:
+        encode, decode = encode_message, decode_message
+    wire = encode(request) + encode(response)
+    start = time.perf_counter()
+    for _ in range(iterations):
+        encoded_request = encode(request)
+        encoded_response = encode(response)
+    encode_us = (time.perf_counter() - start) / iterations * 1e6
+    start = time.perf_counter()
+    for _ in range(iterations):
+        decode(encoded_request)
+        decode(encoded_response)
+    decode_us = (time.perf_counter() - start) / iterations * 1e6
+    return {"bytes": len(wire), "encode_us": round(encode_us, 1), "decode_us": round(decode_us, 1)}
+
+
+def end_to_end(client: KVClient, op: str, dim: int, value_size: int, top_k: int, duration: float) -> float:
+    rng = random.Random(2)
+    vector = [rng.uniform(-1, 1) for _ in range(dim)]
+    value = {"text": "x" * value_size, "n": 42}
+    actions = {
+        "get": lambda: client.get("user:1"),
+        "set": lambda: client.set("user:1", value),
+        "vector_search": lambda: client.vector_search(vector, top_k=top_k),
+    }
+    count = 0
+    deadline = time.perf_counter() + duration
+    while time.perf_counter() < deadline:
+        actions[op]()
+        count += 1
+    return round(count / duration, 1)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="JSON-lines versus binary frames: codec cost, wire bytes and round trips")
+    parser.add_argument("--dim", type=int, default=128)
+    parser.add_argument("--value-size", type=int, default=256)
+    parser.add_argument("--top-k", type=int, default=10)
+    parser.add_argument("--vectors", type=int, default=500, help="Vectors loaded for the end-to-end search")
+    parser.add_argument("--iterations", type=int, default=2000)
+    parser.add_argument("--duration", type=float, default=3.0)
+    args = parser.parse_args()
+
+    for op, (request, response) in messages(args.dim, args.value_size, args.top_k).items():
+        for binary in (False, True):
+            result = codec_cost(request, response, binary, args.iterations)
+            print(json.dumps({"phase": "codec", "op": op, "protocol": "binary" if binary else "json", **result}))
+
+    with tempfile.TemporaryDirectory() as tmp:
+        config = ClusterConfig(node_id=1, host="127.0.0.1", port=free_port(), data_dir=tmp, anti_entropy_interval=0.0)
+        server = KVServer(config)
+        threading.Thread(target=server.start, daemon=True).start()
+        time.sleep(0.2)
+        rng = random.Random(3)
+        loader = KVClient(config.host, config.port, binary=True)
+        for idx in range(args.vectors):
+            loader.add_vector(f"v{idx}", [rng.uniform(-1, 1) for _ in range(args.dim)])
+        try:
+            for op in ("get", "set", "vector_search"):
+                for binary in (False, True):
+                    client = KVClient(config.host, config.port, binary=binary)
+                    ops = end_to_end(client, op, args.dim, args.value_size, args.top_k, args.duration)
+                    print(json.dumps({"phase": "round_trip", "op": op, "protocol": "binary" if binary else "json", "ops_per_sec": ops}))
+        finally:
+            server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,112 @@
+from __future__ import annotations
+
+import argparse
+import json
+import os
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+import kvstore
+from kvstore.client import KVClient
+from kvstore.config import NodeConfig
+
+
+def free_port() -> int:
+    sock = socket.socket()
+    sock.bind(("127.0.0.1", 0))
+    port = sock.getsockname()[1]
+    sock.close()
+    return port
+
+
+def wait_for_server(host: str, port: int, timeout: float = 10.0) -> None:
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        try:
+            with socket.create_connection((host, port), timeout=1.0):
+                return
+        except OSError:
+            time.sleep(0.1)
+    raise SystemExit(f"Server {host}:{port} did not become ready in time")
+
+
+def percentiles(samples: list[float]) -> dict:
+    ordered = sorted(samples)
+
+    def pick(fraction: float) -> float:
+        return round(ordered[min(len(ordered) - 1, int(fraction * len(ordered)))] * 1000, 3)
+
+    return {"p50_ms": pick(0.50), "p95_ms": pick(0.95), "p99_ms": pick(0.99), "max_ms": round(ordered[-1] * 1000, 3)}
+
+
+def start_cluster(base: Path, slow_delay: float, hedge_delay: float) -> tuple[list[NodeConfig], list[subprocess.Popen]]:
+    nodes = [NodeConfig(node_id, "127.0.0.1", free_port()) for node_id in range(1, 4)]
+    env = dict(os.environ, PYTHONPATH=str(Path(kvstore.__file__).resolve().parents[1]))
+    processes = []
+    for node in nodes:
+        peers = [{"node_id": p.node_id, "host": p.host, "port": p.port} for p in nodes if p.node_id != node.node_id]
+        command = [
+            sys.executable, "-m", "kvstore.cli",
+            "--host", node.host, "--port", str(node.port), "--node-id", str(node.node_id),
+            "--data-dir", str(base / f"node_{node.node_id}"), "--mode", "dynamo",
+            "--replication-factor", "3", "--hedge-delay", str(hedge_delay), "--peers", json.dumps(peers),
+        ]
+        if node.node_id == 3:
+            command += ["--response-delay", str(slow_delay)]
+        processes.append(subprocess.Popen(command, env=env))
+    for node in nodes:
+        wait_for_server(node.host, node.port)
+    return nodes, processes
+
+
+def run(ops: int, settings: list[tuple[int, int]], slow_delay: float, hedge_delay: float) -> list[dict]:
+    results = []
+    with tempfile.TemporaryDirectory() as tmp:
+        nodes, processes = start_cluster(Path(tmp), slow_delay, hedge_delay)
+        client = KVClient(nodes[0].host, nodes[0].port, timeout=10.0)
+        try:
+            for r, w in settings:
+                writes, reads = [], []
+                for idx in range(ops):
+                    start = time.perf_counter()
+                    client.set(f"k{idx}", idx, w=w)
+                    writes.append(time.perf_counter() - start)
+                for idx in range(ops):
+                    start = time.perf_counter()
+                    client.get(f"k{idx}", r=r)
+                    reads.append(time.perf_counter() - start)
+                results.append({
+                    "r": r,
+                    "w": w,
+                    "hedge_delay_s": hedge_delay,
+                    "slow_node_delay_s": slow_delay,
+                    "write": percentiles(writes),
+                    "read": percentiles(reads),
+                })
+        finally:
+            for process in processes:
+                process.terminate()
+                process.wait(timeout=5)
+    return results
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Quorum latency benchmark with one slow replica (N=3)")
+    parser.add_argument("--ops", type=int, default=200)
+    parser.add_argument("--settings", default="1:1,2:2,1:3,3:1,3:3", help="Comma separated R:W pairs")
+    parser.add_argument("--slow-delay", type=float, default=0.05, help="Seconds added to every reply of node 3")
+    parser.add_argument("--hedge-delays", type=float, nargs="+", default=[0.0, 0.01])
+    args = parser.parse_args()
+
+    settings = [tuple(int(part) for part in pair.split(":")) for pair in args.settings.split(",")]
+    for hedge_delay in args.hedge_delays:
+        for result in run(args.ops, settings, args.slow_delay, hedge_delay):
+            print(json.dumps(result))
+
+
+if __name__ == "__main__":
+    main()
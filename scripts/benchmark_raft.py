@@ -0,0 +1,135 @@
+from __future__ import annotations
+
+import argparse
+import json
+import os
+import socket
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from pathlib import Path
+
+import kvstore
+from kvstore.client import KVClient
+from kvstore.config import NodeConfig
+
+
+def free_port() -> int:
+    sock = socket.socket()
+    sock.bind(("127.0.0.1", 0))
+    port = sock.getsockname()[1]
+    sock.close()
+    return port
+
+
+def wait_for_server(host: str, port: int, timeout: float = 10.0) -> None:
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        try:
+            with socket.create_connection((host, port), timeout=1.0):
+                return
+        except OSError:
+            time.sleep(0.1)
+    raise SystemExit(f"Server {host}:{port} did not become ready in time")
+
+
+def percentiles(samples: list[float]) -> dict:
+    ordered = sorted(samples)
+
+    def pick(fraction: float) -> float:
+        return round(ordered[min(len(ordered) - 1, int(fraction * len(ordered)))] * 1000, 3)
+
+    return {"p50_ms": pick(0.50), "p99_ms": pick(0.99)}
+
+
+def start_cluster(base: Path, size: int, consensus: str) -> tuple[list[NodeConfig], list[subprocess.Popen]]:
+    nodes = [NodeConfig(node_id, "127.0.0.1", free_port()) for node_id in range(1, size + 1)]
+    env = dict(os.environ, PYTHONPATH=str(Path(kvstore.__file__).resolve().parents[1]))
+    processes = []
+    for node in nodes:
+        peers = [{"node_id": p.node_id, "host": p.host, "port": p.port} for p in nodes if p.node_id != node.node_id]
+        command = [
+            sys.executable, "-m", "kvstore.cli",
+            "--host", node.host, "--port", str(node.port), "--node-id", str(node.node_id),
+            "--data-dir", str(base / f"node_{node.node_id}"),
+            "--role", "primary" if node.node_id == 1 else "secondary",
+            "--consensus", consensus, "--anti-entropy-interval", "0", "--peers", json.dumps(peers),
+        ]
+        processes.append(subprocess.Popen(command, env=env))
+    for node in nodes:
+        wait_for_server(node.host, node.port)
+    return nodes, processes
+
+
+def find_leader(nodes: list[NodeConfig], timeout: float = 10.0) -> NodeConfig:
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        for node in nodes:
+            if KVClient(node.host, node.port).request({"op": "who_is_primary"}).get("role") == "primary":
+                return node
+        time.sleep(0.05)
+    raise SystemExit("No leader elected in time")
+
+
+def run(size: int, consensus: str, clients: int, ops: int) -> dict:
+    with tempfile.TemporaryDirectory() as tmp:
+        nodes, processes = start_cluster(Path(tmp), size, consensus)
+        try:
+            leader = find_leader(nodes)
+            writes: list[float] = []
+            errors = [0]
+
+            def writer(worker: int) -> None:
+                client = KVClient(leader.host, leader.port, timeout=10.0)
+                for idx in range(ops):
+                    start = time.perf_counter()
+                    response = client.request({"op": "set", "key": f"w{worker}-{idx}", "value": idx})
+                    writes.append(time.perf_counter() - start)
+                    if response.get("status") != "ok":
+                        errors[0] += 1
+
+            threads = [threading.Thread(target=writer, args=(worker,)) for worker in range(clients)]
+            started = time.perf_counter()
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join()
+            elapsed = time.perf_counter() - started
+
+            client = KVClient(leader.host, leader.port)
+            reads = []
+            for idx in range(ops):
+                start = time.perf_counter()
+                client.get(f"w0-{idx}")
+                reads.append(time.perf_counter() - start)
+        finally:
+            for process in processes:
+                process.terminate()
+                process.wait(timeout=5)
+    return {
+        "nodes": size,
+        "consensus": consensus,
+        "clients": clients,
+        "write_ops_per_s": round(clients * ops / elapsed, 1),
+        "write_errors": errors[0],
+        "write": percentiles(writes),
+        "read": percentiles(reads),
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Leader-mode write throughput: async replication vs the Raft log")
+    parser.add_argument("--nodes", type=int, default=3)
+    parser.add_argument("--clients", type=int, nargs="+", default=[1, 8])
+    parser.add_argument("--ops", type=int, default=200, help="Writes per client")
+    args = parser.parse_args()
+
+    for clients in args.clients:
+        for consensus in ("none", "raft"):
+            print(json.dumps(run(args.nodes, consensus, clients, args.ops)))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,234 @@
+from __future__ import annotations
+
+import argparse
+import json
+import os
+import signal
+import socket
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+import kvstore
+from kvstore.client import KVClient
+from kvstore.config import NodeConfig
+from kvstore.storage import StorageEngine, WALEntry
+
+# Versions above any the HLC of a fresh node would issue in the first few seconds, so
+# the generated snapshot and WAL entries are never treated as stale.
+_BASE_VERSION = 1 << 24
+
+
+def free_port() -> int:
+    sock = socket.socket()
+    sock.bind(("127.0.0.1", 0))
+    port = sock.getsockname()[1]
+    sock.close()
+    return port
+
+
+def start_node(node: NodeConfig, data_dir: Path, peers: List[NodeConfig], role: str, extra: List[str]) -> subprocess.Popen:
+    env = dict(os.environ, PYTHONPATH=str(Path(kvstore.__file__).resolve().parents[1]))
+    command = [
+        sys.executable, "-m", "kvstore.cli",
+        "--host", node.host, "--port", str(node.port), "--node-id", str(node.node_id),
+        "--data-dir", str(data_dir), "--role", role, "--anti-entropy-interval", "0",
+    ]
+    if peers:
+        command += ["--peers", json.dumps([{"node_id": p.node_id, "host": p.host, "port": p.port} for p in peers])]
+    return subprocess.Popen(command + extra, env=env)
+
+
+def wait_ready(node: NodeConfig, timeout: float = 120.0) -> float:
+    """Seconds until the node answers a request."""
+    start = time.perf_counter()
+    while time.perf_counter() - start < timeout:
+        try:
+            KVClient(node.host, node.port, timeout=1.0).request({"op": "heartbeat"})
+            return time.perf_counter() - start
+        except OSError:
+            time.sleep(0.01)
+    raise SystemExit(f"node {node.node_id} did not become ready in {timeout}s")
+
+
+def stop(processes: List[subprocess.Popen]) -> None:
+    for process in processes:
+        if process.poll() is None:
+            process.terminate()
+            process.wait(timeout=30)
+
+
+def stored_keys(node: NodeConfig) -> int:
+    stats = KVClient(node.host, node.port).stats()
+    return int(stats["kv_keys"][0]["value"])
+
+
+def cluster(base: Path, size: int, extra: List[str]) -> tuple[List[NodeConfig], List[subprocess.Popen]]:
+    nodes = [NodeConfig(node_id, "127.0.0.1", free_port()) for node_id in range(1, size + 1)]
+    processes = [
+        start_node(node, base / f"node_{node.node_id}", [p for p in nodes if p != node], "primary" if node.node_id == 1 else "secondary", extra)
+        for node in nodes
+    ]
+    for node in nodes:
+        wait_ready(node)
+    return nodes, processes
+
+
+def restart(records: int, wal_entries: int) -> Dict[str, Any]:
+    """Time from process start to serving, for a snapshot of ``records`` plus ``wal_entries`` to replay."""
+    with tempfile.TemporaryDirectory() as tmp:
+        data = {f"doc:{idx:08d}": {"text": f"word{idx % 100} body {idx}"} for idx in range(records)}
+        storage = StorageEngine(tmp)
+        storage.save_snapshot(data, versions={key: _BASE_VERSION for key in data})
+        del data
+        for idx in range(wal_entries):
+            payload = {"key": f"wal:{idx:08d}", "value": {"text": f"word{idx % 100} tail"}, "version": _BASE_VERSION + idx + 1}
+            storage.append_wal(WALEntry(op="set", data=payload))
+        wal_mb = os.path.getsize(os.path.join(tmp, "wal.log")) / 2**20 if wal_entries else 0.0
+        result: Dict[str, Any] = {"phase": "restart", "records": records, "wal_entries": wal_entries, "wal_mb": round(wal_mb, 2)}
+        # The first start replays the WAL and rebuilds indexes; the second, after a clean
+        # shutdown, loads the fresh snapshot and index checkpoint.
+        for name in ("first_start_s", "second_start_s"):
+            node = NodeConfig(1, "127.0.0.1", free_port())
+            process = start_node(node, Path(tmp), [], "primary", [])
+            try:
+                result[name] = round(wait_ready(node), 3)
+                assert stored_keys(node) == records + wal_entries
+            finally:
+                stop([process])
+    return result
+
+
+def catch_up(base: Path, writes: int, hint_replay_rate: float) -> Dict[str, Any]:
+    """A secondary misses ``writes`` while down; time until it holds every key after restarting."""
+    extra = ["--heartbeat-interval", "0.2", "--hint-replay-rate", str(hint_replay_rate)]
+    nodes, processes = cluster(base, 2, extra)
+    primary, secondary = nodes
+    try:
+        processes[1].send_signal(signal.SIGKILL)
+        processes[1].wait()
+        client = KVClient(primary.host, primary.port)
+        for idx in range(writes):
+            client.set(f"outage:{idx:06d}", {"text": f"missed write {idx}"})
+        expected = stored_keys(primary)
+        hints = KVClient(primary.host, primary.port).request({"op": "hint_stats"}).get("result", {})
+
+        started = time.perf_counter()
+        processes[1] = start_node(secondary, base / "node_2", [primary], "secondary", extra)
+        ready = wait_ready(secondary)
+        while stored_keys(secondary) < expected:
+            if time.perf_counter() - started > 300:
+                break
+            time.sleep(0.02)
+        caught_up = time.perf_counter() - started
+        return {
+            "phase": "catch_up",
+            "missed_writes": writes,
+            "hint_replay_rate": hint_replay_rate,
+            "hints": hints,
+            "restart_s": round(ready, 3),
+            "caught_up_s": round(caught_up, 3),
+            "complete": stored_keys(secondary) >= expected,
+        }
+    finally:
+        stop(processes)
+
+
+def failover(base: Path, size: int, heartbeat_interval: float) -> Optional[float]:
+    """Seconds from killing the primary until a survivor reports itself primary."""
+    nodes, processes = cluster(base, size, ["--heartbeat-interval", str(heartbeat_interval)])
+    try:
+        time.sleep(3 * heartbeat_interval)
+        roles = [KVClient(node.host, node.port).request({"op": "who_is_primary"}).get("role") for node in nodes]
+        assert roles == ["primary"] + ["secondary"] * (size - 1), roles
+        processes[0].kill()
+        processes[0].wait()
+        killed = time.perf_counter()
+        while time.perf_counter() - killed < 60:
+            for node in nodes[1:]:
+                if KVClient(node.host, node.port).request({"op": "who_is_primary"}).get("role") == "primary":
+                    return time.perf_counter() - killed
+            time.sleep(0.005)
+        return None
+    finally:
+        stop(processes)
+
+
+def replication_lag(base: Path, size: int, rate: float, duration: float) -> Dict[str, Any]:
+    """Steady writes at ``rate``; enqueue-to-ack lag per secondary from the primary's metrics."""
+    nodes, processes = cluster(base, size, ["--heartbeat-interval", "0.2"])
+    try:
+        client = KVClient(nodes[0].host, nodes[0].port)
+        sent = 0
+        start = time.perf_counter()
+        while time.perf_counter() - start < duration:
+            client.set(f"load:{sent % 1000:04d}", {"text": f"steady write {sent}"})
+            sent += 1
+            delay = start + sent / rate - time.perf_counter()
+            if delay > 0:
+                time.sleep(delay)
+        elapsed = time.perf_counter() - start
+        time.sleep(1.0)  # let the last events be acknowledged
+        stats = client.stats()
+        lag = {
+            series["labels"]["peer"]: {name: series[name] for name in ("count", "p50", "p90", "p99", "p99.9", "max")}
+            for series in stats.get("kv_replication_lag_seconds", [])
+        }
+        return {
+            "phase": "replication_lag",
+            "nodes": size,
+            "target_rate": rate,
+            "achieved_rate": round(sent / elapsed, 1),
+            "lag_seconds_by_peer": lag,
+            "failures": {series["labels"]["peer"]: series["value"] for series in stats.get("kv_replication_failures_total", [])},
+        }
+    finally:
+        stop(processes)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Restart, catch-up, failover and replication lag of kvstore nodes")
+    parser.add_argument("--phases", nargs="+", default=["restart", "catch_up", "failover", "replication_lag"])
+    parser.add_argument("--records", type=int, nargs="+", default=[10_000, 100_000], help="Snapshot sizes for restart")
+    parser.add_argument("--wal-entries", type=int, nargs="+", default=[0, 1000, 5000], help="WAL tail lengths for restart")
+    parser.add_argument("--missed-writes", type=int, default=1000, help="Writes a secondary misses while down")
+    parser.add_argument("--hint-replay-rate", type=float, default=1000.0)
+    parser.add_argument("--nodes", type=int, default=3, help="Cluster size for failover and replication lag")
+    parser.add_argument("--heartbeat-interval", type=float, default=0.5)
+    parser.add_argument("--trials", type=int, default=3, help="Failover repetitions")
+    parser.add_argument("--rate", type=float, default=50.0, help="Writes per second for replication lag")
+    parser.add_argument("--duration", type=float, default=10.0)
+    args = parser.parse_args()
+
+    if "restart" in args.phases:
+        for records in args.records:
+            for wal_entries in args.wal_entries:
+                print(json.dumps(restart(records, wal_entries)), flush=True)
+    if "catch_up" in args.phases:
+        with tempfile.TemporaryDirectory() as tmp:
+            print(json.dumps(catch_up(Path(tmp), args.missed_writes, args.hint_replay_rate)), flush=True)
+    if "failover" in args.phases:
+        times = []
+        for _ in range(args.trials):
+            with tempfile.TemporaryDirectory() as tmp:
+                times.append(failover(Path(tmp), args.nodes, args.heartbeat_interval))
+        measured = [round(value, 3) for value in times if value is not None]
+        print(json.dumps({
+            "phase": "failover",
+            "nodes": args.nodes,
+            "heartbeat_interval_s": args.heartbeat_interval,
+            "failover_s": measured,
+            "median_s": round(statistics.median(measured), 3) if measured else None,
+            "timeouts": len(times) - len(measured),
+        }), flush=True)
+    if "replication_lag" in args.phases:
+        with tempfile.TemporaryDirectory() as tmp:
+            print(json.dumps(replication_lag(Path(tmp), args.nodes, args.rate, args.duration)), flush=True)
+
+
+if __name__ == "__main__":
+    main()
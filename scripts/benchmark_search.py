@@ -0,0 +1,185 @@
+from __future__ import annotations
+
+import argparse
+import itertools
+import json
+import math
+import multiprocessing
+import os
+import random
+import tempfile
+import threading
+import time
+from typing import Any, Callable, Dict, List, Tuple
+
+from kvstore.engine import KVEngine
+from kvstore.metrics import Histogram
+from kvstore.storage import StorageEngine
+
+
+def rss_mb() -> float:
+    with open("/proc/self/statm") as handle:
+        return int(handle.read().split()[1]) * os.sysconf("SC_PAGE_SIZE") / 2**20
+
+
+def zipf_weights(count: int, exponent: float = 1.0) -> List[float]:
+    return list(itertools.accumulate(1.0 / (rank**exponent) for rank in range(1, count + 1)))
+
+
+def normalize(vector: List[float]) -> List[float]:
+    norm = math.sqrt(sum(x * x for x in vector)) or 1.0
+    return [x / norm for x in vector]
+
+
+def build_corpus(args: argparse.Namespace, docs: int) -> Tuple[Dict[str, Any], Dict[str, Any]]:
+    """Documents with Zipf-distributed words, tagged string values, and clustered embeddings."""
+    rng = random.Random(args.seed)
+    vocabulary = [f"term{idx}" for idx in range(args.vocabulary)]
+    # Zipf word frequencies give the few huge postings lists real text has.
+    weights = zipf_weights(args.vocabulary)
+    data: Dict[str, Any] = {
+        f"doc:{idx:08d}": {"text": " ".join(rng.choices(vocabulary, cum_weights=weights, k=args.words))}
+        for idx in range(docs)
+    }
+    tags = int(docs * args.value_ratio)
+    data.update({f"tag:{idx:08d}": f"value{rng.randrange(args.distinct_values)}" for idx in range(tags)})
+    vectors = int(docs * args.vector_ratio)
+    centers = [[rng.gauss(0, 1) for _ in range(args.dim)] for _ in range(args.clusters)]
+    for idx in range(vectors):
+        center = centers[rng.randrange(args.clusters)]
+        data[f"vec:{idx:08d}"] = {"vector": [c + rng.gauss(0, args.spread) for c in center]}
+
+    # Queries: popular and rare terms, existing values, and embeddings near the data.
+    queries = {
+        "search_text": [vocabulary[int(rng.paretovariate(1.0)) % args.vocabulary] for _ in range(args.queries)],
+        "search_value": [f"value{rng.randrange(args.distinct_values)}" for _ in range(args.queries)],
+        "vector_search": [
+            [c + rng.gauss(0, args.spread) for c in centers[rng.randrange(args.clusters)]] for _ in range(args.queries)
+        ],
+    }
+    return data, queries
+
+
+def exact_top_k(data: Dict[str, Any], queries: List[List[float]], k: int) -> List[List[str]]:
+    """Brute-force cosine top-k in float64, independent of the engine's own scoring."""
+    keys = [key for key, value in data.items() if key.startswith("vec:")]
+    matrix = [normalize(data[key]["vector"]) for key in keys]
+    truth = []
+    for query in queries:
+        q = normalize(query)
+        scores = [sum(map(float.__mul__, q, row)) for row in matrix]
+        best = sorted(range(len(keys)), key=scores.__getitem__, reverse=True)[:k]
+        truth.append([keys[idx] for idx in best])
+    return truth
+
+
+def measure(call: Callable[[Any], Any], queries: List[Any], threads: int, duration: float) -> Dict[str, Any]:
+    histograms = [Histogram() for _ in range(threads)]
+    stop = time.perf_counter() + duration
+
+    def worker(slot: int) -> None:
+        for query in itertools.cycle(queries[slot:] + queries[:slot]):
+            if time.perf_counter() >= stop:
+                return
+            start = time.perf_counter()
+            call(query)
+            histograms[slot].record(time.perf_counter() - start)
+
+    pool = [threading.Thread(target=worker, args=(slot,)) for slot in range(threads)]
+    started = time.perf_counter()
+    for thread in pool:
+        thread.start()
+    for thread in pool:
+        thread.join()
+    elapsed = time.perf_counter() - started
+    merged = Histogram()
+    for histogram in histograms:
+        merged.merge(histogram)
+    return {
+        "threads": threads,
+        "qps": round(merged.count / elapsed, 1),
+        "p50_ms": round(merged.quantile(0.5) * 1000, 3),
+        "p95_ms": round(merged.quantile(0.95) * 1000, 3),
+        "p99_ms": round(merged.quantile(0.99) * 1000, 3),
+    }
+
+
+def run_scale(args: argparse.Namespace, docs: int, workers: int, results: "multiprocessing.Queue[Dict[str, Any]]") -> None:
+    """One scale and one index implementation, in a fresh process so RSS figures are its own."""
+    data, queries = build_corpus(args, docs)
+    truth = exact_top_k(data, queries["vector_search"], args.k)
+    implementation = f"search_pool:{workers}" if workers else "engine"
+    with tempfile.TemporaryDirectory() as tmp:
+        StorageEngine(tmp).save_snapshot(data, versions={key: 1 << 24 for key in data})
+        del data
+        base = rss_mb()
+        start = time.perf_counter()
+        engine = KVEngine(tmp, search_workers=workers, background_index_rebuild=True)
+        loaded, loaded_rss = time.perf_counter(), rss_mb()
+        engine.wait_for_indexes()
+        engine.vector_search(queries["vector_search"][0], top_k=args.k)  # start pool workers outside the timing
+        built = time.perf_counter()
+        common = {"docs": docs, "implementation": implementation}
+        # Gets are served from ``loaded`` on while the indexes build in the background.
+        results.put({
+            **common,
+            "phase": "build",
+            "serving_s": round(loaded - start, 2),
+            "searchable_s": round(built - start, 2),
+            "data_rss_mb": round(loaded_rss - base, 1),
+            "index_rss_mb": round(rss_mb() - loaded_rss, 1),
+        })
+
+        hits = [len(set(item["key"] for item in engine.vector_search(query, top_k=args.k)) & set(expected))
+                for query, expected in zip(queries["vector_search"], truth)]
+        calls = {
+            "search_text": engine.search_text,
+            "search_value": engine.search_by_value,
+            "vector_search": lambda query: engine.vector_search(query, top_k=args.k),
+        }
+        for op, call in calls.items():
+            for threads in args.threads:
+                report = {**common, "phase": "query", "op": op, **measure(call, queries[op], threads, args.duration)}
+                if op == "vector_search":
+                    report[f"recall_at_{args.k}"] = round(sum(hits) / (args.k * len(hits)), 4)
+                results.put(report)
+        engine.close()
+    results.put({})
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="search_text, search_by_value and vector_search: build cost, latency, QPS and recall")
+    parser.add_argument("--docs", type=int, nargs="+", default=[10_000, 50_000], help="Corpus scales")
+    parser.add_argument("--search-workers", type=int, nargs="+", default=[0, 2], help="0 scans in the engine; N uses the search pool")
+    parser.add_argument("--threads", type=int, nargs="+", default=[1, 8], help="Concurrent query threads")
+    parser.add_argument("--duration", type=float, default=3.0, help="Seconds per op and thread count")
+    parser.add_argument("--words", type=int, default=30, help="Words per document")
+    parser.add_argument("--vocabulary", type=int, default=20_000)
+    parser.add_argument("--value-ratio", type=float, default=0.5, help="Tagged values per document")
+    parser.add_argument("--distinct-values", type=int, default=1000)
+    parser.add_argument("--vector-ratio", type=float, default=0.2, help="Embeddings per document")
+    parser.add_argument("--dim", type=int, default=64)
+    parser.add_argument("--clusters", type=int, default=50)
+    parser.add_argument("--spread", type=float, default=0.5, help="Standard deviation of embeddings around their cluster")
+    parser.add_argument("--queries", type=int, default=50)
+    parser.add_argument("--k", type=int, default=10)
+    parser.add_argument("--seed", type=int, default=1)
+    args = parser.parse_args()
+
+    context = multiprocessing.get_context("spawn")
+    print(json.dumps({"cpus": os.cpu_count()}))
+    for docs in args.docs:
+        for workers in args.search_workers:
+            results = context.Queue()
+            child = context.Process(target=run_scale, args=(args, docs, workers, results))
+            child.start()
+            while True:
+                report = results.get()
+                if not report:
+                    break
+                print(json.dumps(report), flush=True)
+            child.join()
+
+
+if __name__ == "__main__":
+    main()
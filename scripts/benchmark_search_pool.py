@@ -0,0 +1,85 @@
+from __future__ import annotations
+
+import argparse
+import json
+import os
+import random
+import tempfile
+import threading
+import time
+
+from kvstore.engine import KVEngine
+
+
+def percentiles(samples: list[float]) -> dict:
+    ordered = sorted(samples)
+
+    def pick(fraction: float) -> float:
+        return round(ordered[min(len(ordered) - 1, int(fraction * len(ordered)))] * 1000, 3)
+
+    return {"p50_ms": pick(0.50), "p99_ms": pick(0.99)}
+
+
+def run(workers: int, vectors: int, dim: int, threads: int, duration: float) -> dict:
+    rng = random.Random(1)
+    with tempfile.TemporaryDirectory() as tmp:
+        engine = KVEngine(tmp, search_workers=workers)
+        events = [
+            ("add_vector", {"key": f"v{idx}", "vector": [rng.uniform(-1, 1) for _ in range(dim)], "version": idx + 1})
+            for idx in range(vectors)
+        ]
+        engine.apply_batch(events)
+        queries = [[rng.uniform(-1, 1) for _ in range(dim)] for _ in range(64)]
+        engine.vector_search(queries[0])  # start the worker processes outside the timed window
+
+        stop = threading.Event()
+        counts = [0] * threads
+        get_latencies: list[float] = []
+
+        def searcher(slot: int) -> None:
+            while not stop.is_set():
+                engine.vector_search(queries[counts[slot] % len(queries)], top_k=10)
+                counts[slot] += 1
+
+        def reader() -> None:
+            while not stop.is_set():
+                start = time.perf_counter()
+                engine.get("v0")
+                get_latencies.append(time.perf_counter() - start)
+                time.sleep(0.001)
+
+        pool = [threading.Thread(target=searcher, args=(slot,)) for slot in range(threads)]
+        pool.append(threading.Thread(target=reader))
+        for thread in pool:
+            thread.start()
+        time.sleep(duration)
+        stop.set()
+        for thread in pool:
+            thread.join()
+        engine.close()
+    return {
+        "search_workers": workers,
+        "vectors": vectors,
+        "dim": dim,
+        "client_threads": threads,
+        "qps": round(sum(counts) / duration, 1),
+        "get_during_search": percentiles(get_latencies),
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Vector search QPS versus search worker processes")
+    parser.add_argument("--workers", type=int, nargs="+", default=[0, 1, 2, 4, 8])
+    parser.add_argument("--vectors", type=int, default=20000)
+    parser.add_argument("--dim", type=int, default=64)
+    parser.add_argument("--threads", type=int, default=8, help="Concurrent query threads")
+    parser.add_argument("--duration", type=float, default=5.0)
+    args = parser.parse_args()
+
+    print(json.dumps({"cpus": os.cpu_count()}))
+    for workers in args.workers:
+        print(json.dumps(run(workers, args.vectors, args.dim, args.threads, args.duration)))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,88 @@
+from __future__ import annotations
+
+import argparse
+import json
+import multiprocessing
+import os
+import shutil
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+import kvstore
+from kvstore.client import KVClient
+
+
+def free_port() -> int:
+    sock = socket.socket()
+    sock.bind(("127.0.0.1", 0))
+    port = sock.getsockname()[1]
+    sock.close()
+    return port
+
+
+def wait_for_server(host: str, port: int, timeout: float = 30.0) -> None:
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        try:
+            if KVClient(host, port, timeout=5.0).request({"op": "who_is_primary"}).get("status") == "ok":
+                return
+        except OSError:
+            time.sleep(0.1)
+    raise SystemExit(f"Server {host}:{port} did not become ready in time")
+
+
+def load(args: tuple[int, str, int, str, int]) -> int:
+    port, op, worker, host, ops = args
+    client = KVClient(host, port, timeout=30.0)
+    for idx in range(ops):
+        key = f"w{worker}-{idx % 200}"
+        if op == "set":
+            client.set(key, {"n": idx, "payload": "x" * 64})
+        else:
+            client.get(key)
+    return ops
+
+
+def run(shards: int, clients: int, ops: int) -> dict:
+    base = Path(tempfile.mkdtemp())
+    port = free_port()
+    env = dict(os.environ, PYTHONPATH=str(Path(kvstore.__file__).resolve().parents[1]))
+    command = [
+        sys.executable, "-m", "kvstore.cli", "--port", str(port), "--data-dir", str(base), "--shards", str(shards),
+    ]
+    process = subprocess.Popen(command, env=env)
+    result: dict = {"shards": shards, "clients": clients}
+    try:
+        wait_for_server("127.0.0.1", port)
+        with multiprocessing.Pool(clients) as pool:
+            for op in ("set", "get"):
+                jobs = [(port, op, worker, "127.0.0.1", ops) for worker in range(clients)]
+                start = time.perf_counter()
+                total = sum(pool.map(load, jobs))
+                result[f"{op}_ops_per_s"] = round(total / (time.perf_counter() - start), 1)
+    finally:
+        process.terminate()
+        process.wait(timeout=15)
+        shutil.rmtree(base, ignore_errors=True)
+    return result
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Single-node throughput with 1, 2, 4 and 8 shard worker processes")
+    parser.add_argument("--shards", type=int, nargs="+", default=[1, 2, 4, 8])
+    parser.add_argument("--clients", type=int, default=16, help="Load generator processes")
+    parser.add_argument("--ops", type=int, default=200, help="Operations per client and op type")
+    args = parser.parse_args()
+
+    result = {"cpus": os.cpu_count()}
+    print(json.dumps(result))
+    for shards in args.shards:
+        print(json.dumps(run(shards, args.clients, args.ops)))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,100 @@
+from __future__ import annotations
+
+import argparse
+import json
+import os
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+import kvstore
+from kvstore.storage import StorageEngine
+
+# Run in a fresh interpreter per measurement so ru_maxrss is the peak of one load only.
+CHILD = """
+import json, resource, sys, time
+from kvstore.protocol import json_object_hook
+from kvstore.storage import StorageEngine
+layout, data_dir, workers = sys.argv[1], sys.argv[2], int(sys.argv[3])
+start = time.perf_counter()
+if layout == "legacy":
+    with open(data_dir + "/data.json") as handle:
+        data = json.load(handle, object_hook=json_object_hook)
+    with open(data_dir + "/versions.json") as handle:
+        versions = json.load(handle)
+else:
+    data, versions = StorageEngine(data_dir, load_workers=workers).load_state()
+elapsed = time.perf_counter() - start
+print(json.dumps({"keys": len(data), "load_s": elapsed, "peak_rss_mb": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024}))
+"""
+
+
+def build(keys: int, value_size: int) -> tuple[dict, dict]:
+    data = {f"user:{idx:09d}": {"name": f"user-{idx}", "bio": "x" * value_size, "n": idx} for idx in range(keys)}
+    versions = {key: (1 << 24) + idx for idx, key in enumerate(data)}
+    return data, versions
+
+
+def write_legacy(data_dir: Path, data: dict, versions: dict) -> float:
+    start = time.perf_counter()
+    for name, payload in (("data.json", data), ("versions.json", versions)):
+        with open(data_dir / name, "w", encoding="utf-8") as handle:
+            json.dump(payload, handle, separators=(",", ":"))
+            handle.flush()
+            os.fsync(handle.fileno())
+    return time.perf_counter() - start
+
+
+def load_in_child(layout: str, data_dir: Path, workers: int) -> dict:
+    env = dict(os.environ, PYTHONPATH=str(Path(kvstore.__file__).resolve().parents[1]))
+    output = subprocess.run(
+        [sys.executable, "-c", CHILD, layout, str(data_dir), str(workers)], env=env, check=True, capture_output=True, text=True
+    ).stdout
+    return json.loads(output)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Restart time and peak RSS: data.json versus the chunked data.snap")
+    parser.add_argument("--keys", type=int, nargs="+", default=[1_000_000])
+    parser.add_argument("--value-size", type=int, default=64)
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, 4])
+    args = parser.parse_args()
+
+    for keys in args.keys:
+        data, versions = build(keys, args.value_size)
+        with tempfile.TemporaryDirectory() as tmp:
+            legacy_dir, snap_dir = Path(tmp, "legacy"), Path(tmp, "snap")
+            legacy_dir.mkdir()
+            save_s = write_legacy(legacy_dir, data, versions)
+            size = sum(path.stat().st_size for path in legacy_dir.iterdir())
+            runs = [("legacy", save_s, size, load_in_child("legacy", legacy_dir, 1))]
+
+            storage = StorageEngine(str(snap_dir))
+            start = time.perf_counter()
+            storage.save_snapshot(data, versions=versions)
+            save_s = time.perf_counter() - start
+            size = (snap_dir / "data.snap").stat().st_size
+            runs += [(f"snap_{workers}w", save_s, size, load_in_child("snap", snap_dir, workers)) for workers in args.workers]
+
+            for layout, save_s, size, load in runs:
+                assert load["keys"] == keys
+                print(
+                    json.dumps(
+                        {
+                            "keys": keys,
+                            "layout": layout,
+                            "file_mb": round(size / 2**20, 1),
+                            "save_s": round(save_s, 2),
+                            "load_s": round(load["load_s"], 2),
+                            "peak_rss_mb": round(load["peak_rss_mb"], 1),
+                        }
+                    )
+                )
+        del data, versions
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,116 @@
+from __future__ import annotations
+
+import argparse
+import json
+import os
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+from typing import Callable
+
+import kvstore
+from kvstore.client import KVClient
+from kvstore.tracing import Tracer, current
+
+
+def free_port() -> int:
+    sock = socket.socket()
+    sock.bind(("127.0.0.1", 0))
+    port = sock.getsockname()[1]
+    sock.close()
+    return port
+
+
+def wait_for_server(host: str, port: int, timeout: float = 10.0) -> None:
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        try:
+            with socket.create_connection((host, port), timeout=1.0):
+                return
+        except OSError:
+            time.sleep(0.1)
+    raise SystemExit(f"Server {host}:{port} did not become ready in time")
+
+
+def per_call_ns(call: Callable[[], object], iterations: int) -> float:
+    start = time.perf_counter()
+    for _ in range(iterations):
+        call()
+    return (time.perf_counter() - start) / iterations * 1e9
+
+
+def rate(call: Callable[[], object], duration: float) -> float:
+    count = 0
+    start = time.perf_counter()
+    deadline = start + duration
+    while time.perf_counter() < deadline:
+        call()
+        count += 1
+    return count / (time.perf_counter() - start)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Cost of request tracing: off versus on, over TCP")
+    parser.add_argument("--iterations", type=int, default=500_000)
+    parser.add_argument("--duration", type=float, default=1.0)
+    parser.add_argument("--trials", type=int, default=5)
+    args = parser.parse_args()
+
+    tracer = Tracer()
+    tracer.configure(enabled=True)
+
+    def traced_request() -> None:
+        trace = tracer.begin()
+        trace.mark("decode")
+        trace.mark("engine")
+        trace.mark("encode")
+        trace.add("write", 0.0)
+        tracer.finish(trace)
+
+    primitive = {"current_ns": round(per_call_ns(current, args.iterations), 1)}
+    primitive["traced_request_ns"] = round(per_call_ns(traced_request, args.iterations), 1)
+    tracer.configure(enabled=False)
+    primitive["current_when_off_ns"] = round(per_call_ns(current, args.iterations), 1)
+    print(json.dumps({"phase": "primitive", **primitive}))
+
+    # The server runs in its own process so client and server threads do not share a GIL.
+    with tempfile.TemporaryDirectory() as tmp:
+        port = free_port()
+        env = dict(os.environ, PYTHONPATH=str(Path(kvstore.__file__).resolve().parents[1]))
+        command = [
+            sys.executable, "-m", "kvstore.cli", "--host", "127.0.0.1", "--port", str(port),
+            "--node-id", "1", "--data-dir", tmp, "--anti-entropy-interval", "0",
+        ]
+        process = subprocess.Popen(command, env=env)
+        try:
+            wait_for_server("127.0.0.1", port)
+            client = KVClient("127.0.0.1", port, binary=True)
+            client.bulk_set([(f"doc:{idx}", {"text": f"word{idx % 50} common"}) for idx in range(2000)])
+            workloads = {
+                "get": lambda: client.get("doc:7"),
+                "search_text": lambda: client.search_text("word7"),
+                "set": lambda: client.set("doc:7", {"text": "word7 common"}),
+            }
+            for name, call in workloads.items():
+                # Alternate off/on trials so drift on the machine hits both equally.
+                best = {False: 0.0, True: 0.0}
+                for _ in range(args.trials):
+                    for enabled in (False, True):
+                        client.trace(enabled=enabled, limit=0, clear=True)
+                        best[enabled] = max(best[enabled], rate(call, args.duration / 2))
+                client.trace(enabled=False, limit=0)
+                print(json.dumps({
+                    "phase": "tcp", "op": name,
+                    "ops_per_sec_off": round(best[False]), "ops_per_sec_on": round(best[True]),
+                    "overhead_pct": round((best[False] / best[True] - 1) * 100, 2),
+                }))
+        finally:
+            process.terminate()
+            process.wait()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,328 @@
+from __future__ import annotations
+
+import argparse
+import bisect
+import itertools
+import json
+import os
+import random
+import socket
+import string
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+import kvstore
+from kvstore.client import KVClient
+from kvstore.metrics import Histogram
+
+# Operation mixes and request distributions of the YCSB core workloads.
+WORKLOADS: Dict[str, Tuple[Dict[str, float], str]] = {
+    "A": ({"read": 0.5, "update": 0.5}, "zipfian"),
+    "B": ({"read": 0.95, "update": 0.05}, "zipfian"),
+    "C": ({"read": 1.0}, "zipfian"),
+    "D": ({"read": 0.95, "insert": 0.05}, "latest"),
+    "E": ({"scan": 0.95, "insert": 0.05}, "zipfian"),
+    "F": ({"read": 0.5, "read_modify_write": 0.5}, "zipfian"),
+}
+QUANTILES = (("p50", 0.5), ("p95", 0.95), ("p99", 0.99), ("p999", 0.999))
+
+_FNV_OFFSET = 0xCBF29CE484222325
+_FNV_PRIME = 1099511628211
+_MASK = (1 << 64) - 1
+
+
+def fnv64(value: int) -> int:
+    digest = _FNV_OFFSET
+    for _ in range(8):
+        digest ^= value & 0xFF
+        digest = (digest * _FNV_PRIME) & _MASK
+        value >>= 8
+    return digest
+
+
+def record_key(index: int) -> str:
+    # Hashed like YCSB's default (non-ordered) inserts, so neighbouring indexes are not neighbouring keys.
+    return f"user{fnv64(index)}"
+
+
+class Zipfian:
+    """YCSB's zipfian generator (Gray et al.), rank 0 most popular; the item count may grow."""
+
+    def __init__(self, items: int, theta: float = 0.99) -> None:
+        self.theta = theta
+        self.alpha = 1.0 / (1.0 - theta)
+        self.zeta2 = 1.0 + 0.5**theta
+        self._items = 0
+        self._zetan = 0.0
+        self._lock = threading.Lock()
+        self._grow(items)
+
+    def _grow(self, items: int) -> None:
+        self._zetan += sum(1.0 / (rank**self.theta) for rank in range(self._items + 1, items + 1))
+        self._items = items
+        self._eta = (1 - (2.0 / items) ** (1 - self.theta)) / (1 - self.zeta2 / self._zetan)
+
+    def next(self, rng: random.Random, items: int) -> int:
+        if items > self._items:
+            with self._lock:
+                if items > self._items:
+                    self._grow(items)
+        u = rng.random()
+        uz = u * self._zetan
+        if uz < 1.0:
+            return 0
+        if uz < self.zeta2:
+            return 1
+        return min(items - 1, int(items * (self._eta * u - self._eta + 1) ** self.alpha))
+
+
+@dataclass
+class KeyChooser:
+    distribution: str
+    zipfian: Optional[Zipfian]
+
+    def choose(self, rng: random.Random, items: int) -> int:
+        if self.distribution == "uniform":
+            return rng.randrange(items)
+        assert self.zipfian is not None
+        rank = self.zipfian.next(rng, items)
+        if self.distribution == "latest":
+            return items - 1 - rank
+        # Scrambled, so the popular records are spread over the key space instead of being the first ones.
+        return fnv64(rank) % items
+
+
+class Store:
+    """The few calls a workload makes, over either package's client."""
+
+    def __init__(self, target: str, host: str, port: int, binary: bool) -> None:
+        self.target = target
+        if target == "kvstore":
+            self.client: Any = KVClient(host, port, timeout=30.0, binary=binary)
+        else:
+            from datastore import DatastoreConnector
+
+            self.client = DatastoreConnector(host, port, timeout=30.0, binary=binary)
+
+    def supports(self, op: str) -> bool:
+        return op != "scan" or self.target == "kvstore"
+
+    def read(self, key: str) -> Any:
+        return self.client.get(key)
+
+    def write(self, key: str, value: Any) -> None:
+        self.client.set(key, value)
+
+    def scan(self, key: str, length: int) -> list:
+        return self.client.scan("user", after=key, limit=length)
+
+    def load(self, items: List[Tuple[str, Any]]) -> None:
+        self.client.bulk_set(items)
+
+
+class Values:
+    def __init__(self, field_count: int, field_length: int, seed: int) -> None:
+        rng = random.Random(seed)
+        self._pool = "".join(rng.choice(string.ascii_letters) for _ in range(65536 + field_length))
+        self.field_count = field_count
+        self.field_length = field_length
+
+    def record(self, rng: random.Random) -> Dict[str, str]:
+        return {
+            f"field{idx}": self._pool[offset : offset + self.field_length]
+            for idx, offset in enumerate(rng.randrange(65536) for _ in range(self.field_count))
+        }
+
+
+def free_port() -> int:
+    sock = socket.socket()
+    sock.bind(("127.0.0.1", 0))
+    port = sock.getsockname()[1]
+    sock.close()
+    return port
+
+
+def wait_for_server(host: str, port: int, timeout: float = 15.0) -> None:
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        try:
+            with socket.create_connection((host, port), timeout=1.0):
+                return
+        except OSError:
+            time.sleep(0.1)
+    raise SystemExit(f"Server {host}:{port} did not become ready in time")
+
+
+def start_server(target: str, port: int, data_dir: str) -> subprocess.Popen:
+    env = dict(os.environ, PYTHONPATH=str(Path(kvstore.__file__).resolve().parents[1]))
+    module = "kvstore.cli" if target == "kvstore" else "datastore.boot_handler"
+    command = [sys.executable, "-m", module, "--host", "127.0.0.1", "--port", str(port), "--node-id", "1", "--data-dir", data_dir]
+    if target == "kvstore":
+        command += ["--anti-entropy-interval", "0"]
+    process = subprocess.Popen(command, env=env)
+    wait_for_server("127.0.0.1", port)
+    return process
+
+
+def load(store: Store, values: Values, records: int, batch: int, seed: int) -> float:
+    rng = random.Random(seed)
+    start = time.perf_counter()
+    for first in range(0, records, batch):
+        store.load([(record_key(idx), values.record(rng)) for idx in range(first, min(first + batch, records))])
+    return time.perf_counter() - start
+
+
+def summarize(histogram: Histogram, seconds: Optional[float] = None) -> Dict[str, Any]:
+    result: Dict[str, Any] = {"count": histogram.count}
+    if seconds:
+        result["ops_per_sec"] = round(histogram.count / seconds, 1)
+    for name, q in QUANTILES:
+        result[f"{name}_us"] = round(histogram.quantile(q) * 1e6, 1)
+    result["max_us"] = round(histogram.max * 1e6, 1)
+    return result
+
+
+def run(store_factory: Callable[[], Store], args: argparse.Namespace, workload: str, values: Values, inserted: List[int]) -> Dict[str, Any]:
+    mix, default_distribution = WORKLOADS[workload]
+    distribution = args.distribution or default_distribution
+    chooser = KeyChooser(distribution, None if distribution == "uniform" else Zipfian(inserted[0]))
+    ops = list(mix)
+    weights = list(itertools.accumulate(mix[op] for op in ops))
+    tickets = itertools.count()
+    insert_lock = threading.Lock()
+    next_insert = itertools.count(inserted[0])
+    results: List[Tuple[Dict[str, Histogram], Dict[str, Histogram], int]] = []
+    # Open loop: each thread issues at a fixed rate and latency is measured from when a
+    # request was due, so a stalled server is charged for the requests queued behind it.
+    interval = args.threads / args.target_rate if args.target_rate else 0.0
+    start = time.perf_counter()
+    deadline = start + args.duration if args.duration else float("inf")
+
+    def worker(thread_index: int) -> None:
+        rng = random.Random(args.seed * 1000 + thread_index)
+        store = store_factory()
+        latency = {op: Histogram() for op in ops}
+        service = {op: Histogram() for op in ops}
+        errors = 0
+        due = start + interval * thread_index / args.threads
+        while next(tickets) < args.operations:
+            if interval:
+                delay = due - time.perf_counter()
+                if delay > 0:
+                    time.sleep(delay)
+                if due >= deadline:
+                    break
+            elif time.perf_counter() >= deadline:
+                break
+            op = ops[min(len(ops) - 1, bisect.bisect_right(weights, rng.random() * weights[-1]))]
+            began = time.perf_counter()
+            try:
+                if op == "insert":
+                    index = next(next_insert)
+                    store.write(record_key(index), values.record(rng))
+                    with insert_lock:
+                        inserted[0] = max(inserted[0], index + 1)
+                else:
+                    key = record_key(chooser.choose(rng, inserted[0]))
+                    if op == "read":
+                        store.read(key)
+                    elif op == "update":
+                        store.write(key, values.record(rng))
+                    elif op == "scan":
+                        store.scan(key, rng.randint(1, args.max_scan_length))
+                    else:
+                        record = store.read(key) or {}
+                        record.update(values.record(rng))
+                        store.write(key, record)
+            except (OSError, ValueError):
+                errors += 1
+            finished = time.perf_counter()
+            service[op].record(finished - began)
+            latency[op].record(finished - (due if interval else began))
+            due += interval
+        results.append((latency, service, errors))
+
+    threads = [threading.Thread(target=worker, args=(idx,)) for idx in range(args.threads)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - start
+
+    per_op: Dict[str, Dict[str, Any]] = {}
+    overall, overall_service = Histogram(), Histogram()
+    for op in ops:
+        merged, merged_service = Histogram(), Histogram()
+        for latency, service, _ in results:
+            merged.merge(latency[op])
+            merged_service.merge(service[op])
+        overall.merge(merged)
+        overall_service.merge(merged_service)
+        if merged.count:
+            per_op[op] = summarize(merged)
+            if interval:
+                per_op[op]["service_p99_us"] = summarize(merged_service)["p99_us"]
+    return {
+        "target": store_factory().target,
+        "workload": workload,
+        "distribution": distribution,
+        "threads": args.threads,
+        "target_rate": args.target_rate,
+        "records": inserted[0],
+        "duration_s": round(elapsed, 2),
+        "errors": sum(errors for _, _, errors in results),
+        "overall": summarize(overall, elapsed),
+        "ops": per_op,
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="YCSB core workloads A-F against a kvstore or datastore node")
+    parser.add_argument("--target", choices=["kvstore", "datastore"], default="kvstore")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=0, help="Existing node to benchmark; 0 starts a fresh local node")
+    parser.add_argument("--workloads", default="ABCDEF", help="Letters of the workloads to run, in order")
+    parser.add_argument("--records", type=int, default=10_000)
+    parser.add_argument("--operations", type=int, default=5000, help="Operations per workload")
+    parser.add_argument("--duration", type=float, default=0.0, help="Also stop a workload after N seconds; 0 means no limit")
+    parser.add_argument("--threads", type=int, default=8)
+    parser.add_argument("--target-rate", type=float, default=0.0, help="Open-loop ops/s across all threads; 0 runs closed-loop")
+    parser.add_argument("--distribution", choices=["zipfian", "uniform", "latest"], help="Override the workload's distribution")
+    parser.add_argument("--field-count", type=int, default=10)
+    parser.add_argument("--field-length", type=int, default=100)
+    parser.add_argument("--max-scan-length", type=int, default=100)
+    parser.add_argument("--load-batch", type=int, default=1000)
+    parser.add_argument("--binary", action="store_true", help="Use the binary protocol")
+    parser.add_argument("--skip-load", action="store_true", help="Records 0..N-1 are already loaded")
+    parser.add_argument("--seed", type=int, default=1)
+    args = parser.parse_args()
+
+    values = Values(args.field_count, args.field_length, args.seed)
+    with tempfile.TemporaryDirectory() as tmp:
+        port = args.port or free_port()
+        process = None if args.port else start_server(args.target, port, tmp)
+        try:
+            store_factory = lambda: Store(args.target, args.host, port, args.binary)  # noqa: E731
+            inserted = [args.records]
+            if not args.skip_load:
+                seconds = load(store_factory(), values, args.records, args.load_batch, args.seed)
+                print(json.dumps({"target": args.target, "phase": "load", "records": args.records, "duration_s": round(seconds, 2)}))
+            for workload in args.workloads.upper():
+                if not all(store_factory().supports(op) for op in WORKLOADS[workload][0]):
+                    print(json.dumps({"target": args.target, "workload": workload, "skipped": "scan is not supported"}))
+                    continue
+                print(json.dumps(run(store_factory, args, workload, values, inserted)), flush=True)
+        finally:
+            if process is not None:
+                process.terminate()
+                process.wait()
+
+
+if __name__ == "__main__":
+    main()
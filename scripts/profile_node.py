@@ -0,0 +1,27 @@
+from __future__ import annotations
+
+import argparse
+import sys
+
+from kvstore.client import KVClient
+from kvstore.profiler import collapsed_text
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Sample a live node's thread stacks and print collapsed stacks")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=9000)
+    parser.add_argument("--seconds", type=float, default=10.0)
+    parser.add_argument("--interval-ms", type=float, default=5.0)
+    parser.add_argument("--idle", action="store_true", help="Keep threads parked in waits and socket reads")
+    args = parser.parse_args()
+
+    profile = KVClient(args.host, args.port).profile(args.seconds, args.interval_ms, args.idle)
+    if not profile:
+        raise SystemExit("profile failed (is another profile running?)")
+    sys.stdout.write(collapsed_text(profile))
+    print(f"{profile['samples']} samples over {profile['seconds']}s", file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
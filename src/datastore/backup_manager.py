@@ -9,6 +9,8 @@ import threading
 from dataclasses import dataclass
 from typing import Any, Dict, Iterable, List
 
+from .wire_protocol import json_default, json_object_hook
+
 
 @dataclass
 class JournalEntry:
@@ -31,19 +33,19 @@ class PersistenceEngine:
         data: Dict[str, Any] = {}
         if os.path.exists(self._snapshot_file):
             with open(self._snapshot_file, "r", encoding="utf-8") as handle:
-                data = json.load(handle)
+                data = json.load(handle, object_hook=json_object_hook)
         if os.path.exists(self._journal_file):
             with open(self._journal_file, "r", encoding="utf-8") as handle:
                 for line in handle:
                     line = line.strip()
                     if not line:
                         continue
-                    entry = json.loads(line)
+                    entry = json.loads(line, object_hook=json_object_hook)
                     self._apply_entry(data, entry)
         return data
 
     def append_journal(self, entry: JournalEntry) -> None:
-        encoded = json.dumps({"op": entry.op, "data": entry.data}, separators=(",", ":"))
+        encoded = json.dumps({"op": entry.op, "data": entry.data}, separators=(",", ":"), default=json_default)
         with self._lock:
             with open(self._journal_file, "a", encoding="utf-8") as handle:
                 handle.write(encoded + "\n")
@@ -57,7 +59,7 @@ class PersistenceEngine:
         temp_file = self._snapshot_file + ".tmp"
         with self._lock:
             with open(temp_file, "w", encoding="utf-8") as handle:
-                json.dump(data, handle)
+                json.dump(data, handle, default=json_default)
                 handle.flush()
                 os.fsync(handle.fileno())
             os.replace(temp_file, self._snapshot_file)
@@ -26,6 +26,7 @@ class DatastoreSettings:
     election_interval: float = 0.5
     heartbeat_interval: float = 1.0
     drop_rate: float = 0.0
+    compression_threshold: int = 1024
 
     def all_nodes(self) -> List[RemoteNodeConfig]:
         nodes = [RemoteNodeConfig(self.node_id, self.host, self.port)]
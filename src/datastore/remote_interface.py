@@ -3,20 +3,42 @@
 from __future__ import annotations
 
 import socket
-from typing import Any, Iterable, List, Tuple
+from typing import Any, Iterable, List, Optional, Tuple
 
-from .wire_protocol import decode_message, encode_message
+from .wire_protocol import (
+    FLAG_ZLIB,
+    MAGIC,
+    Float32Array,
+    ProtocolError,
+    check_handshake_reply,
+    decode_message,
+    encode_frame,
+    encode_message,
+    handshake,
+    read_frame,
+)
 
 
 class DatastoreConnector:
     """Remote client interface to interact with data store nodes."""
 
-    def __init__(self, host: str, port: int, timeout: float = 3.0) -> None:
+    def __init__(
+        self,
+        host: str,
+        port: int,
+        timeout: float = 3.0,
+        binary: bool = False,
+        compress_threshold: Optional[int] = None,
+    ) -> None:
         self.host = host
         self.port = port
         self.timeout = timeout
+        self.binary = binary or compress_threshold is not None
+        self.compress_threshold = compress_threshold
 
     def _request(self, payload: dict) -> dict:
+        if self.binary:
+            return self._request_binary(payload)
         with socket.create_connection((self.host, self.port), timeout=self.timeout) as sock:
             sock.sendall(encode_message(payload))
             buffer = b""
@@ -27,6 +49,18 @@ class DatastoreConnector:
                 buffer += chunk
         return decode_message(buffer)
 
+    def _request_binary(self, payload: dict) -> dict:
+        """Send one request as a binary frame, pipelined behind the handshake."""
+        with socket.create_connection((self.host, self.port), timeout=self.timeout) as sock:
+            flags = FLAG_ZLIB if self.compress_threshold is not None else 0
+            sock.sendall(handshake(flags) + encode_frame(payload, self.compress_threshold))
+            with sock.makefile("rb") as stream:
+                check_handshake_reply(stream.read(len(MAGIC) + 2))
+                response = read_frame(stream)
+        if response is None:
+            raise ProtocolError("Connection closed")
+        return response
+
     def get(self, key: str) -> Any:
         response = self._request({"op": "get", "key": key})
         return response.get("result")
@@ -50,8 +84,8 @@ class DatastoreConnector:
         return list(response.get("result", []))
 
     def add_vector(self, key: str, vector: list[float]) -> None:
-        self._request({"op": "add_vector", "key": key, "vector": vector})
+        self._request({"op": "add_vector", "key": key, "vector": Float32Array(vector)})
 
     def vector_search(self, vector: list[float], top_k: int = 5) -> list[dict]:
-        response = self._request({"op": "vector_search", "vector": vector, "top_k": top_k})
+        response = self._request({"op": "vector_search", "vector": Float32Array(vector), "top_k": top_k})
         return list(response.get("result", []))
@@ -7,7 +7,7 @@ import socketserver
 from typing import Any, Dict, Optional
 
 from .memory_engine import DatastoreCore
-from .wire_protocol import ProtocolError, decode_message, encode_message
+from .wire_protocol import FLAG_ZLIB, MAGIC, ProtocolError, accept_handshake, decode_message, encode_frame, encode_message, read_frame
 from .sync_coordinator import ChangeLog, ClusterCoordinator, NodeState, ReplicationEvent
 from .node_config import DatastoreSettings
 
@@ -16,6 +16,9 @@ class RequestDispatcher(socketserver.StreamRequestHandler):
     server: "DatastoreServer"
 
     def handle(self) -> None:
+        if self.rfile.peek(1)[:1] == MAGIC[:1]:
+            self._handle_binary()
+            return
         raw = self.rfile.readline()
         if not raw:
             return
@@ -27,6 +30,24 @@ class RequestDispatcher(socketserver.StreamRequestHandler):
         response = self.server.handle_request(request)
         self.wfile.write(encode_message(response))
 
+    def _handle_binary(self) -> None:
+        """Serve length-prefixed binary frames after the handshake until the client closes."""
+        try:
+            reply, flags = accept_handshake(self.rfile.read(len(MAGIC) + 2))
+        except ProtocolError:
+            return
+        compress_above = self.server.settings.compression_threshold if flags & FLAG_ZLIB else None
+        self.wfile.write(reply)
+        while True:
+            try:
+                request = read_frame(self.rfile)
+            except ProtocolError as exc:
+                self.wfile.write(encode_frame({"status": "error", "error": str(exc)}))
+                return
+            if request is None:
+                return
+            self.wfile.write(encode_frame(self.server.handle_request(request), compress_above))
+
 
 class DatastoreServer(socketserver.ThreadingTCPServer):
     allow_reuse_address = True
@@ -2,8 +2,13 @@
 
 from __future__ import annotations
 
+import base64
 import json
-from typing import Any, Dict
+import struct
+import sys
+import zlib
+from array import array
+from typing import Any, BinaryIO, Dict, List, Optional, Tuple
 
 
 class ProtocolError(Exception):
@@ -11,17 +16,313 @@ class ProtocolError(Exception):
     pass
 
 
+# Binary connections open with MAGIC + version + flags; 0xc1 is never a valid
+# MessagePack or JSON first byte, so the server can tell the two apart.
+MAGIC = b"\xc1KV"
+VERSION = 1
+FLAG_ZLIB = 0x01  # the client asks for compressed responses
+SUPPORTED_FLAGS = FLAG_ZLIB
+MAX_FRAME = 64 * 1024 * 1024
+# Set in a frame's length prefix when its body is zlib-compressed.
+_COMPRESSED = 0x80000000
+
+_FRAME = struct.Struct(">I")
+_FLOAT32_EXT = 1
+_BYTES_TAG = "__bytes__"
+
+
+class Float32Array(list):
+    """Vector sent as packed float32 by the binary protocol and as a plain list in JSON."""
+
+
+def json_default(obj: Any) -> Any:
+    """Encode bytes values for JSON as a base64 tagged object."""
+    if isinstance(obj, (bytes, bytearray, memoryview)):
+        return {_BYTES_TAG: base64.b64encode(bytes(obj)).decode("ascii")}
+    raise TypeError(f"Object of type {type(obj).__name__} is not JSON serializable")
+
+
+def json_object_hook(obj: Dict[str, Any]) -> Any:
+    """Decode base64 tagged objects back to bytes."""
+    if len(obj) == 1 and _BYTES_TAG in obj:
+        return base64.b64decode(obj[_BYTES_TAG])
+    return obj
+
+
 def encode_message(payload: Dict[str, Any]) -> bytes:
     """Encode a message dict to JSON bytes with newline."""
-    return (json.dumps(payload, separators=(",", ":")) + "\n").encode("utf-8")
+    return (json.dumps(payload, separators=(",", ":"), default=json_default) + "\n").encode("utf-8")
 
 
 def decode_message(raw: bytes) -> Dict[str, Any]:
     """Decode JSON bytes to message dict with validation."""
     try:
-        data = json.loads(raw.decode("utf-8"))
+        data = json.loads(raw.decode("utf-8"), object_hook=json_object_hook)
     except json.JSONDecodeError as exc:
         raise ProtocolError("Invalid JSON") from exc
     if not isinstance(data, dict):
         raise ProtocolError("Message must be an object")
     return data
+
+
+_DOUBLE = struct.Struct(">Bd")
+
+
+def _header(out: bytearray, size: int, fix: int, fix_limit: int, codes: Tuple[int, int, int]) -> None:
+    """Append a length header using the smallest fitting type code."""
+    if size < fix_limit:
+        out.append(fix | size)
+    elif codes[0] and size <= 0xFF:
+        out += bytes((codes[0], size))
+    elif size <= 0xFFFF:
+        out += struct.pack(">BH", codes[1], size)
+    else:
+        out += struct.pack(">BI", codes[2], size)
+
+
+def _pack_int(obj: int, out: bytearray) -> None:
+    """Append an integer using the smallest fitting type code."""
+    if 0 <= obj < 0x80:
+        out.append(obj)
+    elif -32 <= obj < 0:
+        out += struct.pack(">b", obj)
+    elif 0 <= obj <= 0xFFFF:
+        out += struct.pack(">BH", 0xCD, obj)
+    elif 0 <= obj <= 0xFFFFFFFF:
+        out += struct.pack(">BI", 0xCE, obj)
+    elif 0 <= obj < 1 << 64:
+        out += struct.pack(">BQ", 0xCF, obj)
+    elif -(1 << 31) <= obj < 0:
+        out += struct.pack(">Bi", 0xD2, obj)
+    elif -(1 << 63) <= obj < 0:
+        out += struct.pack(">Bq", 0xD3, obj)
+    else:
+        raise ProtocolError(f"Integer out of range: {obj}")
+
+
+def _pack(obj: Any, out: bytearray) -> None:
+    """Append the MessagePack encoding of a value."""
+    # Exact type checks first: they are the hot path and much cheaper than isinstance chains.
+    kind = type(obj)
+    if kind is str:
+        data = obj.encode("utf-8")
+        _header(out, len(data), 0xA0, 32, (0xD9, 0xDA, 0xDB))
+        out += data
+    elif kind is dict:
+        _header(out, len(obj), 0x80, 16, (0, 0xDE, 0xDF))
+        for key, value in obj.items():
+            _pack(key, out)
+            _pack(value, out)
+    elif kind is int:
+        _pack_int(obj, out)
+    elif kind is list or kind is tuple:
+        _header(out, len(obj), 0x90, 16, (0, 0xDC, 0xDD))
+        for item in obj:
+            _pack(item, out)
+    elif kind is float:
+        out += _DOUBLE.pack(0xCB, obj)
+    elif obj is None:
+        out.append(0xC0)
+    elif kind is bool:
+        out.append(0xC3 if obj else 0xC2)
+    elif kind is Float32Array:
+        values = array("f", obj)
+        if sys.byteorder == "big":
+            values.byteswap()
+        _header(out, len(values) * 4, 0, 0, (0xC7, 0xC8, 0xC9))
+        out.append(_FLOAT32_EXT)
+        out += values.tobytes()
+    elif isinstance(obj, (bytes, bytearray, memoryview)):
+        data = bytes(obj)
+        _header(out, len(data), 0, 0, (0xC4, 0xC5, 0xC6))
+        out += data
+    else:
+        for base in (dict, list, tuple, str, int, float):
+            if isinstance(obj, base):
+                _pack(base(obj), out)
+                return
+        raise ProtocolError(f"Cannot encode {kind.__name__}")
+
+
+def packb(obj: Any) -> bytes:
+    """Encode ``obj`` as MessagePack; ``Float32Array`` becomes ext type 1 (little-endian float32)."""
+    out = bytearray()
+    _pack(obj, out)
+    return bytes(out)
+
+
+_FIXED = {
+    0xCC: struct.Struct(">B"), 0xCD: struct.Struct(">H"), 0xCE: struct.Struct(">I"), 0xCF: struct.Struct(">Q"),
+    0xD0: struct.Struct(">b"), 0xD1: struct.Struct(">h"), 0xD2: struct.Struct(">i"), 0xD3: struct.Struct(">q"),
+    0xCA: struct.Struct(">f"), 0xCB: struct.Struct(">d"),
+}
+_SIZES = {
+    0xD9: (struct.Struct(">B"), "str"), 0xDA: (struct.Struct(">H"), "str"), 0xDB: (struct.Struct(">I"), "str"),
+    0xC4: (struct.Struct(">B"), "bin"), 0xC5: (struct.Struct(">H"), "bin"), 0xC6: (struct.Struct(">I"), "bin"),
+    0xC7: (struct.Struct(">B"), "ext"), 0xC8: (struct.Struct(">H"), "ext"), 0xC9: (struct.Struct(">I"), "ext"),
+    0xDC: (struct.Struct(">H"), "array"), 0xDD: (struct.Struct(">I"), "array"),
+    0xDE: (struct.Struct(">H"), "map"), 0xDF: (struct.Struct(">I"), "map"),
+}
+_FIXEXT = {0xD4: 1, 0xD5: 2, 0xD6: 4, 0xD7: 8, 0xD8: 16}
+
+
+def _take(data: bytes, pos: int, size: int) -> Tuple[bytes, int]:
+    """Slice a fixed number of bytes from the buffer."""
+    end = pos + size
+    if end > len(data):
+        raise ProtocolError("Truncated message")
+    return data[pos:end], end
+
+
+def _ext(code: int, payload: bytes) -> Any:
+    """Decode an extension payload."""
+    if code != _FLOAT32_EXT or len(payload) % 4:
+        raise ProtocolError(f"Unsupported extension type {code}")
+    values = array("f")
+    values.frombytes(payload)
+    if sys.byteorder == "big":
+        values.byteswap()
+    return values.tolist()
+
+
+def _unpack(data: bytes, pos: int) -> Tuple[Any, int]:
+    """Decode one value starting at the given offset."""
+    code = data[pos]
+    pos += 1
+    if code < 0x80:
+        return code, pos
+    if code >= 0xE0:
+        return code - 0x100, pos
+    if code >= 0xA0:
+        if code <= 0xBF:
+            end = pos + (code & 0x1F)
+            if end > len(data):
+                raise ProtocolError("Truncated message")
+            return data[pos:end].decode("utf-8"), end
+    elif code >= 0x90:
+        return _unpack_array(data, pos, code & 0x0F)
+    else:
+        return _unpack_map(data, pos, code & 0x0F)
+    if code == 0xC0:
+        return None, pos
+    if code == 0xC2 or code == 0xC3:
+        return code == 0xC3, pos
+    if code in _FIXED:
+        layout = _FIXED[code]
+        return layout.unpack_from(data, pos)[0], pos + layout.size
+    if code in _FIXEXT:
+        raw, pos = _take(data, pos, 1 + _FIXEXT[code])
+        return _ext(raw[0], raw[1:]), pos
+    if code in _SIZES:
+        layout, kind = _SIZES[code]
+        (size,) = layout.unpack_from(data, pos)
+        pos += layout.size
+        if kind == "array":
+            return _unpack_array(data, pos, size)
+        if kind == "map":
+            return _unpack_map(data, pos, size)
+        if kind == "ext":
+            raw, pos = _take(data, pos, 1 + size)
+            return _ext(raw[0], raw[1:]), pos
+        raw, pos = _take(data, pos, size)
+        return (raw.decode("utf-8") if kind == "str" else raw), pos
+    raise ProtocolError(f"Invalid type byte 0x{code:02x}")
+
+
+def _unpack_array(data: bytes, pos: int, size: int) -> Tuple[List[Any], int]:
+    """Decode a sequence of array items."""
+    items = []
+    for _ in range(size):
+        item, pos = _unpack(data, pos)
+        items.append(item)
+    return items, pos
+
+
+def _unpack_map(data: bytes, pos: int, size: int) -> Tuple[Dict[Any, Any], int]:
+    """Decode a sequence of map entries."""
+    result = {}
+    for _ in range(size):
+        key, pos = _unpack(data, pos)
+        result[key], pos = _unpack(data, pos)
+    return result, pos
+
+
+def unpackb(data: bytes) -> Any:
+    """Decode a complete MessagePack message."""
+    try:
+        obj, pos = _unpack(data, 0)
+    except (IndexError, struct.error) as exc:
+        raise ProtocolError("Truncated message") from exc
+    except (UnicodeDecodeError, TypeError) as exc:
+        raise ProtocolError("Invalid binary message") from exc
+    if pos != len(data):
+        raise ProtocolError("Trailing bytes after message")
+    return obj
+
+
+def handshake(flags: int = 0) -> bytes:
+    """Preface a client sends to switch its connection to binary frames."""
+    return MAGIC + bytes((VERSION, flags))
+
+
+def accept_handshake(preface: bytes) -> Tuple[bytes, int]:
+    """Validate a client preface; returns the server's reply and the flags both sides will use."""
+    if len(preface) != len(MAGIC) + 2 or preface[: len(MAGIC)] != MAGIC:
+        raise ProtocolError("Invalid handshake")
+    if preface[len(MAGIC)] != VERSION:
+        raise ProtocolError(f"Unsupported protocol version {preface[len(MAGIC)]}")
+    flags = preface[len(MAGIC) + 1] & SUPPORTED_FLAGS
+    return handshake(flags), flags
+
+
+def check_handshake_reply(reply: bytes) -> int:
+    """Validate the server handshake reply and return the accepted flags."""
+    if len(reply) != len(MAGIC) + 2 or reply[: len(MAGIC)] != MAGIC or reply[len(MAGIC)] != VERSION:
+        raise ProtocolError("Server does not speak the binary protocol")
+    return reply[len(MAGIC) + 1]
+
+
+def encode_frame(payload: Dict[str, Any], compress_above: Optional[int] = None) -> bytes:
+    """Encode a message dict as a length-prefixed binary frame, compressing bodies above the threshold."""
+    body = packb(payload)
+    if len(body) > MAX_FRAME:
+        raise ProtocolError("Frame too large")
+    if compress_above is not None and len(body) > compress_above:
+        compressed = zlib.compress(body, 1)
+        if len(compressed) < len(body):
+            return _FRAME.pack(len(compressed) | _COMPRESSED) + compressed
+    return _FRAME.pack(len(body)) + body
+
+
+def _decode_body(body: bytes, compressed: bool) -> Dict[str, Any]:
+    """Inflate a frame body if needed and decode it to a message dict."""
+    if compressed:
+        inflater = zlib.decompressobj()
+        try:
+            body = inflater.decompress(body, MAX_FRAME)
+        except zlib.error as exc:
+            raise ProtocolError("Invalid compressed frame") from exc
+        if inflater.unconsumed_tail:
+            raise ProtocolError("Frame too large")
+    data = unpackb(body)
+    if not isinstance(data, dict):
+        raise ProtocolError("Message must be an object")
+    return data
+
+
+def read_frame(stream: BinaryIO) -> Optional[Dict[str, Any]]:
+    """Read one length-prefixed frame; ``None`` on a clean end of stream."""
+    header = stream.read(_FRAME.size)
+    if not header:
+        return None
+    if len(header) < _FRAME.size:
+        raise ProtocolError("Truncated frame")
+    (size,) = _FRAME.unpack(header)
+    compressed = bool(size & _COMPRESSED)
+    size &= ~_COMPRESSED
+    if size > MAX_FRAME:
+        raise ProtocolError("Frame too large")
+    body = stream.read(size)
+    if len(body) < size:
+        raise ProtocolError("Truncated frame")
+    return _decode_body(body, compressed)
@@ -0,0 +1,220 @@
+from __future__ import annotations
+
+import hashlib
+import threading
+from typing import Any, Callable, Dict, Iterable, List, Optional, Set, Tuple
+
+from .client import KVClient
+from .config import ClusterConfig, NodeConfig
+from .engine import KVEngine
+from .partitioning import HashRing, stable_hash
+from .protocol import encode_message
+
+Transport = Callable[[NodeConfig, Dict[str, Any]], Optional[Dict[str, Any]]]
+
+
+def _digest(key: str, version: int) -> int:
+    return stable_hash(f"{key}\0{version}")
+
+
+def _combine(left: int, right: int) -> int:
+    if not left and not right:
+        return 0
+    raw = left.to_bytes(8, "big") + right.to_bytes(8, "big")
+    return int.from_bytes(hashlib.blake2b(raw, digest_size=8).digest(), "big")
+
+
+class MerkleTree:
+    """Fixed-shape Merkle tree over key-hash buckets, updated incrementally on every write.
+
+    Leaves hold the XOR of ``hash(key, version)`` for the keys in the bucket, so a
+    write only touches one leaf. Inner nodes live in heap order (root at index 1)
+    and are recomputed lazily along the paths of dirty leaves when read. Each
+    bucket also keeps its key set, so a differing bucket is listed without a scan
+    of every key.
+    """
+
+    def __init__(self, depth: int = 12) -> None:
+        self.depth = depth
+        self.leaf_count = 1 << depth
+        self._nodes: List[int] = [0] * (2 * self.leaf_count)
+        self._dirty: Set[int] = set()
+        self._keys: Dict[int, Set[str]] = {}
+        self._lock = threading.Lock()
+
+    def bucket(self, key: str) -> int:
+        return stable_hash(key) >> (64 - self.depth)
+
+    def update(self, key: str, old_version: int, new_version: int) -> None:
+        delta = (_digest(key, old_version) if old_version else 0) ^ (_digest(key, new_version) if new_version else 0)
+        bucket = self.bucket(key)
+        leaf = self.leaf_count + bucket
+        with self._lock:
+            self._nodes[leaf] ^= delta
+            self._dirty.add(leaf)
+            if not old_version:
+                self._keys.setdefault(bucket, set()).add(key)
+            elif not new_version:
+                self._keys[bucket].discard(key)
+
+    def keys(self, buckets: Iterable[int]) -> List[str]:
+        """Keys in ``buckets``; deleted keys stay listed while their tombstone version does."""
+        with self._lock:
+            return [key for bucket in buckets for key in self._keys.get(bucket, ())]
+
+    def hashes(self, indices: Iterable[int]) -> List[int]:
+        with self._lock:
+            self._refresh()
+            return [self._nodes[index] for index in indices]
+
+    def _refresh(self) -> None:
+        parents = {leaf >> 1 for leaf in self._dirty}
+        self._dirty.clear()
+        while parents:
+            for parent in parents:
+                self._nodes[parent] = _combine(self._nodes[2 * parent], self._nodes[2 * parent + 1])
+            parents = {parent >> 1 for parent in parents if parent > 1}
+
+
+class AntiEntropy:
+    """Background repair that compares Merkle trees with each peer and syncs only differing buckets."""
+
+    def __init__(
+        self,
+        config: ClusterConfig,
+        engine: KVEngine,
+        ring: Optional[HashRing] = None,
+        depth: Optional[int] = None,
+        transport: Optional[Transport] = None,
+    ) -> None:
+        self._config = config
+        self._engine = engine
+        self._ring = ring
+        self._transport = transport or self._call
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        peers = config.peers or []
+        depth = config.merkle_depth if depth is None else depth
+        if ring is None:
+            shared = MerkleTree(depth)
+            self._trees: Dict[int, MerkleTree] = {peer.node_id: shared for peer in peers}
+        else:
+            self._trees = {peer.node_id: MerkleTree(depth) for peer in peers}
+        engine.subscribe(self._on_change)
+        for key, version in engine.versions().items():
+            self._on_change(key, 0, version)
+
+    def start(self) -> None:
+        if self._config.peers and self._config.anti_entropy_interval > 0:
+            self._thread.start()
+
+    def stop(self) -> None:
+        self._stop.set()
+
+    def _run(self) -> None:
+        while not self._stop.wait(self._config.anti_entropy_interval):
+            for peer in self._config.peers or []:
+                self.sync_with(peer)
+
+    def _trees_for(self, key: str) -> List[MerkleTree]:
+        if self._ring is None:
+            return list({id(tree): tree for tree in self._trees.values()}.values())
+        owners = self._ring.owners(key)
+        if not any(node.node_id == self._config.node_id for node in owners):
+            return []
+        return [self._trees[node.node_id] for node in owners if node.node_id in self._trees]
+
+    def _on_change(self, key: str, old_version: int, new_version: int) -> None:
+        for tree in self._trees_for(key):
+            tree.update(key, old_version, new_version)
+
+    def _shares(self, key: str, peer_id: int) -> bool:
+        return self._ring is None or any(node.node_id == peer_id for node in self._ring.owners(key))
+
+    def _bucket_versions(self, peer_id: int, buckets: Set[int]) -> Dict[str, int]:
+        keys = [key for key in self._trees[peer_id].keys(buckets) if self._shares(key, peer_id)]
+        return self._engine.versions_of(keys)
+
+    def _call(self, node: NodeConfig, payload: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+        try:
+            return KVClient(node.host, node.port, timeout=self._config.replication_timeout).request(payload)
+        except OSError:
+            return None
+
+    def sync_with(self, peer: NodeConfig) -> Optional[Dict[str, int]]:
+        tree = self._trees.get(peer.node_id)
+        if tree is None:
+            return None
+        stats = {"rounds": 0, "bytes": 0, "buckets": 0, "pulled": 0, "pushed": 0}
+
+        def send(payload: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+            response = self._transport(peer, payload)
+            stats["rounds"] += 1
+            stats["bytes"] += len(encode_message(payload))
+            if response is None or response.get("status") != "ok":
+                return None
+            stats["bytes"] += len(encode_message(response))
+            return response
+
+        indices = [1]
+        buckets: Set[int] = set()
+        while indices:
+            response = send({"op": "merkle_hashes", "peer": self._config.node_id, "nodes": indices})
+            if response is None:
+                return None
+            local = tree.hashes(indices)
+            differing = [index for index, mine, theirs in zip(indices, local, response["hashes"]) if mine != theirs]
+            buckets.update(index - tree.leaf_count for index in differing if index >= tree.leaf_count)
+            indices = [child for index in differing if index < tree.leaf_count for child in (2 * index, 2 * index + 1)]
+        stats["buckets"] = len(buckets)
+        if not buckets:
+            return stats
+
+        response = send({"op": "merkle_bucket", "peer": self._config.node_id, "buckets": sorted(buckets)})
+        if response is None:
+            return None
+        theirs: Dict[str, int] = response["versions"]
+        mine = self._bucket_versions(peer.node_id, buckets)
+        pull = [key for key, version in theirs.items() if version > mine.get(key, 0)]
+        push = [key for key, version in mine.items() if version > theirs.get(key, 0)]
+
+        if pull:
+            response = send({"op": "merkle_fetch", "keys": pull})
+            if response is None:
+                return None
+            stats["pulled"] = self._engine.apply_batch(_events_from_records(response["records"]))
+        if push:
+            events = [{"op": op, "payload": payload} for op, payload in _events_from_records(self._engine.records(push))]
+            if send({"op": "replicate_batch", "events": events}) is None:
+                return None
+            stats["pushed"] = len(events)
+        return stats
+
+    def handle(self, request: Dict[str, Any]) -> Dict[str, Any]:
+        op = request.get("op")
+        peer_id = int(request.get("peer", 0))
+        if op == "merkle_hashes":
+            tree = self._trees.get(peer_id)
+            if tree is None:
+                return {"status": "error", "error": "unknown_peer"}
+            return {"status": "ok", "hashes": tree.hashes(request.get("nodes", []))}
+        if op == "merkle_bucket":
+            if peer_id not in self._trees:
+                return {"status": "error", "error": "unknown_peer"}
+            return {"status": "ok", "versions": self._bucket_versions(peer_id, set(request.get("buckets", [])))}
+        if op == "merkle_fetch":
+            return {"status": "ok", "records": self._engine.records(request.get("keys", []))}
+        return {"status": "error", "error": f"unknown op: {op}"}
+
+
+def _events_from_records(records: List[Dict[str, Any]]) -> List[Tuple[str, Dict[str, Any]]]:
+    events: List[Tuple[str, Dict[str, Any]]] = []
+    for record in records:
+        if record["deleted"]:
+            events.append(("delete", {"key": record["key"], "version": record["version"]}))
+        else:
+            payload = {"key": record["key"], "value": record["value"], "version": record["version"]}
+            if record.get("expire_at") is not None:
+                payload["expire_at"] = record["expire_at"]
+            events.append(("set", payload))
+    return events
@@ -2,10 +2,13 @@ from __future__ import annotations
 
 import argparse
 import json
+import signal
 from pathlib import Path
 
 from .config import ClusterConfig, NodeConfig
+from .memory import POLICIES, parse_size
 from .server import KVServer
+from .sharding import ShardDispatcher
 
 
 def _load_peers(peers_json: str | None) -> list[NodeConfig] | None:
@@ -15,6 +18,10 @@ def _load_peers(peers_json: str | None) -> list[NodeConfig] | None:
     return [NodeConfig(node_id=item["node_id"], host=item["host"], port=item["port"]) for item in peers_data]
 
 
+def _interrupt(signum: int, frame: object) -> None:
+    raise KeyboardInterrupt
+
+
 def main() -> None:
     parser = argparse.ArgumentParser(description="KV Store Server")
     parser.add_argument("--host", default="127.0.0.1")
@@ -23,9 +30,62 @@ def main() -> None:
     parser.add_argument("--data-dir", default="./data")
     parser.add_argument("--role", choices=["primary", "secondary"], default="primary")
     parser.add_argument("--mode", choices=["leader", "dynamo"], default="leader")
+    parser.add_argument("--consensus", choices=["none", "raft"], default="none", help="Raft log for leader mode")
+    parser.add_argument("--raft-election-timeout", type=float, default=1.0)
+    parser.add_argument("--raft-heartbeat-interval", type=float, default=0.1)
+    parser.add_argument(
+        "--raft-segment-entries", type=int, default=4096, help="Raft log entries per segment file; applied segments are deleted"
+    )
+    parser.add_argument("--shards", type=int, default=1, help="Worker processes, each owning a key-hash range")
+    parser.add_argument(
+        "--search-workers", type=int, default=0, help="Processes for vector_search only; 0 searches inline. Text and value searches always run inline"
+    )
     parser.add_argument("--peers", help="JSON list of peers with node_id/host/port")
     parser.add_argument("--drop-rate", type=float, default=0.0)
+    parser.add_argument("--heartbeat-interval", type=float, default=1.0, help="Seconds between heartbeats to each peer")
+    parser.add_argument("--phi-threshold", type=float, default=8.0, help="Phi above which a silent peer is down")
+    parser.add_argument("--replication-factor", type=int, default=3)
+    parser.add_argument("--virtual-nodes", type=int, default=64)
+    parser.add_argument("--read-quorum", type=int, default=2)
+    parser.add_argument("--write-quorum", type=int, default=2)
+    parser.add_argument("--hedge-delay", type=float, default=0.05, help="Seconds before a hedged read; 0 disables")
+    parser.add_argument("--response-delay", type=float, default=0.0, help="Chaos: delay every response by N seconds")
+    parser.add_argument("--anti-entropy-interval", type=float, default=30.0, help="Seconds between Merkle syncs; 0 disables")
+    parser.add_argument("--max-hints-per-peer", type=int, default=100_000)
+    parser.add_argument("--hint-replay-rate", type=float, default=1000.0, help="Hinted events replayed per second")
+    parser.add_argument("--compression", choices=["none", "zlib"], default="none", help="Compress replication traffic to peers")
+    parser.add_argument("--compression-threshold", type=int, default=1024, help="Bytes above which a frame is compressed")
+    parser.add_argument("--lazy-values", action="store_true", help="Memory-map the snapshot and decode values on access")
+    parser.add_argument("--value-cache", type=int, default=0, help="Decoded values kept in memory with --lazy-values")
+    parser.add_argument(
+        "--compact-values", action="store_true", help="Pack keys and values into arrays; smaller, slower per access"
+    )
+    parser.add_argument(
+        "--background-index-rebuild", action="store_true", help="Serve gets while indexes rebuild; searches wait for them"
+    )
+    parser.add_argument(
+        "--index-checkpoint-interval", type=float, default=60.0, help="Seconds between index checkpoints, also written on shutdown"
+    )
+    parser.add_argument("--metrics-port", type=int, default=0, help="Serve Prometheus text on /metrics; 0 disables")
+    parser.add_argument("--no-metrics", dest="metrics", action="store_false", help="Turn off latency histograms and counters")
+    parser.add_argument("--trace", action="store_true", help="Record per-request phase timings from startup")
+    parser.add_argument("--trace-capacity", type=int, default=1024, help="Recent request traces kept in memory")
+    parser.add_argument("--slow-log-ms", type=float, default=0.0, help="Also keep traces of requests at least this slow; 0 disables")
+    parser.add_argument("--maxmemory", type=parse_size, default=0, help="Memory estimate to stay under, e.g. 512mb; 0 is unlimited")
+    parser.add_argument("--maxmemory-policy", choices=POLICIES, default="noeviction", help="Evict keys or reject writes at --maxmemory")
+    parser.add_argument("--maxmemory-samples", type=int, default=5, help="Keys sampled per eviction; more is closer to exact LRU/LFU")
+    parser.add_argument("--expiry-interval", type=float, default=0.1, help="Seconds between active expiry rounds; 0 disables")
+    parser.add_argument("--expiry-batch", type=int, default=100, help="Expired keys deleted per engine lock hold")
+    parser.add_argument(
+        "--tombstone-grace", type=float, default=600.0, help="Seconds a deleted key's version is kept to block older writes"
+    )
     args = parser.parse_args()
+    if args.shards > 1 and args.peers:
+        parser.error("--shards runs a standalone node and cannot be combined with --peers")
+    if args.lazy_values and args.compact_values:
+        parser.error("--lazy-values and --compact-values cannot be combined")
+    if args.maxmemory and (args.mode == "dynamo" or args.consensus == "raft"):
+        parser.error("--maxmemory only applies in leader mode without --consensus raft")
 
     data_dir = Path(args.data_dir).resolve()
     config = ClusterConfig(
@@ -37,8 +97,45 @@ def main() -> None:
         mode=args.mode,
         peers=_load_peers(args.peers),
         drop_rate=args.drop_rate,
+        heartbeat_interval=args.heartbeat_interval,
+        phi_threshold=args.phi_threshold,
+        replication_factor=args.replication_factor,
+        virtual_nodes=args.virtual_nodes,
+        read_quorum=args.read_quorum,
+        write_quorum=args.write_quorum,
+        hedge_delay=args.hedge_delay,
+        response_delay=args.response_delay,
+        anti_entropy_interval=args.anti_entropy_interval,
+        max_hints_per_peer=args.max_hints_per_peer,
+        hint_replay_rate=args.hint_replay_rate,
+        consensus=args.consensus,
+        raft_election_timeout=args.raft_election_timeout,
+        raft_heartbeat_interval=args.raft_heartbeat_interval,
+        raft_segment_entries=args.raft_segment_entries,
+        shards=args.shards,
+        search_workers=args.search_workers,
+        compression=args.compression,
+        compression_threshold=args.compression_threshold,
+        lazy_values=args.lazy_values,
+        value_cache=args.value_cache,
+        compact_values=args.compact_values,
+        background_index_rebuild=args.background_index_rebuild,
+        index_checkpoint_interval=args.index_checkpoint_interval,
+        tombstone_grace=args.tombstone_grace,
+        metrics=args.metrics,
+        metrics_port=args.metrics_port,
+        trace=args.trace,
+        trace_capacity=args.trace_capacity,
+        slow_log_ms=args.slow_log_ms,
+        maxmemory=args.maxmemory,
+        maxmemory_policy=args.maxmemory_policy,
+        maxmemory_samples=args.maxmemory_samples,
+        expiry_interval=args.expiry_interval,
+        expiry_batch=args.expiry_batch,
     )
-    server = KVServer(config)
+    server = ShardDispatcher(config) if config.shards > 1 else KVServer(config)
+    # Shut down cleanly on SIGTERM too, so a dispatcher stops its shard workers.
+    signal.signal(signal.SIGTERM, _interrupt)
     try:
         server.start()
     except KeyboardInterrupt:
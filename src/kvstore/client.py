@@ -1,41 +1,109 @@
 from __future__ import annotations
 
 import socket
-from typing import Any, Iterable, List, Tuple
+import threading
+from typing import Any, Dict, Iterable, List, Optional, Tuple
 
-from .protocol import decode_message, encode_message
+from .config import NodeConfig
+from .partitioning import HashRing
+from .protocol import (
+    FLAG_ZLIB,
+    MAGIC,
+    Float32Array,
+    ProtocolError,
+    RecvBuffer,
+    check_handshake_reply,
+    decode_message,
+    encode_frame,
+    encode_message,
+    handshake,
+)
+
+_local = threading.local()
+
+
+def _recv_buffer() -> RecvBuffer:
+    """Receive buffer reused by every request made on the calling thread."""
+    buffer = getattr(_local, "buffer", None)
+    if buffer is None:
+        buffer = _local.buffer = RecvBuffer()
+    return buffer
+
+
+def _with_quorum(payload: dict, name: str, value: Optional[float]) -> dict:
+    if value is not None:
+        payload[name] = value
+    return payload
 
 
 class KVClient:
-    def __init__(self, host: str, port: int, timeout: float = 3.0) -> None:
+    def __init__(
+        self,
+        host: str,
+        port: int,
+        timeout: float = 3.0,
+        binary: bool = False,
+        compress_threshold: Optional[int] = None,
+    ) -> None:
         self.host = host
         self.port = port
         self.timeout = timeout
+        # Compression is part of the binary protocol, so asking for it implies binary frames.
+        self.binary = binary or compress_threshold is not None
+        self.compress_threshold = compress_threshold
 
     def _request(self, payload: dict) -> dict:
+        if self.binary:
+            return self._request_binary(payload)
         with socket.create_connection((self.host, self.port), timeout=self.timeout) as sock:
             sock.sendall(encode_message(payload))
-            buffer = b""
-            while not buffer.endswith(b"\n"):
-                chunk = sock.recv(4096)
-                if not chunk:
-                    break
-                buffer += chunk
-        return decode_message(buffer)
-
-    def get(self, key: str) -> Any:
-        response = self._request({"op": "get", "key": key})
+            line = _recv_buffer().attach(sock).read_line()
+            return decode_message(line if line is not None else b"")
+
+    def _request_binary(self, payload: dict) -> dict:
+        with socket.create_connection((self.host, self.port), timeout=self.timeout) as sock:
+            # The first frame rides along with the handshake, so binary costs no extra round trip.
+            flags = FLAG_ZLIB if self.compress_threshold is not None else 0
+            sock.sendall(handshake(flags) + encode_frame(payload, self.compress_threshold))
+            buffer = _recv_buffer().attach(sock)
+            check_handshake_reply(bytes(buffer.read_exact(len(MAGIC) + 2) or b""))
+            response = buffer.read_frame()
+        if response is None:
+            raise ProtocolError("Connection closed")
+        return response
+
+    def request(self, payload: dict) -> dict:
+        return self._request(payload)
+
+    def get(self, key: str, r: Optional[int] = None) -> Any:
+        response = self._request(_with_quorum({"op": "get", "key": key}, "r", r))
         return response.get("result")
 
-    def set(self, key: str, value: Any) -> None:
-        self._request({"op": "set", "key": key, "value": value})
+    def mget(self, keys: Iterable[str]) -> Dict[str, Any]:
+        response = self._request({"op": "mget", "keys": list(keys)})
+        return dict(response.get("result", {}))
 
-    def delete(self, key: str) -> None:
-        self._request({"op": "delete", "key": key})
+    def set(self, key: str, value: Any, w: Optional[int] = None, ttl: Optional[float] = None) -> None:
+        payload = _with_quorum({"op": "set", "key": key, "value": value}, "w", w)
+        self._request(_with_quorum(payload, "ttl", ttl))
 
-    def bulk_set(self, items: Iterable[Tuple[str, Any]]) -> None:
+    def delete(self, key: str, w: Optional[int] = None) -> None:
+        self._request(_with_quorum({"op": "delete", "key": key}, "w", w))
+
+    def bulk_set(self, items: Iterable[Tuple[str, Any]], ttl: Optional[float] = None) -> None:
         items_list = list(items)
-        self._request({"op": "bulk_set", "items": items_list})
+        self._request(_with_quorum({"op": "bulk_set", "items": items_list}, "ttl", ttl))
+
+    def expire(self, key: str, ttl: float) -> bool:
+        """Expire ``key`` in ``ttl`` seconds; False if it does not exist."""
+        return bool(self._request({"op": "expire", "key": key, "ttl": ttl}).get("result"))
+
+    def persist(self, key: str) -> bool:
+        return bool(self._request({"op": "persist", "key": key}).get("result"))
+
+    def ttl(self, key: str) -> float:
+        """Seconds left: -1 if ``key`` has no TTL, -2 if it does not exist."""
+        return self._request({"op": "ttl", "key": key}).get("result", -2)
 
     def search_by_value(self, value: Any) -> list[str]:
         response = self._request({"op": "search_value", "value": value})
@@ -45,9 +113,113 @@ class KVClient:
         response = self._request({"op": "search_text", "term": term})
         return list(response.get("result", []))
 
+    def scan(self, prefix: str = "", after: Optional[str] = None, limit: int = 1000) -> List[Tuple[str, Any]]:
+        response = self._request({"op": "scan", "prefix": prefix, "after": after, "limit": limit})
+        return [(key, value) for key, value in response.get("result", [])]
+
+    def add_vector(self, key: str, vector: list[float]) -> None:
+        self._request({"op": "add_vector", "key": key, "vector": Float32Array(vector)})
+
+    def vector_search(self, vector: list[float], top_k: int = 5) -> list[dict]:
+        response = self._request({"op": "vector_search", "vector": Float32Array(vector), "top_k": top_k})
+        return list(response.get("result", []))
+
+    def stats(self) -> Dict[str, Any]:
+        return dict(self._request({"op": "stats"}).get("result", {}))
+
+    def memory(self) -> Dict[str, Any]:
+        """Estimated bytes per structure, the maxmemory limit and policy, and keys evicted so far."""
+        return dict(self._request({"op": "memory"}).get("result", {}))
+
+    def trace(
+        self, enabled: Optional[bool] = None, slow_ms: Optional[float] = None, limit: int = 100, clear: bool = False
+    ) -> Dict[str, Any]:
+        """Optionally switch tracing or the slow-op threshold, then return recent and slow request traces."""
+        request: Dict[str, Any] = {"op": "trace", "limit": limit, "clear": clear}
+        if enabled is not None:
+            request["enabled"] = enabled
+        if slow_ms is not None:
+            request["slow_ms"] = slow_ms
+        return dict(self._request(request).get("result", {}))
+
+    def profile(self, seconds: float = 5.0, interval_ms: float = 5.0, idle: bool = False) -> Dict[str, Any]:
+        """Sample the node's thread stacks for ``seconds``; see ``kvstore.profiler.collapsed_text`` for flame graphs."""
+        client = KVClient(self.host, self.port, timeout=self.timeout + seconds, binary=self.binary)
+        response = client._request({"op": "profile", "seconds": seconds, "interval_ms": interval_ms, "idle": idle})
+        return dict(response.get("result", {}))
+
+
+class PartitionedKVClient:
+    """Dynamo-mode client that sends key operations straight to the owning nodes."""
+
+    def __init__(
+        self,
+        nodes: List[NodeConfig],
+        replication_factor: int = 3,
+        virtual_nodes: int = 64,
+        timeout: float = 3.0,
+        binary: bool = False,
+    ) -> None:
+        self._ring = HashRing(nodes, virtual_nodes=virtual_nodes, replication_factor=replication_factor)
+        self._clients: Dict[int, KVClient] = {
+            node.node_id: KVClient(node.host, node.port, timeout, binary=binary) for node in nodes
+        }
+
+    def _send(self, candidates: List[NodeConfig], payload: dict) -> dict:
+        last_error: Optional[OSError] = None
+        for node in candidates:
+            try:
+                return self._clients[node.node_id].request(payload)
+            except OSError as exc:
+                last_error = exc
+        raise last_error or OSError("no nodes available")
+
+    def _send_for_key(self, key: str, payload: dict) -> dict:
+        return self._send(self._ring.preference_list(key), payload)
+
+    def get(self, key: str, r: Optional[int] = None) -> Any:
+        response = self._send_for_key(key, _with_quorum({"op": "get", "key": key}, "r", r))
+        return response.get("result")
+
+    def set(self, key: str, value: Any, w: Optional[int] = None, ttl: Optional[float] = None) -> None:
+        payload = _with_quorum({"op": "set", "key": key, "value": value}, "w", w)
+        self._send_for_key(key, _with_quorum(payload, "ttl", ttl))
+
+    def expire(self, key: str, ttl: float) -> bool:
+        return bool(self._send_for_key(key, {"op": "expire", "key": key, "ttl": ttl}).get("result"))
+
+    def persist(self, key: str) -> bool:
+        return bool(self._send_for_key(key, {"op": "persist", "key": key}).get("result"))
+
+    def ttl(self, key: str) -> float:
+        return self._send_for_key(key, {"op": "ttl", "key": key}).get("result", -2)
+
+    def delete(self, key: str, w: Optional[int] = None) -> None:
+        self._send_for_key(key, _with_quorum({"op": "delete", "key": key}, "w", w))
+
+    def bulk_set(self, items: Iterable[Tuple[str, Any]]) -> None:
+        groups: Dict[int, List[Tuple[str, Any]]] = {}
+        for key, value in items:
+            owner = self._ring.owners(key)[0]
+            groups.setdefault(owner.node_id, []).append((key, value))
+        for group in groups.values():
+            self._send_for_key(group[0][0], {"op": "bulk_set", "items": group})
+
+    def search_by_value(self, value: Any) -> list[str]:
+        response = self._send(self._ring.nodes, {"op": "search_value", "value": value})
+        return list(response.get("result", []))
+
+    def search_text(self, term: str) -> list[str]:
+        response = self._send(self._ring.nodes, {"op": "search_text", "term": term})
+        return list(response.get("result", []))
+
+    def scan(self, prefix: str = "", after: Optional[str] = None, limit: int = 1000) -> List[Tuple[str, Any]]:
+        response = self._send(self._ring.nodes, {"op": "scan", "prefix": prefix, "after": after, "limit": limit})
+        return [(key, value) for key, value in response.get("result", [])]
+
     def add_vector(self, key: str, vector: list[float]) -> None:
-        self._request({"op": "add_vector", "key": key, "vector": vector})
+        self._send_for_key(key, {"op": "add_vector", "key": key, "vector": Float32Array(vector)})
 
     def vector_search(self, vector: list[float], top_k: int = 5) -> list[dict]:
-        response = self._request({"op": "vector_search", "vector": vector, "top_k": top_k})
+        response = self._send(self._ring.nodes, {"op": "vector_search", "vector": Float32Array(vector), "top_k": top_k})
         return list(response.get("result", []))
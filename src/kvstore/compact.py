@@ -0,0 +1,285 @@
+from __future__ import annotations
+
+import json
+from array import array
+from collections.abc import MutableMapping
+from typing import Any, Dict, Iterator, Optional, Tuple
+
+from .protocol import json_default, json_object_hook
+
+# Per key id: the KeyTable arena offset (8), its hash slots at up to two-thirds
+# load (about 12), the value tag (1) and slot (8), and the version (8).
+COMPACT_ENTRY_OVERHEAD = 37
+
+# Value tags. Small ints live in the slot itself; strings, bytes and other JSON
+# values are encoded into the arena, with ``offset << 24 | length`` in the slot.
+_ABSENT, _INT, _STR, _BYTES, _JSON, _OBJECT = range(6)
+_INT_MIN, _INT_MAX = -(1 << 63), (1 << 63) - 1
+# Values at least this large are kept as Python objects; packing would save nothing.
+_INLINE_LIMIT = 1 << 24
+_LENGTH_MASK = _INLINE_LIMIT - 1
+# Arena bytes left behind by overwritten values before the arena is rewritten.
+_MIN_GARBAGE = 1 << 20
+
+
+def _encode(value: Any) -> Tuple[int, Optional[bytes]]:
+    if type(value) is int and _INT_MIN <= value <= _INT_MAX:
+        return _INT, None
+    if type(value) is str:
+        return _STR, value.encode("utf-8")
+    if type(value) is bytes:
+        return _BYTES, value
+    return _JSON, json.dumps(value, separators=(",", ":"), default=json_default).encode("utf-8")
+
+
+def entry_size(key: str, value: Any) -> int:
+    """Estimated bytes of ``key`` and ``value`` in a compact store."""
+    _, raw = _encode(value)
+    size = 0 if raw is None or len(raw) >= _INLINE_LIMIT else len(raw)
+    return COMPACT_ENTRY_OVERHEAD + len(key.encode("utf-8")) + size
+
+
+class KeyTable:
+    """Keys interned to dense integer ids, with their UTF-8 bytes packed into one arena.
+
+    Lookups go through an open-addressing hash table of ``id + 1`` (0 is empty)
+    with linear probing, so a key costs its encoded bytes and a few array slots
+    instead of a str object and a dict entry. Ids are never reused: a deleted key
+    keeps its id for its tombstone version. Not locked; the engine calls it under
+    its own lock.
+    """
+
+    def __init__(self, capacity: int = 8) -> None:
+        self._arena = bytearray()
+        self._offsets = array("Q", [0])
+        self._slots = array("q", [0]) * capacity
+        self._mask = capacity - 1
+
+    def __len__(self) -> int:
+        return len(self._offsets) - 1
+
+    def key(self, ident: int) -> str:
+        return self._arena[self._offsets[ident] : self._offsets[ident + 1]].decode("utf-8")
+
+    def find(self, key: str) -> int:
+        """The id of ``key``, or -1 if it was never interned."""
+        encoded = key.encode("utf-8")
+        arena, offsets, slots, mask = self._arena, self._offsets, self._slots, self._mask
+        slot = hash(encoded) & mask
+        while True:
+            ident = slots[slot] - 1
+            if ident < 0 or arena[offsets[ident] : offsets[ident + 1]] == encoded:
+                return ident
+            slot = (slot + 1) & mask
+
+    def intern(self, key: str) -> int:
+        encoded = key.encode("utf-8")
+        arena, offsets, slots, mask = self._arena, self._offsets, self._slots, self._mask
+        slot = hash(encoded) & mask
+        while True:
+            ident = slots[slot] - 1
+            if ident < 0:
+                break
+            if arena[offsets[ident] : offsets[ident + 1]] == encoded:
+                return ident
+            slot = (slot + 1) & mask
+        ident = len(self)
+        arena += encoded
+        offsets.append(len(arena))
+        slots[slot] = ident + 1
+        if 3 * (ident + 1) > 2 * len(slots):
+            self._resize(2 * len(slots))
+        return ident
+
+    def _resize(self, capacity: int) -> None:
+        arena, offsets = self._arena, self._offsets
+        slots = array("q", [0]) * capacity
+        mask = capacity - 1
+        for ident in range(len(self)):
+            slot = hash(bytes(arena[offsets[ident] : offsets[ident + 1]])) & mask
+            while slots[slot]:
+                slot = (slot + 1) & mask
+            slots[slot] = ident + 1
+        self._slots, self._mask = slots, mask
+
+    def nbytes(self) -> int:
+        return len(self._arena) + self._offsets.itemsize * len(self._offsets) + self._slots.itemsize * len(self._slots)
+
+
+class CompactValues(MutableMapping):
+    """Values stored per key id and decoded on access.
+
+    Small ints sit in an 8-byte slot; strings, bytes and other JSON values are
+    encoded into a shared arena. Overwritten values leave garbage in the arena,
+    which is rewritten once garbage is over half of it.
+    """
+
+    def __init__(self, table: KeyTable) -> None:
+        self.table = table
+        self._tags = bytearray()
+        self._slots = array("q")
+        self._arena = bytearray()
+        self._objects: Dict[int, Any] = {}
+        self._garbage = 0
+        self._count = 0
+
+    def _ident(self, key: str) -> int:
+        ident = self.table.find(key)
+        if ident < 0 or ident >= len(self._tags) or self._tags[ident] == _ABSENT:
+            return -1
+        return ident
+
+    def _decode(self, ident: int) -> Any:
+        tag, slot = self._tags[ident], self._slots[ident]
+        if tag == _INT:
+            return slot
+        if tag == _OBJECT:
+            return self._objects[ident]
+        raw = self._arena[slot >> 24 : (slot >> 24) + (slot & _LENGTH_MASK)]
+        if tag == _STR:
+            return raw.decode("utf-8")
+        if tag == _BYTES:
+            return bytes(raw)
+        return json.loads(raw, object_hook=json_object_hook if b'"__bytes__"' in raw else None)
+
+    def _release(self, ident: int) -> None:
+        tag = self._tags[ident]
+        if tag == _OBJECT:
+            del self._objects[ident]
+        elif tag != _INT:
+            self._garbage += self._slots[ident] & _LENGTH_MASK
+
+    def entry_size(self, key: str) -> int:
+        """Estimated bytes of a stored key and its value, without decoding the value."""
+        ident = self._ident(key)
+        if ident < 0:
+            raise KeyError(key)
+        tag = self._tags[ident]
+        size = self._slots[ident] & _LENGTH_MASK if tag not in (_INT, _OBJECT) else 0
+        return COMPACT_ENTRY_OVERHEAD + len(key.encode("utf-8")) + size
+
+    def __getitem__(self, key: str) -> Any:
+        ident = self._ident(key)
+        if ident < 0:
+            raise KeyError(key)
+        return self._decode(ident)
+
+    def __setitem__(self, key: str, value: Any) -> None:
+        ident = self.table.intern(key)
+        if ident >= len(self._tags):
+            grow = ident + 1 - len(self._tags)
+            self._tags.extend(bytes(grow))
+            self._slots.extend(array("q", [0]) * grow)
+        if self._tags[ident] == _ABSENT:
+            self._count += 1
+        else:
+            self._release(ident)
+        tag, raw = _encode(value)
+        if tag == _INT:
+            self._slots[ident] = value
+        elif len(raw) >= _INLINE_LIMIT:
+            tag = _OBJECT
+            self._objects[ident] = value
+        else:
+            self._slots[ident] = len(self._arena) << 24 | len(raw)
+            self._arena += raw
+        self._tags[ident] = tag
+        if self._garbage > _MIN_GARBAGE and 2 * self._garbage > len(self._arena):
+            self._rewrite_arena()
+
+    def __delitem__(self, key: str) -> None:
+        ident = self._ident(key)
+        if ident < 0:
+            raise KeyError(key)
+        self._release(ident)
+        self._tags[ident] = _ABSENT
+        self._count -= 1
+
+    def __contains__(self, key: object) -> bool:
+        return isinstance(key, str) and self._ident(key) >= 0
+
+    def __iter__(self) -> Iterator[str]:
+        for ident, tag in enumerate(self._tags):
+            if tag != _ABSENT:
+                yield self.table.key(ident)
+
+    def items(self) -> Iterator[Tuple[str, Any]]:  # type: ignore[override]
+        # An iterator rather than a view, so each value is found by id instead of by a second key lookup.
+        for ident, tag in enumerate(self._tags):
+            if tag != _ABSENT:
+                yield self.table.key(ident), self._decode(ident)
+
+    def __len__(self) -> int:
+        return self._count
+
+    def _rewrite_arena(self) -> None:
+        arena = bytearray()
+        for ident, tag in enumerate(self._tags):
+            if tag in (_STR, _BYTES, _JSON):
+                slot = self._slots[ident]
+                start = slot >> 24
+                self._slots[ident] = len(arena) << 24 | (slot & _LENGTH_MASK)
+                arena += self._arena[start : start + (slot & _LENGTH_MASK)]
+        self._arena = arena
+        self._garbage = 0
+
+    def nbytes(self) -> int:
+        return len(self._tags) + self._slots.itemsize * len(self._slots) + len(self._arena)
+
+
+class CompactVersions(MutableMapping):
+    """Versions in an int64 array indexed by the key ids of a shared ``KeyTable``; -1 marks no version."""
+
+    def __init__(self, table: KeyTable) -> None:
+        self.table = table
+        self._versions = array("q")
+        self._count = 0
+
+    def _ident(self, key: str) -> int:
+        ident = self.table.find(key)
+        if ident < 0 or ident >= len(self._versions) or self._versions[ident] < 0:
+            return -1
+        return ident
+
+    def __getitem__(self, key: str) -> int:
+        ident = self._ident(key)
+        if ident < 0:
+            raise KeyError(key)
+        return self._versions[ident]
+
+    def __setitem__(self, key: str, version: int) -> None:
+        ident = self.table.intern(key)
+        if ident >= len(self._versions):
+            self._versions.extend(array("q", [-1]) * (ident + 1 - len(self._versions)))
+        if self._versions[ident] < 0:
+            self._count += 1
+        self._versions[ident] = version
+
+    def __delitem__(self, key: str) -> None:
+        ident = self._ident(key)
+        if ident < 0:
+            raise KeyError(key)
+        self._versions[ident] = -1
+        self._count -= 1
+
+    def __contains__(self, key: object) -> bool:
+        return isinstance(key, str) and self._ident(key) >= 0
+
+    def __iter__(self) -> Iterator[str]:
+        for ident, version in enumerate(self._versions):
+            if version >= 0:
+                yield self.table.key(ident)
+
+    def items(self) -> Iterator[Tuple[str, int]]:  # type: ignore[override]
+        for ident, version in enumerate(self._versions):
+            if version >= 0:
+                yield self.table.key(ident), version
+
+    def values(self) -> Iterator[int]:  # type: ignore[override]
+        return (version for version in self._versions if version >= 0)
+
+    def __len__(self) -> int:
+        return self._count
+
+    def nbytes(self) -> int:
+        return self._versions.itemsize * len(self._versions)
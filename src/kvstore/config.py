@@ -23,10 +23,49 @@ class ClusterConfig:
     replication_timeout: float = 2.0
     election_interval: float = 0.5
     heartbeat_interval: float = 1.0
+    phi_threshold: float = 8.0
     drop_rate: float = 0.0
+    replication_factor: int = 3
+    virtual_nodes: int = 64
+    read_quorum: int = 2
+    write_quorum: int = 2
+    hedge_delay: float = 0.05
+    response_delay: float = 0.0
+    anti_entropy_interval: float = 30.0
+    merkle_depth: int = 12
+    max_hints_per_peer: int = 100_000
+    hint_replay_rate: float = 1000.0
+    consensus: str = "none"
+    shards: int = 1
+    search_workers: int = 0
+    raft_election_timeout: float = 1.0
+    raft_heartbeat_interval: float = 0.1
+    raft_segment_entries: int = 4096
+    compression: str = "none"
+    compression_threshold: int = 1024
+    lazy_values: bool = False
+    value_cache: int = 0
+    compact_values: bool = False
+    background_index_rebuild: bool = False
+    index_checkpoint_interval: float = 60.0
+    tombstone_grace: float = 600.0
+    metrics: bool = True
+    metrics_port: int = 0
+    trace: bool = False
+    trace_capacity: int = 1024
+    slow_log_ms: float = 0.0
+    maxmemory: int = 0
+    maxmemory_policy: str = "noeviction"
+    maxmemory_samples: int = 5
+    expiry_interval: float = 0.1
+    expiry_batch: int = 100
 
     def all_nodes(self) -> List[NodeConfig]:
         nodes = [NodeConfig(self.node_id, self.host, self.port)]
         if self.peers:
             nodes.extend(self.peers)
         return nodes
+
+    def peer_compress_threshold(self) -> Optional[int]:
+        """Frame size above which traffic to peers is compressed, or ``None`` to keep it uncompressed."""
+        return self.compression_threshold if self.compression == "zlib" else None
@@ -1,46 +1,315 @@
 from __future__ import annotations
 
+import heapq
 import math
+import sys
 import threading
-from typing import Any, Dict, Iterable, List, Optional, Tuple
+import time
+from array import array
+from collections.abc import MutableMapping
+from typing import Any, Callable, Dict, Iterable, List, Optional, Set, Tuple
 
+from .compact import CompactValues, KeyTable, entry_size
 from .indexing import InvertedIndex, SecondaryIndex, VectorIndex
-from .storage import StorageEngine, WALEntry
+from .memory import (
+    ENTRY_OVERHEAD,
+    POLICIES,
+    POSTING_BYTES,
+    KeySampler,
+    MaxMemoryExceeded,
+    MemoryAccounting,
+    encoded_size,
+    value_size,
+    vector_bytes,
+)
+from .metrics import Metrics
+from .search_pool import VectorSearchPool
+from .storage import LazyValues, StorageEngine, WALEntry
+from .tracing import TracedLock, current
+from .versioning import HybridLogicalClock, version_at
 
 
 class KVEngine:
-    def __init__(self, data_dir: str, drop_rate: float = 0.0) -> None:
-        self._storage = StorageEngine(data_dir, drop_rate=drop_rate)
-        self._data: Dict[str, Any] = self._storage.load()
-        self._lock = threading.Lock()
-        self._secondary_index = SecondaryIndex()
-        self._inverted_index = InvertedIndex()
+    def __init__(
+        self,
+        data_dir: str,
+        drop_rate: float = 0.0,
+        node_id: int = 0,
+        search_workers: int = 0,
+        lazy_values: bool = False,
+        value_cache: int = 0,
+        background_index_rebuild: bool = False,
+        metrics: Optional[Metrics] = None,
+        maxmemory: int = 0,
+        maxmemory_policy: str = "noeviction",
+        maxmemory_samples: int = 5,
+        compact_values: bool = False,
+        index_checkpoint_interval: float = 60.0,
+        tombstone_grace: float = 600.0,
+    ) -> None:
+        if maxmemory_policy not in POLICIES:
+            raise ValueError(f"unknown maxmemory policy: {maxmemory_policy}")
+        if lazy_values and compact_values:
+            raise ValueError("lazy_values and compact_values cannot be combined")
+        metrics = metrics or Metrics()
+        self._index_seconds = metrics.histogram("kv_index_update_seconds")
+        self.maxmemory = maxmemory
+        self.maxmemory_policy = maxmemory_policy
+        self.evicted_keys = 0
+        self._memory = MemoryAccounting()
+        # Access stamps are only kept when there is something to evict by.
+        self._sampler: Optional[KeySampler] = None
+        self._evict_listeners: List[Callable[[str, int], None]] = []
+        # Unix expiry time per key with a TTL, and a min-heap of (expire_at, key) over
+        # it. Heap entries are not removed when a TTL changes; stale ones are skipped.
+        self._expires: Dict[str, float] = {}
+        self._expiry_heap: List[Tuple[float, str]] = []
+        # Tombstones are forgotten once their version is this many seconds old; a
+        # min-heap of (version, key) finds them. Replicated writes older than that
+        # could bring a deleted key back, so it should outlast anti-entropy rounds.
+        self.tombstone_grace = tombstone_grace
+        self._tombstones: List[Tuple[int, str]] = []
+        self._evicted = metrics.counter("kv_evicted_keys_total")
+        self._rejected = metrics.counter("kv_maxmemory_rejections_total")
+        self._storage = StorageEngine(
+            data_dir,
+            drop_rate=drop_rate,
+            lazy_values=lazy_values,
+            value_cache=value_cache,
+            metrics=metrics,
+            compact_values=compact_values,
+        )
+        self._data: MutableMapping[str, Any]
+        self._versions: MutableMapping[str, int]
+        self._data, self._versions, tail = self._storage.load_checkpoint(self._expires)
+        # With compact values the secondary and inverted indexes hold int64 key ids, not key strings.
+        self._keys: Optional[KeyTable] = self._data.table if isinstance(self._data, CompactValues) else None
+        self._lock: Any = threading.Lock()
+        self._listeners: List[Callable[[str, int, int], None]] = []
+        postings = list if self._keys is None else (lambda: array("q"))
+        self._secondary_index = SecondaryIndex(postings)
+        self._inverted_index = InvertedIndex(postings)
         self._vector_index = VectorIndex()
-        self._rebuild_indexes()
+        self._search_pool = VectorSearchPool(search_workers) if search_workers > 0 else None
+        self._indexes_ready = threading.Event()
+        # Keys the background rebuild has not indexed yet; writes leave their index entries to it.
+        self._unindexed: Optional[Set[str]] = None
+        # Index checkpoints cost as much as a snapshot, so they are written at most this often and on close.
+        self.index_checkpoint_interval = index_checkpoint_interval
+        self._next_index_checkpoint = time.monotonic() + index_checkpoint_interval
+        checkpoint = self._storage.load_indexes()
+        if checkpoint is not None:
+            self._restore_indexes(*checkpoint)
+            for entry in tail:
+                self._replay(entry)
+            self._indexes_ready.set()
+        else:
+            for entry in tail:
+                StorageEngine._apply_entry(self._data, entry, self._versions, self._expires)
+            if background_index_rebuild:
+                keys = list(self._data)
+                self._unindexed = set(keys)
+                threading.Thread(target=self._rebuild_in_background, args=(keys,), daemon=True).start()
+            else:
+                self._rebuild_indexes()
+                self._indexes_ready.set()
+                self._storage.save_indexes(self._dump_indexes())
+        self._expiry_heap = [(expire_at, key) for key, expire_at in self._expires.items()]
+        heapq.heapify(self._expiry_heap)
+        self._tombstones = [(version, key) for key, version in self._versions.items() if key not in self._data]
+        heapq.heapify(self._tombstones)
+        self._clock = HybridLogicalClock(node_id)
+        if self._versions:
+            self._clock.observe(max(self._versions.values()))
+        self._memory.data = sum(self._stored_bytes(key) for key in self._data)
+        if maxmemory > 0 and maxmemory_policy.startswith("allkeys-"):
+            self._sampler = KeySampler(maxmemory_policy, maxmemory_samples)
+            for key in self._data:
+                self._sampler.add(key)
+        metrics.gauge("kv_keys", lambda: len(self._data))
+        for structure in MemoryAccounting.STRUCTURES:
+            metrics.gauge("kv_memory_bytes", lambda name=structure: getattr(self._memory, name), structure=structure)
+        metrics.gauge("kv_maxmemory_bytes", lambda: self.maxmemory)
+
+    def close(self) -> None:
+        with self._lock:
+            if self._indexes_ready.is_set() and self._storage.index_sequence != self._storage.sequence:
+                self._checkpoint(indexes=True)
+        if self._search_pool is not None:
+            self._search_pool.close()
 
     def _rebuild_indexes(self) -> None:
-        for key, value in self._data.items():
+        if isinstance(self._data, LazyValues):
+            items = self._data.items_where(self._may_index)
+        else:
+            items = self._data.items()
+        for key, value in items:
             self._index_value(key, value)
 
+    def _rebuild_in_background(self, keys: List[str], batch: int = 1000) -> None:
+        for start in range(0, len(keys), batch):
+            with self._lock:
+                for key in keys[start : start + batch]:
+                    if key not in self._unindexed:
+                        continue
+                    self._unindexed.discard(key)
+                    if isinstance(self._data, LazyValues):
+                        raw = self._data.raw(key)
+                        if raw is not None and not self._may_index(raw):
+                            continue
+                        value = self._data.peek(key)
+                    else:
+                        value = self._data.get(key)
+                    if value is not None:
+                        self._index_value(key, value)
+        with self._lock:
+            self._unindexed = None
+            self._indexes_ready.set()
+            self._storage.save_indexes(self._dump_indexes())
+
+    def trace_lock_waits(self, enabled: bool) -> None:
+        """Report time spent waiting for the engine lock to the current request trace.
+
+        The wrapper is swapped in only while tracing, so the lock costs nothing extra
+        otherwise. Both forms share one underlying lock, so holders are unaffected.
+        """
+        lock = self._lock.lock if isinstance(self._lock, TracedLock) else self._lock
+        self._lock = TracedLock(lock) if enabled else lock
+
+    def wait_for_indexes(self, timeout: Optional[float] = None) -> bool:
+        """Block until the search indexes cover every key; ``False`` if ``timeout`` ran out first."""
+        return self._indexes_ready.wait(timeout)
+
+    def _dump_indexes(self) -> Optional[Dict[str, Any]]:
+        if not self._indexes_ready.is_set():
+            return None
+        secondary, inverted = self._secondary_index.dump(), self._inverted_index.dump()
+        if self._keys is not None:
+            # Ids depend on load order, so checkpoints store key names.
+            secondary = [(value, self._names(ids)) for value, ids in secondary]
+            inverted = {token: self._names(ids) for token, ids in inverted.items()}
+        return {"secondary": secondary, "inverted": inverted, "vector": self._vector_index.dump()}
+
+    def _restore_indexes(self, indexes: Dict[str, Any], stale: Set[str]) -> None:
+        """Load an index checkpoint, then reindex the ``stale`` keys the snapshot wrote after it."""
+        secondary, inverted = indexes["secondary"], indexes["inverted"]
+        if self._keys is not None:
+            intern = self._keys.intern
+            secondary = [(value, [intern(key) for key in keys]) for value, keys in secondary]
+            inverted = {token: [intern(key) for key in keys] for token, keys in inverted.items()}
+        self._secondary_index.restore(secondary)
+        self._inverted_index.restore(inverted)
+        self._vector_index.restore(indexes["vector"])
+        if stale:
+            # The values these keys had at the checkpoint are gone, so their entries are found by a scan.
+            refs = {self._ref(key) for key in stale}
+            self._secondary_index.discard(refs)
+            self._inverted_index.discard(refs)
+            for key in stale:
+                self._vector_index.remove_vector(key)
+        self._memory.secondary_index = POSTING_BYTES * self._secondary_index.postings()
+        self._memory.inverted_index = POSTING_BYTES * self._inverted_index.postings()
+        self._memory.vector_index = sum(vector_bytes(len(vector)) for _, vector in self._vector_index.items())
+        if self._search_pool is not None:
+            for key, vector in self._vector_index.items():
+                self._search_pool.upsert(key, vector)
+        for key in stale:
+            if key in self._data:
+                self._index_value(key, self._data[key])
+
+    def _replay(self, entry: Dict[str, Any]) -> None:
+        """Apply a WAL entry written after the snapshot, keeping the restored indexes in step."""
+        payload = entry["data"]
+        if entry["op"] == "batch":
+            for nested in payload["entries"]:
+                self._replay(nested)
+            return
+        version = payload.get("version") or 0
+        if entry["op"] == "set":
+            self._store(payload["key"], payload["value"], version, payload.get("expire_at"))
+        elif entry["op"] == "delete":
+            self._remove(payload["key"], version)
+        elif entry["op"] == "bulk_set":
+            for key, value in payload["items"]:
+                self._store(key, value, version, payload.get("expire_at"))
+        elif entry["op"] == "expire":
+            self._apply_expire(payload["key"], payload.get("expire_at"), version)
+
+    def _checkpoint(self, simulate_drop: bool = False, indexes: bool = False) -> None:
+        """Snapshot the data, with the indexes when ``indexes`` is set or the interval has passed.
+
+        Until the next index checkpoint the WAL keeps the writes since the last
+        one, so a restart can load it and reindex just the keys they touched.
+        """
+        dump = self._dump_indexes() if indexes or time.monotonic() >= self._next_index_checkpoint else None
+        saved = self._storage.save_snapshot(
+            self._data,
+            simulate_drop=simulate_drop,
+            versions=self._versions,
+            indexes=dump,
+            expires=self._expires,
+        )
+        if saved and dump is not None:
+            self._next_index_checkpoint = time.monotonic() + self.index_checkpoint_interval
+
+    @staticmethod
+    def _may_index(raw: bytes) -> bool:
+        """Whether an encoded value could reach ``_index_value``: anything but a list or a plain object."""
+        if raw[:1] == b"[":
+            return False
+        if raw[:1] == b"{":
+            return b'"text"' in raw or b'"vector"' in raw or b'"__bytes__"' in raw
+        return True
+
+    def _ref(self, key: str) -> Any:
+        return key if self._keys is None else self._keys.intern(key)
+
+    def _names(self, refs: List[Any]) -> List[str]:
+        if self._keys is None:
+            return refs
+        return [self._keys.key(ident) for ident in refs]
+
     def _index_value(self, key: str, value: Any) -> None:
+        start = time.perf_counter()
         if self._is_hashable(value):
-            self._secondary_index.add(key, value)
+            self._secondary_index.add(self._ref(key), value)
+            self._memory.secondary_index += POSTING_BYTES
         text_value = self._extract_text(value)
         if text_value:
-            self._inverted_index.add_document(key, text_value)
+            self._inverted_index.add_document(self._ref(key), text_value)
+            self._memory.inverted_index += POSTING_BYTES * len(text_value.split())
         vector = self._extract_vector(value)
         if vector:
             self._vector_index.add_vector(key, vector)
+            self._memory.vector_index += vector_bytes(len(vector))
+            if self._search_pool is not None:
+                self._search_pool.upsert(key, vector)
+        elapsed = time.perf_counter() - start
+        self._index_seconds.record(elapsed)
+        trace = current()
+        if trace is not None:
+            trace.add("index", elapsed)
 
     def _unindex_value(self, key: str, value: Any) -> None:
+        start = time.perf_counter()
         if self._is_hashable(value):
-            self._secondary_index.remove(key, value)
+            self._secondary_index.remove(self._ref(key), value)
+            self._memory.secondary_index -= POSTING_BYTES
         text_value = self._extract_text(value)
         if text_value:
-            self._inverted_index.remove_document(key, text_value)
+            self._inverted_index.remove_document(self._ref(key), text_value)
+            self._memory.inverted_index -= POSTING_BYTES * len(text_value.split())
         vector = self._extract_vector(value)
         if vector:
             self._vector_index.remove_vector(key)
+            self._memory.vector_index -= vector_bytes(len(vector))
+            if self._search_pool is not None:
+                self._search_pool.remove(key)
+        elapsed = time.perf_counter() - start
+        self._index_seconds.record(elapsed)
+        trace = current()
+        if trace is not None:
+            trace.add("index", elapsed)
 
     @staticmethod
     def _is_hashable(value: Any) -> bool:
@@ -68,70 +337,478 @@ class KVEngine:
                 return [float(v) for v in vector]
         return None
 
+    def next_version(self) -> int:
+        return self._clock.now()
+
+    def observe_version(self, version: int) -> None:
+        """Make every later ``next_version`` exceed ``version``."""
+        self._clock.observe(version)
+
+    def _claim_version(self, key: str, version: Optional[int]) -> Optional[int]:
+        if version is None:
+            return self._clock.now()
+        self._clock.observe(version)
+        if version <= self._versions.get(key, 0):
+            return None
+        return version
+
     def get(self, key: str) -> Optional[Any]:
         with self._lock:
+            if self._expires and self._expired(key, time.time()):
+                return None
+            if self._sampler is not None:
+                self._sampler.touch(key)
             return self._data.get(key)
 
-    def set(self, key: str, value: Any, simulate_drop: bool = False) -> None:
-        entry = WALEntry(op="set", data={"key": key, "value": value})
+    def get_versioned(self, key: str) -> Tuple[Optional[Any], int]:
         with self._lock:
-            if key in self._data:
+            if self._expires and self._expired(key, time.time()):
+                return None, self._versions.get(key, 0)
+            if self._sampler is not None:
+                self._sampler.touch(key)
+            return self._data.get(key), self._versions.get(key, 0)
+
+    def ttl(self, key: str) -> float:
+        """Seconds until ``key`` expires: -1 if it has no TTL, -2 if it does not exist or already expired."""
+        with self._lock:
+            now = time.time()
+            if key not in self._data or self._expired(key, now):
+                return -2
+            expire_at = self._expires.get(key)
+            return -1 if expire_at is None else round(expire_at - now, 3)
+
+    def _expired(self, key: str, now: float) -> bool:
+        # Expired keys stay stored until the expirer deletes them; reads treat them as missing.
+        expire_at = self._expires.get(key)
+        return expire_at is not None and expire_at <= now
+
+    def _live(self, keys: List[str]) -> List[str]:
+        if not self._expires:
+            return keys
+        now = time.time()
+        return [key for key in keys if not self._expired(key, now)]
+
+    def _set_expiry(self, key: str, expire_at: Optional[float]) -> None:
+        # NaN compares false with everything, so at the heap root it would hold back every later expiry.
+        if expire_at is None or math.isnan(expire_at):
+            self._expires.pop(key, None)
+            return
+        self._expires[key] = expire_at
+        heapq.heappush(self._expiry_heap, (expire_at, key))
+        if len(self._expiry_heap) > 2 * len(self._expires) + 1024:
+            self._expiry_heap = [(at, name) for name, at in self._expires.items()]
+            heapq.heapify(self._expiry_heap)
+
+    def _pop_expiring(self, before: float = math.inf) -> Optional[str]:
+        """Pop the key that expires first, if it expires by ``before``; O(log n) per heap entry."""
+        heap = self._expiry_heap
+        while heap and heap[0][0] <= before:
+            expire_at, key = heapq.heappop(heap)
+            if self._expires.get(key) == expire_at:
+                return key
+        return None
+
+    def due_expirations(self, limit: int = 100) -> List[Tuple[str, int]]:
+        """Up to ``limit`` expired keys, each with a delete version taken now.
+
+        The keys leave the expiry heap; hand back any whose delete was not applied
+        with ``reschedule_expirations``. A write that refreshes a key after this
+        call gets a higher version, so the delete cannot undo it.
+        """
+        with self._lock:
+            now = time.time()
+            due: List[Tuple[str, int]] = []
+            while len(due) < limit:
+                key = self._pop_expiring(now)
+                if key is None:
+                    break
+                due.append((key, self._clock.now()))
+            return due
+
+    def reschedule_expirations(self, keys: Iterable[str]) -> None:
+        with self._lock:
+            for key in keys:
+                expire_at = self._expires.get(key)
+                if expire_at is not None:
+                    heapq.heappush(self._expiry_heap, (expire_at, key))
+
+    def subscribe(self, listener: Callable[[str, int, int], None]) -> None:
+        """Register ``listener(key, old_version, new_version)``, called under the engine lock after each change."""
+        with self._lock:
+            self._listeners.append(listener)
+
+    def on_evict(self, listener: Callable[[str, int], None]) -> None:
+        """Register ``listener(key, version)``, called under the engine lock for each key evicted for memory."""
+        with self._lock:
+            self._evict_listeners.append(listener)
+
+    def memory_stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "used_bytes": self._memory.total(),
+                "maxmemory": self.maxmemory,
+                "policy": self.maxmemory_policy,
+                "keys": len(self._data),
+                "evicted_keys": self.evicted_keys,
+                "volatile_keys": len(self._expires),
+                "structures": self._memory.as_dict(),
+            }
+
+    def _stored_bytes(self, key: str) -> int:
+        if isinstance(self._data, CompactValues):
+            return self._data.entry_size(key)
+        if isinstance(self._data, LazyValues):
+            size = self._data.encoded_size(key)
+        else:
+            size = value_size(self._data[key])
+        return ENTRY_OVERHEAD + sys.getsizeof(key) + size
+
+    def _value_bytes(self, key: str, value: Any) -> int:
+        if self._keys is not None:
+            return entry_size(key, value)
+        # Lazy values are counted by their encoded length, which a snapshot keeps unchanged.
+        size = encoded_size(value) if isinstance(self._data, LazyValues) else value_size(value)
+        return ENTRY_OVERHEAD + sys.getsizeof(key) + size
+
+    def _make_room(self) -> None:
+        """Before a client write, evict keys until the estimate is back under ``maxmemory``.
+
+        ``allkeys-*`` policies take the coldest of a random sample each time;
+        ``volatile-ttl`` takes the keys with a TTL that expire soonest.
+
+        Evictions are logged as one WAL batch of deletes, take versions from the
+        clock like client deletes, and are handed to the ``on_evict`` listeners
+        for replication. Writes that carry a version (replication, quorum and Raft
+        applies) never call this, so replicas follow the primary's evictions.
+        """
+        excess = self._memory.total() - self.maxmemory
+        if self.maxmemory <= 0 or excess <= 0:
+            return
+        victims: List[str] = []
+        chosen: Set[str] = set()
+        freed = 0
+        while freed < excess:
+            key = self._next_victim(chosen)
+            if key is None:
+                break
+            if key in chosen:
+                continue
+            victims.append(key)
+            chosen.add(key)
+            freed += self._stored_bytes(key)
+        if not victims:
+            self._rejected.incr()
+            raise MaxMemoryExceeded("maxmemory_exceeded")
+        entries = [{"op": "delete", "data": {"key": key, "version": self._clock.now()}} for key in victims]
+        self._storage.append_wal(WALEntry(op="batch", data={"entries": entries}))
+        for entry in entries:
+            key, version = entry["data"]["key"], entry["data"]["version"]
+            self._remove(key, version)
+            for listener in self._evict_listeners:
+                listener(key, version)
+        self.evicted_keys += len(victims)
+        self._evicted.incr(len(victims))
+
+    def _next_victim(self, chosen: Set[str]) -> Optional[str]:
+        if self._sampler is not None:
+            return self._sampler.victim(chosen)
+        if self.maxmemory_policy == "volatile-ttl":
+            return self._pop_expiring()
+        return None
+
+    def _store(self, key: str, value: Any, version: int, expire_at: Optional[float] = None) -> None:
+        previous = self._versions.get(key, 0)
+        indexed = self._unindexed is None or key not in self._unindexed
+        if key in self._data:
+            self._memory.data -= self._stored_bytes(key)
+            if indexed:
                 self._unindex_value(key, self._data[key])
-            self._storage.append_wal(entry)
-            self._data[key] = value
+        self._data[key] = value
+        self._versions[key] = version
+        self._set_expiry(key, expire_at)
+        self._memory.data += self._value_bytes(key, value)
+        if self._sampler is not None:
+            self._sampler.add(key)
+        if indexed:
             self._index_value(key, value)
-            self._storage.save_snapshot(self._data, simulate_drop=simulate_drop)
+        for listener in self._listeners:
+            listener(key, previous, version)
 
-    def delete(self, key: str, simulate_drop: bool = False) -> None:
-        entry = WALEntry(op="delete", data={"key": key})
-        with self._lock:
-            self._storage.append_wal(entry)
-            if key in self._data:
+    def _remove(self, key: str, version: int) -> None:
+        previous = self._versions.get(key, 0)
+        if key in self._data:
+            self._memory.data -= self._stored_bytes(key)
+            if self._unindexed is None or key not in self._unindexed:
                 self._unindex_value(key, self._data[key])
-                self._data.pop(key, None)
-            self._storage.save_snapshot(self._data, simulate_drop=simulate_drop)
+            self._data.pop(key, None)
+            self._expires.pop(key, None)
+            if self._sampler is not None:
+                self._sampler.remove(key)
+        # The version stays behind as a tombstone so older replicated writes cannot resurrect the key.
+        self._versions[key] = version
+        heapq.heappush(self._tombstones, (version, key))
+        for listener in self._listeners:
+            listener(key, previous, version)
+        self._collect_tombstones()
+
+    def _collect_tombstones(self) -> None:
+        """Forget tombstones older than ``tombstone_grace``; O(log n) per tombstone, run as keys are removed."""
+        heap = self._tombstones
+        cutoff = version_at(time.time() - self.tombstone_grace)
+        while heap and heap[0][0] < cutoff:
+            version, key = heapq.heappop(heap)
+            if key not in self._data and self._versions.get(key) == version:
+                del self._versions[key]
+                for listener in self._listeners:
+                    listener(key, version, 0)
+
+    def _apply_expire(self, key: str, expire_at: Optional[float], version: int) -> None:
+        if key not in self._data:
+            return
+        previous = self._versions.get(key, 0)
+        self._versions[key] = version
+        self._set_expiry(key, expire_at)
+        for listener in self._listeners:
+            listener(key, previous, version)
+
+    def set(
+        self,
+        key: str,
+        value: Any,
+        simulate_drop: bool = False,
+        version: Optional[int] = None,
+        expire_at: Optional[float] = None,
+    ) -> int:
+        """Store ``value``; ``expire_at`` is a Unix time, and a set without one clears any TTL the key had."""
+        with self._lock:
+            if version is None:
+                # Before the write takes its version, so evicting the key itself cannot outrank the write.
+                self._make_room()
+            applied = self._claim_version(key, version)
+            if applied is None:
+                return self._versions.get(key, 0)
+            payload = {"key": key, "value": value, "version": applied}
+            if expire_at is not None:
+                payload["expire_at"] = expire_at
+            self._storage.append_wal(WALEntry(op="set", data=payload))
+            self._store(key, value, applied, expire_at)
+            self._checkpoint(simulate_drop=simulate_drop)
+            return applied
+
+    def expire(self, key: str, expire_at: Optional[float], version: Optional[int] = None) -> int:
+        """Set (or with ``None``, remove) the key's expiry time; 0 if the key does not exist."""
+        with self._lock:
+            if key not in self._data or (version is None and self._expired(key, time.time())):
+                return 0
+            applied = self._claim_version(key, version)
+            if applied is None:
+                return self._versions.get(key, 0)
+            self._storage.append_wal(WALEntry(op="expire", data={"key": key, "expire_at": expire_at, "version": applied}))
+            self._apply_expire(key, expire_at, applied)
+            self._checkpoint()
+            return applied
 
-    def bulk_set(self, items: Iterable[Tuple[str, Any]], simulate_drop: bool = False) -> None:
+    def delete(self, key: str, simulate_drop: bool = False, version: Optional[int] = None) -> int:
+        with self._lock:
+            applied = self._claim_version(key, version)
+            if applied is None:
+                return self._versions.get(key, 0)
+            self._storage.append_wal(WALEntry(op="delete", data={"key": key, "version": applied}))
+            self._remove(key, applied)
+            self._checkpoint(simulate_drop=simulate_drop)
+            return applied
+
+    def bulk_set(
+        self,
+        items: Iterable[Tuple[str, Any]],
+        simulate_drop: bool = False,
+        version: Optional[int] = None,
+        expire_at: Optional[float] = None,
+    ) -> int:
         items_list = list(items)
-        entry = WALEntry(op="bulk_set", data={"items": items_list})
         with self._lock:
-            self._storage.append_wal(entry)
+            if version is None:
+                self._make_room()
+            applied = self._clock.now() if version is None else version
+            if version is not None:
+                self._clock.observe(version)
+                items_list = [(key, value) for key, value in items_list if version > self._versions.get(key, 0)]
+            if not items_list:
+                return applied
+            payload = {"items": items_list, "version": applied}
+            if expire_at is not None:
+                payload["expire_at"] = expire_at
+            self._storage.append_wal(WALEntry(op="bulk_set", data=payload))
             for key, value in items_list:
-                if key in self._data:
-                    self._unindex_value(key, self._data[key])
-                self._data[key] = value
-                self._index_value(key, value)
-            self._storage.save_snapshot(self._data, simulate_drop=simulate_drop)
+                self._store(key, value, applied, expire_at)
+            self._checkpoint(simulate_drop=simulate_drop)
+            return applied
 
-    def apply_replication(self, op: str, payload: Dict[str, Any]) -> None:
+    def apply_replication(self, op: str, payload: Dict[str, Any], simulate_drop: bool = False) -> int:
+        version = payload.get("version")
         if op == "set":
-            self.set(payload["key"], payload["value"], simulate_drop=False)
-        elif op == "delete":
-            self.delete(payload["key"], simulate_drop=False)
-        elif op == "bulk_set":
-            self.bulk_set(payload["items"], simulate_drop=False)
-        elif op == "add_vector":
-            self.set(payload["key"], {"vector": payload["vector"]}, simulate_drop=False)
+            return self.set(
+                payload["key"], payload["value"], simulate_drop=simulate_drop, version=version,
+                expire_at=payload.get("expire_at"),
+            )
+        if op == "delete":
+            return self.delete(payload["key"], simulate_drop=simulate_drop, version=version)
+        if op == "bulk_set":
+            return self.bulk_set(
+                payload["items"], simulate_drop=simulate_drop, version=version, expire_at=payload.get("expire_at")
+            )
+        if op == "expire":
+            return self.expire(payload["key"], payload.get("expire_at"), version=version)
+        if op == "add_vector":
+            return self.set(payload["key"], {"vector": payload["vector"]}, simulate_drop=simulate_drop, version=version)
+        return 0
+
+    def apply_batch(self, events: Iterable[Tuple[str, Dict[str, Any]]]) -> int:
+        """Apply versioned replication events with one WAL append and one snapshot; returns how many applied."""
+        with self._lock:
+            entries: List[Dict[str, Any]] = []
+            staged: Dict[str, int] = {}
+
+            def newer(key: str, version: int) -> bool:
+                if version <= staged.get(key, self._versions.get(key, 0)):
+                    return False
+                staged[key] = version
+                return True
+
+            for op, payload in events:
+                version = payload["version"]
+                self._clock.observe(version)
+                if op == "bulk_set":
+                    items = [(key, value) for key, value in payload["items"] if newer(key, version)]
+                    if items:
+                        data = {"items": items, "version": version}
+                        if payload.get("expire_at") is not None:
+                            data["expire_at"] = payload["expire_at"]
+                        entries.append({"op": op, "data": data})
+                    continue
+                if not newer(payload["key"], version):
+                    continue
+                if op == "add_vector":
+                    payload = {"key": payload["key"], "value": {"vector": payload["vector"]}, "version": version}
+                    op = "set"
+                entries.append({"op": op, "data": payload})
+            if not entries:
+                return 0
+            self._storage.append_wal(WALEntry(op="batch", data={"entries": entries}))
+            for entry in entries:
+                data = entry["data"]
+                if entry["op"] == "set":
+                    self._store(data["key"], data["value"], data["version"], data.get("expire_at"))
+                elif entry["op"] == "delete":
+                    self._remove(data["key"], data["version"])
+                elif entry["op"] == "expire":
+                    self._apply_expire(data["key"], data.get("expire_at"), data["version"])
+                else:
+                    for key, value in data["items"]:
+                        self._store(key, value, data["version"], data.get("expire_at"))
+            self._checkpoint()
+            return len(entries)
+
+    def versions(self) -> Dict[str, int]:
+        with self._lock:
+            return dict(self._versions.items())
+
+    def versions_of(self, keys: Iterable[str]) -> Dict[str, int]:
+        """Versions of those ``keys`` the engine has seen, tombstones included."""
+        with self._lock:
+            return {key: self._versions[key] for key in keys if key in self._versions}
+
+    def records(self, keys: Optional[Iterable[str]] = None) -> List[Dict[str, Any]]:
+        """Value, version and expiry of ``keys``, or of every key the engine has seen, tombstones included."""
+        with self._lock:
+            if keys is None:
+                keys = list(self._versions)
+            return [
+                {
+                    "key": key,
+                    "value": self._data.get(key),
+                    "version": self._versions.get(key, 0),
+                    "deleted": key not in self._data,
+                    "expire_at": self._expires.get(key),
+                }
+                for key in keys
+            ]
+
+    def install_records(self, records: List[Dict[str, Any]]) -> None:
+        """Replace the whole state with ``records`` from ``records()``, then snapshot it with the indexes.
+
+        Keys the records do not mention are forgotten, tombstones included.
+        """
+        with self._lock:
+            incoming = {record["key"]: record for record in records}
+            for key in [key for key in self._versions if key not in incoming]:
+                version = self._versions[key]
+                if key in self._data:
+                    self._remove(key, version)
+                del self._versions[key]
+                for listener in self._listeners:
+                    listener(key, version, 0)
+            for key, record in incoming.items():
+                version = record["version"]
+                self._clock.observe(version)
+                if record["deleted"]:
+                    if key in self._data or self._versions.get(key) != version:
+                        self._remove(key, version)
+                elif self._versions.get(key) != version or key not in self._data:
+                    self._store(key, record["value"], version, record.get("expire_at"))
+            # The WAL does not hold these changes, so only a snapshot with the indexes makes them durable.
+            self._checkpoint(indexes=True)
 
     def snapshot(self) -> Dict[str, Any]:
         with self._lock:
-            return dict(self._data)
+            if not self._expires:
+                return dict(self._data) if isinstance(self._data, dict) else dict(self._data.items())
+            now = time.time()
+            return {key: value for key, value in self._data.items() if not self._expired(key, now)}
+
+    def scan(self, prefix: str = "", after: Optional[str] = None, limit: int = 1000) -> List[List[Any]]:
+        """Up to ``limit`` ``[key, value]`` pairs in key order, for keys with ``prefix`` that sort after ``after``."""
+        with self._lock:
+            now = time.time()
+            keys = heapq.nsmallest(
+                limit,
+                (
+                    key
+                    for key in self._data
+                    if key.startswith(prefix) and (after is None or key > after) and not self._expired(key, now)
+                ),
+            )
+            return [[key, self._data[key]] for key in keys]
 
     def search_by_value(self, value: Any) -> List[str]:
+        self._indexes_ready.wait()
         with self._lock:
-            return self._secondary_index.search(value)
+            return self._live(self._names(self._secondary_index.search(value)))
 
     def search_text(self, term: str) -> List[str]:
+        self._indexes_ready.wait()
         with self._lock:
-            return self._inverted_index.search(term)
+            return self._live(self._names(self._inverted_index.search(term)))
 
-    def add_vector(self, key: str, vector: List[float], simulate_drop: bool = False) -> None:
-        self.set(key, {"vector": vector}, simulate_drop=simulate_drop)
+    def add_vector(self, key: str, vector: List[float], simulate_drop: bool = False) -> int:
+        return self.set(key, {"vector": vector}, simulate_drop=simulate_drop)
 
     def vector_search(self, vector: List[float], top_k: int = 5) -> List[Dict[str, Any]]:
+        self._indexes_ready.wait()
+        if self._search_pool is not None:
+            # The pool reads its own shared-memory copy, so writers are not blocked by the scan.
+            results = self._search_pool.search(vector, top_k=top_k)
+            if not self._expires:
+                return results
+            with self._lock:
+                live = set(self._live([item["key"] for item in results]))
+            return [item for item in results if item["key"] in live]
         with self._lock:
             scores: List[Dict[str, Any]] = []
+            now = time.time()
             for key, candidate in self._vector_index.items():
+                if self._expired(key, now):
+                    continue
                 score = self._cosine_similarity(vector, candidate)
                 if score is not None:
                     scores.append({"key": key, "score": score})
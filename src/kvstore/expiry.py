@@ -0,0 +1,71 @@
+from __future__ import annotations
+
+import threading
+import time
+from typing import Callable, List, Optional, Tuple
+
+from .engine import KVEngine
+from .metrics import Metrics
+
+
+class Expirer:
+    """Background deletion of expired keys, a batch at a time.
+
+    Each round takes up to ``batch`` due keys from the engine's expiry heap and
+    hands them with their delete versions to ``expire``, which deletes them the
+    way the node replicates deletes. The engine lock is held only while a batch
+    is taken and applied, so requests interleave with a large backlog, and a
+    round stops after ``interval`` seconds of work. While ``active`` is false
+    (a secondary or Raft follower) expiry is left to the leader; reads hide
+    expired keys either way.
+    """
+
+    def __init__(
+        self,
+        engine: KVEngine,
+        expire: Callable[[List[Tuple[str, int]]], bool],
+        active: Callable[[], bool] = lambda: True,
+        interval: float = 0.1,
+        batch: int = 100,
+        metrics: Optional[Metrics] = None,
+    ) -> None:
+        self._engine = engine
+        self._expire = expire
+        self._active = active
+        self.interval = interval
+        self.batch = max(1, batch)
+        self.expired = 0
+        self._expired = (metrics or Metrics()).counter("kv_expired_keys_total")
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+
+    def start(self) -> None:
+        if self.interval > 0:
+            self._thread.start()
+
+    def stop(self) -> None:
+        self._stop.set()
+
+    def _run(self) -> None:
+        while not self._stop.wait(self.interval):
+            self.run_once()
+
+    def run_once(self) -> int:
+        """Delete due keys until none are left or the round's time is used up; returns how many."""
+        if not self._active():
+            return 0
+        deadline = time.monotonic() + self.interval
+        expired = 0
+        while not self._stop.is_set():
+            due = self._engine.due_expirations(self.batch)
+            if not due:
+                break
+            if not self._expire(due):
+                self._engine.reschedule_expirations(key for key, _ in due)
+                break
+            expired += len(due)
+            if len(due) < self.batch or time.monotonic() >= deadline:
+                break
+        self.expired += expired
+        self._expired.incr(expired)
+        return expired
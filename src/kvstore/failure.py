@@ -0,0 +1,220 @@
+from __future__ import annotations
+
+import math
+import socket
+import threading
+import time
+from collections import deque
+from typing import Any, Callable, Deque, Dict, List, Optional, Set
+
+from .config import ClusterConfig, NodeConfig
+from .protocol import ProtocolError, decode_message, encode_message
+
+
+class PhiAccrualDetector:
+    """Phi-accrual suspicion level for one peer, computed from recent heartbeat inter-arrival times.
+
+    ``phi`` is ``-log10`` of the probability that a heartbeat would still arrive
+    after the current silence, assuming normally distributed intervals. One
+    missed heartbeat (``acceptable_pause``) is tolerated before suspicion grows.
+    """
+
+    def __init__(
+        self,
+        expected_interval: float,
+        window: int = 100,
+        min_std: float = 0.1,
+        acceptable_pause: Optional[float] = None,
+    ) -> None:
+        self._intervals: Deque[float] = deque([expected_interval], maxlen=window)
+        self._min_std = min_std
+        self._pause = expected_interval if acceptable_pause is None else acceptable_pause
+        self._last: Optional[float] = None
+
+    def heartbeat(self, now: Optional[float] = None) -> None:
+        now = time.monotonic() if now is None else now
+        if self._last is not None:
+            self._intervals.append(now - self._last)
+        self._last = now
+
+    def reset(self) -> None:
+        self._last = None
+
+    def phi(self, now: Optional[float] = None) -> float:
+        if self._last is None:
+            return math.inf
+        now = time.monotonic() if now is None else now
+        mean = sum(self._intervals) / len(self._intervals)
+        variance = sum((interval - mean) ** 2 for interval in self._intervals) / len(self._intervals)
+        std = max(math.sqrt(variance), self._min_std)
+        y = (now - self._last - mean - self._pause) / std
+        # Logistic approximation of the normal CDF tail, as used by Cassandra and Akka:
+        # phi = log10(1 + e^a), evaluated so that long silences do not overflow.
+        a = y * (1.5976 + 0.070566 * y * y)
+        if a > 0:
+            return (a + math.log1p(math.exp(-a))) / math.log(10)
+        return math.log1p(math.exp(a)) / math.log(10)
+
+
+class PeerLink:
+    """Persistent connection to one peer, reopened lazily after any failure."""
+
+    def __init__(self, node: NodeConfig, timeout: float) -> None:
+        self.node = node
+        self._timeout = timeout
+        self._sock: Optional[socket.socket] = None
+        self._reader: Any = None
+        self._lock = threading.Lock()
+        self.connects = 0
+        self.bytes_sent = 0
+        self.bytes_received = 0
+
+    def request(self, payload: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+        encoded = encode_message(payload)
+        with self._lock:
+            try:
+                if self._sock is None:
+                    self._sock = socket.create_connection((self.node.host, self.node.port), timeout=self._timeout)
+                    self._reader = self._sock.makefile("rb")
+                    self.connects += 1
+                self._sock.sendall(encoded)
+                raw = self._reader.readline()
+                if not raw:
+                    raise ConnectionResetError("peer closed the connection")
+                self.bytes_sent += len(encoded)
+                self.bytes_received += len(raw)
+                return decode_message(raw)
+            except (OSError, ProtocolError):
+                self._close()
+                return None
+
+    def _close(self) -> None:
+        if self._sock is not None:
+            try:
+                self._reader.close()
+                self._sock.close()
+            except OSError:
+                pass
+        self._sock = None
+        self._reader = None
+
+    def close(self) -> None:
+        with self._lock:
+            self._close()
+
+
+class HeartbeatMonitor:
+    """Sends heartbeats to every peer over persistent connections and tracks which peers are up.
+
+    A peer is down when its connection fails or its phi rises above
+    ``config.phi_threshold``. The role each peer reported in its last heartbeat
+    reply is kept so elections need no extra round trips.
+    """
+
+    def __init__(self, config: ClusterConfig, role: Callable[[], str]) -> None:
+        self._config = config
+        self._role = role
+        self._stop = threading.Event()
+        self._lock = threading.Lock()
+        self._links: Dict[int, PeerLink] = {
+            node.node_id: PeerLink(node, config.replication_timeout) for node in config.peers or []
+        }
+        self._detectors: Dict[int, PhiAccrualDetector] = {
+            node_id: PhiAccrualDetector(config.heartbeat_interval) for node_id in self._links
+        }
+        self._roles: Dict[int, str] = {}
+        self._up: Set[int] = set()
+        self._probed: Set[int] = set()
+        self._peer_up_listeners: List[Callable[[NodeConfig], None]] = []
+        self._peer_down_listeners: List[Callable[[NodeConfig], None]] = []
+        self._threads = [
+            threading.Thread(target=self._run, args=(link,), daemon=True) for link in self._links.values()
+        ]
+
+    def start(self) -> None:
+        for thread in self._threads:
+            thread.start()
+
+    def stop(self) -> None:
+        self._stop.set()
+        for link in self._links.values():
+            link.close()
+
+    def on_peer_up(self, listener: Callable[[NodeConfig], None]) -> None:
+        self._peer_up_listeners.append(listener)
+
+    def on_peer_down(self, listener: Callable[[NodeConfig], None]) -> None:
+        self._peer_down_listeners.append(listener)
+
+    def _run(self, link: PeerLink) -> None:
+        while not self._stop.is_set():
+            response = link.request({"op": "heartbeat", "node_id": self._config.node_id, "role": self._role()})
+            if response is not None and response.get("status") == "ok":
+                detector = self._detectors[link.node.node_id]
+                with self._lock:
+                    returning = link.node.node_id not in self._up
+                if returning:
+                    # The outage is not a heartbeat interval; keep it out of the window.
+                    detector.reset()
+                detector.heartbeat()
+                self._set_up(link.node, True, response.get("role"))
+            else:
+                self._set_up(link.node, False)
+            self._stop.wait(self._config.heartbeat_interval)
+
+    def _set_up(self, node: NodeConfig, up: bool, role: Optional[str] = None) -> None:
+        with self._lock:
+            self._probed.add(node.node_id)
+            if role is not None:
+                self._roles[node.node_id] = role
+            changed = up != (node.node_id in self._up)
+            if up:
+                self._up.add(node.node_id)
+            else:
+                self._up.discard(node.node_id)
+                self._roles.pop(node.node_id, None)
+        if changed:
+            for listener in self._peer_up_listeners if up else self._peer_down_listeners:
+                listener(node)
+
+    def mark_down(self, node_id: int) -> None:
+        link = self._links.get(node_id)
+        if link is not None:
+            self._set_up(link.node, False)
+
+    def ready(self) -> bool:
+        """True once every peer has been heartbeated at least once."""
+        with self._lock:
+            return len(self._probed) == len(self._links)
+
+    def phi(self, node_id: int) -> float:
+        return self._detectors[node_id].phi()
+
+    def alive(self) -> List[NodeConfig]:
+        suspected = [node_id for node_id in self._links if self.phi(node_id) > self._config.phi_threshold]
+        for node_id in suspected:
+            self.mark_down(node_id)
+        with self._lock:
+            return [link.node for node_id, link in self._links.items() if node_id in self._up]
+
+    def role_of(self, node_id: int) -> Optional[str]:
+        with self._lock:
+            return self._roles.get(node_id)
+
+    def request(self, node_id: int, payload: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+        link = self._links.get(node_id)
+        return None if link is None else link.request(payload)
+
+    def stats(self) -> Dict[str, Dict[str, Any]]:
+        with self._lock:
+            up = set(self._up)
+        return {
+            str(node_id): {
+                "up": node_id in up,
+                "phi": round(min(self.phi(node_id), 1e6), 3),
+                "connects": link.connects,
+                "bytes_sent": link.bytes_sent,
+                "bytes_received": link.bytes_received,
+            }
+            for node_id, link in self._links.items()
+        }
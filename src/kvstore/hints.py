@@ -0,0 +1,129 @@
+from __future__ import annotations
+
+import json
+import os
+import threading
+import time
+from typing import Any, Callable, Dict, List, Optional
+
+from .config import NodeConfig
+from .protocol import json_default, json_object_hook
+
+
+class HintStore:
+    """Bounded on-disk store of replication events that could not be delivered, one log per target peer.
+
+    Replay renames the peer's log aside before sending it, so hints written while
+    a replay is running go to a fresh log and are picked up on the next pass.
+    """
+
+    def __init__(self, data_dir: str, max_hints: int = 100_000) -> None:
+        self._dir = os.path.join(data_dir, "hints")
+        os.makedirs(self._dir, exist_ok=True)
+        self.max_hints = max_hints
+        self._lock = threading.Lock()
+        self._pending: Dict[int, int] = {}
+        self._dropped: Dict[int, int] = {}
+        self._replayed: Dict[int, int] = {}
+        self._replay_rate: Dict[int, float] = {}
+        self._listeners: List[Callable[[int], None]] = []
+        for name in os.listdir(self._dir):
+            if name.endswith(".replay"):
+                self._merge_back(int(name.split(".")[0]))
+        for name in os.listdir(self._dir):
+            if name.endswith(".log"):
+                with open(os.path.join(self._dir, name), "r", encoding="utf-8") as handle:
+                    self._pending[int(name.split(".")[0])] = sum(1 for line in handle if line.strip())
+
+    def _log_path(self, node_id: int) -> str:
+        return os.path.join(self._dir, f"{node_id}.log")
+
+    def on_hint(self, listener: Callable[[int], None]) -> None:
+        self._listeners.append(listener)
+
+    def pending(self, node_id: int) -> int:
+        with self._lock:
+            return self._pending.get(node_id, 0)
+
+    def add(self, peer: NodeConfig, op: str, payload: Dict[str, Any]) -> bool:
+        encoded = json.dumps({"op": op, "payload": payload}, separators=(",", ":"), default=json_default)
+        with self._lock:
+            if self._pending.get(peer.node_id, 0) >= self.max_hints:
+                self._dropped[peer.node_id] = self._dropped.get(peer.node_id, 0) + 1
+                return False
+            with open(self._log_path(peer.node_id), "a", encoding="utf-8") as handle:
+                handle.write(encoded + "\n")
+                handle.flush()
+                os.fsync(handle.fileno())
+            self._pending[peer.node_id] = self._pending.get(peer.node_id, 0) + 1
+        for listener in self._listeners:
+            listener(peer.node_id)
+        return True
+
+    def _merge_back(self, node_id: int, skip: int = 0) -> None:
+        replay_path = self._log_path(node_id)[: -len(".log")] + ".replay"
+        if not os.path.exists(replay_path):
+            return
+        with open(replay_path, "r", encoding="utf-8") as handle:
+            leftover = [line for line in handle if line.strip()][skip:]
+        if leftover:
+            with open(self._log_path(node_id), "a", encoding="utf-8") as handle:
+                handle.writelines(leftover)
+                handle.flush()
+                os.fsync(handle.fileno())
+        os.remove(replay_path)
+
+    def replay(
+        self,
+        peer: NodeConfig,
+        deliver: Callable[[List[Dict[str, Any]]], bool],
+        rate: float,
+        batch_size: int = 100,
+        stop: Optional[threading.Event] = None,
+    ) -> bool:
+        """Send the peer's hints in batches, at most ``rate`` events per second; True once the backlog is empty."""
+        while True:
+            log_path = self._log_path(peer.node_id)
+            replay_path = log_path[: -len(".log")] + ".replay"
+            with self._lock:
+                if not os.path.exists(log_path):
+                    self._pending[peer.node_id] = 0
+                    return True
+                os.replace(log_path, replay_path)
+            with open(replay_path, "r", encoding="utf-8") as handle:
+                events = [json.loads(line, object_hook=json_object_hook) for line in handle if line.strip()]
+            sent = 0
+            started = time.monotonic()
+            while sent < len(events):
+                if stop is not None and stop.is_set():
+                    break
+                batch = events[sent : sent + batch_size]
+                if not deliver(batch):
+                    break
+                sent += len(batch)
+                with self._lock:
+                    self._pending[peer.node_id] = max(0, self._pending.get(peer.node_id, 0) - len(batch))
+                    self._replayed[peer.node_id] = self._replayed.get(peer.node_id, 0) + len(batch)
+                    elapsed = time.monotonic() - started
+                    self._replay_rate[peer.node_id] = sent / elapsed if elapsed > 0 else float(sent)
+                if rate > 0:
+                    ahead = sent / rate - (time.monotonic() - started)
+                    if ahead > 0:
+                        time.sleep(ahead)
+            with self._lock:
+                self._merge_back(peer.node_id, skip=sent)
+            if sent < len(events):
+                return False
+
+    def stats(self) -> Dict[str, Dict[str, float]]:
+        with self._lock:
+            peers = set(self._pending) | set(self._dropped) | set(self._replayed)
+            return {
+                str(node_id): {
+                    "pending": self._pending.get(node_id, 0),
+                    "dropped": self._dropped.get(node_id, 0),
+                    "replayed": self._replayed.get(node_id, 0),
+                    "replay_rate": round(self._replay_rate.get(node_id, 0.0), 1),
+                }
+                for node_id in sorted(peers)
+            }
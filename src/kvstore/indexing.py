@@ -1,39 +1,86 @@
 from __future__ import annotations
 
-from typing import Any, Dict, List
+from typing import Any, Callable, Dict, List, MutableSequence, Set, Tuple
+
+Postings = Callable[[], MutableSequence[Any]]
+
+
+def _restored(postings: Postings, keys: List[Any]) -> MutableSequence[Any]:
+    if postings is list:
+        return keys
+    restored = postings()
+    restored.extend(keys)
+    return restored
+
+
+def _discard(index: Dict[Any, MutableSequence[Any]], postings: Postings, keys: Set[Any]) -> None:
+    for term, posted in list(index.items()):
+        if keys.isdisjoint(posted):
+            continue
+        kept = [key for key in posted if key not in keys]
+        if kept:
+            index[term] = _restored(postings, kept)
+        else:
+            del index[term]
 
 
 class SecondaryIndex:
-    """Placeholder for value-based secondary indexes."""
+    """Placeholder for value-based secondary indexes.
 
-    def __init__(self) -> None:
-        self._index: Dict[Any, List[str]] = {}
+    ``postings`` makes each key list; a compact engine passes ``array("q")`` and adds key ids.
+    """
+
+    def __init__(self, postings: Postings = list) -> None:
+        self._postings = postings
+        self._index: Dict[Any, MutableSequence[Any]] = {}
 
-    def add(self, key: str, value: Any) -> None:
-        self._index.setdefault(value, []).append(key)
+    def add(self, key: Any, value: Any) -> None:
+        keys = self._index.get(value)
+        if keys is None:
+            keys = self._index[value] = self._postings()
+        keys.append(key)
 
-    def remove(self, key: str, value: Any) -> None:
+    def remove(self, key: Any, value: Any) -> None:
         keys = self._index.get(value, [])
         if key in keys:
             keys.remove(key)
         if not keys and value in self._index:
             self._index.pop(value, None)
 
+    def discard(self, keys: Set[Any]) -> None:
+        """Remove ``keys`` under every value; a scan, for when their indexed values are unknown."""
+        _discard(self._index, self._postings, keys)
+
     def search(self, value: Any) -> List[str]:
         return list(self._index.get(value, []))
 
+    def postings(self) -> int:
+        return sum(len(keys) for keys in self._index.values())
+
+    def dump(self) -> List[Tuple[Any, List[str]]]:
+        # Pairs rather than an object, since values are not all strings.
+        return list(self._index.items())
+
+    def restore(self, state: List[List[Any]]) -> None:
+        self._index = {value: _restored(self._postings, keys) for value, keys in state}
+
 
 class InvertedIndex:
     """Placeholder for full-text inverted index support."""
 
-    def __init__(self) -> None:
-        self._index: Dict[str, List[str]] = {}
+    def __init__(self, postings: Postings = list) -> None:
+        self._postings = postings
+        self._index: Dict[str, MutableSequence[Any]] = {}
 
-    def add_document(self, key: str, text: str) -> None:
+    def add_document(self, key: Any, text: str) -> None:
         for token in text.split():
-            self._index.setdefault(token.lower(), []).append(key)
+            token = token.lower()
+            keys = self._index.get(token)
+            if keys is None:
+                keys = self._index[token] = self._postings()
+            keys.append(key)
 
-    def remove_document(self, key: str, text: str) -> None:
+    def remove_document(self, key: Any, text: str) -> None:
         for token in text.split():
             token = token.lower()
             keys = self._index.get(token, [])
@@ -42,9 +89,24 @@ class InvertedIndex:
             if not keys and token in self._index:
                 self._index.pop(token, None)
 
+    def discard(self, keys: Set[Any]) -> None:
+        """Remove ``keys`` under every token; a scan, for when their indexed text is unknown."""
+        _discard(self._index, self._postings, keys)
+
     def search(self, term: str) -> List[str]:
         return list(self._index.get(term.lower(), []))
 
+    def postings(self) -> int:
+        return sum(len(keys) for keys in self._index.values())
+
+    def dump(self) -> Dict[str, List[str]]:
+        return self._index
+
+    def restore(self, state: Dict[str, List[str]]) -> None:
+        self._index = state if self._postings is list else {
+            token: _restored(self._postings, keys) for token, keys in state.items()
+        }
+
 
 class VectorIndex:
     """Placeholder for vector-based embedding search."""
@@ -60,3 +122,9 @@ class VectorIndex:
 
     def items(self):
         return self._vectors.items()
+
+    def dump(self) -> Dict[str, List[float]]:
+        return self._vectors
+
+    def restore(self, state: Dict[str, List[float]]) -> None:
+        self._vectors = state
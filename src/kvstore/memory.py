@@ -0,0 +1,175 @@
+from __future__ import annotations
+
+import json
+import random
+import re
+import sys
+import time
+from typing import Any, Dict, List, Optional, Set
+
+from .protocol import json_default
+
+# What a node does once its estimated memory goes over ``maxmemory``.
+POLICIES = ("noeviction", "allkeys-lru", "allkeys-lfu", "volatile-ttl")
+
+# Per key, beyond the key and value objects: its slots in the data and versions
+# dicts and the version int. A rough CPython figure; accounting is an estimate.
+ENTRY_OVERHEAD = 112
+# One key reference in a secondary or inverted index postings list.
+POSTING_BYTES = 8
+# A vector index entry besides its floats: the dict slot and the list object.
+VECTOR_OVERHEAD = 112
+FLOAT_BYTES = sys.getsizeof(1.0) + 8
+
+# LFU counters as in Redis: logarithmic, starting at LFU_INIT so new keys are not
+# the first evicted, and losing one per LFU_DECAY_MINUTES without an access.
+LFU_INIT = 5
+LFU_LOG_FACTOR = 10
+LFU_DECAY_MINUTES = 1
+
+_SIZE = re.compile(r"^\s*(\d+(?:\.\d+)?)\s*([kmg]?)b?\s*$", re.IGNORECASE)
+_UNITS = {"": 1, "k": 1 << 10, "m": 1 << 20, "g": 1 << 30}
+
+
+class MaxMemoryExceeded(Exception):
+    pass
+
+
+def parse_size(text: str) -> int:
+    """Bytes from ``"1048576"``, ``"512mb"`` or ``"2g"``."""
+    match = _SIZE.match(str(text))
+    if match is None:
+        raise ValueError(f"not a size: {text!r}")
+    return int(float(match.group(1)) * _UNITS[match.group(2).lower()])
+
+
+def value_size(value: Any) -> int:
+    """Approximate heap bytes of a decoded JSON-like value, its nested objects included."""
+    size = sys.getsizeof(value)
+    if isinstance(value, dict):
+        for key, item in value.items():
+            size += sys.getsizeof(key) + value_size(item)
+    elif isinstance(value, (list, tuple)):
+        for item in value:
+            size += value_size(item)
+    return size
+
+
+def encoded_size(value: Any) -> int:
+    """Bytes of ``value`` as a lazy snapshot stores it, so it matches the mapped length once saved."""
+    return len(json.dumps(value, separators=(",", ":"), default=json_default).encode("utf-8"))
+
+
+def vector_bytes(dim: int) -> int:
+    return VECTOR_OVERHEAD + dim * FLOAT_BYTES
+
+
+class MemoryAccounting:
+    """Running byte estimates per engine structure, adjusted as keys are stored, indexed and removed."""
+
+    STRUCTURES = ("data", "secondary_index", "inverted_index", "vector_index")
+
+    def __init__(self) -> None:
+        self.data = 0
+        self.secondary_index = 0
+        self.inverted_index = 0
+        self.vector_index = 0
+
+    def total(self) -> int:
+        return self.data + self.secondary_index + self.inverted_index + self.vector_index
+
+    def as_dict(self) -> Dict[str, int]:
+        return {name: getattr(self, name) for name in self.STRUCTURES}
+
+
+class KeySampler:
+    """Keys kept in an array for O(1) random sampling, each with an access stamp.
+
+    Eviction samples ``samples`` keys and picks the one with the oldest access
+    (LRU) or the lowest access counter (LFU), as Redis does, instead of keeping
+    an exact ordering that every read would have to update. LRU stamps come from
+    a logical clock; LFU stamps pack the minute of the last access above an 8-bit
+    logarithmic counter. Not locked; the engine calls it under its own lock.
+    """
+
+    def __init__(self, policy: str, samples: int = 5, seed: Optional[int] = None) -> None:
+        self.lfu = policy == "allkeys-lfu"
+        self.samples = max(1, samples)
+        self._keys: List[str] = []
+        self._stamps: List[int] = []
+        self._slots: Dict[str, int] = {}
+        self._tick = 0
+        self._rng = random.Random(seed)
+
+    def __len__(self) -> int:
+        return len(self._keys)
+
+    def add(self, key: str) -> None:
+        """Record a write: a new key starts with a fresh stamp, an existing one counts as accessed."""
+        slot = self._slots.get(key)
+        if slot is not None:
+            self._stamps[slot] = self._touched(self._stamps[slot])
+            return
+        self._slots[key] = len(self._keys)
+        self._keys.append(key)
+        self._stamps.append(_minutes() << 8 | LFU_INIT if self.lfu else self._next_tick())
+
+    def touch(self, key: str) -> None:
+        slot = self._slots.get(key)
+        if slot is not None:
+            self._stamps[slot] = self._touched(self._stamps[slot])
+
+    def remove(self, key: str) -> None:
+        slot = self._slots.pop(key, None)
+        if slot is None:
+            return
+        last_key, last_stamp = self._keys.pop(), self._stamps.pop()
+        if slot < len(self._keys):
+            self._keys[slot] = last_key
+            self._stamps[slot] = last_stamp
+            self._slots[last_key] = slot
+
+    def victim(self, exclude: Set[str]) -> Optional[str]:
+        """The coldest of a random sample of keys, skipping ``exclude``."""
+        count = len(self._keys)
+        if count <= len(exclude):
+            return None
+        now = _minutes()
+        best: Optional[str] = None
+        best_score = 0
+        sampled = attempts = 0
+        while sampled < self.samples and attempts < 4 * self.samples:
+            attempts += 1
+            slot = self._rng.randrange(count)
+            key = self._keys[slot]
+            if key in exclude:
+                continue
+            sampled += 1
+            score = _lfu_counter(self._stamps[slot], now) if self.lfu else self._stamps[slot]
+            if best is None or score < best_score:
+                best, best_score = key, score
+        if best is None:
+            # Every draw hit an excluded key; take any key that is not.
+            best = next(key for key in self._keys if key not in exclude)
+        return best
+
+    def _next_tick(self) -> int:
+        self._tick += 1
+        return self._tick
+
+    def _touched(self, stamp: int) -> int:
+        if not self.lfu:
+            return self._next_tick()
+        now = _minutes()
+        counter = _lfu_counter(stamp, now)
+        if counter < 255 and self._rng.random() < 1.0 / (max(counter - LFU_INIT, 0) * LFU_LOG_FACTOR + 1):
+            counter += 1
+        return now << 8 | counter
+
+
+def _minutes() -> int:
+    return int(time.monotonic() // 60)
+
+
+def _lfu_counter(stamp: int, now: int) -> int:
+    return max(0, (stamp & 0xFF) - (now - (stamp >> 8)) // LFU_DECAY_MINUTES)
@@ -0,0 +1,220 @@
+from __future__ import annotations
+
+import threading
+from array import array
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Callable, Dict, List, Tuple
+
+# Histograms count microseconds in log-linear buckets, HDR style: exact below 16,
+# then 16 buckets per power of two, so a reported quantile is within 1/16 of
+# the true value. The last of the 16 * 41 buckets starts at about 12 days.
+_SUB_BUCKETS = 16
+_BUCKETS = _SUB_BUCKETS * 41
+_QUANTILES = (0.5, 0.9, 0.99, 0.999)
+
+Labels = Tuple[Tuple[str, str], ...]
+
+
+def _bucket(micros: int) -> int:
+    if micros < _SUB_BUCKETS:
+        return micros
+    shift = micros.bit_length() - 5
+    return min((shift + 1) * _SUB_BUCKETS + (micros >> shift) - _SUB_BUCKETS, _BUCKETS - 1)
+
+
+# Bucket of every value below 65.536 ms, so recording a typical latency is one lookup.
+_SMALL_LIMIT = 1 << 16
+_SMALL = array("H", (_bucket(micros) for micros in range(_SMALL_LIMIT)))
+
+
+def _bucket_high(index: int) -> int:
+    """Largest value that lands in bucket ``index``."""
+    if index < _SUB_BUCKETS:
+        return index
+    shift = index // _SUB_BUCKETS - 1
+    return ((index % _SUB_BUCKETS + _SUB_BUCKETS + 1) << shift) - 1
+
+
+class Histogram:
+    """Latency histogram; ``record`` takes seconds.
+
+    Updates are not locked. Under the GIL two threads can only lose an update
+    if they interleave on the same bucket, which is rare enough for monitoring
+    and keeps ``record`` to a table lookup and a list increment.
+    """
+
+    def __init__(self) -> None:
+        self._counts = [0] * _BUCKETS
+        self.total = 0.0
+        self.max = 0.0
+
+    @property
+    def count(self) -> int:
+        return sum(self._counts)
+
+    def record(self, seconds: float) -> None:
+        micros = int(seconds * 1e6)
+        self._counts[_SMALL[micros] if micros < _SMALL_LIMIT else _bucket(micros)] += 1
+        self.total += seconds
+        if seconds > self.max:
+            self.max = seconds
+
+    def merge(self, other: "Histogram") -> None:
+        """Add ``other``'s samples to this histogram, e.g. to combine per-thread histograms."""
+        for index, bucket_count in enumerate(other._counts):
+            if bucket_count:
+                self._counts[index] += bucket_count
+        self.total += other.total
+        self.max = max(self.max, other.max)
+
+    def quantile(self, q: float) -> float:
+        counts = list(self._counts)
+        count = sum(counts)
+        if count == 0:
+            return 0.0
+        rank = max(1, int(q * count + 0.5))
+        seen = 0
+        for index, bucket_count in enumerate(counts):
+            seen += bucket_count
+            if seen >= rank:
+                return min(_bucket_high(index) / 1e6, self.max)
+        return self.max
+
+    def summary(self) -> Dict[str, float]:
+        result: Dict[str, float] = {"count": self.count, "sum": round(self.total, 6), "max": round(self.max, 6)}
+        for q in _QUANTILES:
+            result[f"p{q * 100:g}"] = round(self.quantile(q), 6)
+        return result
+
+
+class Counter:
+    """Unlocked, like :class:`Histogram`."""
+
+    def __init__(self) -> None:
+        self.value = 0
+
+    def incr(self, amount: int = 1) -> None:
+        self.value += amount
+
+
+class _NullHistogram(Histogram):
+    def record(self, seconds: float) -> None:
+        return None
+
+
+class _NullCounter(Counter):
+    def incr(self, amount: int = 1) -> None:
+        return None
+
+
+class Metrics:
+    """Registry of named histograms, counters and gauges, each with optional labels.
+
+    Callers keep the objects returned by ``histogram``/``counter`` instead of looking
+    them up per event. With ``enabled=False`` those objects discard everything.
+    """
+
+    def __init__(self, enabled: bool = True) -> None:
+        self.enabled = enabled
+        self._lock = threading.Lock()
+        self._histograms: Dict[Tuple[str, Labels], Histogram] = {}
+        self._counters: Dict[Tuple[str, Labels], Counter] = {}
+        self._gauges: Dict[Tuple[str, Labels], Callable[[], float]] = {}
+
+    def histogram(self, name: str, **labels: str) -> Histogram:
+        key = (name, tuple(sorted(labels.items())))
+        with self._lock:
+            if key not in self._histograms:
+                self._histograms[key] = Histogram() if self.enabled else _NullHistogram()
+            return self._histograms[key]
+
+    def counter(self, name: str, **labels: str) -> Counter:
+        key = (name, tuple(sorted(labels.items())))
+        with self._lock:
+            if key not in self._counters:
+                self._counters[key] = Counter() if self.enabled else _NullCounter()
+            return self._counters[key]
+
+    def gauge(self, name: str, read: Callable[[], float], **labels: str) -> None:
+        with self._lock:
+            self._gauges[(name, tuple(sorted(labels.items())))] = read
+
+    def snapshot(self) -> Dict[str, List[Dict[str, Any]]]:
+        """JSON-friendly view: every series with its labels and current values."""
+        with self._lock:
+            histograms = list(self._histograms.items())
+            counters = list(self._counters.items())
+            gauges = list(self._gauges.items())
+        result: Dict[str, List[Dict[str, Any]]] = {}
+        for (name, labels), histogram in histograms:
+            if histogram.count:
+                result.setdefault(name, []).append({"labels": dict(labels), **histogram.summary()})
+        for (name, labels), counter in counters:
+            result.setdefault(name, []).append({"labels": dict(labels), "value": counter.value})
+        for (name, labels), read in gauges:
+            result.setdefault(name, []).append({"labels": dict(labels), "value": read()})
+        return result
+
+    def prometheus(self) -> str:
+        """Prometheus text exposition; histograms are exported as summaries."""
+        with self._lock:
+            histograms = sorted(self._histograms.items())
+            counters = sorted(self._counters.items())
+            gauges = sorted(self._gauges.items(), key=lambda item: item[0])
+        lines: List[str] = []
+        typed = set()
+
+        def declare(name: str, kind: str) -> None:
+            if name not in typed:
+                typed.add(name)
+                lines.append(f"# TYPE {name} {kind}")
+
+        for (name, labels), histogram in histograms:
+            if not histogram.count:
+                continue
+            declare(name, "summary")
+            for q in _QUANTILES:
+                lines.append(f"{name}{_format_labels(labels + (('quantile', f'{q:g}'),))} {histogram.quantile(q):.6f}")
+            lines.append(f"{name}_sum{_format_labels(labels)} {histogram.total:.6f}")
+            lines.append(f"{name}_count{_format_labels(labels)} {histogram.count}")
+        for (name, labels), counter in counters:
+            declare(name, "counter")
+            lines.append(f"{name}{_format_labels(labels)} {counter.value}")
+        for (name, labels), read in gauges:
+            declare(name, "gauge")
+            lines.append(f"{name}{_format_labels(labels)} {read():g}")
+        return "\n".join(lines) + "\n"
+
+
+def _format_labels(labels: Labels) -> str:
+    if not labels:
+        return ""
+    pairs = []
+    for name, value in labels:
+        escaped = str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+        pairs.append(f'{name}="{escaped}"')
+    return "{" + ",".join(pairs) + "}"
+
+
+def serve_prometheus(metrics: Metrics, host: str, port: int) -> ThreadingHTTPServer:
+    """Start a background HTTP listener answering ``GET /metrics``; stop it with ``shutdown()``."""
+
+    class Handler(BaseHTTPRequestHandler):
+        def do_GET(self) -> None:  # noqa: N802
+            if self.path.split("?")[0] != "/metrics":
+                self.send_error(404)
+                return
+            body = metrics.prometheus().encode("utf-8")
+            self.send_response(200)
+            self.send_header("Content-Type", "text/plain; version=0.0.4")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, format: str, *args: Any) -> None:  # noqa: A002
+            return None
+
+    server = ThreadingHTTPServer((host, port), Handler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
@@ -0,0 +1,52 @@
+from __future__ import annotations
+
+import bisect
+import hashlib
+from typing import Dict, Iterable, List, Optional
+
+from .config import NodeConfig
+
+
+def stable_hash(value: str) -> int:
+    return int.from_bytes(hashlib.blake2b(value.encode("utf-8"), digest_size=8).digest(), "big")
+
+
+class HashRing:
+    """Consistent-hash ring with virtual nodes used to place keys in dynamo mode."""
+
+    def __init__(self, nodes: Iterable[NodeConfig], virtual_nodes: int = 64, replication_factor: int = 3) -> None:
+        self._nodes: Dict[int, NodeConfig] = {node.node_id: node for node in nodes}
+        if not self._nodes:
+            raise ValueError("HashRing needs at least one node")
+        self.virtual_nodes = max(1, virtual_nodes)
+        self.replication_factor = max(1, min(replication_factor, len(self._nodes)))
+        points = sorted(
+            (stable_hash(f"{node_id}#{vnode}"), node_id)
+            for node_id in self._nodes
+            for vnode in range(self.virtual_nodes)
+        )
+        self._tokens: List[int] = [token for token, _ in points]
+        self._token_owners: List[int] = [node_id for _, node_id in points]
+
+    @property
+    def nodes(self) -> List[NodeConfig]:
+        return list(self._nodes.values())
+
+    def preference_list(self, key: str, count: Optional[int] = None) -> List[NodeConfig]:
+        wanted = len(self._nodes) if count is None else min(count, len(self._nodes))
+        start = bisect.bisect(self._tokens, stable_hash(key))
+        seen: List[int] = []
+        total = len(self._tokens)
+        for offset in range(total):
+            node_id = self._token_owners[(start + offset) % total]
+            if node_id not in seen:
+                seen.append(node_id)
+                if len(seen) == wanted:
+                    break
+        return [self._nodes[node_id] for node_id in seen]
+
+    def owners(self, key: str) -> List[NodeConfig]:
+        return self.preference_list(key, self.replication_factor)
+
+    def is_owner(self, key: str, node_id: int) -> bool:
+        return any(node.node_id == node_id for node in self.owners(key))
@@ -0,0 +1,84 @@
+from __future__ import annotations
+
+import os
+import re
+import sys
+import threading
+import time
+from types import FrameType
+from typing import Any, Dict, List, Optional
+
+# A profile holds the request thread that asked for it, so keep it bounded.
+MAX_PROFILE_SECONDS = 60.0
+MIN_INTERVAL = 0.001
+
+_running = threading.Lock()
+
+# Innermost Python frames of threads parked in a blocking C call (lock acquire,
+# select, recv_into), which does not show up as a frame of its own.
+_WAIT_POINTS = {"wait", "select", "accept", "_fill", "_wait_for_tstate_lock"}
+# Per-connection and pool threads get numbered names ("Thread-12 (process_request_thread)",
+# "shard_3"); dropping the number lets their identical stacks merge.
+_THREAD_NUMBER = re.compile(r"[-_]\d+")
+
+
+class ProfilerBusy(Exception):
+    pass
+
+
+def _frame_label(frame: FrameType) -> str:
+    code = frame.f_code
+    return f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})"
+
+
+def _collapse(frame: Optional[FrameType], thread_name: str) -> str:
+    labels: List[str] = []
+    while frame is not None:
+        labels.append(_frame_label(frame))
+        frame = frame.f_back
+    labels.append(thread_name)
+    labels.reverse()
+    return ";".join(labels)
+
+
+def sample_stacks(seconds: float, interval: float = 0.005, idle: bool = False) -> Dict[str, Any]:
+    """Sample the stack of every other thread for ``seconds`` and count identical stacks.
+
+    Stacks are collapsed root-first as ``thread;outer (file:line);...;inner (file:line)``,
+    the input format of flamegraph.pl and speedscope. This is wall-clock sampling:
+    with ``idle=False`` stacks parked in a known wait point (condition waits, the
+    accept loop, socket reads) are dropped, but a thread in ``time.sleep`` still
+    shows up under its caller. Only one profile runs at a time; a second caller
+    gets :class:`ProfilerBusy`.
+    """
+    seconds = min(max(seconds, 0.0), MAX_PROFILE_SECONDS)
+    interval = max(interval, MIN_INTERVAL)
+    if not _running.acquire(blocking=False):
+        raise ProfilerBusy("a profile is already running")
+    try:
+        me = threading.get_ident()
+        counts: Dict[str, int] = {}
+        samples = 0
+        start = time.perf_counter()
+        deadline = start + seconds
+        while True:
+            names = {thread.ident: thread.name for thread in threading.enumerate()}
+            for ident, frame in sys._current_frames().items():
+                if ident == me or (not idle and frame.f_code.co_name in _WAIT_POINTS):
+                    continue
+                stack = _collapse(frame, _THREAD_NUMBER.sub("", names.get(ident, "Thread")))
+                counts[stack] = counts.get(stack, 0) + 1
+            samples += 1
+            if time.perf_counter() + interval > deadline:
+                break
+            time.sleep(interval)
+        elapsed = time.perf_counter() - start
+    finally:
+        _running.release()
+    stacks = sorted(counts.items(), key=lambda item: item[1], reverse=True)
+    return {"samples": samples, "seconds": round(elapsed, 3), "interval": interval, "stacks": [list(item) for item in stacks]}
+
+
+def collapsed_text(profile: Dict[str, Any]) -> str:
+    """``stack count`` lines, ready for ``flamegraph.pl``."""
+    return "".join(f"{stack} {count}\n" for stack, count in profile["stacks"])
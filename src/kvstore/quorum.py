@@ -0,0 +1,121 @@
+from __future__ import annotations
+
+from concurrent.futures import FIRST_COMPLETED, Future, ThreadPoolExecutor, as_completed, wait
+from typing import Any, Callable, Dict, List, Optional, Set
+
+from .client import KVClient
+from .config import ClusterConfig, NodeConfig
+from .hints import HintStore
+from .replication import ReplicationEvent
+
+
+class QuorumCoordinator:
+    """Fans dynamo-mode requests out to replicas and returns once R or W of them answered."""
+
+    def __init__(self, config: ClusterConfig, max_workers: int = 32, hints: Optional[HintStore] = None) -> None:
+        self._config = config
+        self._hints = hints
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="quorum")
+
+    def stop(self) -> None:
+        self._executor.shutdown(wait=False)
+
+    def _call(self, node: NodeConfig, payload: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+        threshold = self._config.peer_compress_threshold()
+        client = KVClient(node.host, node.port, timeout=self._config.replication_timeout, compress_threshold=threshold)
+        try:
+            return client.request(payload)
+        except OSError:
+            return None
+
+    def _replicate(self, node: NodeConfig, event: ReplicationEvent) -> bool:
+        response = self._call(node, {"op": "replicate", "event": {"op": event.op, "payload": event.payload}})
+        if response is not None and response.get("status") == "ok":
+            return True
+        if self._hints is not None:
+            self._hints.add(node, event.op, event.payload)
+        return False
+
+    def write(
+        self,
+        owners: List[NodeConfig],
+        event: ReplicationEvent,
+        apply_local: Callable[[], Any],
+        required: int,
+    ) -> bool:
+        required = max(1, min(required, len(owners)))
+        remote = [
+            self._executor.submit(self._replicate, node, event)
+            for node in owners
+            if node.node_id != self._config.node_id
+        ]
+        acks = 0
+        if len(remote) < len(owners):
+            apply_local()
+            acks += 1
+        if acks >= required:
+            return True
+        for future in as_completed(remote):
+            if future.result():
+                acks += 1
+                if acks >= required:
+                    return True
+        return False
+
+    def read(
+        self,
+        owners: List[NodeConfig],
+        payload: Dict[str, Any],
+        read_local: Callable[[], Dict[str, Any]],
+        required: int,
+    ) -> List[Dict[str, Any]]:
+        ordered = sorted(owners, key=lambda node: node.node_id != self._config.node_id)
+        required = max(1, min(required, len(ordered)))
+        replies: List[Dict[str, Any]] = []
+        pending: Set[Future] = set()
+        launched = 0
+
+        def fetch(node: NodeConfig) -> Optional[Dict[str, Any]]:
+            if node.node_id == self._config.node_id:
+                response: Optional[Dict[str, Any]] = read_local()
+            else:
+                response = self._call(node, payload)
+            if response is None or response.get("status") != "ok":
+                return None
+            return dict(response, node_id=node.node_id)
+
+        def launch(count: int) -> None:
+            nonlocal launched
+            for _ in range(count):
+                if launched < len(ordered):
+                    pending.add(self._executor.submit(fetch, ordered[launched]))
+                    launched += 1
+
+        launch(required)
+        while len(replies) < required and pending:
+            hedge = self._config.hedge_delay if self._config.hedge_delay > 0 and launched < len(ordered) else None
+            done, still_pending = wait(pending, timeout=hedge, return_when=FIRST_COMPLETED)
+            pending.clear()
+            pending.update(still_pending)
+            if not done:
+                # Speculative hedge: a replica is slow, ask the next one in the preference list.
+                launch(1)
+                continue
+            for future in done:
+                response = future.result()
+                if response is None:
+                    launch(1)
+                else:
+                    replies.append(response)
+        return replies
+
+    def repair(self, nodes: List[NodeConfig], event: ReplicationEvent, apply_local: Callable[[], Any]) -> None:
+        for node in nodes:
+            if node.node_id == self._config.node_id:
+                self._executor.submit(apply_local)
+            else:
+                self._executor.submit(self._replicate, node, event)
+
+    def fan_out(self, nodes: List[NodeConfig], payload: Dict[str, Any]) -> List[Dict[str, Any]]:
+        futures = [self._executor.submit(self._call, node, payload) for node in nodes]
+        return [response for response in (future.result() for future in futures) if response is not None]
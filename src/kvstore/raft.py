@@ -0,0 +1,745 @@
+from __future__ import annotations
+
+import json
+import os
+import random
+import socket
+import threading
+import time
+from collections import deque
+from typing import Any, Deque, Dict, List, Optional, Set, Tuple
+
+from .config import ClusterConfig, NodeConfig
+from .engine import KVEngine
+from .failure import PeerLink
+from .protocol import ProtocolError, decode_message, encode_message, json_default, json_object_hook
+from .replication import ServerState
+
+MAX_BATCH = 256
+MAX_INFLIGHT = 8
+LEASE_SAFETY = 0.9
+
+
+class RaftLog:
+    """Persistent Raft state under ``data_dir/raft``: term and vote, the entry log and the applied index.
+
+    Entries live in segment files of ``segment_entries`` entries, each named after
+    its first index. Once every entry of a closed segment has been applied the
+    segment is deleted and its last index and term become the snapshot point;
+    ``entries`` holds only what follows it.
+    """
+
+    def __init__(self, directory: str, segment_entries: int = 4096) -> None:
+        os.makedirs(directory, exist_ok=True)
+        self._directory = directory
+        self._segment_entries = max(1, segment_entries)
+        self._state_file = os.path.join(directory, "state.json")
+        self._applied_file = os.path.join(directory, "applied")
+        self.term = 0
+        self.voted_for: Optional[int] = None
+        self.snapshot_index = 0
+        self.snapshot_term = 0
+        self.entries: List[Dict[str, Any]] = []
+        # Byte offset of each entry in its segment, so truncation cuts the file instead of rewriting it.
+        self._offsets: List[int] = []
+        self._segments: List[int] = []
+        if os.path.exists(self._state_file):
+            with open(self._state_file, "r", encoding="utf-8") as handle:
+                state = json.load(handle)
+            self.term, self.voted_for = state["term"], state["voted_for"]
+            self.snapshot_index = state.get("snapshot_index", 0)
+            self.snapshot_term = state.get("snapshot_term", 0)
+        legacy = os.path.join(directory, "log.jsonl")
+        if os.path.exists(legacy):
+            os.replace(legacy, self._segment_path(1))
+        self._load_segments()
+        self._handle = open(self._segment_path(self._segments[-1]), "ab")
+        self._size = self._handle.tell()
+        self.synced = self.last_index
+
+    def _segment_path(self, first: int) -> str:
+        return os.path.join(self._directory, f"log-{first:020d}.jsonl")
+
+    def _load_segments(self) -> None:
+        names = [name for name in os.listdir(self._directory) if name.startswith("log-") and name.endswith(".jsonl")]
+        firsts = sorted(int(name[4:-6]) for name in names)
+        for position, first in enumerate(firsts):
+            path = self._segment_path(first)
+            if first > self.last_index + 1:
+                # A gap after a torn tail or a crash mid-compaction: nothing from here on is usable.
+                for stale in firsts[position:]:
+                    os.remove(self._segment_path(stale))
+                break
+            index, offset, torn = first, 0, False
+            with open(path, "rb") as handle:
+                for line in handle:
+                    try:
+                        entry = json.loads(line, object_hook=json_object_hook) if line.endswith(b"\n") else None
+                    except ValueError:
+                        entry = None
+                    if entry is None:
+                        torn = True  # torn tail from a crash mid-append
+                        break
+                    if index > self.last_index:
+                        self.entries.append(entry)
+                        self._offsets.append(offset)
+                    index += 1
+                    offset += len(line)
+            if index - 1 <= self.snapshot_index and position + 1 < len(firsts):
+                os.remove(path)  # fully compacted; the crash came before it was deleted
+                continue
+            self._segments.append(first)
+            if torn:
+                os.truncate(path, offset)
+                for stale in firsts[position + 1 :]:
+                    os.remove(self._segment_path(stale))
+                break
+        if not self._segments:
+            self._segments.append(self.last_index + 1)
+
+    @property
+    def last_index(self) -> int:
+        return self.snapshot_index + len(self.entries)
+
+    def term_at(self, index: int) -> int:
+        """The term of entry ``index``; 0 for index 0, entries past the log and entries compacted away."""
+        if index == self.snapshot_index:
+            return self.snapshot_term
+        if self.snapshot_index < index <= self.last_index:
+            return self.entries[index - self.snapshot_index - 1]["term"]
+        return 0
+
+    def entries_from(self, index: int, limit: int) -> List[Dict[str, Any]]:
+        """Up to ``limit`` entries starting at ``index``, which must follow the snapshot point."""
+        start = index - self.snapshot_index - 1
+        return self.entries[start : start + limit]
+
+    def save_state(self, term: int, voted_for: Optional[int]) -> None:
+        self.term, self.voted_for = term, voted_for
+        self._write_state()
+
+    def _write_state(self) -> None:
+        tmp_path = self._state_file + ".tmp"
+        with open(tmp_path, "w", encoding="utf-8") as handle:
+            json.dump(
+                {
+                    "term": self.term,
+                    "voted_for": self.voted_for,
+                    "snapshot_index": self.snapshot_index,
+                    "snapshot_term": self.snapshot_term,
+                },
+                handle,
+            )
+            handle.flush()
+            os.fsync(handle.fileno())
+        os.replace(tmp_path, self._state_file)
+
+    def append(self, entries: List[Dict[str, Any]]) -> None:
+        for entry in entries:
+            if self.last_index + 1 - self._segments[-1] >= self._segment_entries:
+                self._roll()
+            encoded = (json.dumps(entry, separators=(",", ":"), default=json_default) + "\n").encode("utf-8")
+            self._handle.write(encoded)
+            self.entries.append(entry)
+            self._offsets.append(self._size)
+            self._size += len(encoded)
+        self._handle.flush()
+
+    def _roll(self) -> None:
+        # The group commit only fsyncs the open segment, so the one being closed is synced here.
+        self._handle.flush()
+        os.fsync(self._handle.fileno())
+        self._handle.close()
+        self._segments.append(self.last_index + 1)
+        self._handle = open(self._segment_path(self._segments[-1]), "ab")
+        self._size = 0
+
+    def fsync(self) -> None:
+        os.fsync(self._handle.fileno())
+
+    def truncate(self, index: int) -> None:
+        """Drop entries from ``index`` onward by cutting their segment short and deleting later ones."""
+        position = index - self.snapshot_index - 1
+        offset = self._offsets[position]
+        del self.entries[position:]
+        del self._offsets[position:]
+        self._handle.close()
+        while len(self._segments) > 1 and self._segments[-1] > index:
+            os.remove(self._segment_path(self._segments.pop()))
+        self._handle = open(self._segment_path(self._segments[-1]), "ab")
+        self._handle.truncate(offset)
+        self._handle.seek(offset)
+        os.fsync(self._handle.fileno())
+        self._size = offset
+        self.synced = min(self.synced, self.last_index)
+
+    def compact(self, applied: int) -> bool:
+        """Delete the closed segments whose entries are all applied; True when any were."""
+        closed = 0
+        while closed + 1 < len(self._segments) and self._segments[closed + 1] - 1 <= applied:
+            closed += 1
+        if closed == 0:
+            return False
+        index = self._segments[closed] - 1
+        self.snapshot_term = self.term_at(index)
+        dropped = index - self.snapshot_index
+        self.snapshot_index = index
+        del self.entries[:dropped]
+        del self._offsets[:dropped]
+        self._write_state()
+        for first in self._segments[:closed]:
+            os.remove(self._segment_path(first))
+        del self._segments[:closed]
+        return True
+
+    def reset(self, index: int, term: int) -> None:
+        """Discard the whole log in favour of an installed snapshot that ends at ``index``."""
+        self._handle.close()
+        self.snapshot_index, self.snapshot_term = index, term
+        self._write_state()
+        for first in self._segments:
+            os.remove(self._segment_path(first))
+        self.entries, self._offsets, self._segments = [], [], [index + 1]
+        self._handle = open(self._segment_path(index + 1), "ab")
+        self._size = 0
+        self.synced = index
+
+    def load_applied(self) -> int:
+        if not os.path.exists(self._applied_file):
+            return self.snapshot_index
+        with open(self._applied_file, "r", encoding="utf-8") as handle:
+            return max(self.snapshot_index, min(int(handle.read() or 0), self.last_index))
+
+    def save_applied(self, index: int) -> None:
+        # Not fsynced: replaying a few entries after a crash is harmless because applies are versioned.
+        tmp_path = self._applied_file + ".tmp"
+        with open(tmp_path, "w", encoding="utf-8") as handle:
+            handle.write(str(index))
+        os.replace(tmp_path, self._applied_file)
+
+    def close(self) -> None:
+        self._handle.close()
+
+
+class _AppendStream:
+    """Pipelined AppendEntries to one follower over a persistent connection.
+
+    The sender keeps up to ``MAX_INFLIGHT`` requests outstanding; a reader thread
+    matches the in-order replies back to what was sent.
+    """
+
+    def __init__(self, raft: "RaftNode", node: NodeConfig) -> None:
+        self._raft = raft
+        self.node = node
+        self._sock: Optional[socket.socket] = None
+        self._inflight: Deque[Tuple[float, int, int, int]] = deque()
+
+    def run(self) -> None:
+        while not self._raft.stopped():
+            request = self._raft.next_append(self.node.node_id, len(self._inflight))
+            if request is None:
+                if not self._raft.is_leader():
+                    self._close()
+                continue
+            connected = None if self._raft.is_blocked(self.node.node_id) else self._connect()
+            if connected is None:
+                self._raft.append_failed(self.node.node_id)
+                time.sleep(self._raft.heartbeat_interval)
+                continue
+            sock, inflight = connected
+            if request["op"] == "raft_snapshot":
+                inflight.append((time.monotonic(), request["term"], request["last_index"], 0))
+            else:
+                inflight.append(
+                    (time.monotonic(), request["term"], request["prev_index"], len(request["entries"]))
+                )
+            try:
+                sock.sendall(encode_message(request))
+            except OSError:
+                self._close()
+
+    def _connect(self) -> Optional[Tuple[socket.socket, Deque[Tuple[float, int, int, int]]]]:
+        sock, inflight = self._sock, self._inflight
+        if sock is not None:
+            return sock, inflight
+        try:
+            sock = socket.create_connection((self.node.host, self.node.port), timeout=self._raft.election_timeout)
+        except OSError:
+            return None
+        inflight = deque()
+        self._sock, self._inflight = sock, inflight
+        threading.Thread(target=self._read, args=(sock, inflight), daemon=True).start()
+        return sock, inflight
+
+    def _read(self, sock: socket.socket, inflight: Deque[Tuple[float, int, int, int]]) -> None:
+        try:
+            with sock.makefile("rb") as reader:
+                for raw in reader:
+                    response = decode_message(raw)
+                    sent = inflight.popleft()
+                    if response.get("status") != "ok":
+                        break
+                    self._raft.append_result(self.node.node_id, sent, response)
+        except (OSError, ProtocolError, IndexError):
+            pass
+        if self._sock is sock:
+            self._close()
+        self._raft.append_failed(self.node.node_id)
+
+    def _close(self) -> None:
+        sock, self._sock = self._sock, None
+        if sock is not None:
+            try:
+                sock.shutdown(socket.SHUT_RDWR)
+                sock.close()
+            except OSError:
+                pass
+
+
+class RaftNode:
+    """Raft consensus for leader mode: terms, log matching, majority commit and leader-lease reads.
+
+    Client writes are appended to the leader's log, group-committed with one fsync,
+    streamed to followers and applied to the engine once a majority stored them.
+    A leader serves reads locally while a majority acknowledged it within
+    the minimum election timeout; followers refuse votes during that window.
+    Applied segments of the log are deleted, and a follower that needs entries
+    from before them is sent the engine's records instead.
+    """
+
+    def __init__(self, config: ClusterConfig, engine: KVEngine, state: ServerState) -> None:
+        self._config = config
+        self._engine = engine
+        self._state = state
+        self.election_timeout = config.raft_election_timeout
+        self.heartbeat_interval = config.raft_heartbeat_interval
+        self._log = RaftLog(os.path.join(config.data_dir, "raft"), config.raft_segment_entries)
+        self._peers = {node.node_id: node for node in config.peers or []}
+        self._majority = (len(self._peers) + 1) // 2 + 1
+        self._lock = threading.RLock()
+        self._changed = threading.Condition(self._lock)
+        self._sync_lock = threading.Lock()
+        # Held while entries are applied, so a snapshot install never interleaves with them.
+        self._apply_lock = threading.Lock()
+        self._stop = threading.Event()
+        self._role = "follower"
+        self.leader_id: Optional[int] = None
+        self._commit = 0
+        self._applied = self._log.load_applied()
+        self._next_index: Dict[int, int] = {}
+        self._match_index: Dict[int, int] = {}
+        self._last_sent: Dict[int, float] = {}
+        self._acked_at: Dict[int, float] = {}
+        self._blocked: Set[int] = set()
+        self._last_contact = 0.0
+        self._deadline = self._new_deadline()
+        self._vote_links = {node_id: PeerLink(node, config.replication_timeout) for node_id, node in self._peers.items()}
+        self._threads = [
+            threading.Thread(target=self._tick, daemon=True),
+            threading.Thread(target=self._apply_loop, daemon=True),
+        ] + [threading.Thread(target=_AppendStream(self, node).run, daemon=True) for node in self._peers.values()]
+        state.set_role("secondary")
+
+    def start(self) -> None:
+        for thread in self._threads:
+            thread.start()
+
+    def stop(self) -> None:
+        self._stop.set()
+        with self._changed:
+            self._changed.notify_all()
+        for link in self._vote_links.values():
+            link.close()
+
+    def stopped(self) -> bool:
+        return self._stop.is_set()
+
+    def is_leader(self) -> bool:
+        with self._lock:
+            return self._role == "leader"
+
+    def block(self, node_ids: Set[int]) -> None:
+        """Chaos: drop all Raft traffic to and from these peers (simulated partition)."""
+        with self._changed:
+            self._blocked = set(node_ids)
+            self._changed.notify_all()
+
+    def is_blocked(self, node_id: int) -> bool:
+        with self._lock:
+            return node_id in self._blocked
+
+    def status(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "role": self._role,
+                "term": self._log.term,
+                "leader": self.leader_id,
+                "last_index": self._log.last_index,
+                "snapshot_index": self._log.snapshot_index,
+                "commit_index": self._commit,
+                "applied_index": self._applied,
+                "lease_valid": self._lease_valid(),
+            }
+
+    # -- timers and elections -------------------------------------------------
+
+    def _new_deadline(self) -> float:
+        return time.monotonic() + self.election_timeout * (1 + random.random())
+
+    def _tick(self) -> None:
+        while not self._stop.wait(self.heartbeat_interval / 4):
+            with self._lock:
+                start = self._role != "leader" and time.monotonic() >= self._deadline
+            if start:
+                self._start_election()
+
+    def _become_follower(self, term: int) -> None:
+        if term > self._log.term:
+            self._log.save_state(term, None)
+        if self._role != "follower":
+            if self._role == "leader":
+                self.leader_id = None
+            self._role = "follower"
+            self._state.set_role("secondary")
+        self._changed.notify_all()
+
+    def _start_election(self) -> None:
+        with self._lock:
+            term = self._log.term + 1
+            self._log.save_state(term, self._config.node_id)
+            self._role = "candidate"
+            self.leader_id = None
+            self._deadline = self._new_deadline()
+            request = {
+                "op": "raft_vote",
+                "term": term,
+                "candidate": self._config.node_id,
+                "last_index": self._log.last_index,
+                "last_term": self._log.term_at(self._log.last_index),
+            }
+            votes = [self._config.node_id]
+        if len(votes) >= self._majority:
+            with self._lock:
+                self._become_leader(term)
+            return
+
+        def ask(node_id: int) -> None:
+            if self.is_blocked(node_id):
+                return
+            response = self._vote_links[node_id].request(request)
+            if response is None or response.get("status") != "ok":
+                return
+            with self._lock:
+                if response["term"] > self._log.term:
+                    self._become_follower(response["term"])
+                    return
+                if response.get("granted") and self._role == "candidate" and self._log.term == term:
+                    votes.append(node_id)
+                    if len(votes) >= self._majority:
+                        self._become_leader(term)
+
+        for node_id in self._peers:
+            threading.Thread(target=ask, args=(node_id,), daemon=True).start()
+
+    def _become_leader(self, term: int) -> None:
+        self._role = "leader"
+        self.leader_id = self._config.node_id
+        for node_id in self._peers:
+            self._next_index[node_id] = self._log.last_index + 1
+            self._match_index[node_id] = 0
+            self._last_sent[node_id] = 0.0
+            self._acked_at[node_id] = 0.0
+        # Versions are stamped at propose time, so they must outrun every version this log will still apply.
+        for entry in self._log.entries_from(self._applied + 1, self._log.last_index - self._applied):
+            if "version" in entry["payload"]:
+                self._engine.observe_version(entry["payload"]["version"])
+        # A no-op from the new term lets the leader commit, and so serve reads, right away.
+        self._log.append([{"term": term, "op": "noop", "payload": {}}])
+        self._state.set_role("primary")
+        self._changed.notify_all()
+        threading.Thread(target=self._sync_log, daemon=True).start()
+
+    # -- leader side ------------------------------------------------------------
+
+    def _sync_log(self) -> None:
+        """Group commit: one fsync covers every entry appended before it started."""
+        with self._sync_lock:
+            with self._lock:
+                target = self._log.last_index
+                if target <= self._log.synced:
+                    return
+            self._log.fsync()
+            with self._changed:
+                self._log.synced = max(self._log.synced, min(target, self._log.last_index))
+                self._advance_commit()
+
+    def _advance_commit(self) -> None:
+        if self._role != "leader":
+            return
+        matched = sorted([self._log.synced] + list(self._match_index.values()), reverse=True)
+        candidate = matched[self._majority - 1]
+        if candidate > self._commit and self._log.term_at(candidate) == self._log.term:
+            self._commit = candidate
+            self._changed.notify_all()
+
+    def _lease_start(self) -> float:
+        acked = sorted([time.monotonic()] + list(self._acked_at.values()), reverse=True)
+        return acked[self._majority - 1]
+
+    def _lease_valid(self) -> bool:
+        return (
+            self._role == "leader"
+            and time.monotonic() < self._lease_start() + self.election_timeout * LEASE_SAFETY
+        )
+
+    def next_append(self, node_id: int, inflight: int) -> Optional[Dict[str, Any]]:
+        with self._changed:
+            request = self._next_request(node_id, inflight)
+            if request is None:
+                self._changed.wait(self.heartbeat_interval / 2)
+                return None
+        if request["op"] == "raft_snapshot":
+            # Read after the applied index was taken, so the records are at least that recent; entries
+            # after it that they already reflect are skipped by version when the follower applies them.
+            request["records"] = self._engine.records()
+        return request
+
+    def _next_request(self, node_id: int, inflight: int) -> Optional[Dict[str, Any]]:
+        """What to send ``node_id`` next, or None when nothing is due; under the node lock."""
+        if self._role != "leader" or node_id in self._blocked or inflight >= MAX_INFLIGHT:
+            return None
+        next_index = self._next_index[node_id]
+        if next_index <= self._log.snapshot_index:
+            # The entries it needs were compacted away; the engine state replaces its log instead.
+            self._next_index[node_id] = self._applied + 1
+            self._last_sent[node_id] = time.monotonic()
+            return {
+                "op": "raft_snapshot",
+                "term": self._log.term,
+                "leader": self._config.node_id,
+                "last_index": self._applied,
+                "last_term": self._log.term_at(self._applied),
+            }
+        due = time.monotonic() >= self._last_sent[node_id] + self.heartbeat_interval
+        if next_index > self._log.last_index and not due:
+            return None
+        prev_index = next_index - 1
+        entries = self._log.entries_from(next_index, MAX_BATCH)
+        self._next_index[node_id] = prev_index + len(entries) + 1
+        self._last_sent[node_id] = time.monotonic()
+        return {
+            "op": "raft_append",
+            "term": self._log.term,
+            "leader": self._config.node_id,
+            "prev_index": prev_index,
+            "prev_term": self._log.term_at(prev_index),
+            "entries": entries,
+            "commit": self._commit,
+        }
+
+    def append_result(self, node_id: int, sent: Tuple[float, int, int, int], response: Dict[str, Any]) -> None:
+        sent_at, term, prev_index, count = sent
+        with self._changed:
+            if response["term"] > self._log.term:
+                self._become_follower(response["term"])
+                return
+            if self._role != "leader" or term != self._log.term:
+                return
+            if response.get("success"):
+                self._match_index[node_id] = max(self._match_index[node_id], prev_index + count)
+                self._acked_at[node_id] = max(self._acked_at[node_id], sent_at)
+                self._advance_commit()
+                self._changed.notify_all()
+                return
+            conflict = int(response.get("conflict_index", prev_index))
+            self._next_index[node_id] = max(self._match_index[node_id] + 1, min(self._next_index[node_id], conflict))
+            self._changed.notify_all()
+
+    def append_failed(self, node_id: int) -> None:
+        with self._changed:
+            if self._role == "leader":
+                self._next_index[node_id] = self._match_index[node_id] + 1
+                self._last_sent[node_id] = 0.0
+
+    def propose(self, op: str, payload: Dict[str, Any], timeout: Optional[float] = None) -> bool:
+        """Replicate one command; True once a majority stored it and it was applied locally."""
+        with self._changed:
+            if self._role != "leader":
+                return False
+            if "version" not in payload:
+                # Stamped under the node lock, after _become_leader observed the log, so it orders after them all.
+                payload = dict(payload, version=self._engine.next_version())
+            term = self._log.term
+            self._log.append([{"term": term, "op": op, "payload": payload}])
+            index = self._log.last_index
+            self._changed.notify_all()
+        self._sync_log()
+        deadline = time.monotonic() + (timeout or self._config.replication_timeout)
+        with self._changed:
+            while self._applied < index and self._log.term == term and self._role == "leader":
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    return False
+                self._changed.wait(remaining)
+            if self._applied < index:
+                return False
+            if index <= self._log.snapshot_index:
+                # Compacted away; a leader never overwrites its own entries, so in its term the entry was ours.
+                return self._log.term == term and self._role == "leader"
+            return self._log.term_at(index) == term
+
+    def read_ready(self, timeout: Optional[float] = None) -> bool:
+        """True when local state is safe to read; renews an expired lease with an immediate heartbeat round."""
+        deadline = time.monotonic() + (timeout or self._config.replication_timeout)
+        with self._changed:
+            if not self._lease_valid():
+                for node_id in self._peers:
+                    self._last_sent[node_id] = 0.0
+                self._changed.notify_all()
+            while self._role == "leader":
+                current = self._log.term_at(self._commit) == self._log.term and self._applied >= self._commit
+                if current and self._lease_valid():
+                    return True
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    return False
+                self._changed.wait(min(remaining, self.heartbeat_interval))
+            return False
+
+    # -- follower side ------------------------------------------------------------
+
+    def handle(self, request: Dict[str, Any]) -> Dict[str, Any]:
+        sender = request.get("leader", request.get("candidate"))
+        with self._lock:
+            if sender in self._blocked:
+                return {"status": "error", "error": "partitioned"}
+        if request.get("op") == "raft_vote":
+            return self._handle_vote(request)
+        if request.get("op") == "raft_append":
+            return self._handle_append(request)
+        if request.get("op") == "raft_snapshot":
+            return self._handle_snapshot(request)
+        return {"status": "error", "error": f"unknown op: {request.get('op')}"}
+
+    def _handle_vote(self, request: Dict[str, Any]) -> Dict[str, Any]:
+        with self._changed:
+            term = request["term"]
+            recent_leader = time.monotonic() - self._last_contact < self.election_timeout
+            if term < self._log.term or (recent_leader and self.leader_id not in (None, request["candidate"])):
+                # Refusing while a leader is live is what makes leader leases safe.
+                return {"status": "ok", "term": self._log.term, "granted": False}
+            if self._role == "leader" and self._lease_valid():
+                return {"status": "ok", "term": self._log.term, "granted": False}
+            if term > self._log.term:
+                self.leader_id = None
+                self._become_follower(term)
+            last_index = self._log.last_index
+            up_to_date = (request["last_term"], request["last_index"]) >= (self._log.term_at(last_index), last_index)
+            if up_to_date and self._log.voted_for in (None, request["candidate"]):
+                self._log.save_state(term, request["candidate"])
+                self._deadline = self._new_deadline()
+                return {"status": "ok", "term": term, "granted": True}
+            return {"status": "ok", "term": self._log.term, "granted": False}
+
+    def _handle_append(self, request: Dict[str, Any]) -> Dict[str, Any]:
+        # The sync lock keeps appends and truncations out while the log is fsynced without the node lock.
+        with self._sync_lock:
+            with self._changed:
+                response = self._append_entries(request)
+                if not response["success"]:
+                    return response
+                target = self._log.last_index
+                synced = self._log.synced >= target
+            if not synced:
+                self._log.fsync()
+            with self._changed:
+                self._log.synced = max(self._log.synced, min(target, self._log.last_index))
+                last_new = request["prev_index"] + len(request["entries"])
+                if request["commit"] > self._commit:
+                    self._commit = min(request["commit"], last_new)
+                    self._changed.notify_all()
+            return response
+
+    def _accept_leader(self, request: Dict[str, Any]) -> bool:
+        """Follow the sender if its term is current; False when it is stale. Under the node lock."""
+        if request["term"] < self._log.term:
+            return False
+        self._become_follower(request["term"])
+        self.leader_id = request["leader"]
+        self._last_contact = time.monotonic()
+        self._deadline = self._new_deadline()
+        return True
+
+    def _append_entries(self, request: Dict[str, Any]) -> Dict[str, Any]:
+        """Check the leader's term and log position and append its entries, under the node lock."""
+        term = request["term"]
+        if not self._accept_leader(request):
+            return {"status": "ok", "term": self._log.term, "success": False}
+
+        prev_index, prev_term, entries = request["prev_index"], request["prev_term"], request["entries"]
+        if prev_index < self._log.snapshot_index:
+            # Entries up to the snapshot point were committed and applied here already.
+            skip = self._log.snapshot_index - prev_index
+            prev_index, prev_term, entries = self._log.snapshot_index, self._log.snapshot_term, entries[skip:]
+        if prev_index > self._log.last_index:
+            return {"status": "ok", "term": term, "success": False, "conflict_index": self._log.last_index + 1}
+        if self._log.term_at(prev_index) != prev_term:
+            conflict_term = self._log.term_at(prev_index)
+            conflict = prev_index
+            while conflict > self._log.snapshot_index + 1 and self._log.term_at(conflict - 1) == conflict_term:
+                conflict -= 1
+            return {"status": "ok", "term": term, "success": False, "conflict_index": conflict}
+
+        index = prev_index
+        for position, entry in enumerate(entries):
+            index += 1
+            if index <= self._log.last_index:
+                if self._log.term_at(index) == entry["term"]:
+                    continue
+                self._log.truncate(index)
+            self._log.append(entries[position:])
+            break
+        return {"status": "ok", "term": term, "success": True}
+
+    def _handle_snapshot(self, request: Dict[str, Any]) -> Dict[str, Any]:
+        """Replace the engine state and the log with the leader's records as of ``last_index``."""
+        index, last_term = request["last_index"], request["last_term"]
+        with self._sync_lock:
+            with self._changed:
+                if not self._accept_leader(request):
+                    return {"status": "ok", "term": self._log.term, "success": False}
+                term = self._log.term
+                if index <= self._applied or (index <= self._log.last_index and self._log.term_at(index) == last_term):
+                    # The log already holds the entries the records stand for.
+                    return {"status": "ok", "term": term, "success": True}
+            # The node lock is released first: the apply loop takes it while holding the apply lock.
+            with self._apply_lock:
+                self._engine.install_records(request["records"])
+                with self._changed:
+                    self._log.reset(index, last_term)
+                    self._commit = max(self._commit, index)
+                    self._applied = index
+                    self._log.save_applied(index)
+                    self._changed.notify_all()
+            return {"status": "ok", "term": term, "success": True}
+
+    # -- state machine ---------------------------------------------------------------
+
+    def _apply_loop(self) -> None:
+        while not self._stop.is_set():
+            with self._apply_lock:
+                with self._changed:
+                    if self._applied >= self._commit:
+                        self._changed.wait(self.heartbeat_interval)
+                        continue
+                    start, end = self._applied, self._commit
+                    batch = self._log.entries_from(start + 1, end - start)
+                events = [(entry["op"], entry["payload"]) for entry in batch if entry["op"] != "noop"]
+                if events:
+                    # apply_batch fsyncs its WAL entry before returning, so applied entries are durable in the engine.
+                    self._engine.apply_batch(events)
+                with self._changed:
+                    self._applied = end
+                    self._log.save_applied(end)
+                    self._log.compact(end)
+                    self._changed.notify_all()
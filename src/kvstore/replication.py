@@ -1,19 +1,27 @@
 from __future__ import annotations
 
 import queue
-import socket
 import threading
-from dataclasses import dataclass
-from typing import Any, Dict, Iterable, List, Optional
+import time
+from dataclasses import dataclass, field
+from typing import Any, Dict, Iterable, List, Optional, Set, Tuple
 
+from .client import KVClient
 from .config import ClusterConfig, NodeConfig
-from .protocol import decode_message, encode_message
+from .failure import HeartbeatMonitor
+from .hints import HintStore
+from .memory import value_size
+from .metrics import Histogram, Metrics
+from .partitioning import HashRing
+from .protocol import ProtocolError
+from .tracing import current
 
 
 @dataclass
 class ReplicationEvent:
     op: str
     payload: Dict[str, Any]
+    created: float = field(default_factory=time.monotonic)
 
 
 class ServerState:
@@ -31,11 +39,31 @@ class ServerState:
 
 
 class Replicator:
-    def __init__(self, config: ClusterConfig) -> None:
+    """Sends local writes to peers in the background: every peer, or with a ``ring`` the other owners of each key."""
+
+    def __init__(
+        self,
+        config: ClusterConfig,
+        hints: Optional[HintStore] = None,
+        metrics: Optional[Metrics] = None,
+        ring: Optional[HashRing] = None,
+    ) -> None:
         self._config = config
+        self._hints = hints
+        self._ring = ring
         self._queue: queue.Queue[ReplicationEvent] = queue.Queue()
+        self._metrics = metrics or Metrics()
+        self._metrics.gauge("kv_replication_queue_depth", self._queue.qsize)
+        self._metrics.gauge("kv_memory_bytes", self.queued_bytes, structure="replication_queue")
+        self._send_seconds: Dict[int, Histogram] = {}
+        self._lag_seconds: Dict[int, Histogram] = {}
+        for peer in config.peers or []:
+            self._send_seconds[peer.node_id] = self._metrics.histogram("kv_replication_send_seconds", peer=str(peer.node_id))
+            self._lag_seconds[peer.node_id] = self._metrics.histogram("kv_replication_lag_seconds", peer=str(peer.node_id))
         self._stop = threading.Event()
         self._thread = threading.Thread(target=self._run, daemon=True)
+        self._replaying: Set[int] = set()
+        self._replay_lock = threading.Lock()
 
     def start(self) -> None:
         if self._config.peers:
@@ -46,7 +74,19 @@ class Replicator:
 
     def enqueue(self, event: ReplicationEvent) -> None:
         if self._config.peers:
+            trace = current()
+            if trace is None:
+                self._queue.put(event)
+                return
+            start = time.perf_counter()
             self._queue.put(event)
+            trace.add("replicate", time.perf_counter() - start)
+
+    def queued_bytes(self) -> int:
+        """Approximate size of the events waiting to be sent, summed on demand."""
+        with self._queue.mutex:
+            events = list(self._queue.queue)
+        return sum(value_size(event.payload) for event in events)
 
     def _run(self) -> None:
         while not self._stop.is_set():
@@ -54,22 +94,84 @@ class Replicator:
                 event = self._queue.get(timeout=0.2)
             except queue.Empty:
                 continue
-            for peer in self._config.peers or []:
-                self._replicate_to_peer(peer, event)
-
-    def _replicate_to_peer(self, peer: NodeConfig, event: ReplicationEvent) -> None:
+            for peer, routed in self._routes(event):
+                if self._hints is not None and self._hints.pending(peer.node_id):
+                    # Peer is known to be behind: keep queuing hints until the backlog has been replayed.
+                    self._hints.add(peer, routed.op, routed.payload)
+                elif self._replicate_to_peer(peer, routed):
+                    if peer.node_id in self._lag_seconds:
+                        self._lag_seconds[peer.node_id].record(time.monotonic() - routed.created)
+                else:
+                    self._metrics.counter("kv_replication_failures_total", peer=str(peer.node_id)).incr()
+                    if self._hints is not None:
+                        self._hints.add(peer, routed.op, routed.payload)
+
+    def _routes(self, event: ReplicationEvent) -> List[Tuple[NodeConfig, ReplicationEvent]]:
+        peers = self._config.peers or []
+        if self._ring is None:
+            return [(peer, event) for peer in peers]
+        nodes = {peer.node_id: peer for peer in peers}
+        if event.op != "bulk_set":
+            return [(nodes[node.node_id], event) for node in self._ring.owners(event.payload["key"]) if node.node_id in nodes]
+        # Each owner gets only the items it owns, as _dynamo_bulk_set splits client writes.
+        items: Dict[int, List[Any]] = {}
+        for item in event.payload["items"]:
+            for node in self._ring.owners(item[0]):
+                if node.node_id in nodes:
+                    items.setdefault(node.node_id, []).append(item)
+        return [
+            (nodes[node_id], ReplicationEvent(event.op, dict(event.payload, items=owned), event.created))
+            for node_id, owned in items.items()
+        ]
+
+    def _send(self, peer: NodeConfig, payload: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+        threshold = self._config.peer_compress_threshold()
+        client = KVClient(peer.host, peer.port, timeout=self._config.replication_timeout, compress_threshold=threshold)
+        start = time.perf_counter()
         try:
-            with socket.create_connection((peer.host, peer.port), timeout=self._config.replication_timeout) as sock:
-                sock.sendall(encode_message({"op": "replicate", "event": {"op": event.op, "payload": event.payload}}))
-                _ = sock.recv(4096)
-        except OSError:
+            response = client.request(payload)
+        except (OSError, ProtocolError):
+            return None
+        if peer.node_id in self._send_seconds:
+            self._send_seconds[peer.node_id].record(time.perf_counter() - start)
+        return response
+
+    def _replicate_to_peer(self, peer: NodeConfig, event: ReplicationEvent) -> bool:
+        response = self._send(peer, {"op": "replicate", "event": {"op": event.op, "payload": event.payload}})
+        return response is not None and response.get("status") == "ok"
+
+    def _deliver_batch(self, peer: NodeConfig, events: List[Dict[str, Any]]) -> bool:
+        response = self._send(peer, {"op": "replicate_batch", "events": events})
+        return response is not None and response.get("status") == "ok"
+
+    def replay_hints(self, peer: NodeConfig) -> None:
+        if self._hints is None or not self._hints.pending(peer.node_id):
             return
+        with self._replay_lock:
+            if peer.node_id in self._replaying:
+                return
+            self._replaying.add(peer.node_id)
+        threading.Thread(target=self._replay, args=(peer,), daemon=True).start()
+
+    def _replay(self, peer: NodeConfig) -> None:
+        assert self._hints is not None
+        try:
+            self._hints.replay(
+                peer,
+                lambda events: self._deliver_batch(peer, events),
+                rate=self._config.hint_replay_rate,
+                stop=self._stop,
+            )
+        finally:
+            with self._replay_lock:
+                self._replaying.discard(peer.node_id)
 
 
 class LeaderElector:
-    def __init__(self, config: ClusterConfig, state: ServerState) -> None:
+    def __init__(self, config: ClusterConfig, state: ServerState, monitor: HeartbeatMonitor) -> None:
         self._config = config
         self._state = state
+        self._monitor = monitor
         self._stop = threading.Event()
         self._thread = threading.Thread(target=self._run, daemon=True)
 
@@ -86,47 +188,16 @@ class LeaderElector:
             self._stop.wait(self._config.election_interval)
 
     def _check_primary(self) -> None:
-        if self._state.get_role() == "primary":
+        if self._state.get_role() == "primary" or not self._monitor.ready():
             return
-        primary = self._find_primary()
-        if primary is None:
-            self._elect_new_primary()
-
-    def _find_primary(self) -> Optional[NodeConfig]:
-        for node in self._config.peers or []:
-            if self._query_role(node) == "primary":
-                return node
-        return None
-
-    def _query_role(self, node: NodeConfig) -> Optional[str]:
-        try:
-            with socket.create_connection((node.host, node.port), timeout=self._config.replication_timeout) as sock:
-                sock.sendall(encode_message({"op": "who_is_primary"}))
-                response = decode_message(sock.recv(4096))
-                return response.get("role")
-        except OSError:
-            return None
-
-    def _elect_new_primary(self) -> None:
-        candidates = [self._config.node_id]
-        for node in self._config.peers or []:
-            if self._query_role(node) is not None:
-                candidates.append(node.node_id)
-        if not candidates:
+        alive = self._monitor.alive()
+        if any(self._monitor.role_of(node.node_id) == "primary" for node in alive):
             return
-        winner = min(candidates)
+        self._elect_new_primary(alive)
+
+    def _elect_new_primary(self, alive: List[NodeConfig]) -> None:
+        winner = min([self._config.node_id] + [node.node_id for node in alive])
         if winner == self._config.node_id:
             self._state.set_role("primary")
             return
-        for node in self._config.peers or []:
-            if node.node_id == winner:
-                self._promote(node)
-                return
-
-    def _promote(self, node: NodeConfig) -> None:
-        try:
-            with socket.create_connection((node.host, node.port), timeout=self._config.replication_timeout) as sock:
-                sock.sendall(encode_message({"op": "promote"}))
-                _ = sock.recv(4096)
-        except OSError:
-            return
+        self._monitor.request(winner, {"op": "promote"})
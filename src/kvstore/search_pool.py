@@ -0,0 +1,205 @@
+from __future__ import annotations
+
+import heapq
+import math
+import multiprocessing
+import multiprocessing.util
+import operator
+import threading
+from array import array
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import shared_memory
+from typing import Any, Dict, List, Optional, Tuple
+
+# Row layout in the shared matrix, as float64 slots:
+# [seqlock counter, vector length, vector norm, v0, v1, ...]
+_HEADER = 3
+_DOUBLE = 8
+
+_attached: Dict[str, Tuple[shared_memory.SharedMemory, memoryview]] = {}
+_finalizer: Optional[multiprocessing.util.Finalize] = None
+
+
+def _detach_all() -> None:
+    for name, (segment, view) in list(_attached.items()):
+        view.release()
+        segment.close()
+        del _attached[name]
+
+
+def _attach(name: str) -> memoryview:
+    """Map a matrix segment in a worker process, dropping the mapping of any older segment."""
+    global _finalizer
+    if name not in _attached:
+        if _finalizer is None:
+            # Runs at worker exit, before the segment's own finalizer would find the view still exported.
+            _finalizer = multiprocessing.util.Finalize(None, _detach_all, exitpriority=10)
+        _detach_all()
+        # Workers share the parent's resource tracker, so the parent's unlink settles the registration.
+        segment = shared_memory.SharedMemory(name=name)
+        _attached[name] = (segment, segment.buf.cast("d"))
+    return _attached[name][1]
+
+
+def _scan(
+    matrix: memoryview, stride: int, start: int, stop: int, query: List[float], top_k: int
+) -> List[Tuple[float, int, float]]:
+    """Top-k ``(score, row, seq)`` by cosine similarity over rows ``[start, stop)``.
+
+    Rows are read without locks; a row whose seqlock counter is odd or changed
+    while it was read is re-read, so a reader never scores a half-written vector.
+    """
+    dim = len(query)
+    query_norm = math.sqrt(sum(x * x for x in query))
+    if dim == 0 or query_norm == 0:
+        return []
+    best: List[Tuple[float, int, float]] = []
+    for row in range(start, stop):
+        base = row * stride
+        for _ in range(8):
+            seq = matrix[base]
+            if int(seq) % 2:
+                continue
+            if int(matrix[base + 1]) != dim:
+                break
+            norm = matrix[base + 2]
+            values = matrix[base + _HEADER : base + _HEADER + dim].tolist()
+            if matrix[base] != seq:
+                continue
+            if norm == 0:
+                break
+            score = sum(map(operator.mul, query, values)) / (query_norm * norm)
+            if len(best) < top_k:
+                heapq.heappush(best, (score, -row, seq))
+            elif score > best[0][0]:
+                heapq.heapreplace(best, (score, -row, seq))
+            break
+    return [(score, -neg_row, seq) for score, neg_row, seq in best]
+
+
+def _scan_segment(
+    name: str, stride: int, start: int, stop: int, query: List[float], top_k: int
+) -> List[Tuple[float, int, float]]:
+    return _scan(_attach(name), stride, start, stop, query, top_k)
+
+
+class VectorSearchPool:
+    """Vector index kept in a shared-memory matrix and searched by a pool of worker processes.
+
+    The engine pushes every vector upsert and removal here as it indexes values,
+    so the matrix always mirrors the vector index. Queries split the rows across
+    the workers and merge their top-k, without holding the engine lock.
+    Matrices smaller than ``inline_rows`` are scanned on the calling thread.
+    """
+
+    def __init__(self, workers: int, inline_rows: int = 2048, initial_rows: int = 1024, initial_dim: int = 16) -> None:
+        self.workers = workers
+        self.inline_rows = inline_rows
+        self._lock = threading.Lock()
+        self._stride = _HEADER + initial_dim
+        self._capacity = initial_rows
+        self._segment = shared_memory.SharedMemory(create=True, size=self._capacity * self._stride * _DOUBLE)
+        self._matrix = self._segment.buf.cast("d")
+        self._rows: Dict[str, int] = {}
+        self._keys: List[Optional[str]] = []
+        self._free: List[int] = []
+        self._executor: Optional[ProcessPoolExecutor] = None
+
+    def _pool(self) -> ProcessPoolExecutor:
+        if self._executor is None:
+            # spawn, not fork: the server process is multi-threaded.
+            self._executor = ProcessPoolExecutor(self.workers, mp_context=multiprocessing.get_context("spawn"))
+        return self._executor
+
+    def close(self) -> None:
+        if self._executor is not None:
+            self._executor.shutdown(wait=True, cancel_futures=True)
+        with self._lock:
+            self._matrix.release()
+            self._segment.close()
+            self._segment.unlink()
+
+    def __len__(self) -> int:
+        with self._lock:
+            return len(self._rows)
+
+    def _resize(self, capacity: int, stride: int) -> None:
+        segment = shared_memory.SharedMemory(create=True, size=capacity * stride * _DOUBLE)
+        matrix = segment.buf.cast("d")
+        used = min(len(self._keys), self._capacity)
+        if stride == self._stride:
+            matrix[: used * stride] = self._matrix[: used * stride]
+        else:
+            for row in range(used):
+                matrix[row * stride : row * stride + self._stride] = self._matrix[row * self._stride : (row + 1) * self._stride]
+        old_segment, old_matrix = self._segment, self._matrix
+        self._segment, self._matrix = segment, matrix
+        self._capacity, self._stride = capacity, stride
+        old_matrix.release()
+        old_segment.close()
+        old_segment.unlink()
+
+    def upsert(self, key: str, vector: List[float]) -> None:
+        with self._lock:
+            if _HEADER + len(vector) > self._stride:
+                self._resize(self._capacity, _HEADER + max(len(vector), 2 * (self._stride - _HEADER)))
+            row = self._rows.get(key)
+            if row is None:
+                if self._free:
+                    row = self._free.pop()
+                else:
+                    row = len(self._keys)
+                    self._keys.append(None)
+                    if row >= self._capacity:
+                        self._resize(2 * self._capacity, self._stride)
+                self._rows[key] = row
+                self._keys[row] = key
+            base = row * self._stride
+            self._matrix[base] += 1
+            self._matrix[base + 1] = len(vector)
+            self._matrix[base + 2] = math.sqrt(sum(x * x for x in vector))
+            self._matrix[base + _HEADER : base + _HEADER + len(vector)] = array("d", vector)
+            self._matrix[base] += 1
+
+    def remove(self, key: str) -> None:
+        with self._lock:
+            row = self._rows.pop(key, None)
+            if row is None:
+                return
+            base = row * self._stride
+            self._matrix[base] += 1
+            self._matrix[base + 1] = 0
+            self._matrix[base] += 1
+            self._keys[row] = None
+            self._free.append(row)
+
+    def search(self, vector: List[float], top_k: int = 5) -> List[Dict[str, Any]]:
+        query = [float(x) for x in vector]
+        while True:
+            with self._lock:
+                name, stride, rows = self._segment.name, self._stride, len(self._keys)
+                if rows < self.inline_rows:
+                    return self._resolve(_scan(self._matrix, stride, 0, rows, query, top_k), stride)
+            step = -(-rows // self.workers)
+            futures = [
+                self._pool().submit(_scan_segment, name, stride, start, min(rows, start + step), query, top_k)
+                for start in range(0, rows, step)
+            ]
+            try:
+                hits = heapq.nlargest(top_k, (hit for future in futures for hit in future.result()))
+            except FileNotFoundError:
+                continue  # the matrix was resized and its old segment unlinked mid-query
+            with self._lock:
+                if stride == self._stride:
+                    return self._resolve(hits, stride)
+
+    def _resolve(self, hits: List[Tuple[float, int, float]], stride: int) -> List[Dict[str, Any]]:
+        results = []
+        for score, row, seq in sorted(hits, key=lambda hit: (-hit[0], hit[1])):
+            # Drop rows rewritten after they were scored.
+            if row >= len(self._keys) or self._matrix[row * stride] != seq:
+                continue
+            key = self._keys[row]
+            if key is not None:
+                results.append({"key": key, "score": score})
+        return results
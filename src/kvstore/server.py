@@ -1,87 +1,619 @@
 from __future__ import annotations
 
 import json
+import math
+import queue
+import socket
 import socketserver
-from typing import Any, Dict, Optional
+import threading
+import time
+from typing import Any, Callable, Dict, List, Optional, Set, Tuple
 
-from .config import ClusterConfig
+from .antientropy import AntiEntropy
+from .client import KVClient
+from .config import ClusterConfig, NodeConfig
 from .engine import KVEngine
-from .protocol import ProtocolError, decode_message, encode_message
+from .expiry import Expirer
+from .failure import HeartbeatMonitor
+from .hints import HintStore
+from .metrics import Metrics, serve_prometheus
+from .partitioning import HashRing
+from .profiler import ProfilerBusy, sample_stacks
+from .protocol import (
+    FLAG_ZLIB,
+    MAGIC,
+    ProtocolError,
+    RecvBuffer,
+    accept_handshake,
+    decode_frame_body,
+    decode_message,
+    encode_frame,
+    encode_message,
+    send_chunks,
+)
+from .quorum import QuorumCoordinator
+from .raft import RaftNode
 from .replication import LeaderElector, ReplicationEvent, Replicator, ServerState
+from .tracing import Trace, Tracer, deactivate
 
 
-class KVRequestHandler(socketserver.StreamRequestHandler):
+# Receive buffers outlive their connections, so a server answering one request
+# per connection does not allocate a fresh buffer each time.
+_recv_buffers: "queue.LifoQueue[RecvBuffer]" = queue.LifoQueue()
+_MAX_POOLED_BUFFER = 1024 * 1024
+
+
+class KVRequestHandler(socketserver.BaseRequestHandler):
     server: "KVServer"
 
+    def setup(self) -> None:
+        self.connection: socket.socket = self.request
+        self.server.track_connection(self.connection, True)
+        try:
+            self.buffer = _recv_buffers.get_nowait()
+        except queue.Empty:
+            self.buffer = RecvBuffer()
+        self.buffer.attach(self.connection)
+        self._accepted = self.server.accepted_at(self.connection)
+        self._traces: List[Trace] = []
+
+    def finish(self) -> None:
+        self.server.track_connection(self.connection, False)
+        if self.buffer.capacity <= _MAX_POOLED_BUFFER:
+            _recv_buffers.put(self.buffer.attach(None))
+
     def handle(self) -> None:
-        raw = self.rfile.readline()
-        if not raw:
+        try:
+            first = self.buffer.peek()
+            if first == MAGIC[:1]:
+                self._handle_binary()
+            elif first:
+                self._handle_lines()
+        except OSError:
             return
+
+    def _handle_lines(self) -> None:
+        # Clients may keep the connection open and send one request per line. Requests
+        # that arrive together are parsed in place and answered with a single send.
+        pending: List[bytes] = []
+        while True:
+            line = self.buffer.read_line(block=not pending)
+            if line is None:
+                if not pending:
+                    return
+                self._send(pending)
+                pending = []
+                continue
+            trace = self._begin_trace()
+            try:
+                request = decode_message(line)
+            except ProtocolError as exc:
+                pending.append(encode_message({"status": "error", "error": str(exc)}))
+                self._send(pending)
+                return
+            if trace is None:
+                pending.append(encode_message(self.server.handle_request(request)))
+            else:
+                pending.append(self._traced(trace, request, encode_message))
+
+    def _handle_binary(self) -> None:
+        preface = self.buffer.read_exact(len(MAGIC) + 2)
         try:
-            request = decode_message(raw)
-        except ProtocolError as exc:
-            self.wfile.write(encode_message({"status": "error", "error": str(exc)}))
+            reply, flags = accept_handshake(bytes(preface or b""))
+        except ProtocolError:
             return
-        response = self.server.handle_request(request)
-        self.wfile.write(encode_message(response))
+        compress_above = self.server.config.compression_threshold if flags & FLAG_ZLIB else None
+        pending: List[bytes] = [reply]
+        while True:
+            trace = None
+            try:
+                body = self.buffer.read_frame_body(block=not pending)
+                if body is not None:
+                    trace = self._begin_trace()
+                    request = decode_frame_body(*body)
+            except ProtocolError as exc:
+                pending.append(encode_frame({"status": "error", "error": str(exc)}))
+                self._send(pending)
+                return
+            if body is None:
+                if not pending:
+                    return
+                self._send(pending)
+                pending = []
+                continue
+            if trace is None:
+                pending.append(self._encode_frame(self.server.handle_request(request), compress_above))
+            else:
+                pending.append(self._traced(trace, request, lambda response: self._encode_frame(response, compress_above)))
+
+    @staticmethod
+    def _encode_frame(response: Dict[str, Any], compress_above: Optional[int]) -> bytes:
+        """Encode a response; one MessagePack cannot carry (an int of 2^64 or more, too deep) becomes an error frame."""
+        try:
+            return encode_frame(response, compress_above)
+        except ProtocolError as exc:
+            return encode_frame({"status": "error", "error": str(exc)})
+
+    def _begin_trace(self) -> Optional[Trace]:
+        trace = self.server.tracer.begin()
+        if trace is not None and self._accepted is not None:
+            trace.add("accept", trace.started - self._accepted)
+        self._accepted = None
+        return trace
+
+    def _traced(self, trace: Trace, request: Dict[str, Any], encode: Callable[[Dict[str, Any]], bytes]) -> bytes:
+        trace.mark("decode")
+        trace.op = request.get("op")
+        try:
+            response = self.server.handle_request(request)
+        finally:
+            deactivate()
+        trace.mark("engine")
+        encoded = encode(response)
+        trace.mark("encode")
+        self._traces.append(trace)
+        return encoded
+
+    def _send(self, pending: List[bytes]) -> None:
+        start = time.perf_counter()
+        send_chunks(self.connection, pending)
+        if self._traces:
+            # Replies that go out together share one send, so each gets its full duration.
+            elapsed = time.perf_counter() - start
+            for trace in self._traces:
+                trace.add("write", elapsed)
+                self.server.tracer.finish(trace)
+            self._traces = []
 
 
 class KVServer(socketserver.ThreadingTCPServer):
     allow_reuse_address = True
+    daemon_threads = True
+
+    _KEY_OPS = {"get", "set", "delete", "add_vector", "expire", "persist", "ttl"}
+    _SEARCH_OPS = {"search_value", "search_text", "vector_search", "scan"}
+    # Ops with their own latency series; anything else a client sends is counted as "unknown".
+    _METRIC_OPS = _KEY_OPS | _SEARCH_OPS | {
+        "heartbeat", "who_is_primary", "raft_append", "raft_vote", "raft_snapshot", "raft_status", "promote", "replicate",
+        "replicate_batch", "merkle_hashes", "merkle_bucket", "merkle_fetch", "hint_stats", "detector_stats",
+        "stats", "trace", "profile", "memory", "mget", "bulk_set",
+    }
 
     def __init__(self, config: ClusterConfig) -> None:
+        if config.maxmemory and (config.mode == "dynamo" or config.consensus == "raft"):
+            # Quorum writes and Raft applies carry versions, and versioned writes never evict or reject.
+            raise ValueError("maxmemory only applies in leader mode without raft consensus")
         self.config = config
         self.state = ServerState(config.role)
-        self.engine = KVEngine(config.data_dir, drop_rate=config.drop_rate)
-        self.replicator = Replicator(config)
-        self.elector = LeaderElector(config, self.state)
+        self.metrics = Metrics(enabled=config.metrics)
+        self._op_seconds = {op: self.metrics.histogram("kv_request_seconds", op=op) for op in self._METRIC_OPS | {"unknown"}}
+        self._metrics_http = None
+        self.tracer = Tracer(capacity=config.trace_capacity, slow_ms=config.slow_log_ms)
+        # Accept times of connections not yet picked up by a handler thread, kept only while tracing.
+        self._accept_times: Dict[socket.socket, float] = {}
+        self.engine = KVEngine(
+            config.data_dir,
+            drop_rate=config.drop_rate,
+            node_id=config.node_id,
+            search_workers=config.search_workers,
+            lazy_values=config.lazy_values,
+            value_cache=config.value_cache,
+            compact_values=config.compact_values,
+            background_index_rebuild=config.background_index_rebuild,
+            index_checkpoint_interval=config.index_checkpoint_interval,
+            tombstone_grace=config.tombstone_grace,
+            metrics=self.metrics,
+            maxmemory=config.maxmemory,
+            maxmemory_policy=config.maxmemory_policy,
+            maxmemory_samples=config.maxmemory_samples,
+        )
+        self.hints = HintStore(config.data_dir, max_hints=config.max_hints_per_peer)
+        for peer in config.peers or []:
+            self.metrics.gauge("kv_hints_pending", lambda node_id=peer.node_id: self.hints.pending(node_id), peer=str(peer.node_id))
+        self.ring: Optional[HashRing] = None
+        if config.mode == "dynamo":
+            self.ring = HashRing(
+                config.all_nodes(),
+                virtual_nodes=config.virtual_nodes,
+                replication_factor=config.replication_factor,
+            )
+        self.replicator = Replicator(config, hints=self.hints, metrics=self.metrics, ring=self.ring)
+        self.engine.on_evict(
+            lambda key, version: self.replicator.enqueue(
+                ReplicationEvent(op="delete", payload={"key": key, "version": version})
+            )
+        )
+        self.monitor = HeartbeatMonitor(config, self.state.get_role)
+        self.elector = LeaderElector(config, self.state, self.monitor)
+        self.quorum = QuorumCoordinator(config, hints=self.hints)
+        self.hints.on_hint(self.monitor.mark_down)
+        self._connections: Set[socket.socket] = set()
+        self._connections_lock = threading.Lock()
+        self.raft: Optional[RaftNode] = None
+        if config.mode == "leader" and config.consensus == "raft":
+            self.raft = RaftNode(config, self.engine, self.state)
+        # Under Raft the log is the only way data reaches a node, so neither Merkle
+        # repair nor hint replay may write around it.
+        self.anti_entropy: Optional[AntiEntropy] = None
+        if self.raft is None:
+            self.anti_entropy = AntiEntropy(config, self.engine, self.ring)
+            self.monitor.on_peer_up(self.replicator.replay_hints)
+        self.expirer = Expirer(
+            self.engine,
+            self._expire_keys,
+            active=self._expires_locally,
+            interval=config.expiry_interval,
+            batch=config.expiry_batch,
+            metrics=self.metrics,
+        )
+        if config.trace:
+            self.configure_tracing(enabled=True)
         super().__init__((config.host, config.port), KVRequestHandler)
 
     def start(self) -> None:
-        self.replicator.start()
-        self.elector.start()
+        if self.raft is not None:
+            self.raft.start()
+        else:
+            self.replicator.start()
+            self.elector.start()
+        self.monitor.start()
+        if self.anti_entropy is not None:
+            self.anti_entropy.start()
+        self.expirer.start()
+        if self.config.metrics_port:
+            self._metrics_http = serve_prometheus(self.metrics, self.config.host, self.config.metrics_port)
         self.serve_forever()
 
     def shutdown(self) -> None:
         self.replicator.stop()
+        self.monitor.stop()
         self.elector.stop()
+        if self.raft is not None:
+            self.raft.stop()
+        if self.anti_entropy is not None:
+            self.anti_entropy.stop()
+        self.expirer.stop()
+        self.quorum.stop()
+        if self._metrics_http is not None:
+            self._metrics_http.shutdown()
+            self._metrics_http.server_close()
         super().shutdown()
         self.server_close()
+        self.engine.close()
+        with self._connections_lock:
+            connections = list(self._connections)
+        for connection in connections:
+            try:
+                connection.shutdown(socket.SHUT_RDWR)
+            except OSError:
+                pass
+
+    def process_request(self, request: Any, client_address: Any) -> None:
+        if self.tracer.enabled:
+            self._accept_times[request] = time.perf_counter()
+        super().process_request(request, client_address)
+
+    def accepted_at(self, connection: socket.socket) -> Optional[float]:
+        return self._accept_times.pop(connection, None)
+
+    def configure_tracing(self, enabled: Optional[bool] = None, slow_ms: Optional[float] = None) -> None:
+        """Switch request tracing and the slow-op threshold at runtime."""
+        self.tracer.configure(enabled=enabled, slow_ms=slow_ms)
+        self.engine.trace_lock_waits(self.tracer.enabled)
+
+    def track_connection(self, connection: socket.socket, active: bool) -> None:
+        with self._connections_lock:
+            if active:
+                self._connections.add(connection)
+            else:
+                self._connections.discard(connection)
+
+    def _expires_locally(self) -> bool:
+        # Dynamo owners each expire their copy; otherwise the leader expires and replicates the deletes.
+        if self.raft is not None:
+            return self.raft.is_leader()
+        return self.ring is not None or self.state.get_role() == "primary"
+
+    def _expire_keys(self, due: List[Tuple[str, int]]) -> bool:
+        events = [ReplicationEvent(op="delete", payload={"key": key, "version": version}) for key, version in due]
+        if self.raft is not None:
+            return all(self.raft.propose(event.op, event.payload) for event in events)
+        self.engine.apply_batch([(event.op, event.payload) for event in events])
+        if self.ring is None:
+            for event in events:
+                self.replicator.enqueue(event)
+        return True
 
     def handle_request(self, request: Dict[str, Any]) -> Dict[str, Any]:
         op = request.get("op")
+        start = time.perf_counter()
+        response = self._dispatch(op, request)
+        histogram = self._op_seconds.get(op) or self._op_seconds["unknown"]
+        histogram.record(time.perf_counter() - start)
+        if response.get("status") != "ok":
+            self.metrics.counter("kv_request_errors_total", op=op if op in self._METRIC_OPS else "unknown").incr()
+        return response
+
+    def _dispatch(self, op: Optional[str], request: Dict[str, Any]) -> Dict[str, Any]:
+        if op == "heartbeat":
+            return {"status": "ok", "node_id": self.config.node_id, "role": self.state.get_role()}
+        if self.config.response_delay > 0:
+            time.sleep(self.config.response_delay)
         if op == "who_is_primary":
             return {"status": "ok", "role": self.state.get_role()}
+        if op in ("raft_append", "raft_vote", "raft_snapshot") and self.raft is not None:
+            return self.raft.handle(request)
+        if op == "raft_status" and self.raft is not None:
+            return {"status": "ok", "result": self.raft.status()}
         if op == "promote":
+            if self.raft is not None:
+                return {"status": "error", "error": "roles are managed by raft"}
             self.state.set_role("primary")
             return {"status": "ok"}
+        if op in ("replicate", "replicate_batch") and self.raft is not None:
+            return {"status": "error", "error": "writes are replicated by raft"}
         if op == "replicate":
             event = request.get("event", {})
             self.engine.apply_replication(event.get("op"), event.get("payload", {}))
             return {"status": "ok"}
+        if op == "replicate_batch":
+            events = [(event["op"], event["payload"]) for event in request.get("events", [])]
+            return {"status": "ok", "applied": self.engine.apply_batch(events)}
+        if op in ("merkle_hashes", "merkle_bucket", "merkle_fetch"):
+            if self.anti_entropy is None:
+                return {"status": "error", "error": "anti_entropy_disabled"}
+            return self.anti_entropy.handle(request)
+        if op == "hint_stats":
+            return {"status": "ok", "result": self.hints.stats()}
+        if op == "detector_stats":
+            return {"status": "ok", "result": self.monitor.stats()}
+        if op == "stats":
+            return {"status": "ok", "result": self.metrics.snapshot()}
+        if op == "memory":
+            result = self.engine.memory_stats()
+            # Reported, but not counted against maxmemory.
+            result["structures"]["replication_queue"] = self.replicator.queued_bytes()
+            return {"status": "ok", "result": result}
+        if op == "trace":
+            # Checked before anything is switched, so a bad request changes nothing.
+            try:
+                limit = int(request.get("limit", 100))
+                slow_ms = None if request.get("slow_ms") is None else float(request["slow_ms"])
+            except (TypeError, ValueError):
+                return {"status": "error", "error": "limit and slow_ms must be numbers"}
+            if slow_ms is not None and math.isnan(slow_ms):
+                return {"status": "error", "error": "limit and slow_ms must be numbers"}
+            self.configure_tracing(enabled=request.get("enabled"), slow_ms=slow_ms)
+            result = self.tracer.dump(limit)
+            if request.get("clear"):
+                self.tracer.clear()
+            return {"status": "ok", "result": result}
+        if op == "profile":
+            try:
+                seconds = float(request.get("seconds", 5.0))
+                interval_ms = float(request.get("interval_ms", 5.0))
+            except (TypeError, ValueError):
+                seconds = interval_ms = math.nan
+            if math.isnan(seconds) or math.isnan(interval_ms):
+                return {"status": "error", "error": "seconds and interval_ms must be numbers"}
+            try:
+                profile = sample_stacks(seconds, interval=interval_ms / 1000, idle=bool(request.get("idle")))
+            except ProfilerBusy as exc:
+                return {"status": "error", "error": str(exc)}
+            return {"status": "ok", "result": profile}
         if self.config.mode == "leader" and self.state.get_role() != "primary":
             return {"status": "error", "error": "not_primary"}
+        if "ttl" in request:
+            try:
+                ttl = float(request["ttl"])
+            except (TypeError, ValueError):
+                ttl = math.nan
+            if not math.isfinite(ttl) or ttl < 0:
+                return {"status": "error", "error": f"invalid ttl: {request['ttl']!r}"}
+            # Relative TTLs become absolute once, so forwarded and replicated copies agree.
+            request = dict(request)
+            del request["ttl"]
+            request["expire_at"] = time.time() + ttl
         try:
+            if self.raft is not None:
+                return self._handle_raft(op, request)
+            if self.ring is not None:
+                return self._handle_dynamo(op, request)
             return self._handle_primary(op, request)
         except Exception as exc:  # noqa: BLE001
             return {"status": "error", "error": str(exc)}
 
+    def _handle_dynamo(self, op: Optional[str], request: Dict[str, Any]) -> Dict[str, Any]:
+        assert self.ring is not None
+        if request.get("local"):
+            return self._handle_primary(op, request)
+        if op in self._KEY_OPS:
+            owners = self.ring.owners(request["key"])
+            if not self.ring.is_owner(request["key"], self.config.node_id) and not request.get("forwarded"):
+                return self._forward(owners, request)
+            if op == "get":
+                return self._quorum_get(owners, request)
+            if op == "ttl":
+                return self._handle_primary(op, request)
+            event = self._event_for(op, request)
+            event.payload["version"] = self.engine.next_version()
+            response = self._quorum_write(owners, event, request)
+            if op in ("expire", "persist") and response["status"] == "ok":
+                response["result"] = self.engine.ttl(request["key"]) != -2
+            return response
+        if op == "mget":
+            results = {}
+            for key in request.get("keys", []):
+                response = self._handle_dynamo("get", {"op": "get", "key": key, "r": request.get("r")})
+                results[key] = response.get("result")
+            return {"status": "ok", "result": results}
+        if op == "bulk_set":
+            return self._dynamo_bulk_set(request)
+        if op in self._SEARCH_OPS:
+            return self._scatter_search(op, request)
+        return self._handle_primary(op, request)
+
+    def _handle_raft(self, op: Optional[str], request: Dict[str, Any]) -> Dict[str, Any]:
+        assert self.raft is not None
+        if op in ("set", "delete", "add_vector", "bulk_set", "expire", "persist"):
+            if op == "bulk_set":
+                event = ReplicationEvent(op="bulk_set", payload={"items": request.get("items", [])})
+                if request.get("expire_at") is not None:
+                    event.payload["expire_at"] = request["expire_at"]
+            else:
+                event = self._event_for(op, request)
+            if not self.raft.propose(event.op, event.payload):
+                return {"status": "error", "error": "not_committed", "leader": self.raft.leader_id}
+            if op in ("expire", "persist"):
+                return {"status": "ok", "result": self.engine.ttl(request["key"]) != -2}
+            return {"status": "ok"}
+        if not self.raft.read_ready():
+            return {"status": "error", "error": "not_primary", "leader": self.raft.leader_id}
+        return self._handle_primary(op, request)
+
+    @staticmethod
+    def _event_for(op: str, request: Dict[str, Any]) -> ReplicationEvent:
+        if op == "set":
+            payload = {"key": request["key"], "value": request["value"]}
+            if request.get("expire_at") is not None:
+                payload["expire_at"] = request["expire_at"]
+            return ReplicationEvent(op="set", payload=payload)
+        if op in ("expire", "persist"):
+            expire_at = request.get("expire_at") if op == "expire" else None
+            return ReplicationEvent(op="expire", payload={"key": request["key"], "expire_at": expire_at})
+        if op == "delete":
+            return ReplicationEvent(op="delete", payload={"key": request["key"]})
+        return ReplicationEvent(op="add_vector", payload={"key": request["key"], "vector": request["vector"]})
+
+    def _quorum_write(
+        self, owners: List[NodeConfig], event: ReplicationEvent, request: Dict[str, Any]
+    ) -> Dict[str, Any]:
+        required = int(request.get("w") or self.config.write_quorum)
+        simulate_drop = bool(request.get("simulate_drop"))
+        acked = self.quorum.write(
+            owners,
+            event,
+            lambda: self.engine.apply_replication(event.op, event.payload, simulate_drop=simulate_drop),
+            required,
+        )
+        if not acked:
+            return {"status": "error", "error": "write_quorum_not_met"}
+        return {"status": "ok"}
+
+    def _quorum_get(self, owners: List[NodeConfig], request: Dict[str, Any]) -> Dict[str, Any]:
+        required = int(request.get("r") or self.config.read_quorum)
+        key = request["key"]
+        replies = self.quorum.read(
+            owners,
+            {"op": "get", "key": key, "local": True, "forwarded": True},
+            lambda: self._handle_primary("get", request),
+            required,
+        )
+        if len(replies) < min(required, len(owners)):
+            return {"status": "error", "error": "read_quorum_not_met"}
+        newest = max(replies, key=lambda reply: reply.get("version", 0))
+        version = newest.get("version", 0)
+        stale = [reply["node_id"] for reply in replies if reply.get("version", 0) < version]
+        if stale:
+            self._read_repair(owners, stale, key, newest.get("result"), version)
+        return {"status": "ok", "result": newest.get("result"), "version": version}
+
+    def _read_repair(self, owners: List[NodeConfig], stale: List[int], key: str, value: Any, version: int) -> None:
+        if value is None:
+            event = ReplicationEvent(op="delete", payload={"key": key, "version": version})
+        else:
+            event = ReplicationEvent(op="set", payload={"key": key, "value": value, "version": version})
+        self.quorum.repair(
+            [node for node in owners if node.node_id in stale],
+            event,
+            lambda: self.engine.apply_replication(event.op, event.payload),
+        )
+
+    def _dynamo_bulk_set(self, request: Dict[str, Any]) -> Dict[str, Any]:
+        assert self.ring is not None
+        groups: Dict[Tuple[int, ...], List[Tuple[str, Any]]] = {}
+        nodes = {node.node_id: node for node in self.ring.nodes}
+        for key, value in request.get("items", []):
+            owner_ids = tuple(node.node_id for node in self.ring.owners(key))
+            groups.setdefault(owner_ids, []).append((key, value))
+        for owner_ids, items in groups.items():
+            owners = [nodes[node_id] for node_id in owner_ids]
+            if self.config.node_id in owner_ids or request.get("forwarded"):
+                event = ReplicationEvent(op="bulk_set", payload={"items": items, "version": self.engine.next_version()})
+                if request.get("expire_at") is not None:
+                    event.payload["expire_at"] = request["expire_at"]
+                response = self._quorum_write(owners, event, request)
+            else:
+                response = self._forward(owners, dict(request, items=items))
+            if response.get("status") != "ok":
+                return response
+        return {"status": "ok"}
+
+    def _forward(self, owners: List[NodeConfig], request: Dict[str, Any]) -> Dict[str, Any]:
+        payload = dict(request, forwarded=True)
+        for node in owners:
+            try:
+                return KVClient(node.host, node.port, timeout=self.config.replication_timeout).request(payload)
+            except OSError:
+                continue
+        return {"status": "error", "error": "owners_unavailable"}
+
+    def _scatter_search(self, op: str, request: Dict[str, Any]) -> Dict[str, Any]:
+        results = [self._handle_primary(op, request).get("result", [])]
+        for response in self.quorum.fan_out(self.config.peers or [], dict(request, local=True)):
+            if response.get("status") == "ok":
+                results.append(response.get("result", []))
+        if op == "vector_search":
+            best: Dict[str, float] = {}
+            for result in results:
+                for item in result:
+                    best[item["key"]] = max(item["score"], best.get(item["key"], item["score"]))
+            ranked = sorted(best.items(), key=lambda pair: pair[1], reverse=True)
+            top_k = int(request.get("top_k", 5))
+            return {"status": "ok", "result": [{"key": key, "score": score} for key, score in ranked[:top_k]]}
+        if op == "scan":
+            items = {key: value for result in results for key, value in result}
+            limit = int(request.get("limit", 1000))
+            return {"status": "ok", "result": [[key, items[key]] for key in sorted(items)[:limit]]}
+        merged = dict.fromkeys(key for result in results for key in result)
+        return {"status": "ok", "result": list(merged)}
+
     def _handle_primary(self, op: Optional[str], request: Dict[str, Any]) -> Dict[str, Any]:
         if op == "get":
-            value = self.engine.get(request["key"])
-            return {"status": "ok", "result": value}
+            value, version = self.engine.get_versioned(request["key"])
+            return {"status": "ok", "result": value, "version": version}
+        if op == "mget":
+            return {"status": "ok", "result": {key: self.engine.get(key) for key in request.get("keys", [])}}
         if op == "set":
-            self.engine.set(request["key"], request["value"], simulate_drop=bool(request.get("simulate_drop")))
-            self.replicator.enqueue(ReplicationEvent(op="set", payload={"key": request["key"], "value": request["value"]}))
+            expire_at = request.get("expire_at")
+            version = self.engine.set(
+                request["key"], request["value"], simulate_drop=bool(request.get("simulate_drop")), expire_at=expire_at
+            )
+            event = self._event_for(op, request)
+            event.payload["version"] = version
+            self.replicator.enqueue(event)
             return {"status": "ok"}
+        if op in ("expire", "persist"):
+            event = self._event_for(op, request)
+            version = self.engine.expire(request["key"], event.payload["expire_at"])
+            if version:
+                event.payload["version"] = version
+                self.replicator.enqueue(event)
+            return {"status": "ok", "result": bool(version)}
+        if op == "ttl":
+            return {"status": "ok", "result": self.engine.ttl(request["key"])}
         if op == "delete":
-            self.engine.delete(request["key"], simulate_drop=bool(request.get("simulate_drop")))
-            self.replicator.enqueue(ReplicationEvent(op="delete", payload={"key": request["key"]}))
+            version = self.engine.delete(request["key"], simulate_drop=bool(request.get("simulate_drop")))
+            self.replicator.enqueue(ReplicationEvent(op="delete", payload={"key": request["key"], "version": version}))
             return {"status": "ok"}
         if op == "bulk_set":
             items = request.get("items", [])
-            self.engine.bulk_set(items, simulate_drop=bool(request.get("simulate_drop")))
-            self.replicator.enqueue(ReplicationEvent(op="bulk_set", payload={"items": items}))
+            expire_at = request.get("expire_at")
+            version = self.engine.bulk_set(items, simulate_drop=bool(request.get("simulate_drop")), expire_at=expire_at)
+            payload = {"items": items, "version": version}
+            if expire_at is not None:
+                payload["expire_at"] = expire_at
+            self.replicator.enqueue(ReplicationEvent(op="bulk_set", payload=payload))
             return {"status": "ok"}
         if op == "search_value":
             keys = self.engine.search_by_value(request.get("value"))
@@ -91,12 +623,22 @@ class KVServer(socketserver.ThreadingTCPServer):
             keys = self.engine.search_text(term)
             return {"status": "ok", "result": keys}
         if op == "add_vector":
-            self.engine.add_vector(request["key"], request["vector"], simulate_drop=bool(request.get("simulate_drop")))
-            self.replicator.enqueue(ReplicationEvent(op="add_vector", payload={"key": request["key"], "vector": request["vector"]}))
+            version = self.engine.add_vector(
+                request["key"], request["vector"], simulate_drop=bool(request.get("simulate_drop"))
+            )
+            self.replicator.enqueue(
+                ReplicationEvent(
+                    op="add_vector",
+                    payload={"key": request["key"], "vector": request["vector"], "version": version},
+                )
+            )
             return {"status": "ok"}
         if op == "vector_search":
             vector = request.get("vector", [])
             top_k = int(request.get("top_k", 5))
             results = self.engine.vector_search(vector, top_k=top_k)
             return {"status": "ok", "result": results}
+        if op == "scan":
+            items = self.engine.scan(request.get("prefix", ""), request.get("after"), int(request.get("limit", 1000)))
+            return {"status": "ok", "result": items}
         return {"status": "error", "error": f"unknown op: {op}"}
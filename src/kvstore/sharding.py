@@ -0,0 +1,240 @@
+from __future__ import annotations
+
+import heapq
+import os
+import queue
+import socket
+import socketserver
+import subprocess
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Set
+
+from .config import ClusterConfig, NodeConfig
+from .failure import PeerLink
+from .partitioning import stable_hash
+from .server import KVRequestHandler
+from .tracing import Tracer
+
+
+def shard_for(key: str, shards: int) -> int:
+    """Shard owning ``key``: the key-hash space is split into ``shards`` equal contiguous ranges."""
+    return (stable_hash(key) * shards) >> 64
+
+
+def _free_port(host: str) -> int:
+    sock = socket.socket()
+    sock.bind((host, 0))
+    port = sock.getsockname()[1]
+    sock.close()
+    return port
+
+
+class _ShardPool:
+    """Persistent connections to one shard worker, one per concurrent request."""
+
+    def __init__(self, node: NodeConfig, timeout: float) -> None:
+        self.node = node
+        self._timeout = timeout
+        self._idle: "queue.LifoQueue[PeerLink]" = queue.LifoQueue()
+
+    def request(self, payload: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+        try:
+            link = self._idle.get_nowait()
+        except queue.Empty:
+            link = PeerLink(self.node, self._timeout)
+        try:
+            return link.request(payload)
+        finally:
+            self._idle.put(link)
+
+    def close(self) -> None:
+        while True:
+            try:
+                self._idle.get_nowait().close()
+            except queue.Empty:
+                return
+
+
+class ShardDispatcher(socketserver.ThreadingTCPServer):
+    """Front end of a sharded node: K ``KVServer`` worker processes, each owning one key-hash range.
+
+    Key operations go to the owning worker. ``mget``, ``bulk_set`` and searches
+    fan out to every shard involved and the results are merged here.
+    """
+
+    allow_reuse_address = True
+    daemon_threads = True
+
+    _KEY_OPS = {"get", "set", "delete", "add_vector", "expire", "persist", "ttl"}
+
+    def __init__(self, config: ClusterConfig) -> None:
+        self.config = config
+        self.shards = [
+            NodeConfig(config.node_id, "127.0.0.1", _free_port("127.0.0.1")) for _ in range(config.shards)
+        ]
+        self._pools = [_ShardPool(node, config.replication_timeout * 5) for node in self.shards]
+        self._executor = ThreadPoolExecutor(max_workers=max(4, 4 * config.shards), thread_name_prefix="shard")
+        self._processes: List[subprocess.Popen] = []
+        self._connections: Set[socket.socket] = set()
+        self._connections_lock = threading.Lock()
+        # Requests are traced inside the shard workers; the front end's tracer stays off.
+        self.tracer = Tracer()
+        super().__init__((config.host, config.port), KVRequestHandler)
+
+    def _spawn_workers(self) -> None:
+        package_root = str(Path(__file__).resolve().parents[1])
+        env = dict(os.environ, PYTHONPATH=os.pathsep.join(filter(None, [package_root, os.environ.get("PYTHONPATH")])))
+        for index, node in enumerate(self.shards):
+            # Workers run as standalone primaries, so only the address, role and peer settings are not passed on.
+            command = [
+                sys.executable, "-m", "kvstore.cli",
+                "--host", node.host, "--port", str(node.port), "--node-id", str(node.node_id),
+                "--data-dir", os.path.join(self.config.data_dir, f"shard-{index}"),
+                "--drop-rate", str(self.config.drop_rate),
+                "--response-delay", str(self.config.response_delay),
+                "--search-workers", str(self.config.search_workers),
+                "--compression", self.config.compression,
+                "--compression-threshold", str(self.config.compression_threshold),
+                "--value-cache", str(self.config.value_cache),
+                "--trace-capacity", str(self.config.trace_capacity),
+                "--slow-log-ms", str(self.config.slow_log_ms),
+                # Keys are spread evenly over the shards, and so is the memory budget.
+                "--maxmemory", str(self.config.maxmemory // self.config.shards),
+                "--maxmemory-policy", self.config.maxmemory_policy,
+                "--maxmemory-samples", str(self.config.maxmemory_samples),
+                "--expiry-interval", str(self.config.expiry_interval),
+                "--expiry-batch", str(self.config.expiry_batch),
+                "--index-checkpoint-interval", str(self.config.index_checkpoint_interval),
+                "--tombstone-grace", str(self.config.tombstone_grace),
+            ]
+            if self.config.metrics_port:
+                # Each worker serves its own series, on consecutive ports from --metrics-port.
+                command += ["--metrics-port", str(self.config.metrics_port + index)]
+            if not self.config.metrics:
+                command.append("--no-metrics")
+            if self.config.trace:
+                command.append("--trace")
+            if self.config.lazy_values:
+                command.append("--lazy-values")
+            if self.config.compact_values:
+                command.append("--compact-values")
+            if self.config.background_index_rebuild:
+                command.append("--background-index-rebuild")
+            self._processes.append(subprocess.Popen(command, env=env))
+        for node in self.shards:
+            deadline = time.monotonic() + 15
+            while True:
+                try:
+                    with socket.create_connection((node.host, node.port), timeout=1.0):
+                        break
+                except OSError:
+                    if time.monotonic() > deadline:
+                        raise RuntimeError(f"shard worker on port {node.port} did not start")
+                    time.sleep(0.05)
+
+    def start(self) -> None:
+        self._spawn_workers()
+        self.serve_forever()
+
+    def shutdown(self) -> None:
+        super().shutdown()
+        self.server_close()
+        for pool in self._pools:
+            pool.close()
+        for process in self._processes:
+            process.terminate()
+        for process in self._processes:
+            process.wait(timeout=10)
+        self._executor.shutdown(wait=False)
+        with self._connections_lock:
+            connections = list(self._connections)
+        for connection in connections:
+            try:
+                connection.shutdown(socket.SHUT_RDWR)
+            except OSError:
+                pass
+
+    def accepted_at(self, connection: socket.socket) -> Optional[float]:
+        return None
+
+    def track_connection(self, connection: socket.socket, active: bool) -> None:
+        with self._connections_lock:
+            if active:
+                self._connections.add(connection)
+            else:
+                self._connections.discard(connection)
+
+    def _send(self, shard: int, payload: Dict[str, Any]) -> Dict[str, Any]:
+        if payload.get("op") == "profile":
+            # A profile holds its connection for up to a minute, longer than pooled links wait.
+            link = PeerLink(self.shards[shard], self.config.replication_timeout * 5 + 60.0)
+            response = link.request(payload)
+            link.close()
+        else:
+            response = self._pools[shard].request(payload)
+        if response is None:
+            return {"status": "error", "error": f"shard {shard} unavailable"}
+        return response
+
+    def _fan_out(self, payloads: Dict[int, Dict[str, Any]]) -> List[Dict[str, Any]]:
+        futures = [self._executor.submit(self._send, shard, payload) for shard, payload in payloads.items()]
+        return [future.result() for future in futures]
+
+    def handle_request(self, request: Dict[str, Any]) -> Dict[str, Any]:
+        op = request.get("op")
+        count = len(self.shards)
+        if op == "shard_map":
+            ranges = [
+                {"shard": index, "host": node.host, "port": node.port, "start": (index << 64) // count}
+                for index, node in enumerate(self.shards)
+            ]
+            return {"status": "ok", "result": ranges}
+        if op in self._KEY_OPS:
+            return self._send(shard_for(request["key"], count), request)
+        if op == "mget":
+            grouped: Dict[int, List[str]] = {}
+            for key in request.get("keys", []):
+                grouped.setdefault(shard_for(key, count), []).append(key)
+            merged: Dict[str, Any] = {}
+            for response in self._fan_out({shard: {"op": "mget", "keys": keys} for shard, keys in grouped.items()}):
+                if response.get("status") != "ok":
+                    return response
+                merged.update(response["result"])
+            return {"status": "ok", "result": {key: merged.get(key) for key in request.get("keys", [])}}
+        if op == "bulk_set":
+            items_by_shard: Dict[int, List[Any]] = {}
+            for key, value in request.get("items", []):
+                items_by_shard.setdefault(shard_for(key, count), []).append([key, value])
+            responses = self._fan_out({shard: dict(request, items=items) for shard, items in items_by_shard.items()})
+            failed = [response for response in responses if response.get("status") != "ok"]
+            return failed[0] if failed else {"status": "ok"}
+        if op in ("search_value", "search_text", "vector_search"):
+            responses = self._fan_out({shard: request for shard in range(count)})
+            failed = [response for response in responses if response.get("status") != "ok"]
+            if failed:
+                return failed[0]
+            if op == "vector_search":
+                hits = [hit for response in responses for hit in response["result"]]
+                hits.sort(key=lambda item: item["score"], reverse=True)
+                return {"status": "ok", "result": hits[: int(request.get("top_k", 5))]}
+            return {"status": "ok", "result": sorted({key for response in responses for key in response["result"]})}
+        if op == "scan":
+            responses = self._fan_out({shard: request for shard in range(count)})
+            failed = [response for response in responses if response.get("status") != "ok"]
+            if failed:
+                return failed[0]
+            items = heapq.nsmallest(int(request.get("limit", 1000)), (item for response in responses for item in response["result"]))
+            return {"status": "ok", "result": items}
+        if op in ("stats", "trace", "memory", "profile"):
+            responses = self._fan_out({shard: request for shard in range(count)})
+            failed = [response for response in responses if response.get("status") != "ok"]
+            if failed:
+                return failed[0]
+            return {"status": "ok", "result": {"shards": [response.get("result") for response in responses]}}
+        if op == "who_is_primary":
+            return {"status": "ok", "role": "primary"}
+        return {"status": "error", "error": f"unknown op: {op}"}
@@ -1,11 +1,44 @@
 from __future__ import annotations
 
 import json
+import mmap
 import os
 import random
+import struct
 import threading
+import time
+import zlib
+from collections import OrderedDict, deque
+from collections.abc import MutableMapping
+from concurrent.futures import Future, ThreadPoolExecutor
 from dataclasses import dataclass
-from typing import Any, Dict, Iterable, List
+from typing import Any, Callable, Deque, Dict, Iterable, Iterator, List, Optional, Set, Tuple
+
+from .compact import CompactValues, CompactVersions, KeyTable
+from .memory import encoded_size
+from .metrics import Metrics
+from .protocol import json_default, json_object_hook
+from .tracing import current
+
+
+# data.snap layout: magic, then the offset of the chunk index, then the chunks.
+# Each chunk is a values region, a JSON array zlib-compressed unless values are
+# read lazily from a memory map, followed by a zlib-compressed JSON meta block
+# {"keys": [...], "versions": {...}, "refs": [...], "expires": {...}}. A key with a
+# version but no value is a tombstone. ``refs`` holds each value's
+# ``offset << 32 | length`` in the file and is only written for uncompressed
+# regions. ``expires`` maps keys with a TTL to their Unix expiry time and is
+# left out of chunks without any. The index is a JSON
+# object listing [region offset, length, crc32, meta offset, length, crc32,
+# compressed] per chunk, plus the sequence number of the last WAL entry the
+# snapshot includes.
+SNAPSHOT_MAGIC = b"KVSNAP\x00\x02"
+# Version 1 chunks were one compressed {"data": {...}, "versions": {...}} object each.
+_SNAPSHOT_MAGIC_V1 = b"KVSNAP\x00\x01"
+_SNAPSHOT_HEADER = struct.Struct(">8sQ")
+# indexes.snap: magic, the WAL sequence the indexes include, then zlib-compressed JSON.
+# It is written less often than data.snap, and the WAL is kept back to its sequence.
+INDEX_MAGIC = b"KVINDX\x00\x01"
 
 
 @dataclass
@@ -14,69 +47,528 @@ class WALEntry:
     data: Dict[str, Any]
 
 
+def _loads(raw: bytes) -> Any:
+    # The bytes hook runs once per JSON object; skip it when nothing encodes bytes.
+    return json.loads(raw, object_hook=json_object_hook if b'"__bytes__"' in raw else None)
+
+
+class LazyValues(MutableMapping):
+    """Values backed by a memory-mapped ``data.snap``, decoded on each access.
+
+    Keys written since the last snapshot keep their value in ``_dirty``; every
+    other key maps to a packed ``offset << 32 | length`` reference into the map.
+    Up to ``cache_size`` decoded values are kept, least recently used first out.
+    """
+
+    def __init__(self, cache_size: int = 0) -> None:
+        self.cache_size = cache_size
+        self._map: Optional[mmap.mmap] = None
+        self._refs: Dict[str, int] = {}
+        self._dirty: Dict[str, Any] = {}
+        self._cache: "OrderedDict[str, Any]" = OrderedDict()
+
+    def rebase(self, mapped: mmap.mmap, refs: Dict[str, int]) -> None:
+        """Read the keys in ``refs`` from ``mapped`` from now on, dropping their unsaved values."""
+        previous, self._map = self._map, mapped
+        self._refs = refs
+        self._dirty = {key: value for key, value in self._dirty.items() if key not in refs}
+        if previous is not None:
+            previous.close()
+
+    def raw(self, key: str) -> Optional[bytes]:
+        """The encoded value of a key that has not changed since the snapshot, else ``None``."""
+        ref = self._refs.get(key)
+        if ref is None:
+            return None
+        offset = ref >> 32
+        return self._map[offset : offset + (ref & 0xFFFFFFFF)]
+
+    def encoded_size(self, key: str) -> int:
+        """Bytes of the key's encoded value: its length in the map, or what the next snapshot will write."""
+        ref = self._refs.get(key)
+        if ref is not None:
+            return ref & 0xFFFFFFFF
+        return encoded_size(self._dirty[key])
+
+    def peek(self, key: str) -> Any:
+        """Like ``get``, but leaves the value cache alone."""
+        if key in self._dirty:
+            return self._dirty[key]
+        raw = self.raw(key)
+        return None if raw is None else _loads(raw)
+
+    def items_where(self, predicate: Callable[[bytes], bool]) -> Iterator[Tuple[str, Any]]:
+        """Decode only the mapped values whose encoding passes ``predicate``, without caching them."""
+        mapped = self._map
+        for key, ref in self._refs.items():
+            offset = ref >> 32
+            raw = mapped[offset : offset + (ref & 0xFFFFFFFF)]
+            if predicate(raw):
+                yield key, _loads(raw)
+        yield from self._dirty.items()
+
+    def __getitem__(self, key: str) -> Any:
+        if key in self._dirty:
+            return self._dirty[key]
+        if key in self._cache:
+            self._cache.move_to_end(key)
+            return self._cache[key]
+        raw = self.raw(key)
+        if raw is None:
+            raise KeyError(key)
+        value = _loads(raw)
+        if self.cache_size > 0:
+            self._cache[key] = value
+            if len(self._cache) > self.cache_size:
+                self._cache.popitem(last=False)
+        return value
+
+    def __setitem__(self, key: str, value: Any) -> None:
+        self._dirty[key] = value
+        self._refs.pop(key, None)
+        self._cache.pop(key, None)
+
+    def __delitem__(self, key: str) -> None:
+        if key not in self:
+            raise KeyError(key)
+        self._dirty.pop(key, None)
+        self._refs.pop(key, None)
+        self._cache.pop(key, None)
+
+    def __contains__(self, key: object) -> bool:
+        return key in self._dirty or key in self._refs
+
+    def __iter__(self) -> Iterator[str]:
+        yield from self._refs
+        yield from self._dirty
+
+    def __len__(self) -> int:
+        return len(self._refs) + len(self._dirty)
+
+
 class StorageEngine:
-    def __init__(self, data_dir: str, drop_rate: float = 0.0) -> None:
+    def __init__(
+        self,
+        data_dir: str,
+        drop_rate: float = 0.0,
+        chunk_records: int = 8192,
+        load_workers: Optional[int] = None,
+        lazy_values: bool = False,
+        value_cache: int = 0,
+        metrics: Optional[Metrics] = None,
+        compact_values: bool = False,
+    ) -> None:
         self.data_dir = data_dir
         os.makedirs(self.data_dir, exist_ok=True)
+        self._snapshot_file = os.path.join(self.data_dir, "data.snap")
+        self._index_file = os.path.join(self.data_dir, "indexes.snap")
         self._data_file = os.path.join(self.data_dir, "data.json")
         self._wal_file = os.path.join(self.data_dir, "wal.log")
+        self._versions_file = os.path.join(self.data_dir, "versions.json")
         self._lock = threading.Lock()
         self.drop_rate = drop_rate
+        self.chunk_records = chunk_records
+        self.load_workers = load_workers or min(4, os.cpu_count() or 1)
+        self.lazy_values = lazy_values
+        self.value_cache = value_cache
+        self.compact_values = compact_values
+        self.sequence = 0
+        self._snapshot_sequence = 0
+        # Sequence of the index checkpoint on disk, or None without a readable one.
+        self.index_sequence: Optional[int] = None
+        # WAL entries the snapshot holds but the index checkpoint does not.
+        self._unindexed_entries: List[Dict[str, Any]] = []
+        metrics = metrics or Metrics()
+        self._wal_seconds = metrics.histogram("kv_wal_append_seconds")
+        self._snapshot_seconds = metrics.histogram("kv_snapshot_seconds")
 
-    def load(self) -> Dict[str, Any]:
-        data: Dict[str, Any] = {}
-        if os.path.exists(self._data_file):
+    def load(self) -> MutableMapping[str, Any]:
+        return self.load_state()[0]
+
+    def load_state(
+        self, expires: Optional[Dict[str, float]] = None
+    ) -> Tuple[MutableMapping[str, Any], MutableMapping[str, int]]:
+        data, versions, tail = self.load_checkpoint(expires)
+        for entry in tail:
+            self._apply_entry(data, entry, versions, expires)
+        return data, versions
+
+    def load_checkpoint(
+        self, expires: Optional[Dict[str, float]] = None
+    ) -> Tuple[MutableMapping[str, Any], MutableMapping[str, int], List[Dict[str, Any]]]:
+        """The state as of the snapshot, plus the WAL entries written after it, not yet applied.
+
+        Expiry times from the snapshot are added to ``expires`` when it is given.
+        """
+        data: MutableMapping[str, Any] = {}
+        versions: MutableMapping[str, int] = {}
+        if self.lazy_values:
+            data = LazyValues(self.value_cache)
+        elif self.compact_values:
+            table = KeyTable()
+            data, versions = CompactValues(table), CompactVersions(table)
+        expires = {} if expires is None else expires
+        rewrite = False
+        if os.path.exists(self._snapshot_file):
+            rewrite = self._load_snapshot(data, versions, expires)
+        elif os.path.exists(self._data_file):
+            # One-time migration: rewrite data.json + versions.json as data.snap.
+            rewrite = True
             with open(self._data_file, "r", encoding="utf-8") as handle:
-                data = json.load(handle)
+                data.update(json.load(handle, object_hook=json_object_hook))
+            if os.path.exists(self._versions_file):
+                with open(self._versions_file, "r", encoding="utf-8") as handle:
+                    versions.update(json.load(handle))
+        self.sequence = self._snapshot_sequence
+        self.index_sequence = self._read_index_sequence()
+        self._unindexed_entries = []
+        tail: List[Dict[str, Any]] = []
         if os.path.exists(self._wal_file):
             with open(self._wal_file, "r", encoding="utf-8") as handle:
                 for line in handle:
                     line = line.strip()
                     if not line:
                         continue
-                    entry = json.loads(line)
-                    self._apply_entry(data, entry)
-        return data
+                    entry = json.loads(line, object_hook=json_object_hook)
+                    # Entries written before sequence numbers existed are never in the snapshot.
+                    seq = entry.get("seq", self._snapshot_sequence + 1)
+                    if seq > self._snapshot_sequence:
+                        tail.append(entry)
+                        self.sequence = max(self.sequence, seq)
+                    elif self.index_sequence is not None and seq > self.index_sequence:
+                        self._unindexed_entries.append(entry)
+        if rewrite:
+            for entry in tail:
+                self._apply_entry(data, entry, versions, expires)
+            self._unindexed_entries.extend(tail)
+            self.save_snapshot(data, versions=versions, expires=expires)
+            tail = []
+        return data, versions, tail
 
     def append_wal(self, entry: WALEntry) -> None:
-        encoded = json.dumps({"op": entry.op, "data": entry.data}, separators=(",", ":"))
+        entered = time.perf_counter()
         with self._lock:
+            self.sequence += 1
+            encoded = json.dumps(
+                {"op": entry.op, "data": entry.data, "seq": self.sequence}, separators=(",", ":"), default=json_default
+            )
+            start = time.perf_counter()
             with open(self._wal_file, "a", encoding="utf-8") as handle:
                 handle.write(encoded + "\n")
                 handle.flush()
                 os.fsync(handle.fileno())
+            end = time.perf_counter()
+            self._wal_seconds.record(end - start)
+        trace = current()
+        if trace is not None:
+            # The trace includes encoding the entry, which the histogram leaves out.
+            trace.add("wal", end - entered)
+
+    def save_snapshot(
+        self,
+        data: MutableMapping[str, Any],
+        simulate_drop: bool = False,
+        versions: Optional[MutableMapping[str, int]] = None,
+        indexes: Optional[Dict[str, Any]] = None,
+        expires: Optional[Dict[str, float]] = None,
+    ) -> bool:
+        """Snapshot ``data``; ``indexes`` are checkpointed with the same sequence number.
 
-    def save_snapshot(self, data: Dict[str, Any], simulate_drop: bool = False) -> None:
+        The WAL is truncated unless it still holds entries the index checkpoint
+        lacks. Returns ``False`` when a simulated drop skipped the snapshot.
+        """
         if simulate_drop and self.drop_rate > 0.0:
             if random.random() < self.drop_rate:
-                return
-        temp_file = self._data_file + ".tmp"
+                return False
         with self._lock:
-            with open(temp_file, "w", encoding="utf-8") as handle:
-                json.dump(data, handle)
-                handle.flush()
-                os.fsync(handle.fileno())
-            os.replace(temp_file, self._data_file)
+            start = time.perf_counter()
+            self._write_snapshot(data, versions or {}, expires or {})
+            self._snapshot_sequence = self.sequence
+            if indexes is not None:
+                self._write_indexes(indexes)
+            elapsed = time.perf_counter() - start
+            self._snapshot_seconds.record(elapsed)
+            trace = current()
+            if trace is not None:
+                trace.add("snapshot", elapsed)
+            for legacy_file in (self._data_file, self._versions_file):
+                if os.path.exists(legacy_file):
+                    os.remove(legacy_file)
+            if self.index_sequence is None or self.index_sequence == self._snapshot_sequence:
+                self._rotate_wal()
+            return True
+
+    def save_indexes(self, indexes: Dict[str, Any]) -> bool:
+        """Checkpoint ``indexes`` on their own; only possible while the snapshot holds every WAL entry."""
+        with self._lock:
+            if self._snapshot_sequence != self.sequence or not os.path.exists(self._snapshot_file):
+                return False
+            self._write_indexes(indexes)
             self._rotate_wal()
+            return True
+
+    def load_indexes(self) -> Optional[Tuple[Dict[str, Any], Set[str]]]:
+        """The index checkpoint and the keys written after it that the loaded snapshot holds.
+
+        ``None`` if the checkpoint is missing, unreadable, newer than the snapshot,
+        or older than the WAL reaches back.
+        """
+        entries, self._unindexed_entries = self._unindexed_entries, []
+        indexes = self._read_indexes(entries)
+        if indexes is None:
+            # Nothing can use the checkpoint now, so the WAL need not be kept for it.
+            self.index_sequence = None
+            return None
+        keys: Set[str] = set()
+        for entry in entries:
+            _entry_keys(entry, keys)
+        return indexes, keys
+
+    def _read_indexes(self, entries: List[Dict[str, Any]]) -> Optional[Dict[str, Any]]:
+        if self.index_sequence is None or self.index_sequence > self._snapshot_sequence:
+            return None
+        # Every append takes the next sequence number, so a complete stretch of the WAL has one entry per number.
+        if len(entries) != self._snapshot_sequence - self.index_sequence:
+            return None
+        try:
+            with open(self._index_file, "rb") as handle:
+                raw = handle.read()
+            magic, sequence = _SNAPSHOT_HEADER.unpack_from(raw)
+            if magic != INDEX_MAGIC or sequence != self.index_sequence:
+                return None
+            return _loads(zlib.decompress(memoryview(raw)[_SNAPSHOT_HEADER.size :]))
+        except (OSError, struct.error, zlib.error, ValueError):
+            return None
+
+    def _read_index_sequence(self) -> Optional[int]:
+        try:
+            with open(self._index_file, "rb") as handle:
+                magic, sequence = _SNAPSHOT_HEADER.unpack(handle.read(_SNAPSHOT_HEADER.size))
+        except (OSError, struct.error):
+            return None
+        return sequence if magic == INDEX_MAGIC else None
+
+    def _write_indexes(self, indexes: Dict[str, Any]) -> None:
+        temp_file = self._index_file + ".tmp"
+        encoded = json.dumps(indexes, separators=(",", ":"), default=json_default).encode("utf-8")
+        with open(temp_file, "wb") as handle:
+            handle.write(_SNAPSHOT_HEADER.pack(INDEX_MAGIC, self.sequence))
+            handle.write(zlib.compress(encoded, 1))
+            handle.flush()
+            os.fsync(handle.fileno())
+        os.replace(temp_file, self._index_file)
+        self.index_sequence = self.sequence
+
+    def _chunks(
+        self, data: MutableMapping[str, Any], versions: MutableMapping[str, int]
+    ) -> Iterator[Tuple[List[str], Dict[str, int]]]:
+        keys: List[str] = []
+        chunk_versions: Dict[str, int] = {}
+        for key in data:
+            keys.append(key)
+            if key in versions:
+                chunk_versions[key] = versions[key]
+            if len(keys) == self.chunk_records:
+                yield keys, chunk_versions
+                keys, chunk_versions = [], {}
+        for key, version in versions.items():
+            if key not in data:
+                chunk_versions[key] = version
+                if len(chunk_versions) == self.chunk_records:
+                    yield keys, chunk_versions
+                    keys, chunk_versions = [], {}
+        if keys or chunk_versions:
+            yield keys, chunk_versions
+
+    def _write_snapshot(
+        self, data: MutableMapping[str, Any], versions: MutableMapping[str, int], expires: Dict[str, float]
+    ) -> None:
+        """Stream ``data`` to disk one chunk at a time, then point the header at the chunk index."""
+        temp_file = self._snapshot_file + ".tmp"
+        index: List[List[int]] = []
+        refs: Dict[str, int] = {}
+        with open(temp_file, "wb") as handle:
+            handle.write(_SNAPSHOT_HEADER.pack(SNAPSHOT_MAGIC, 0))
+            for keys, chunk_versions in self._chunks(data, versions):
+                index.append(self._write_chunk(handle, data, keys, chunk_versions, refs, expires))
+            index_offset = handle.tell()
+            handle.write(json.dumps({"chunks": index, "sequence": self.sequence}, separators=(",", ":")).encode("utf-8"))
+            handle.seek(0)
+            handle.write(_SNAPSHOT_HEADER.pack(SNAPSHOT_MAGIC, index_offset))
+            handle.flush()
+            os.fsync(handle.fileno())
+        os.replace(temp_file, self._snapshot_file)
+        if isinstance(data, LazyValues):
+            with open(self._snapshot_file, "rb") as handle:
+                data.rebase(mmap.mmap(handle.fileno(), 0, access=mmap.ACCESS_READ), refs)
+
+    def _write_chunk(
+        self,
+        handle: Any,
+        data: MutableMapping[str, Any],
+        keys: List[str],
+        chunk_versions: Dict[str, int],
+        refs: Dict[str, int],
+        expires: Dict[str, float],
+    ) -> List[int]:
+        region_offset = handle.tell()
+        meta: Dict[str, Any] = {"keys": keys, "versions": chunk_versions}
+        if expires:
+            chunk_expires = {key: expires[key] for key in keys if key in expires}
+            if chunk_expires:
+                meta["expires"] = chunk_expires
+        if self.lazy_values:
+            # Unchanged values are copied as encoded bytes, so a lazy snapshot never decodes them.
+            parts: List[bytes] = []
+            position = region_offset + 1
+            for key in keys:
+                raw = data.raw(key) if isinstance(data, LazyValues) else None
+                if raw is None:
+                    raw = json.dumps(data[key], separators=(",", ":"), default=json_default).encode("utf-8")
+                refs[key] = position << 32 | len(raw)
+                position += len(raw) + 1
+                parts.append(raw)
+            region = b"[" + b",".join(parts) + b"]"
+            meta["refs"] = [refs[key] for key in keys]
+        else:
+            values = json.dumps([data[key] for key in keys], separators=(",", ":"), default=json_default)
+            region = zlib.compress(values.encode("utf-8"), 1)
+        handle.write(region)
+        encoded_meta = zlib.compress(json.dumps(meta, separators=(",", ":")).encode("utf-8"), 1)
+        meta_offset = handle.tell()
+        handle.write(encoded_meta)
+        return [
+            region_offset, len(region), zlib.crc32(region),
+            meta_offset, len(encoded_meta), zlib.crc32(encoded_meta),
+            int(not self.lazy_values),
+        ]
+
+    def _load_snapshot(
+        self, data: MutableMapping[str, Any], versions: MutableMapping[str, int], expires: Dict[str, float]
+    ) -> bool:
+        """Decode chunks on a thread pool, a bounded window ahead of the merge, so memory stays near one chunk per worker.
+
+        A :class:`LazyValues` only reads each chunk's keys and offsets. Returns
+        ``True`` when it had to decode values anyway (compressed or version 1
+        chunks), so the caller can rewrite the snapshot in the lazy layout.
+        """
+        fd = os.open(self._snapshot_file, os.O_RDONLY)
+        try:
+            magic, index_offset = _SNAPSHOT_HEADER.unpack(os.pread(fd, _SNAPSHOT_HEADER.size, 0))
+            if magic not in (SNAPSHOT_MAGIC, _SNAPSHOT_MAGIC_V1) or index_offset == 0:
+                raise ValueError(f"{self._snapshot_file} is not a complete snapshot")
+            index_size = os.fstat(fd).st_size - index_offset
+            header = json.loads(os.pread(fd, index_size, index_offset))
+            chunks = header["chunks"]
+            self._snapshot_sequence = header.get("sequence", 0)
+            lazy = isinstance(data, LazyValues)
+            refs: Dict[str, int] = {}
+
+            def read(offset: int, length: int, crc: int) -> bytes:
+                raw = os.pread(fd, length, offset)
+                if zlib.crc32(raw) != crc:
+                    raise ValueError(f"corrupt snapshot chunk at offset {offset}")
+                return raw
+
+            def decode(chunk: List[int]) -> Tuple[Optional[Dict[str, Any]], Dict[str, int], Dict[str, Any]]:
+                if magic == _SNAPSHOT_MAGIC_V1:
+                    decoded = _loads(zlib.decompress(read(*chunk[:3])))
+                    return decoded["data"], {}, decoded
+                meta = json.loads(zlib.decompress(read(*chunk[3:6])))
+                if lazy and not chunk[6]:
+                    return None, dict(zip(meta["keys"], meta["refs"])), meta
+                region = read(*chunk[:3])
+                values = _loads(zlib.decompress(region) if chunk[6] else region)
+                return dict(zip(meta["keys"], values)), {}, meta
+
+            decoded_values = False
+
+            def merge(result: Tuple[Optional[Dict[str, Any]], Dict[str, int], Dict[str, Any]]) -> None:
+                nonlocal decoded_values
+                values, chunk_refs, meta = result
+                if values is not None:
+                    data.update(values)
+                    decoded_values = decoded_values or bool(values)
+                refs.update(chunk_refs)
+                versions.update(meta["versions"])
+                expires.update(meta.get("expires", {}))
+
+            with ThreadPoolExecutor(max_workers=self.load_workers) as executor:
+                window: Deque[Future] = deque()
+                for chunk in chunks:
+                    window.append(executor.submit(decode, chunk))
+                    if len(window) > 2 * self.load_workers:
+                        merge(window.popleft().result())
+                while window:
+                    merge(window.popleft().result())
+            if lazy:
+                data.rebase(mmap.mmap(fd, 0, access=mmap.ACCESS_READ), refs)
+            return lazy and decoded_values
+        finally:
+            os.close(fd)
 
     def _rotate_wal(self) -> None:
         if os.path.exists(self._wal_file):
             os.remove(self._wal_file)
 
     @staticmethod
-    def _apply_entry(data: Dict[str, Any], entry: Dict[str, Any]) -> None:
+    def _apply_entry(
+        data: MutableMapping[str, Any],
+        entry: Dict[str, Any],
+        versions: Optional[MutableMapping[str, int]] = None,
+        expires: Optional[Dict[str, float]] = None,
+    ) -> None:
         op = entry.get("op")
         payload = entry.get("data", {})
+        if op == "batch":
+            for nested in payload["entries"]:
+                StorageEngine._apply_entry(data, nested, versions, expires)
+            return
+        version = payload.get("version")
+        expires = {} if expires is None else expires
         if op == "set":
             data[payload["key"]] = payload["value"]
+            _set_expiry(expires, payload["key"], payload.get("expire_at"))
         elif op == "delete":
             data.pop(payload["key"], None)
+            expires.pop(payload["key"], None)
         elif op == "bulk_set":
             for key, value in payload["items"]:
                 data[key] = value
+                _set_expiry(expires, key, payload.get("expire_at"))
+        elif op == "expire":
+            if payload["key"] not in data:
+                return
+            _set_expiry(expires, payload["key"], payload.get("expire_at"))
+        if versions is None or version is None:
+            return
+        if op in ("set", "delete", "expire"):
+            versions[payload["key"]] = version
+        elif op == "bulk_set":
+            for key, _ in payload["items"]:
+                versions[key] = version
 
     def replay_entries(self, entries: Iterable[WALEntry]) -> Dict[str, Any]:
         data: Dict[str, Any] = {}
         for entry in entries:
             self._apply_entry(data, {"op": entry.op, "data": entry.data})
         return data
+
+
+def _entry_keys(entry: Dict[str, Any], keys: Set[str]) -> None:
+    """Add the keys a WAL entry writes to ``keys``."""
+    payload = entry.get("data", {})
+    if entry.get("op") == "batch":
+        for nested in payload["entries"]:
+            _entry_keys(nested, keys)
+    elif entry.get("op") == "bulk_set":
+        keys.update(key for key, _ in payload["items"])
+    elif "key" in payload:
+        keys.add(payload["key"])
+
+
+def _set_expiry(expires: Dict[str, float], key: str, expire_at: Optional[float]) -> None:
+    if expire_at is None:
+        expires.pop(key, None)
+    else:
+        expires[key] = expire_at
@@ -0,0 +1,133 @@
+from __future__ import annotations
+
+import threading
+import time
+from collections import deque
+from typing import Any, Deque, Dict, Optional
+
+_local = threading.local()
+# Number of enabled tracers in the process. While it is zero ``current`` returns
+# without touching the thread-local, so instrumented code pays one global read.
+_enabled_tracers = 0
+
+
+class Trace:
+    """Phase timings of one request. ``mark`` closes the phase that ran since the previous mark.
+
+    The server marks ``accept``, ``decode``, ``engine``, ``encode`` and ``write`` in
+    order; ``lock_wait``, ``index``, ``wal``, ``snapshot`` and ``replicate`` are added
+    from inside the engine and overlap ``engine``.
+    """
+
+    __slots__ = ("op", "started", "total", "phases", "_last")
+
+    def __init__(self) -> None:
+        self.op: Optional[str] = None
+        self.started = time.perf_counter()
+        self.total = 0.0
+        self.phases: Dict[str, float] = {}
+        self._last = self.started
+
+    def add(self, phase: str, seconds: float) -> None:
+        self.phases[phase] = self.phases.get(phase, 0.0) + seconds
+
+    def mark(self, phase: str) -> None:
+        now = time.perf_counter()
+        self.add(phase, now - self._last)
+        self._last = now
+
+
+def current() -> Optional[Trace]:
+    """The trace of the request this thread is handling, or ``None`` when it is not traced."""
+    if not _enabled_tracers:
+        return None
+    return getattr(_local, "trace", None)
+
+
+def deactivate() -> None:
+    _local.trace = None
+
+
+class TracedLock:
+    """Wraps a lock and adds the time spent acquiring it to the current trace as ``lock_wait``."""
+
+    __slots__ = ("lock",)
+
+    def __init__(self, lock: Any) -> None:
+        self.lock = lock
+
+    def __enter__(self) -> bool:
+        start = time.perf_counter()
+        self.lock.acquire()
+        trace = current()
+        if trace is not None:
+            trace.add("lock_wait", time.perf_counter() - start)
+        return True
+
+    def __exit__(self, *exc: Any) -> None:
+        self.lock.release()
+
+
+class Tracer:
+    """Keeps the last ``capacity`` request traces and, separately, those slower than ``slow_ms``.
+
+    Both buffers are bounded deques, so appending never blocks a request, and
+    traces are only turned into JSON when dumped. With tracing off ``begin``
+    returns ``None`` and requests take the untraced path.
+    """
+
+    def __init__(self, capacity: int = 1024, slow_ms: float = 0.0, slow_capacity: int = 256) -> None:
+        self._enabled = False
+        self.slow_ms = slow_ms
+        self._recent: Deque[Trace] = deque(maxlen=capacity)
+        self._slow: Deque[Trace] = deque(maxlen=slow_capacity)
+        self._lock = threading.Lock()
+
+    @property
+    def enabled(self) -> bool:
+        return self._enabled
+
+    def configure(self, enabled: Optional[bool] = None, slow_ms: Optional[float] = None) -> None:
+        global _enabled_tracers
+        with self._lock:
+            if slow_ms is not None:
+                self.slow_ms = float(slow_ms)
+            if enabled is not None and bool(enabled) != self._enabled:
+                self._enabled = bool(enabled)
+                _enabled_tracers += 1 if self._enabled else -1
+
+    def clear(self) -> None:
+        self._recent.clear()
+        self._slow.clear()
+
+    def begin(self) -> Optional[Trace]:
+        """Start tracing a request on this thread; ``None`` when tracing is off."""
+        if not self._enabled:
+            return None
+        trace = Trace()
+        _local.trace = trace
+        return trace
+
+    def finish(self, trace: Trace) -> None:
+        trace.total = time.perf_counter() - trace.started
+        self._recent.append(trace)
+        if self.slow_ms > 0 and trace.total * 1000 >= self.slow_ms:
+            self._slow.append(trace)
+
+    def dump(self, limit: int = 100) -> Dict[str, Any]:
+        recent = list(self._recent)[-limit:] if limit > 0 else []
+        return {
+            "enabled": self._enabled,
+            "slow_ms": self.slow_ms,
+            "recent": [_record(trace) for trace in recent],
+            "slow": [_record(trace) for trace in list(self._slow)],
+        }
+
+
+def _record(trace: Trace) -> Dict[str, Any]:
+    return {
+        "op": trace.op,
+        "at": round(time.time() - (time.perf_counter() - trace.started), 6),
+        "total_ms": round(trace.total * 1000, 3),
+        "phases_ms": {phase: round(seconds * 1000, 3) for phase, seconds in trace.phases.items()},
+    }
@@ -0,0 +1,61 @@
+from __future__ import annotations
+
+import threading
+import time
+from typing import Tuple
+
+EPOCH_MS = 1_577_836_800_000  # 2020-01-01T00:00:00Z
+LOGICAL_BITS = 12
+NODE_BITS = 12
+
+
+def pack_version(physical_ms: int, logical: int, node_id: int) -> int:
+    return (physical_ms << (LOGICAL_BITS + NODE_BITS)) | (logical << NODE_BITS) | (node_id & ((1 << NODE_BITS) - 1))
+
+
+def version_at(unix_time: float) -> int:
+    """The lowest version any clock issues at ``unix_time``."""
+    return pack_version(max(0, int(unix_time * 1000) - EPOCH_MS), 0, 0)
+
+
+def unpack_version(version: int) -> Tuple[int, int, int]:
+    node_id = version & ((1 << NODE_BITS) - 1)
+    logical = (version >> NODE_BITS) & ((1 << LOGICAL_BITS) - 1)
+    physical_ms = version >> (LOGICAL_BITS + NODE_BITS)
+    return physical_ms, logical, node_id
+
+
+class HybridLogicalClock:
+    """Hybrid logical clock whose timestamps pack into one unsigned 64-bit integer.
+
+    Layout, high to low bits: 40 bits of milliseconds since 2020-01-01, a 12-bit
+    logical counter and a 12-bit node id that breaks ties between writers.
+    Comparing two versions as plain integers gives last-writer-wins order.
+    """
+
+    def __init__(self, node_id: int) -> None:
+        self._node_id = node_id
+        self._physical = 0
+        self._logical = 0
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _wall_ms() -> int:
+        return int(time.time() * 1000) - EPOCH_MS
+
+    def now(self) -> int:
+        with self._lock:
+            wall = self._wall_ms()
+            if wall > self._physical:
+                self._physical, self._logical = wall, 0
+            else:
+                self._logical += 1
+                if self._logical >> LOGICAL_BITS:
+                    self._physical, self._logical = self._physical + 1, 0
+            return pack_version(self._physical, self._logical, self._node_id)
+
+    def observe(self, version: int) -> None:
+        physical, logical, _ = unpack_version(version)
+        with self._lock:
+            if (physical, logical) > (self._physical, self._logical):
+                self._physical, self._logical = physical, logical
@@ -0,0 +1,85 @@
+from __future__ import annotations
+
+from pathlib import Path
+
+from kvstore.antientropy import AntiEntropy, MerkleTree
+from kvstore.config import ClusterConfig, NodeConfig
+from kvstore.engine import KVEngine
+
+
+def test_incremental_tree_matches_fresh_build():
+    incremental = MerkleTree(depth=6)
+    for idx in range(200):
+        incremental.update(f"k{idx}", 0, 1)
+    for idx in range(0, 200, 3):
+        incremental.update(f"k{idx}", 1, 2)
+
+    fresh = MerkleTree(depth=6)
+    for idx in range(200):
+        fresh.update(f"k{idx}", 0, 2 if idx % 3 == 0 else 1)
+
+    assert incremental.hashes([1]) == fresh.hashes([1])
+    incremental.update("k1", 1, 5)
+    assert incremental.hashes([1]) != fresh.hashes([1])
+    assert sorted(incremental.keys(range(incremental.leaf_count))) == sorted(f"k{idx}" for idx in range(200))
+    assert "k1" in incremental.keys([incremental.bucket("k1")])
+
+
+def test_sync_transfers_only_differences(tmp_path: Path):
+    nodes = [NodeConfig(1, "127.0.0.1", 1), NodeConfig(2, "127.0.0.1", 2)]
+    engines = {node.node_id: KVEngine(str(tmp_path / f"node_{node.node_id}"), node_id=node.node_id) for node in nodes}
+    base = engines[1].next_version()
+    for engine in engines.values():
+        engine.apply_replication("bulk_set", {"items": [[f"k{idx}", idx] for idx in range(2000)], "version": base})
+    engines[1].set("k5", "newer on 1")
+    engines[2].delete("k7")
+    engines[2].set("only-on-2", True)
+
+    sides: dict[int, AntiEntropy] = {}
+
+    def loopback(node: NodeConfig, payload: dict) -> dict:
+        if payload["op"] == "replicate_batch":
+            events = [(event["op"], event["payload"]) for event in payload["events"]]
+            return {"status": "ok", "applied": engines[node.node_id].apply_batch(events)}
+        return sides[node.node_id].handle(payload)
+
+    for node in nodes:
+        config = ClusterConfig(
+            node_id=node.node_id,
+            host=node.host,
+            port=node.port,
+            data_dir=str(tmp_path),
+            peers=[peer for peer in nodes if peer.node_id != node.node_id],
+        )
+        sides[node.node_id] = AntiEntropy(config, engines[node.node_id], depth=8, transport=loopback)
+
+    stats = sides[1].sync_with(nodes[1])
+    assert stats["pulled"] == 2
+    assert stats["pushed"] == 1
+    assert stats["buckets"] <= 3
+    assert engines[1].versions() == engines[2].versions()
+    assert engines[1].snapshot() == engines[2].snapshot()
+    assert engines[1].get("k7") is None
+
+    assert sides[2].sync_with(nodes[0])["buckets"] == 0
+
+
+def test_sync_between_servers(tmp_path: Path, free_port, server_pool):
+    nodes = [NodeConfig(node_id, "127.0.0.1", free_port()) for node_id in (1, 2)]
+    servers = []
+    for node in nodes:
+        config = ClusterConfig(
+            node_id=node.node_id,
+            host=node.host,
+            port=node.port,
+            data_dir=str(tmp_path / f"node_{node.node_id}"),
+            mode="dynamo",
+            peers=[peer for peer in nodes if peer.node_id != node.node_id],
+            replication_factor=2,
+            anti_entropy_interval=0.0,
+        )
+        servers.append(server_pool.start(config))
+
+    servers[1].engine.set("missed", "write")
+    servers[0].anti_entropy.sync_with(nodes[1])
+    assert servers[0].engine.get("missed") == "write"
@@ -0,0 +1,112 @@
+from __future__ import annotations
+
+import io
+import socket
+import struct
+import threading
+from pathlib import Path
+
+import pytest
+
+from datastore.node_config import DatastoreSettings
+from datastore.remote_interface import DatastoreConnector
+from datastore.socket_gateway import DatastoreServer
+from kvstore.client import KVClient
+from kvstore.config import ClusterConfig
+from kvstore.protocol import (
+    Float32Array,
+    ProtocolError,
+    decode_message,
+    encode_frame,
+    encode_message,
+    handshake,
+    packb,
+    read_frame,
+    unpackb,
+)
+from kvstore.server import KVServer
+
+
+def test_codec_round_trips_every_type():
+    values = [
+        None, True, False, 0, 127, 128, -1, -32, -33, 65535, 65536, 2**32, 2**64 - 1, -(2**31), -(2**63),
+        1.5, "", "é" * 40, "x" * 70000, b"", b"\x00\xff" * 200, list(range(20)), {f"k{i}": i for i in range(20)},
+        {"nested": [{"a": [1, {"b": None}]}]},
+    ]
+    for value in values:
+        assert unpackb(packb(value)) == value
+    assert packb({"a": 1}) == b"\x81\xa1a\x01"
+    assert unpackb(packb(Float32Array([0.5, -2.0, 1.0]))) == [0.5, -2.0, 1.0]
+    assert len(packb(Float32Array([0.1] * 128))) == 4 + 128 * 4
+
+    with pytest.raises(ProtocolError):
+        packb(2**64)
+    with pytest.raises(ProtocolError):
+        unpackb(packb("abc")[:-1])
+    with pytest.raises(ProtocolError):
+        read_frame(io.BytesIO(encode_frame({"op": "get"})[:-2]))
+    assert read_frame(io.BytesIO(b"")) is None
+
+
+def test_json_messages_carry_bytes():
+    message = {"value": b"\x00raw\xff", "text": "plain"}
+    assert decode_message(encode_message(message)) == message
+
+
+def test_binary_and_json_clients_share_a_port(tmp_path: Path, free_port, server_pool):
+    config = ClusterConfig(node_id=1, host="127.0.0.1", port=free_port(), data_dir=str(tmp_path), anti_entropy_interval=0.0)
+    server = server_pool.start(config)
+    text_client = KVClient(config.host, config.port)
+    binary_client = KVClient(config.host, config.port, binary=True)
+    binary_client.set("blob", b"\x00\x01\xfe")
+    binary_client.bulk_set([(f"k{idx}", {"n": idx}) for idx in range(50)])
+    binary_client.add_vector("v1", [1.0, 0.0])
+    text_client.add_vector("v2", [0.0, 1.0])
+
+    assert text_client.get("blob") == b"\x00\x01\xfe"
+    assert binary_client.get("blob") == b"\x00\x01\xfe"
+    assert binary_client.mget(["k3", "k49"]) == {"k3": {"n": 3}, "k49": {"n": 49}}
+    assert [hit["key"] for hit in binary_client.vector_search([0.9, 0.1], top_k=2)] == ["v1", "v2"]
+    assert binary_client.request({"op": "nope"})["error"] == "unknown op: nope"
+    server_pool.stop(server)
+
+    restarted = KVServer(config)
+    assert restarted.engine.get("blob") == b"\x00\x01\xfe"
+    restarted.engine.close()
+    restarted.server_close()
+
+
+def test_datastore_connector_speaks_binary(tmp_path: Path, free_port):
+    settings = DatastoreSettings(node_id=1, host="127.0.0.1", port=free_port(), data_dir=str(tmp_path))
+    server = DatastoreServer(settings)
+    threading.Thread(target=server.start, daemon=True).start()
+    client = DatastoreConnector(settings.host, settings.port, binary=True)
+    try:
+        client.set("blob", b"\xff\x00")
+        client.add_vector("v1", [0.0, 1.0])
+        assert client.get("blob") == b"\xff\x00"
+        assert DatastoreConnector(settings.host, settings.port).get("blob") == b"\xff\x00"
+        assert client.vector_search([0.0, 1.0], top_k=1)[0]["key"] == "v1"
+    finally:
+        server.shutdown()
+
+
+def test_unencodable_responses_and_deep_frames_get_error_frames(tmp_path: Path, free_port, server_pool):
+    config = ClusterConfig(node_id=1, host="127.0.0.1", port=free_port(), data_dir=str(tmp_path), anti_entropy_interval=0.0)
+    server_pool.start(config)
+    KVClient(config.host, config.port).set("huge", 2**64)
+    binary_client = KVClient(config.host, config.port, binary=True)
+    response = binary_client.request({"op": "get", "key": "huge"})
+    assert response["status"] == "error" and "out of range" in response["error"]
+    binary_client.set("small", 1)
+    assert binary_client.get("small") == 1
+
+    with socket.create_connection((config.host, config.port)) as sock:
+        sock.sendall(handshake())
+        stream = sock.makefile("rb")
+        assert stream.read(len(handshake())) == handshake()
+        body = b"\x81\xa2op" + b"\x91" * 100_000 + b"\xc0"
+        sock.sendall(struct.pack(">I", len(body)) + body)
+        assert read_frame(stream) == {"status": "error", "error": "Message nested too deeply"}
+    with pytest.raises(ProtocolError):
+        decode_message(b"[" * 100_000 + b"]" * 100_000)
@@ -0,0 +1,93 @@
+from __future__ import annotations
+
+import time
+from pathlib import Path
+
+import pytest
+
+from kvstore.compact import CompactValues, CompactVersions, KeyTable
+from kvstore.engine import KVEngine
+from kvstore.storage import StorageEngine
+
+VALUES = {
+    "int": 42,
+    "negative": -7,
+    "big": 1 << 70,
+    "bool": True,
+    "float": 1.5,
+    "none": None,
+    "str": "active",
+    "unicode": "naïve ✓",
+    "bytes": b"\x00\xff",
+    "doc": {"text": "hello world", "tags": [1, 2]},
+    "list": [1, "two"],
+}
+
+
+def test_compact_values_round_trip_and_mapping_semantics():
+    table = KeyTable(capacity=2)
+    values, versions = CompactValues(table), CompactVersions(table)
+    for idx, (key, value) in enumerate(VALUES.items()):
+        values[key] = value
+        versions[key] = idx
+    assert dict(values.items()) == VALUES
+    assert type(values["bool"]) is bool and type(values["int"]) is int
+    assert len(values) == len(VALUES) and set(values) == set(VALUES)
+    values["str"] = "inactive"
+    del values["doc"]
+    versions["doc"] = 99
+    assert values["str"] == "inactive" and "doc" not in values and "missing" not in values
+    assert versions["doc"] == 99 and versions["int"] == 0 and max(versions.values()) == 99
+    with pytest.raises(KeyError):
+        values["doc"]
+    # Keys keep their id after a delete, so the tombstone version and a later write share it.
+    values["doc"] = "back"
+    assert len(table) == len(VALUES) and values["doc"] == "back"
+
+
+def test_overwrites_rewrite_the_arena(monkeypatch: pytest.MonkeyPatch):
+    monkeypatch.setattr("kvstore.compact._MIN_GARBAGE", 100)
+    values = CompactValues(KeyTable())
+    for round_ in range(50):
+        for idx in range(20):
+            values[f"k{idx}"] = f"value-{round_}-{idx}"
+    assert len(values._arena) < 2 * 20 * len("value-49-19") + 100
+    assert all(values[f"k{idx}"] == f"value-49-{idx}" for idx in range(20))
+
+
+def test_engine_with_compact_values_matches_dict_engine(tmp_path: Path):
+    compact = KVEngine(str(tmp_path / "compact"), compact_values=True)
+    plain = KVEngine(str(tmp_path / "plain"))
+    for engine in (compact, plain):
+        engine.bulk_set(VALUES.items())
+        engine.set("post", {"text": "hello search"}, expire_at=time.time() + 60)
+        engine.add_vector("vec", [0.1, 0.2, 0.3])
+        engine.delete("list")
+        engine.set("str", "active")
+    assert compact.snapshot() == plain.snapshot()
+    for term in ("hello", "missing"):
+        assert sorted(compact.search_text(term)) == sorted(plain.search_text(term))
+    for value in ("active", 42, None):
+        assert sorted(compact.search_by_value(value)) == sorted(plain.search_by_value(value))
+    assert compact.vector_search([0.1, 0.2, 0.3], top_k=1)[0]["key"] == "vec"
+    assert compact.versions().keys() == plain.versions().keys()
+    assert compact.memory_stats()["structures"]["data"] < plain.memory_stats()["structures"]["data"]
+    compact.close()
+
+    reopened = KVEngine(str(tmp_path / "compact"), compact_values=True)
+    assert reopened.snapshot() == plain.snapshot()
+    assert sorted(reopened.search_text("hello")) == ["doc", "post"]
+    assert 0 < reopened.ttl("post") <= 60
+    # The snapshot and index checkpoint use key names, so either layout can open them.
+    assert KVEngine(str(tmp_path / "compact")).snapshot() == plain.snapshot()
+    assert KVEngine(str(tmp_path / "plain"), compact_values=True).search_by_value("active") == ["str"]
+
+
+def test_compact_storage_loads_into_compact_mappings(tmp_path: Path):
+    StorageEngine(str(tmp_path)).save_snapshot({"a": 1, "b": "x"}, versions={"a": 5, "b": 6, "gone": 7})
+    data, versions = StorageEngine(str(tmp_path), compact_values=True).load_state()
+    assert isinstance(data, CompactValues) and isinstance(versions, CompactVersions)
+    assert dict(data.items()) == {"a": 1, "b": "x"}
+    assert dict(versions.items()) == {"a": 5, "b": 6, "gone": 7}
+    with pytest.raises(ValueError):
+        KVEngine(str(tmp_path), lazy_values=True, compact_values=True)
@@ -0,0 +1,92 @@
+from __future__ import annotations
+
+import io
+import os
+import socket
+import threading
+import time
+import zlib
+from pathlib import Path
+
+import pytest
+
+from datastore.node_config import DatastoreSettings
+from datastore.remote_interface import DatastoreConnector
+from datastore.socket_gateway import DatastoreServer
+from kvstore.client import KVClient
+from kvstore.config import ClusterConfig, NodeConfig
+from kvstore.protocol import FLAG_ZLIB, MAX_FRAME, ProtocolError, RecvBuffer, encode_frame, handshake, read_frame
+
+
+def _compressed(frame: bytes) -> bool:
+    return bool(frame[0] & 0x80)
+
+
+def test_frames_compress_only_above_threshold():
+    large = {"op": "bulk_set", "items": [[f"key-{idx}", {"text": "same text " * 4}] for idx in range(200)]}
+    small = {"op": "get", "key": "k"}
+    noise = {"op": "set", "key": "k", "value": os.urandom(4096)}
+
+    frame = encode_frame(large, compress_above=1024)
+    assert _compressed(frame) and len(frame) < len(encode_frame(large)) // 4
+    assert read_frame(io.BytesIO(frame)) == large
+    assert not _compressed(encode_frame(small, compress_above=1024))
+    assert not _compressed(encode_frame(noise, compress_above=1024))
+    assert read_frame(io.BytesIO(encode_frame(noise, compress_above=1024))) == noise
+
+    bomb = zlib.compress(b"\x00" * (MAX_FRAME + 1))
+    with pytest.raises(ProtocolError):
+        read_frame(io.BytesIO((len(bomb) | 0x80000000).to_bytes(4, "big") + bomb))
+
+
+def test_compression_is_negotiated_per_connection(tmp_path: Path, free_port, server_pool):
+    config = ClusterConfig(
+        node_id=1, host="127.0.0.1", port=free_port(), data_dir=str(tmp_path), anti_entropy_interval=0.0, compression_threshold=512
+    )
+    server_pool.start(config)
+    client = KVClient(config.host, config.port, compress_threshold=512)
+    client.bulk_set([(f"user:{idx:04d}", {"bio": "likes compression " * 3}) for idx in range(500)])
+    assert len(client.scan("user:")) == 500
+    assert KVClient(config.host, config.port).get("user:0007") == {"bio": "likes compression " * 3}
+
+    request = bytes(encode_frame({"op": "scan", "prefix": "user:"}))
+    for flags, expect_compressed in ((FLAG_ZLIB, True), (0, False)):
+        with socket.create_connection((config.host, config.port)) as sock:
+            sock.sendall(handshake(flags) + request)
+            buffer = RecvBuffer().attach(sock)
+            assert bytes(buffer.read_exact(5))[-1] == flags
+            assert _compressed(bytes(buffer.read_exact(4))) is expect_compressed
+
+
+def test_replicator_sends_compressed_events(tmp_path: Path, free_port, server_pool):
+    primary_node = NodeConfig(1, "127.0.0.1", free_port())
+    secondary_node = NodeConfig(2, "127.0.0.1", free_port())
+    secondary = server_pool.start(
+        ClusterConfig(
+            node_id=2, host=secondary_node.host, port=secondary_node.port, data_dir=str(tmp_path / "b"),
+            role="secondary", anti_entropy_interval=0.0,
+        )
+    )
+    server_pool.start(
+        ClusterConfig(
+            node_id=1, host=primary_node.host, port=primary_node.port, data_dir=str(tmp_path / "a"),
+            peers=[secondary_node], anti_entropy_interval=0.0, compression="zlib", compression_threshold=256,
+        )
+    )
+    KVClient(primary_node.host, primary_node.port).bulk_set([(f"k{idx}", "value " * 20) for idx in range(200)])
+    deadline = time.monotonic() + 10
+    while secondary.engine.get("k199") is None and time.monotonic() < deadline:
+        time.sleep(0.05)
+    assert secondary.engine.get("k199") == "value " * 20
+
+
+def test_datastore_connector_negotiates_compression(tmp_path: Path, free_port):
+    settings = DatastoreSettings(node_id=1, host="127.0.0.1", port=free_port(), data_dir=str(tmp_path))
+    server = DatastoreServer(settings)
+    threading.Thread(target=server.start, daemon=True).start()
+    try:
+        client = DatastoreConnector(settings.host, settings.port, compress_threshold=128)
+        client.set("doc", "abc " * 1000)
+        assert client.get("doc") == "abc " * 1000
+    finally:
+        server.shutdown()
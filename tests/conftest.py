@@ -0,0 +1,52 @@
+from __future__ import annotations
+
+import socket
+import threading
+from typing import Callable, Iterator, List
+
+import pytest
+
+from kvstore.config import ClusterConfig
+from kvstore.server import KVServer
+
+
+def _free_port() -> int:
+    sock = socket.socket()
+    sock.bind(("127.0.0.1", 0))
+    port = sock.getsockname()[1]
+    sock.close()
+    return port
+
+
+class ServerPool:
+    """KVServers started on daemon threads; those still running are shut down at teardown."""
+
+    def __init__(self) -> None:
+        self._running: List[KVServer] = []
+
+    def start(self, config: ClusterConfig) -> KVServer:
+        server = KVServer(config)
+        threading.Thread(target=server.start, daemon=True).start()
+        self._running.append(server)
+        return server
+
+    def stop(self, server: KVServer) -> None:
+        self._running.remove(server)
+        server.shutdown()
+
+    def stop_all(self) -> None:
+        while self._running:
+            self.stop(self._running[-1])
+
+
+@pytest.fixture
+def free_port() -> Callable[[], int]:
+    """Returns a function that picks an unused localhost port on each call."""
+    return _free_port
+
+
+@pytest.fixture
+def server_pool() -> Iterator[ServerPool]:
+    pool = ServerPool()
+    yield pool
+    pool.stop_all()
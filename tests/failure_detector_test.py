@@ -0,0 +1,50 @@
+from __future__ import annotations
+
+import time
+from pathlib import Path
+
+from kvstore.config import ClusterConfig, NodeConfig
+from kvstore.failure import PhiAccrualDetector
+
+
+def test_phi_grows_with_silence():
+    detector = PhiAccrualDetector(expected_interval=1.0, acceptable_pause=0.0)
+    for tick in range(20):
+        detector.heartbeat(now=float(tick))
+    assert detector.phi(now=19.5) < 1
+    assert detector.phi(now=21.0) < detector.phi(now=22.0) < detector.phi(now=25.0)
+    assert detector.phi(now=25.0) > 8
+
+    detector.reset()
+    assert detector.phi(now=25.0) == float("inf")
+
+
+def test_failover_uses_persistent_heartbeats(tmp_path: Path, free_port, server_pool):
+    nodes = [NodeConfig(node_id, "127.0.0.1", free_port()) for node_id in (1, 2, 3)]
+    servers = {}
+    for node in nodes:
+        config = ClusterConfig(
+            node_id=node.node_id,
+            host=node.host,
+            port=node.port,
+            data_dir=str(tmp_path / f"node_{node.node_id}"),
+            role="primary" if node.node_id == 1 else "secondary",
+            peers=[peer for peer in nodes if peer.node_id != node.node_id],
+            election_interval=0.05,
+            heartbeat_interval=0.1,
+            anti_entropy_interval=0.0,
+        )
+        servers[node.node_id] = server_pool.start(config)
+
+    time.sleep(1.0)
+    for server in servers.values():
+        assert server.state.get_role() == ("primary" if server.config.node_id == 1 else "secondary")
+        assert all(peer["up"] and peer["connects"] == 1 for peer in server.monitor.stats().values())
+
+    server_pool.stop(servers[1])
+    killed = time.monotonic()
+    while servers[2].state.get_role() != "primary" and time.monotonic() - killed < 5:
+        time.sleep(0.01)
+    assert servers[2].state.get_role() == "primary"
+    assert servers[3].state.get_role() == "secondary"
+    assert time.monotonic() - killed < 1.0
@@ -0,0 +1,127 @@
+from __future__ import annotations
+
+import os
+import threading
+import time
+from pathlib import Path
+
+import pytest
+
+from kvstore.client import KVClient
+from kvstore.config import ClusterConfig, NodeConfig
+from kvstore.hints import HintStore
+from kvstore.partitioning import HashRing
+from kvstore.replication import ReplicationEvent, Replicator
+
+
+def test_hint_store_is_bounded_and_survives_restart(tmp_path: Path):
+    peer = NodeConfig(2, "127.0.0.1", 1)
+    store = HintStore(str(tmp_path), max_hints=3)
+    for idx in range(5):
+        store.add(peer, "set", {"key": f"k{idx}", "value": idx})
+    assert store.stats()["2"]["pending"] == 3
+    assert store.stats()["2"]["dropped"] == 2
+
+    reopened = HintStore(str(tmp_path), max_hints=3)
+    assert reopened.pending(2) == 3
+    delivered = []
+    assert reopened.replay(peer, lambda batch: delivered.extend(batch) or True, rate=0, batch_size=2)
+    assert [event["payload"]["key"] for event in delivered] == ["k0", "k1", "k2"]
+    stats = reopened.stats()["2"]
+    assert (stats["pending"], stats["dropped"], stats["replayed"]) == (0, 0, 3)
+
+
+def test_error_response_is_hinted_not_delivered(tmp_path: Path, monkeypatch: pytest.MonkeyPatch):
+    peer = NodeConfig(2, "127.0.0.1", 1)
+    config = ClusterConfig(node_id=1, host="127.0.0.1", port=0, data_dir=str(tmp_path), peers=[peer])
+    hints = HintStore(str(tmp_path))
+    replicator = Replicator(config, hints)
+    monkeypatch.setattr(replicator, "_send", lambda peer, payload: {"status": "error", "error": "disk full"})
+    replicator.start()
+    replicator.enqueue(ReplicationEvent(op="set", payload={"key": "k", "value": 1}))
+    deadline = time.monotonic() + 5
+    while time.monotonic() < deadline and not hints.pending(2):
+        time.sleep(0.02)
+    replicator.stop()
+    assert hints.pending(2) == 1
+
+
+def test_ring_routes_events_to_the_other_owners(tmp_path: Path):
+    nodes = [NodeConfig(node_id, "127.0.0.1", node_id) for node_id in range(1, 5)]
+    config = ClusterConfig(node_id=1, host="127.0.0.1", port=0, data_dir=str(tmp_path), mode="dynamo", peers=nodes[1:])
+    ring = HashRing(nodes, replication_factor=2)
+    replicator = Replicator(config, ring=ring)
+    for idx in range(20):
+        key = f"k{idx}"
+        routed = {peer.node_id for peer, _ in replicator._routes(ReplicationEvent("delete", {"key": key, "version": 1}))}
+        assert routed == {node.node_id for node in ring.owners(key)} - {1}
+    items = [[f"k{idx}", idx] for idx in range(20)]
+    for peer, event in replicator._routes(ReplicationEvent("bulk_set", {"items": items, "version": 1})):
+        assert event.payload["version"] == 1 and event.payload["items"]
+        assert all(ring.is_owner(key, peer.node_id) for key, _ in event.payload["items"])
+
+
+def _run_outage(tmp_path: Path, free_port, server_pool, outage: float) -> None:
+    nodes = [NodeConfig(node_id, "127.0.0.1", free_port()) for node_id in (1, 2)]
+    configs = [
+        ClusterConfig(
+            node_id=node.node_id,
+            host=node.host,
+            port=node.port,
+            data_dir=str(tmp_path / f"node_{node.node_id}"),
+            role="primary" if node.node_id == 1 else "secondary",
+            peers=[peer for peer in nodes if peer.node_id != node.node_id],
+            election_interval=0.2,
+            replication_timeout=0.5,
+            anti_entropy_interval=0.0,
+            hint_replay_rate=5000.0,
+        )
+        for node in nodes
+    ]
+    primary = server_pool.start(configs[0])
+    secondary = server_pool.start(configs[1])
+    client = KVClient(nodes[0].host, nodes[0].port)
+    time.sleep(0.2)
+
+    stop = threading.Event()
+    written = []
+
+    def writer() -> None:
+        idx = 0
+        while not stop.is_set():
+            client.set(f"key-{idx}", idx)
+            written.append(idx)
+            idx += 1
+
+    thread = threading.Thread(target=writer)
+    thread.start()
+    time.sleep(0.3)
+    server_pool.stop(secondary)
+    time.sleep(outage)
+    secondary = server_pool.start(configs[1])
+    time.sleep(0.5)
+    stop.set()
+    thread.join()
+
+    deadline = time.monotonic() + 30
+    while time.monotonic() < deadline:
+        pending = primary.hints.stats().get("2", {}).get("pending", 0)
+        if pending == 0 and secondary.engine.snapshot() == primary.engine.snapshot():
+            break
+        time.sleep(0.1)
+
+    stats = KVClient(nodes[0].host, nodes[0].port).request({"op": "hint_stats"})["result"]["2"]
+    assert stats["pending"] == 0
+    assert stats["replayed"] > 0
+    assert stats["dropped"] == 0
+    snapshot = secondary.engine.snapshot()
+    assert [idx for idx in written if snapshot.get(f"key-{idx}") != idx] == []
+
+
+def test_no_lost_writes_after_peer_outage(tmp_path: Path, free_port, server_pool):
+    _run_outage(tmp_path, free_port, server_pool, float(os.getenv("HINT_OUTAGE_SECONDS", "2")))
+
+
+@pytest.mark.skipif(os.getenv("RUN_INTEGRATION") != "1", reason="set RUN_INTEGRATION=1 for the 60s outage run")
+def test_no_lost_writes_after_minute_long_outage(tmp_path: Path, free_port, server_pool):
+    _run_outage(tmp_path, free_port, server_pool, 60.0)
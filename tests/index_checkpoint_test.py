@@ -0,0 +1,102 @@
+from __future__ import annotations
+
+import threading
+from pathlib import Path
+
+import pytest
+
+from kvstore.engine import KVEngine
+
+
+def _populate(path: Path, **kwargs) -> KVEngine:
+    engine = KVEngine(str(path), **kwargs)
+    engine.bulk_set([(f"doc:{idx}", {"text": f"shared word{idx % 2}"}) for idx in range(20)])
+    engine.set("blob", b"\x00\x01")
+    engine.set("number", 7)
+    engine.add_vector("vec", [1.0, 0.0])
+    return engine
+
+
+def _no_rebuild(monkeypatch: pytest.MonkeyPatch) -> None:
+    def fail(self: KVEngine) -> None:
+        raise AssertionError("indexes were rebuilt instead of loaded")
+
+    monkeypatch.setattr(KVEngine, "_rebuild_indexes", fail)
+
+
+def test_restart_loads_checkpointed_indexes(tmp_path: Path, monkeypatch: pytest.MonkeyPatch):
+    _populate(tmp_path).close()
+    assert (tmp_path / "indexes.snap").exists()
+    _no_rebuild(monkeypatch)
+
+    engine = KVEngine(str(tmp_path))
+    assert len(engine.search_text("shared")) == 20
+    assert engine.search_by_value(b"\x00\x01") == ["blob"]
+    assert engine.search_by_value(7) == ["number"]
+    assert engine.vector_search([1.0, 0.0], top_k=1)[0]["key"] == "vec"
+
+
+def test_wal_tail_is_replayed_into_loaded_indexes(tmp_path: Path, monkeypatch: pytest.MonkeyPatch):
+    engine = _populate(tmp_path, drop_rate=1.0, index_checkpoint_interval=0)
+    # A dropped snapshot leaves these entries in the WAL only, as a crash would.
+    engine.set("doc:0", {"text": "replaced"}, simulate_drop=True)
+    engine.delete("doc:1", simulate_drop=True)
+    engine.set("new", "fresh", simulate_drop=True)
+    _no_rebuild(monkeypatch)
+
+    restarted = KVEngine(str(tmp_path))
+    assert restarted.get("doc:0") == {"text": "replaced"} and restarted.get("doc:1") is None
+    assert len(restarted.search_text("shared")) == 18
+    assert restarted.search_text("replaced") == ["doc:0"]
+    assert restarted.search_by_value("fresh") == ["new"]
+
+
+def test_older_checkpoint_is_brought_up_to_the_snapshot(tmp_path: Path, monkeypatch: pytest.MonkeyPatch):
+    _populate(tmp_path).close()
+    engine = KVEngine(str(tmp_path), index_checkpoint_interval=3600)
+    # Snapshotted without the indexes, so the index checkpoint is older than data.snap.
+    engine.set("doc:0", {"text": "replaced"})
+    engine.delete("doc:1")
+    engine.set("number", 8)
+    engine.bulk_set([("new", "fresh"), ("vec", "no longer a vector")])
+    engine.set("late", {"text": "shared late"})
+    engine.apply_batch([("delete", {"key": "blob", "version": engine.versions()["blob"] + 1})])
+    assert (tmp_path / "wal.log").stat().st_size > 0
+    _no_rebuild(monkeypatch)
+
+    restarted = KVEngine(str(tmp_path))
+    assert len(restarted.search_text("shared")) == 19 and "late" in restarted.search_text("shared")
+    assert restarted.search_text("replaced") == ["doc:0"]
+    assert restarted.search_by_value(7) == [] and restarted.search_by_value(8) == ["number"]
+    assert restarted.search_by_value("fresh") == ["new"] and restarted.search_by_value(b"\x00\x01") == []
+    assert restarted.vector_search([1.0, 0.0], top_k=1) == []
+    restarted.close()
+    assert sorted(KVEngine(str(tmp_path)).search_text("shared")) == sorted(restarted.search_text("shared"))
+
+
+def test_stale_checkpoint_falls_back_to_background_rebuild(tmp_path: Path, monkeypatch: pytest.MonkeyPatch):
+    _populate(tmp_path)
+    (tmp_path / "indexes.snap").write_bytes(b"garbage")
+    release = threading.Event()
+    rebuild = KVEngine._rebuild_in_background
+
+    def gated(self: KVEngine, keys: list) -> None:
+        release.wait(5)
+        rebuild(self, keys)
+
+    monkeypatch.setattr(KVEngine, "_rebuild_in_background", gated)
+    engine = KVEngine(str(tmp_path), background_index_rebuild=True)
+    assert engine.get("doc:3") == {"text": "shared word1"}
+    assert not engine.wait_for_indexes(timeout=0.05)
+    # Writes that land before the rebuild reaches a key leave its index entries to the rebuild.
+    engine.set("doc:0", {"text": "replaced"})
+    engine.delete("doc:1")
+    engine.set("late", "value")
+    release.set()
+
+    assert engine.wait_for_indexes(timeout=5)
+    assert len(engine.search_text("shared")) == 18
+    assert engine.search_text("replaced") == ["doc:0"]
+    assert engine.search_by_value("value") == ["late"]
+    _no_rebuild(monkeypatch)
+    assert sorted(KVEngine(str(tmp_path)).search_text("word0")) == sorted(engine.search_text("word0"))
@@ -0,0 +1,45 @@
+from __future__ import annotations
+
+from pathlib import Path
+
+from kvstore.engine import KVEngine
+from kvstore.storage import LazyValues, StorageEngine
+
+
+def test_lazy_load_maps_values_without_decoding(tmp_path: Path):
+    data = {f"k{idx}": {"n": idx, "blob": bytes([idx])} for idx in range(50)}
+    versions = {**{key: idx + 1 for idx, key in enumerate(data)}, "gone": 99}
+    StorageEngine(str(tmp_path)).save_snapshot(data, versions=versions)
+
+    # The compressed snapshot is decoded once, then rewritten in the mapped layout.
+    lazy = StorageEngine(str(tmp_path), chunk_records=8, lazy_values=True, value_cache=2)
+    values, loaded_versions = lazy.load_state()
+    assert isinstance(values, LazyValues) and not values._dirty
+    assert loaded_versions == versions
+    assert dict(values) == data and "gone" not in values
+
+    values, _ = StorageEngine(str(tmp_path), lazy_values=True, value_cache=2).load_state()
+    assert not values._dirty and not values._cache
+    assert values.raw("k3") == b'{"n":3,"blob":{"__bytes__":"Aw=="}}'
+    assert values["k3"] == data["k3"] and values["k4"] == data["k4"] and values["k5"] == data["k5"]
+    assert list(values._cache) == ["k4", "k5"]
+    assert StorageEngine(str(tmp_path)).load_state() == (data, versions)
+
+
+def test_lazy_engine_writes_and_restarts(tmp_path: Path):
+    engine = KVEngine(str(tmp_path), lazy_values=True)
+    engine.bulk_set([(f"doc:{idx:04d}", {"text": f"word{idx % 3} shared", "n": idx}) for idx in range(300)])
+    engine.set("plain", {"n": 1})
+    engine.set("name", "alice")
+    engine.delete("doc:0000")
+    assert engine.get("doc:0001") == {"text": "word1 shared", "n": 1}
+
+    restarted = KVEngine(str(tmp_path), lazy_values=True)
+    assert restarted.get("doc:0000") is None
+    assert restarted.get("plain") == {"n": 1}
+    assert len(restarted.search_text("shared")) == 299
+    assert restarted.search_by_value("alice") == ["name"]
+    restarted.set("doc:0002", {"text": "replaced"})
+    assert len(restarted.search_text("shared")) == 298
+    assert restarted.scan("doc:", limit=2) == [["doc:0001", {"text": "word1 shared", "n": 1}], ["doc:0002", {"text": "replaced"}]]
+    assert KVEngine(str(tmp_path)).snapshot() == restarted.snapshot()
@@ -0,0 +1,156 @@
+from __future__ import annotations
+
+import time
+from pathlib import Path
+
+import pytest
+
+from kvstore.client import KVClient
+from kvstore.config import ClusterConfig, NodeConfig
+from kvstore.engine import KVEngine
+from kvstore.memory import KeySampler, MaxMemoryExceeded, parse_size
+from kvstore.server import KVServer
+
+
+def test_accounting_tracks_each_structure_and_returns_to_zero(tmp_path: Path):
+    engine = KVEngine(str(tmp_path))
+    assert engine.memory_stats()["used_bytes"] == 0
+    engine.set("doc", {"text": "hello memory world"})
+    engine.set("tag", "blue")
+    engine.add_vector("vec", [0.1] * 16)
+    structures = engine.memory_stats()["structures"]
+    assert all(structures[name] > 0 for name in ("data", "secondary_index", "inverted_index", "vector_index"))
+
+    engine.set("doc", {"text": "shorter"})
+    assert engine.memory_stats()["structures"]["inverted_index"] < structures["inverted_index"]
+    for key in ("doc", "tag", "vec"):
+        engine.delete(key)
+    assert engine.memory_stats()["used_bytes"] == 0
+
+
+def test_accounting_survives_restart(tmp_path: Path):
+    engine = KVEngine(str(tmp_path))
+    engine.bulk_set([(f"doc:{idx}", {"text": f"word{idx} body"}) for idx in range(50)])
+    before = engine.memory_stats()["structures"]
+    engine.close()
+    assert KVEngine(str(tmp_path)).memory_stats()["structures"] == before
+    # Lazy values are counted by their encoded size, before and after the next snapshot.
+    lazy = KVEngine(str(tmp_path), lazy_values=True)
+    lazy.set("doc:extra", {"text": "one more"})
+    lazy.delete("doc:extra")
+    assert lazy.memory_stats()["structures"]["inverted_index"] == before["inverted_index"]
+
+
+def test_noeviction_rejects_writes_but_allows_deletes(tmp_path: Path):
+    engine = KVEngine(str(tmp_path), maxmemory=2000)
+    with pytest.raises(MaxMemoryExceeded):
+        for idx in range(100):
+            engine.set(f"key:{idx}", "x" * 100)
+    engine.delete("key:0")
+    engine.delete("key:1")
+    engine.set("key:new", "fits again")
+    # Replicated writes carry a version and are applied regardless.
+    engine.apply_replication("set", {"key": "replicated", "value": "x" * 5000, "version": engine.next_version()})
+    assert engine.get("replicated") is not None
+
+
+def test_lru_evicts_cold_keys_and_cleans_indexes_and_wal(tmp_path: Path):
+    engine = KVEngine(str(tmp_path), maxmemory=20_000, maxmemory_policy="allkeys-lru", maxmemory_samples=10)
+    evicted = []
+    engine.on_evict(lambda key, version: evicted.append(key))
+    engine.set("hot", {"text": "hot document"})
+    for idx in range(200):
+        engine.set(f"cold:{idx}", {"text": f"cold{idx} document"})
+        engine.get("hot")
+    stats = engine.memory_stats()
+    assert stats["used_bytes"] <= 20_000 + 1000
+    assert stats["evicted_keys"] == len(evicted) > 0
+    assert "hot" not in evicted and engine.get("hot") is not None
+    assert set(engine.search_text("document")) == set(engine.snapshot())
+    engine.close()
+
+    reopened = KVEngine(str(tmp_path))
+    assert all(reopened.get(key) is None for key in evicted)
+    assert set(reopened.search_text("document")) == set(reopened.snapshot())
+
+
+def test_lfu_keeps_frequently_read_keys(tmp_path: Path):
+    engine = KVEngine(str(tmp_path), maxmemory=15_000, maxmemory_policy="allkeys-lfu", maxmemory_samples=10)
+    for idx in range(10):
+        engine.set(f"popular:{idx}", "v" * 50)
+    for _ in range(50):
+        for idx in range(10):
+            engine.get(f"popular:{idx}")
+    for idx in range(200):
+        engine.set(f"once:{idx}", "v" * 50)
+    assert all(engine.get(f"popular:{idx}") is not None for idx in range(10))
+
+
+def test_key_sampler_remove_keeps_slots_consistent():
+    sampler = KeySampler("allkeys-lru", samples=3, seed=1)
+    for idx in range(10):
+        sampler.add(f"k{idx}")
+    for idx in range(0, 10, 2):
+        sampler.remove(f"k{idx}")
+    assert len(sampler) == 5
+    seen = {sampler.victim(set()) for _ in range(200)}
+    assert seen <= {f"k{idx}" for idx in range(1, 10, 2)}
+    assert sampler.victim({f"k{idx}" for idx in range(1, 9, 2)}) == "k9"
+    assert sampler.victim({f"k{idx}" for idx in range(1, 10, 2)}) is None
+
+
+def test_parse_size():
+    assert parse_size("1048576") == 1 << 20
+    assert parse_size("512mb") == 512 << 20
+    assert parse_size("1.5K") == 1536
+    with pytest.raises(ValueError):
+        parse_size("lots")
+
+
+def test_evictions_replicate_as_deletes(tmp_path: Path, free_port, server_pool):
+    secondary_node = NodeConfig(2, "127.0.0.1", free_port())
+    primary = ClusterConfig(
+        node_id=1, host="127.0.0.1", port=free_port(), data_dir=str(tmp_path / "p"), peers=[secondary_node],
+        anti_entropy_interval=0.0, maxmemory=5000, maxmemory_policy="allkeys-lru",
+    )
+    secondary = ClusterConfig(
+        node_id=2, host=secondary_node.host, port=secondary_node.port, data_dir=str(tmp_path / "s"), role="secondary",
+        peers=[NodeConfig(1, primary.host, primary.port)], anti_entropy_interval=0.0,
+    )
+    servers = [server_pool.start(secondary), server_pool.start(primary)]
+    client = KVClient(primary.host, primary.port)
+    for idx in range(40):
+        client.set(f"key:{idx}", "x" * 100)
+    memory = client.memory()
+    assert memory["policy"] == "allkeys-lru" and memory["evicted_keys"] > 0
+    assert "replication_queue" in memory["structures"]
+    expected = servers[1].engine.snapshot()
+    deadline = time.monotonic() + 5
+    while servers[0].engine.snapshot() != expected and time.monotonic() < deadline:
+        time.sleep(0.05)
+    assert servers[0].engine.snapshot() == expected
+
+
+def test_eviction_tombstones_are_collected_after_the_grace_period(tmp_path: Path):
+    engine = KVEngine(str(tmp_path), maxmemory=20000, maxmemory_policy="allkeys-lru", tombstone_grace=0.05)
+    for idx in range(1000):
+        engine.set(f"key:{idx}", "x" * 100)
+    time.sleep(0.1)
+    engine.set("last", "x" * 100)
+    # Only the tombstones of keys evicted for the last write are still within the grace period.
+    tombstones = len(engine.versions()) - len(engine.snapshot())
+    assert engine.evicted_keys > 900 and tombstones < 10
+    engine.close()
+    time.sleep(0.1)
+    reopened = KVEngine(str(tmp_path), tombstone_grace=0.05)
+    reopened.delete("last")
+    assert sorted(reopened.versions()) == sorted(reopened.snapshot()) + ["last"]
+
+
+def test_maxmemory_is_refused_where_writes_carry_versions(tmp_path: Path):
+    for mode, consensus in (("dynamo", "none"), ("leader", "raft")):
+        config = ClusterConfig(
+            node_id=1, host="127.0.0.1", port=0, data_dir=str(tmp_path), mode=mode, consensus=consensus, maxmemory=5000
+        )
+        with pytest.raises(ValueError):
+            KVServer(config)
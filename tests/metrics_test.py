@@ -0,0 +1,67 @@
+from __future__ import annotations
+
+import time
+import urllib.request
+from pathlib import Path
+
+from kvstore.client import KVClient
+from kvstore.config import ClusterConfig, NodeConfig
+from kvstore.metrics import Histogram, Metrics
+
+
+def test_histogram_quantiles_stay_within_bucket_precision():
+    histogram = Histogram()
+    samples = [idx / 1e6 for idx in range(1, 100_001)]
+    for sample in samples:
+        histogram.record(sample)
+    for q in (0.5, 0.9, 0.99):
+        assert abs(histogram.quantile(q) - samples[int(q * len(samples)) - 1]) <= samples[int(q * len(samples)) - 1] / 16
+    assert histogram.quantile(1.0) == histogram.max == 0.1
+    assert histogram.summary()["count"] == 100_000
+
+    merged = Histogram()
+    merged.record(0.2)
+    merged.merge(histogram)
+    assert merged.count == 100_001 and merged.max == 0.2
+    assert merged.quantile(0.5) == histogram.quantile(0.5)
+
+    disabled = Metrics(enabled=False)
+    disabled.histogram("x").record(1.0)
+    disabled.counter("y").incr()
+    assert disabled.snapshot() == {"y": [{"labels": {}, "value": 0}]}
+
+
+def test_stats_op_and_prometheus_listener(tmp_path: Path, free_port, server_pool):
+    peer = NodeConfig(2, "127.0.0.1", free_port())
+    config = ClusterConfig(
+        node_id=1, host="127.0.0.1", port=free_port(), data_dir=str(tmp_path), peers=[peer],
+        anti_entropy_interval=0.0, metrics_port=free_port(), replication_timeout=0.2,
+    )
+    server_pool.start(config)
+    client = KVClient(config.host, config.port)
+    client.set("doc", {"text": "hello world"})
+    client.get("doc")
+    client.search_text("hello")
+    client.request({"op": "no_such_op"})
+    deadline = time.monotonic() + 5
+    stats = client.stats()
+    while "kv_replication_failures_total" not in stats and time.monotonic() < deadline:
+        time.sleep(0.05)
+        stats = client.stats()
+
+    requests = {series["labels"]["op"]: series for series in stats["kv_request_seconds"]}
+    assert requests["set"]["count"] == 1 and requests["get"]["p99"] > 0
+    assert requests["unknown"]["count"] == 1
+    assert {"labels": {"op": "unknown"}, "value": 1} in stats["kv_request_errors_total"]
+    assert stats["kv_wal_append_seconds"][0]["count"] == 1
+    assert stats["kv_snapshot_seconds"][0]["count"] == 1
+    assert stats["kv_index_update_seconds"][0]["count"] >= 1
+    assert stats["kv_keys"] == [{"labels": {}, "value": 1}]
+    assert stats["kv_replication_failures_total"] == [{"labels": {"peer": "2"}, "value": 1}]
+
+    with urllib.request.urlopen(f"http://127.0.0.1:{config.metrics_port}/metrics", timeout=5) as response:
+        text = response.read().decode("utf-8")
+    assert "# TYPE kv_request_seconds summary" in text
+    assert 'kv_request_seconds_count{op="set"} 1' in text
+    assert 'kv_request_seconds{op="get",quantile="0.99"}' in text
+    assert "kv_keys 1" in text
@@ -0,0 +1,94 @@
+from __future__ import annotations
+
+import time
+from pathlib import Path
+
+from kvstore.client import KVClient, PartitionedKVClient
+from kvstore.config import ClusterConfig, NodeConfig
+from kvstore.partitioning import HashRing
+from kvstore.server import KVServer
+
+
+def _start_cluster(tmp_path: Path, free_port, server_pool, count: int, replication_factor: int) -> list[KVServer]:
+    nodes = [NodeConfig(node_id, "127.0.0.1", free_port()) for node_id in range(1, count + 1)]
+    servers = []
+    for node in nodes:
+        config = ClusterConfig(
+            node_id=node.node_id,
+            host=node.host,
+            port=node.port,
+            data_dir=str(tmp_path / f"node_{node.node_id}"),
+            mode="dynamo",
+            peers=[peer for peer in nodes if peer.node_id != node.node_id],
+            replication_factor=replication_factor,
+        )
+        servers.append(server_pool.start(config))
+    return servers
+
+
+def _wait_for(predicate, timeout: float = 3.0) -> bool:
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        if predicate():
+            return True
+        time.sleep(0.05)
+    return predicate()
+
+
+def test_ring_balance_and_minimal_movement():
+    nodes = [NodeConfig(node_id, "127.0.0.1", 9000 + node_id) for node_id in range(1, 4)]
+    ring = HashRing(nodes, virtual_nodes=64, replication_factor=1)
+    keys = [f"key_{idx}" for idx in range(3000)]
+    before = {key: ring.owners(key)[0].node_id for key in keys}
+
+    counts = {node.node_id: 0 for node in nodes}
+    for owner in before.values():
+        counts[owner] += 1
+    assert min(counts.values()) > 600
+
+    grown = HashRing(nodes + [NodeConfig(4, "127.0.0.1", 9004)], virtual_nodes=64, replication_factor=1)
+    moved = [key for key in keys if grown.owners(key)[0].node_id != before[key]]
+    assert all(grown.owners(key)[0].node_id == 4 for key in moved)
+    assert len(moved) < len(keys) / 2
+
+
+def test_preference_list_distinct_nodes():
+    nodes = [NodeConfig(node_id, "127.0.0.1", 9000 + node_id) for node_id in range(1, 6)]
+    ring = HashRing(nodes, virtual_nodes=16, replication_factor=3)
+    owners = ring.owners("some-key")
+    assert len(owners) == 3
+    assert len({node.node_id for node in owners}) == 3
+    assert ring.preference_list("some-key")[:3] == owners
+
+
+def test_dynamo_routes_to_owners(tmp_path: Path, free_port, server_pool):
+    servers = _start_cluster(tmp_path, free_port, server_pool, count=3, replication_factor=2)
+    ring = servers[0].ring
+    key = "user:42"
+    owner_ids = {node.node_id for node in ring.owners(key)}
+    outsider = next(server for server in servers if server.config.node_id not in owner_ids)
+
+    client = KVClient(outsider.config.host, outsider.config.port)
+    client.set(key, "hello partitioned world")
+    assert client.get(key) == "hello partitioned world"
+
+    assert _wait_for(
+        lambda: all(server.engine.get(key) is not None for server in servers if server.config.node_id in owner_ids)
+    )
+    assert outsider.engine.get(key) is None
+    assert client.search_text("partitioned") == [key]
+
+
+def test_partitioned_client_spreads_keys(tmp_path: Path, free_port, server_pool):
+    servers = _start_cluster(tmp_path, free_port, server_pool, count=3, replication_factor=1)
+    client = PartitionedKVClient([NodeConfig(s.config.node_id, s.config.host, s.config.port) for s in servers], replication_factor=1)
+
+    client.bulk_set([(f"k{idx}", idx) for idx in range(30)])
+    client.set("single", "value")
+
+    assert all(client.get(f"k{idx}") == idx for idx in range(30))
+    assert client.get("single") == "value"
+    sizes = [len(server.engine.snapshot()) for server in servers]
+    assert sum(sizes) == 31
+    assert all(size < 31 for size in sizes)
+    assert set(client.search_by_value(7)) == {"k7"}
@@ -0,0 +1,64 @@
+from __future__ import annotations
+
+import threading
+from pathlib import Path
+
+import pytest
+
+from kvstore.client import KVClient
+from kvstore.config import ClusterConfig
+from kvstore.profiler import ProfilerBusy, collapsed_text, sample_stacks
+
+
+def _spin(stop: threading.Event) -> None:
+    while not stop.is_set():
+        sum(range(1000))
+
+
+def test_sample_stacks_collapses_busy_threads_root_first():
+    stop = threading.Event()
+    worker = threading.Thread(target=_spin, args=(stop,), name="spinner", daemon=True)
+    worker.start()
+    try:
+        profile = sample_stacks(0.2, interval=0.005)
+        with pytest.raises(ProfilerBusy):
+            holder = threading.Thread(target=sample_stacks, args=(0.5,), daemon=True)
+            holder.start()
+            while holder.is_alive() and not sample_stacks.__globals__["_running"].locked():
+                pass
+            sample_stacks(0.0)
+        holder.join()
+    finally:
+        stop.set()
+        worker.join()
+    assert profile["samples"] >= 10
+    spinner = [(stack, count) for stack, count in profile["stacks"] if stack.startswith("spinner;")]
+    assert spinner and spinner[0][0].split(";")[-1].startswith("_spin (profiler_test.py:")
+    assert sum(count for _, count in spinner) <= profile["samples"]
+    assert collapsed_text(profile).splitlines()[0] == f"{profile['stacks'][0][0]} {profile['stacks'][0][1]}"
+
+
+def test_profile_op_samples_request_threads_under_load(tmp_path: Path, free_port, server_pool):
+    config = ClusterConfig(node_id=1, host="127.0.0.1", port=free_port(), data_dir=str(tmp_path), anti_entropy_interval=0.0)
+    server_pool.start(config)
+    stop = threading.Event()
+
+    def load() -> None:
+        client = KVClient(config.host, config.port, binary=True)
+        while not stop.is_set():
+            client.search_text("common")
+
+    KVClient(config.host, config.port).bulk_set([(f"doc:{idx}", {"text": f"common word{idx}"}) for idx in range(5000)])
+    loader = threading.Thread(target=load, daemon=True)
+    loader.start()
+    profile = KVClient(config.host, config.port).profile(seconds=0.5, interval_ms=2)
+    stop.set()
+    loader.join()
+    for bad in ({"seconds": "abc"}, {"interval_ms": None}, {"seconds": float("nan")}):
+        response = KVClient(config.host, config.port).request({"op": "profile", **bad})
+        assert response == {"status": "error", "error": "seconds and interval_ms must be numbers"}
+    assert profile["samples"] > 10
+    stacks = [stack for stack, _ in profile["stacks"]]
+    # Connection threads are numbered per connection but merge under one name.
+    assert any(stack.startswith("Thread (process_request_thread);") and "_handle_binary (server.py:" in stack for stack in stacks)
+    assert not any(stack.endswith(("select (selectors.py:", "_fill (protocol.py:")) for stack in stacks)
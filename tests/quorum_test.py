@@ -0,0 +1,69 @@
+from __future__ import annotations
+
+import time
+from pathlib import Path
+
+import pytest
+
+from kvstore.client import KVClient
+from kvstore.config import ClusterConfig, NodeConfig
+
+
+@pytest.fixture()
+def cluster(tmp_path: Path, free_port, server_pool):
+    nodes = [NodeConfig(node_id, "127.0.0.1", free_port()) for node_id in range(1, 4)]
+    servers = []
+    for node in nodes:
+        config = ClusterConfig(
+            node_id=node.node_id,
+            host=node.host,
+            port=node.port,
+            data_dir=str(tmp_path / f"node_{node.node_id}"),
+            mode="dynamo",
+            peers=[peer for peer in nodes if peer.node_id != node.node_id],
+            replication_factor=3,
+            hedge_delay=0.05,
+        )
+        servers.append(server_pool.start(config))
+    return servers
+
+
+def _timed(func):
+    start = time.perf_counter()
+    result = func()
+    return result, time.perf_counter() - start
+
+
+def test_write_returns_after_w_acks(cluster):
+    cluster[2].config.response_delay = 0.5
+    client = KVClient(cluster[0].config.host, cluster[0].config.port)
+
+    response, fast = _timed(lambda: client.request({"op": "set", "key": "k", "value": 1, "w": 2}))
+    assert response["status"] == "ok"
+    assert fast < 0.4
+
+    response, slow = _timed(lambda: client.request({"op": "set", "key": "k", "value": 2, "w": 3}))
+    assert response["status"] == "ok"
+    assert slow >= 0.5
+    assert all(server.engine.get("k") == 2 for server in cluster)
+
+
+def test_hedged_read_avoids_slow_replica(cluster):
+    client = KVClient(cluster[0].config.host, cluster[0].config.port)
+    client.set("k", "v", w=3)
+    others = [node for node in cluster[0].ring.owners("k") if node.node_id != 1]
+    slow = next(server for server in cluster if server.config.node_id == others[0].node_id)
+    slow.config.response_delay = 0.5
+
+    value, elapsed = _timed(lambda: client.get("k", r=2))
+    assert value == "v"
+    assert elapsed < 0.4
+
+
+def test_write_quorum_not_met_when_replica_down(cluster, server_pool):
+    server_pool.stop(cluster[2])
+    client = KVClient(cluster[0].config.host, cluster[0].config.port)
+
+    assert client.request({"op": "set", "key": "k", "value": 1, "w": 3})["status"] == "error"
+    assert client.request({"op": "set", "key": "k", "value": 1, "w": 2})["status"] == "ok"
+    assert client.request({"op": "get", "key": "k", "r": 2})["result"] == 1
@@ -0,0 +1,198 @@
+from __future__ import annotations
+
+import threading
+import time
+from pathlib import Path
+from typing import Callable, Dict
+
+from kvstore.client import KVClient
+from kvstore.config import ClusterConfig, NodeConfig
+from kvstore.engine import KVEngine
+from kvstore.raft import RaftLog, RaftNode
+from kvstore.replication import ServerState
+from kvstore.server import KVServer
+
+
+def _wait(condition: Callable[[], bool], timeout: float = 10.0) -> bool:
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if condition():
+            return True
+        time.sleep(0.02)
+    return condition()
+
+
+def _start_cluster(tmp_path: Path, free_port, server_pool, size: int = 3, **options) -> Dict[int, KVServer]:
+    nodes = [NodeConfig(node_id, "127.0.0.1", free_port()) for node_id in range(1, size + 1)]
+    servers = {}
+    for node in nodes:
+        config = ClusterConfig(
+            node_id=node.node_id,
+            host=node.host,
+            port=node.port,
+            data_dir=str(tmp_path / f"node_{node.node_id}"),
+            peers=[peer for peer in nodes if peer.node_id != node.node_id],
+            consensus="raft",
+            raft_election_timeout=0.3,
+            raft_heartbeat_interval=0.05,
+            anti_entropy_interval=0.0,
+            **options,
+        )
+        servers[node.node_id] = server_pool.start(config)
+    return servers
+
+
+def _leaders(servers: Dict[int, KVServer]) -> list:
+    return [node_id for node_id, server in servers.items() if server.raft.is_leader()]
+
+
+def _client(server: KVServer) -> KVClient:
+    return KVClient(server.config.host, server.config.port)
+
+
+def test_single_leader_replicates_and_survives_restart(tmp_path: Path, free_port, server_pool):
+    servers = _start_cluster(tmp_path, free_port, server_pool)
+    assert _wait(lambda: len(_leaders(servers)) == 1)
+    leader = servers[_leaders(servers)[0]]
+    follower = next(server for server in servers.values() if server is not leader)
+
+    for idx in range(20):
+        assert _client(leader).request({"op": "set", "key": f"k{idx}", "value": idx})["status"] == "ok"
+    assert _client(leader).get("k7") == 7
+    assert _client(follower).request({"op": "get", "key": "k7"})["error"] == "not_primary"
+    # The log is the only write path: no Merkle repair, and direct replication writes are refused.
+    assert follower.anti_entropy is None
+    event = {"op": "set", "payload": {"key": "k7", "value": "bypass", "version": 1 << 62}}
+    assert _client(follower).request({"op": "replicate", "event": event})["status"] == "error"
+    assert _client(follower).request({"op": "merkle_hashes", "peer_id": leader.config.node_id})["status"] == "error"
+    assert _wait(lambda: all(server.engine.get("k19") == 19 for server in servers.values()))
+
+    server_pool.stop_all()
+    restarted = KVServer(follower.config)
+    assert restarted.engine.get("k19") == 19
+    assert restarted.raft.status()["last_index"] >= 21
+    restarted.server_close()
+
+
+def test_partitioned_leader_cannot_commit_and_acked_writes_survive(tmp_path: Path, free_port, server_pool):
+    servers = _start_cluster(tmp_path, free_port, server_pool)
+    assert _wait(lambda: len(_leaders(servers)) == 1)
+    old_id = _leaders(servers)[0]
+    old = servers[old_id]
+    assert _client(old).request({"op": "set", "key": "acked", "value": 1})["status"] == "ok"
+
+    majority = {node_id for node_id in servers if node_id != old_id}
+    old.raft.block(majority)
+    for node_id in majority:
+        servers[node_id].raft.block({old_id})
+
+    lost = _client(old).request({"op": "set", "key": "minority", "value": "lost"})
+    assert lost["status"] == "error"
+    assert _wait(lambda: any(servers[node_id].raft.is_leader() for node_id in majority))
+    new = next(servers[node_id] for node_id in majority if servers[node_id].raft.is_leader())
+    assert new.raft.status()["term"] > old.raft.status()["term"]
+    assert _client(old).request({"op": "get", "key": "acked"})["status"] == "error"
+    assert _client(new).request({"op": "set", "key": "majority", "value": 2})["status"] == "ok"
+
+    old.raft.block(set())
+    for node_id in majority:
+        servers[node_id].raft.block(set())
+    assert _wait(lambda: not old.raft.is_leader() and old.engine.get("majority") == 2)
+    assert _leaders(servers) == [new.config.node_id]
+    for server in servers.values():
+        assert server.engine.get("acked") == 1
+        assert server.engine.get("minority") is None
+
+
+def test_follower_fsync_does_not_hold_the_node_lock(tmp_path: Path, free_port):
+    config = ClusterConfig(
+        node_id=2, host="127.0.0.1", port=free_port(), data_dir=str(tmp_path), peers=[NodeConfig(1, "127.0.0.1", 1)],
+        consensus="raft",
+    )
+    raft = RaftNode(config, KVEngine(str(tmp_path)), ServerState("secondary"))
+    entered, release = threading.Event(), threading.Event()
+    fsync = raft._log.fsync
+    raft._log.fsync = lambda: (entered.set(), release.wait(5), fsync())
+    entry = {"term": 1, "op": "set", "payload": {"key": "k", "value": 1}}
+    append = {"op": "raft_append", "term": 1, "leader": 1, "prev_index": 0, "prev_term": 0, "entries": [entry], "commit": 1}
+    responses = []
+    appender = threading.Thread(target=lambda: responses.append(raft.handle(append)), daemon=True)
+    appender.start()
+    assert entered.wait(5)
+    # Status and votes answer while the follower's fsync is in flight.
+    assert raft._lock.acquire(timeout=1)
+    raft._lock.release()
+    assert raft.status()["last_index"] == 1 and raft.status()["commit_index"] == 0
+    release.set()
+    appender.join(5)
+    assert responses == [{"status": "ok", "term": 1, "success": True}]
+    assert raft.status()["commit_index"] == 1 and raft._log.synced == 1
+
+
+def test_log_segments_truncate_in_place_and_compact(tmp_path: Path):
+    log = RaftLog(str(tmp_path), segment_entries=4)
+    log.append([{"term": 1, "op": "noop", "payload": {}} for _ in range(10)])
+    assert sorted(path.name for path in tmp_path.glob("log-*")) == [
+        f"log-{first:020d}.jsonl" for first in (1, 5, 9)
+    ]
+    log.truncate(7)
+    assert log.last_index == 6 and len(list(tmp_path.glob("log-*"))) == 2
+    assert not log.compact(3)
+    assert log.compact(6) and (log.snapshot_index, log.snapshot_term) == (4, 1)
+    assert not (tmp_path / f"log-{1:020d}.jsonl").exists()
+    log.append([{"term": 2, "op": "set", "payload": {"key": "k", "value": 1}}])
+    log.close()
+    with open(tmp_path / f"log-{5:020d}.jsonl", "ab") as handle:
+        handle.write(b'{"term":2,"op"')  # torn by a crash mid-append
+
+    reopened = RaftLog(str(tmp_path), segment_entries=4)
+    assert (reopened.snapshot_index, reopened.snapshot_term, reopened.last_index) == (4, 1, 7)
+    assert reopened.term_at(4) == 1 and reopened.term_at(7) == 2 and reopened.term_at(3) == 0
+    reopened.append([{"term": 3, "op": "noop", "payload": {}}])
+    reopened.close()
+    assert [entry["term"] for entry in RaftLog(str(tmp_path), segment_entries=4).entries] == [1, 1, 2, 3]
+
+
+def test_follower_behind_the_compacted_log_gets_a_snapshot(tmp_path: Path, free_port, server_pool):
+    servers = _start_cluster(tmp_path, free_port, server_pool, raft_segment_entries=4)
+    assert _wait(lambda: len(_leaders(servers)) == 1)
+    leader = servers[_leaders(servers)[0]]
+    lagging = next(server for server in servers.values() if server is not leader)
+    assert _client(leader).request({"op": "set", "key": "gone", "value": 0})["status"] == "ok"
+    assert _wait(lambda: lagging.engine.get("gone") == 0)
+
+    leader.raft.block({lagging.config.node_id})
+    lagging.raft.block({leader.config.node_id})
+    for idx in range(20):
+        assert _client(leader).request({"op": "set", "key": f"k{idx}", "value": idx})["status"] == "ok"
+    assert _client(leader).request({"op": "delete", "key": "gone"})["status"] == "ok"
+    assert leader.raft.status()["snapshot_index"] > lagging.raft.status()["last_index"]
+
+    leader.raft.block(set())
+    lagging.raft.block(set())
+    assert _wait(lambda: lagging.engine.get("k19") == 19 and lagging.engine.get("gone") is None)
+    assert lagging.raft.status()["snapshot_index"] > 0
+    assert _wait(lambda: len(_leaders(servers)) == 1)
+    current = servers[_leaders(servers)[0]]
+    assert _client(current).request({"op": "set", "key": "after", "value": 1})["status"] == "ok"
+    assert _wait(lambda: lagging.engine.get("after") == 1)
+
+
+def test_new_leader_versions_outrun_the_entries_it_inherits(tmp_path: Path, free_port):
+    config = ClusterConfig(
+        node_id=2, host="127.0.0.1", port=free_port(), data_dir=str(tmp_path), peers=[NodeConfig(1, "127.0.0.1", 1)],
+        consensus="raft",
+    )
+    engine = KVEngine(str(tmp_path))
+    raft = RaftNode(config, engine, ServerState("secondary"))
+    # Written by a leader whose clock ran a minute ahead, and not yet applied here.
+    ahead = engine.next_version() + (60_000 << 24)
+    entry = {"term": 1, "op": "set", "payload": {"key": "k", "value": 1, "version": ahead}}
+    append = {"op": "raft_append", "term": 1, "leader": 1, "prev_index": 0, "prev_term": 0, "entries": [entry], "commit": 0}
+    assert raft.handle(append)["success"]
+
+    with raft._lock:
+        raft._log.save_state(2, 2)
+        raft._become_leader(2)
+    raft.propose("set", {"key": "k", "value": 2}, timeout=0.05)
+    assert raft._log.entries[-1]["payload"]["version"] > ahead
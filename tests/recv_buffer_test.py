@@ -0,0 +1,66 @@
+from __future__ import annotations
+
+import socket
+import threading
+from pathlib import Path
+
+import pytest
+
+from kvstore.client import KVClient
+from kvstore.config import ClusterConfig
+from kvstore.engine import KVEngine
+from kvstore.protocol import ProtocolError, RecvBuffer, decode_message, encode_frame, encode_message, handshake
+
+
+def test_buffer_reassembles_split_lines_and_frames():
+    left, right = socket.socketpair()
+    buffer = RecvBuffer(size=16).attach(right)
+    message = encode_message({"op": "set", "key": "k", "value": "x" * 100})
+    left.sendall(message[:7])
+    sender = threading.Thread(target=lambda: left.sendall(message[7:] + encode_message({"op": "get"})))
+    sender.start()
+    assert decode_message(buffer.read_line()) == {"op": "set", "key": "k", "value": "x" * 100}
+    sender.join()
+    assert decode_message(buffer.read_line()) == {"op": "get"}
+    assert buffer.read_line(block=False) is None
+    assert buffer.capacity >= len(message)
+
+    left.sendall(bytes(encode_frame({"a": b"\x00" * 50})) + bytes(encode_frame({"b": 1}))[:3])
+    assert buffer.read_frame() == {"a": b"\x00" * 50}
+    assert buffer.read_frame(block=False) is None
+    left.close()
+    with pytest.raises(ProtocolError):
+        buffer.read_frame()
+    right.close()
+
+
+def test_pipelined_requests_are_answered_in_order(tmp_path: Path, free_port, server_pool):
+    config = ClusterConfig(node_id=1, host="127.0.0.1", port=free_port(), data_dir=str(tmp_path), anti_entropy_interval=0.0)
+    server_pool.start(config)
+    KVClient(config.host, config.port).bulk_set([(f"user:{idx:03d}", idx) for idx in range(300)] + [("other", 0)])
+    requests = [{"op": "get", "key": f"user:{idx:03d}"} for idx in range(50)]
+
+    with socket.create_connection((config.host, config.port)) as sock:
+        sock.sendall(b"".join(encode_message(request) for request in requests))
+        buffer = RecvBuffer(size=64).attach(sock)
+        assert [decode_message(buffer.read_line())["result"] for _ in requests] == list(range(50))
+
+    with socket.create_connection((config.host, config.port)) as sock:
+        sock.sendall(handshake() + b"".join(bytes(encode_frame(request)) for request in requests))
+        buffer = RecvBuffer().attach(sock)
+        buffer.read_exact(5)
+        assert [buffer.read_frame()["result"] for _ in requests] == list(range(50))
+
+    for binary in (False, True):
+        client = KVClient(config.host, config.port, binary=binary)
+        assert len(client.scan("user:")) == 300
+        assert client.scan("user:", after="user:100", limit=2) == [("user:101", 101), ("user:102", 102)]
+
+
+def test_engine_scan_orders_and_limits(tmp_path: Path):
+    engine = KVEngine(str(tmp_path))
+    for key in ("b", "a2", "a1", "c", "a3"):
+        engine.set(key, key.upper())
+    assert engine.scan() == [["a1", "A1"], ["a2", "A2"], ["a3", "A3"], ["b", "B"], ["c", "C"]]
+    assert engine.scan("a", after="a1", limit=1) == [["a2", "A2"]]
+    assert engine.scan("z") == []
@@ -0,0 +1,50 @@
+from __future__ import annotations
+
+import random
+from pathlib import Path
+
+from kvstore.engine import KVEngine
+from kvstore.search_pool import VectorSearchPool
+
+
+def _vector(rng: random.Random, dim: int) -> list[float]:
+    return [rng.uniform(-1, 1) for _ in range(dim)]
+
+
+def test_pool_matches_inline_search(tmp_path: Path):
+    rng = random.Random(7)
+    inline = KVEngine(str(tmp_path / "inline"))
+    pooled = KVEngine(str(tmp_path / "pooled"), search_workers=2)
+    pooled._search_pool.inline_rows = 0
+    try:
+        events = [("add_vector", {"key": f"v{idx}", "vector": _vector(rng, 8), "version": idx + 1}) for idx in range(300)]
+        events.append(("delete", {"key": "v3", "version": 1000}))
+        events.append(("add_vector", {"key": "v4", "vector": _vector(rng, 8), "version": 1001}))
+        events.append(("set", {"key": "v5", "value": "no longer a vector", "version": 1002}))
+        for engine in (inline, pooled):
+            engine.apply_batch(events)
+
+        for _ in range(5):
+            query = _vector(rng, 8)
+            expected = inline.vector_search(query, top_k=10)
+            actual = pooled.vector_search(query, top_k=10)
+            assert [hit["key"] for hit in actual] == [hit["key"] for hit in expected]
+            assert all(abs(a["score"] - e["score"]) < 1e-9 for a, e in zip(actual, expected))
+        assert all(hit["key"] not in ("v3", "v5") for hit in pooled.vector_search(_vector(rng, 8), top_k=300))
+    finally:
+        pooled.close()
+
+
+def test_matrix_grows_in_rows_and_width():
+    pool = VectorSearchPool(workers=1, initial_rows=2, initial_dim=2)
+    try:
+        for idx in range(10):
+            pool.upsert(f"k{idx}", [float(idx), 1.0])
+        pool.upsert("wide", [1.0, 0.0, 0.0, 0.0, 0.0])
+        assert len(pool) == 11
+        assert pool.search([9.0, 1.0], top_k=1)[0]["key"] == "k9"
+        assert pool.search([1.0, 0.0, 0.0, 0.0, 0.0], top_k=1)[0]["key"] == "wide"
+        pool.remove("k9")
+        assert pool.search([9.0, 1.0], top_k=1)[0]["key"] == "k8"
+    finally:
+        pool.close()
@@ -0,0 +1,89 @@
+from __future__ import annotations
+
+import threading
+import time
+from pathlib import Path
+
+import pytest
+
+from kvstore.client import KVClient
+from kvstore.config import ClusterConfig
+from kvstore.sharding import ShardDispatcher, shard_for
+
+
+def test_shard_ranges_are_balanced():
+    counts = [0] * 4
+    for idx in range(4000):
+        counts[shard_for(f"key-{idx}", 4)] += 1
+    assert all(800 < count < 1200 for count in counts)
+    assert all(shard_for(f"key-{idx}", 1) == 0 for idx in range(100))
+
+
+def test_dispatcher_routes_and_merges(tmp_path: Path, free_port):
+    config = ClusterConfig(node_id=1, host="127.0.0.1", port=free_port(), data_dir=str(tmp_path), shards=3)
+    dispatcher = ShardDispatcher(config)
+    threading.Thread(target=dispatcher.start, daemon=True).start()
+    client = KVClient(config.host, config.port, timeout=10.0)
+    deadline = time.monotonic() + 20
+    while time.monotonic() < deadline:
+        try:
+            if client.request({"op": "who_is_primary"}).get("status") == "ok":
+                break
+        except OSError:
+            time.sleep(0.1)
+
+    try:
+        client.bulk_set([(f"k{idx}", {"text": f"doc {idx % 2}", "n": idx}) for idx in range(30)])
+        client.set("color", "blue")
+        client.set("colour", "blue")
+        client.add_vector("v1", [1.0, 0.0])
+        client.add_vector("v2", [0.0, 1.0])
+        client.add_vector("v3", [0.9, 0.1])
+
+        assert client.get("k7") == {"text": "doc 1", "n": 7}
+        assert client.mget(["k1", "missing", "k2"]) == {"k1": {"text": "doc 1", "n": 1}, "missing": None, "k2": {"text": "doc 0", "n": 2}}
+        assert client.search_by_value("blue") == ["color", "colour"]
+        assert len(client.search_text("doc")) == 30
+        assert [key for key, _ in client.scan("k1", limit=4)] == ["k1", "k10", "k11", "k12"]
+        assert [hit["key"] for hit in client.vector_search([1.0, 0.0], top_k=2)] == ["v1", "v3"]
+
+        profile = client.profile(seconds=0.1, interval_ms=10)
+        assert len(profile["shards"]) == 3 and all("samples" in shard for shard in profile["shards"])
+        assert client.request({"op": "profile", "seconds": "x"})["status"] == "error"
+
+        shard_map = client.request({"op": "shard_map"})["result"]
+        assert len(shard_map) == 3
+        for entry in shard_map:
+            assert (tmp_path / f"shard-{entry['shard']}").is_dir()
+            keys = KVClient(entry["host"], entry["port"]).mget([f"k{idx}" for idx in range(30)])
+            owned = {key for key, value in keys.items() if value is not None}
+            assert owned == {f"k{idx}" for idx in range(30) if shard_for(f"k{idx}", 3) == entry["shard"]}
+    finally:
+        dispatcher.shutdown()
+
+
+def test_workers_get_the_node_options(tmp_path: Path, monkeypatch: pytest.MonkeyPatch, free_port):
+    config = ClusterConfig(
+        node_id=1, host="127.0.0.1", port=free_port(), data_dir=str(tmp_path), shards=2, lazy_values=True,
+        value_cache=64, background_index_rebuild=True, compression="zlib", compression_threshold=512, metrics=False,
+    )
+    commands = []
+
+    class Spawned(Exception):
+        pass
+
+    def popen(command, env):
+        commands.append(command)
+        raise Spawned
+
+    monkeypatch.setattr("kvstore.sharding.subprocess.Popen", popen)
+    dispatcher = ShardDispatcher(config)
+    with pytest.raises(Spawned):
+        dispatcher.start()
+    dispatcher.server_close()
+    command = commands[0]
+    for flag in ("--lazy-values", "--background-index-rebuild", "--no-metrics"):
+        assert flag in command
+    options = dict(zip(command, command[1:]))
+    assert options["--value-cache"] == "64" and options["--compression"] == "zlib"
+    assert options["--compression-threshold"] == "512"
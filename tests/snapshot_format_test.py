@@ -0,0 +1,54 @@
+from __future__ import annotations
+
+import json
+from pathlib import Path
+
+import pytest
+
+from kvstore.engine import KVEngine
+from kvstore.storage import SNAPSHOT_MAGIC, StorageEngine
+
+
+def test_snapshot_round_trips_values_versions_and_tombstones(tmp_path: Path):
+    storage = StorageEngine(str(tmp_path), chunk_records=3)
+    data = {f"k{idx}": {"n": idx, "blob": bytes([idx])} for idx in range(10)}
+    versions = {**{key: idx + 1 for idx, key in enumerate(data)}, "gone": 99}
+    storage.save_snapshot(data, versions=versions)
+
+    raw = (tmp_path / "data.snap").read_bytes()
+    assert raw.startswith(SNAPSHOT_MAGIC)
+    assert len(json.loads(raw[int.from_bytes(raw[8:16], "big"):])["chunks"]) == 4
+    assert StorageEngine(str(tmp_path), load_workers=2).load_state() == (data, versions)
+
+
+def test_legacy_json_files_are_migrated(tmp_path: Path):
+    (tmp_path / "data.json").write_text(json.dumps({"a": 1, "b": {"__bytes__": "AAE="}}))
+    (tmp_path / "versions.json").write_text(json.dumps({"a": 5, "b": 6, "c": 7}))
+    (tmp_path / "wal.log").write_text(json.dumps({"op": "set", "data": {"key": "d", "value": 4, "version": 8}}) + "\n")
+
+    data, versions = StorageEngine(str(tmp_path)).load_state()
+    assert data == {"a": 1, "b": b"\x00\x01", "d": 4}
+    assert versions == {"a": 5, "b": 6, "c": 7, "d": 8}
+    assert sorted(path.name for path in tmp_path.iterdir()) == ["data.snap"]
+    assert StorageEngine(str(tmp_path)).load_state() == (data, versions)
+
+
+def test_corrupt_chunk_fails_the_load(tmp_path: Path):
+    StorageEngine(str(tmp_path)).save_snapshot({"key": "value" * 100})
+    path = tmp_path / "data.snap"
+    raw = bytearray(path.read_bytes())
+    raw[20] ^= 0xFF
+    path.write_bytes(bytes(raw))
+    with pytest.raises(ValueError):
+        StorageEngine(str(tmp_path)).load()
+
+
+def test_engine_restarts_from_snapshot(tmp_path: Path):
+    engine = KVEngine(str(tmp_path))
+    engine.bulk_set([(f"user:{idx:05d}", idx) for idx in range(20000)])
+    engine.delete("user:00000")
+
+    restarted = KVEngine(str(tmp_path))
+    assert restarted.get("user:00000") is None
+    assert restarted.get("user:19999") == 19999
+    assert restarted.scan("user:", limit=2) == [["user:00001", 1], ["user:00002", 2]]
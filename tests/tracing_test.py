@@ -0,0 +1,62 @@
+from __future__ import annotations
+
+import time
+from pathlib import Path
+
+from kvstore.client import KVClient
+from kvstore.config import ClusterConfig, NodeConfig
+from kvstore.tracing import TracedLock
+
+
+def _traces(client: KVClient, op: str, count: int, slow: bool = False) -> list:
+    # A trace is finished after its reply is sent, so it can trail the reply by a moment.
+    deadline = time.monotonic() + 5
+    while True:
+        traces = [trace for trace in client.trace()["slow" if slow else "recent"] if trace["op"] == op]
+        if len(traces) >= count or time.monotonic() > deadline:
+            return traces
+        time.sleep(0.02)
+
+
+def test_request_phases_and_slow_log_switch_at_runtime(tmp_path: Path, free_port, server_pool):
+    peer = NodeConfig(2, "127.0.0.1", free_port())
+    config = ClusterConfig(
+        node_id=1, host="127.0.0.1", port=free_port(), data_dir=str(tmp_path), peers=[peer],
+        anti_entropy_interval=0.0, replication_timeout=0.2,
+    )
+    server = server_pool.start(config)
+    client = KVClient(config.host, config.port)
+    binary = KVClient(config.host, config.port, binary=True)
+    client.set("untraced", "value")
+    assert client.trace() == {"enabled": False, "slow_ms": 0.0, "recent": [], "slow": []}
+    assert not isinstance(server.engine._lock, TracedLock)
+
+    client.trace(enabled=True, slow_ms=0.001)
+    assert isinstance(server.engine._lock, TracedLock)
+    client.set("doc", {"text": "hello world"})
+    binary.get("doc")
+    (write,) = _traces(client, "set", 1)
+    assert set(write["phases_ms"]) == {
+        "accept", "decode", "engine", "lock_wait", "index", "wal", "snapshot", "replicate", "encode", "write",
+    }
+    assert write["phases_ms"]["wal"] <= write["phases_ms"]["engine"] <= write["total_ms"]
+    (read,) = _traces(client, "get", 1)
+    assert {"decode", "engine", "lock_wait", "encode", "write"} <= set(read["phases_ms"])
+    assert "wal" not in read["phases_ms"]
+    assert [trace["op"] for trace in _traces(client, "set", 1, slow=True)] == ["set"]
+
+    client.trace(slow_ms=60_000, clear=True)
+    client.set("fast", "value")
+    assert len(_traces(client, "set", 1)) == 1
+    assert client.trace()["slow"] == []
+
+    for bad in ({"limit": "all"}, {"slow_ms": "fast", "enabled": False}, {"slow_ms": float("nan")}):
+        response = client.request({"op": "trace", **bad})
+        assert response == {"status": "error", "error": "limit and slow_ms must be numbers"}
+    assert client.trace(limit=0)["slow_ms"] == 60_000 and server.tracer.enabled
+
+    client.trace(enabled=False, clear=True)
+    assert not isinstance(server.engine._lock, TracedLock)
+    client.set("off", "value")
+    time.sleep(0.05)
+    assert [trace["op"] for trace in client.trace()["recent"]] == ["trace"]
@@ -0,0 +1,138 @@
+from __future__ import annotations
+
+import time
+from pathlib import Path
+
+from kvstore.client import KVClient
+from kvstore.config import ClusterConfig, NodeConfig
+from kvstore.engine import KVEngine
+from kvstore.expiry import Expirer
+
+
+def test_expired_keys_are_hidden_from_reads(tmp_path: Path):
+    engine = KVEngine(str(tmp_path))
+    engine.set("session", {"text": "user session"}, expire_at=time.time() - 1)
+    engine.set("cache", {"text": "user cache"}, expire_at=time.time() + 60)
+    engine.set("plain", {"text": "user plain"})
+    assert engine.get("session") is None
+    assert engine.ttl("session") == -2
+    assert 59 < engine.ttl("cache") <= 60
+    assert engine.ttl("plain") == -1
+    assert sorted(engine.search_text("user")) == ["cache", "plain"]
+    assert [key for key, _ in engine.scan()] == ["cache", "plain"]
+    # A set without a TTL clears the old one.
+    engine.set("cache", "kept")
+    assert engine.ttl("cache") == -1
+
+
+def test_expire_and_persist_survive_restart(tmp_path: Path):
+    engine = KVEngine(str(tmp_path))
+    engine.set("a", 1)
+    engine.set("b", 2)
+    assert engine.expire("a", time.time() + 100)
+    assert engine.expire("b", time.time() + 100)
+    assert engine.expire("b", None)
+    assert engine.expire("missing", time.time() + 100) == 0
+    engine.bulk_set([("c", 3), ("d", 4)], expire_at=time.time() + 200)
+    engine.close()
+    reopened = KVEngine(str(tmp_path))
+    assert 99 < reopened.ttl("a") <= 100
+    assert reopened.ttl("b") == -1
+    assert 199 < reopened.ttl("d") <= 200
+
+
+def test_expirer_deletes_due_keys_in_batches(tmp_path: Path):
+    engine = KVEngine(str(tmp_path))
+    engine.bulk_set([(f"s:{idx}", idx) for idx in range(250)], expire_at=time.time() - 1)
+    engine.set("s:10", "refreshed")
+    engine.set("live", 1, expire_at=time.time() + 60)
+    deleted = []
+
+    def expire(due):
+        deleted.extend(key for key, _ in due)
+        engine.apply_batch([("delete", {"key": key, "version": version}) for key, version in due])
+        return True
+
+    expirer = Expirer(engine, expire, batch=100, interval=5.0)
+    assert expirer.run_once() == 249
+    assert len(deleted) == len(set(deleted)) == 249 and "s:10" not in deleted
+    assert sorted(engine.snapshot()) == ["live", "s:10"]
+    assert engine.due_expirations() == []
+    engine.close()
+    assert sorted(KVEngine(str(tmp_path)).snapshot()) == ["live", "s:10"]
+
+
+def test_failed_expiry_is_retried(tmp_path: Path):
+    engine = KVEngine(str(tmp_path))
+    engine.set("k", 1, expire_at=time.time() - 1)
+    assert Expirer(engine, lambda due: False).run_once() == 0
+    assert [key for key, _ in engine.due_expirations()] == ["k"]
+
+
+def test_refresh_after_due_check_wins(tmp_path: Path):
+    engine = KVEngine(str(tmp_path))
+    engine.set("k", 1, expire_at=time.time() - 1)
+    due = engine.due_expirations()
+    engine.set("k", 2)
+    engine.apply_batch([("delete", {"key": key, "version": version}) for key, version in due])
+    assert engine.get("k") == 2
+
+
+def test_nan_expiry_does_not_block_active_expiry(tmp_path: Path):
+    engine = KVEngine(str(tmp_path))
+    engine.set("odd", 1, expire_at=float("nan"))
+    engine.bulk_set([(f"k{idx}", idx) for idx in range(5)], expire_at=time.time() - 1)
+    assert sorted(key for key, _ in engine.due_expirations()) == [f"k{idx}" for idx in range(5)]
+    assert engine.ttl("odd") == -1
+
+
+def test_volatile_ttl_evicts_soonest_expiring_keys(tmp_path: Path):
+    engine = KVEngine(str(tmp_path), maxmemory=8000, maxmemory_policy="volatile-ttl")
+    engine.set("permanent", "p" * 100)
+    now = time.time()
+    for idx in range(60):
+        engine.set(f"v:{idx}", "v" * 100, expire_at=now + 1000 + idx)
+    assert engine.get("permanent") is not None
+    assert engine.get("v:0") is None and engine.get("v:59") is not None
+
+
+def test_ttl_ops_and_expiry_replicate(tmp_path: Path, free_port, server_pool):
+    secondary_node = NodeConfig(2, "127.0.0.1", free_port())
+    primary = ClusterConfig(
+        node_id=1, host="127.0.0.1", port=free_port(), data_dir=str(tmp_path / "p"), peers=[secondary_node],
+        anti_entropy_interval=0.0, expiry_interval=0.05,
+    )
+    secondary = ClusterConfig(
+        node_id=2, host=secondary_node.host, port=secondary_node.port, data_dir=str(tmp_path / "s"), role="secondary",
+        peers=[NodeConfig(1, primary.host, primary.port)], anti_entropy_interval=0.0, expiry_interval=0.05,
+    )
+    servers = [server_pool.start(secondary), server_pool.start(primary)]
+    client = KVClient(primary.host, primary.port)
+    client.set("short", "gone soon", ttl=0.3)
+    client.set("long", "stays", ttl=60)
+    client.set("kept", "no ttl")
+    assert client.expire("kept", 60) and client.persist("kept")
+    assert client.ttl("kept") == -1 and 0 < client.ttl("long") <= 60
+    assert not client.expire("missing", 10)
+    time.sleep(0.5)
+    deadline = time.monotonic() + 5
+    while time.monotonic() < deadline and servers[0].engine.versions() != servers[1].engine.versions():
+        time.sleep(0.05)
+    assert servers[0].engine.versions() == servers[1].engine.versions()
+    # The primary deleted the key and the secondary applied its delete instead of expiring it too.
+    assert servers[1].expirer.expired == 1 and servers[0].expirer.expired == 0
+    assert servers[0].engine.records(["short"])[0]["deleted"]
+    assert servers[0].engine.snapshot() == {"long": "stays", "kept": "no ttl"}
+    assert 0 < servers[0].engine.ttl("long") <= 60 and servers[0].engine.ttl("kept") == -1
+
+
+def test_malformed_ttl_is_an_error_response(tmp_path: Path, free_port, server_pool):
+    config = ClusterConfig(node_id=1, host="127.0.0.1", port=free_port(), data_dir=str(tmp_path), anti_entropy_interval=0.0)
+    server_pool.start(config)
+    client = KVClient(config.host, config.port)
+    for ttl in (None, "abc", "nan", "inf", -1):
+        response = client.request({"op": "set", "key": "k", "value": 1, "ttl": ttl})
+        assert response["status"] == "error" and "invalid ttl" in response["error"]
+    assert client.request({"op": "expire", "key": "k", "ttl": [1]})["status"] == "error"
+    client.set("k", 1, ttl="60")
+    assert 0 < client.ttl("k") <= 60
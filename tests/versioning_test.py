@@ -0,0 +1,83 @@
+from __future__ import annotations
+
+import time
+from pathlib import Path
+
+from kvstore.client import KVClient
+from kvstore.config import ClusterConfig, NodeConfig
+from kvstore.engine import KVEngine
+from kvstore.versioning import HybridLogicalClock, unpack_version
+
+
+def test_hlc_is_monotonic_and_absorbs_remote_clocks():
+    clock = HybridLogicalClock(node_id=7)
+    first = clock.now()
+    second = clock.now()
+    assert second > first
+    assert unpack_version(second)[2] == 7
+
+    ahead = first + (60_000 << 24)
+    clock.observe(ahead)
+    assert clock.now() > ahead
+    assert clock.now() < 1 << 64
+
+
+def test_last_writer_wins_and_tombstones(tmp_path: Path):
+    engine = KVEngine(str(tmp_path), node_id=1)
+    newer = engine.set("k", "new")
+    engine.apply_replication("set", {"key": "k", "value": "old", "version": newer - 1})
+    assert engine.get("k") == "new"
+
+    deleted = engine.delete("k")
+    engine.apply_replication("set", {"key": "k", "value": "resurrected", "version": newer})
+    assert engine.get("k") is None
+    assert engine.get_versioned("k") == (None, deleted)
+
+    engine.apply_replication("bulk_set", {"items": [["k", "batch"], ["other", 1]], "version": deleted + 1})
+    assert engine.get("k") == "batch"
+
+    reopened = KVEngine(str(tmp_path), node_id=1)
+    assert reopened.get_versioned("k") == ("batch", deleted + 1)
+    assert reopened.next_version() > deleted + 1
+
+
+def test_tombstones_are_forgotten_after_the_grace_period(tmp_path: Path):
+    engine = KVEngine(str(tmp_path), node_id=1, tombstone_grace=0.1)
+    old = engine.set("k", "old")
+    engine.delete("k")
+    engine.apply_replication("set", {"key": "k", "value": "late", "version": old})
+    assert engine.get("k") is None and "k" in engine.versions()
+    time.sleep(0.2)
+    engine.delete("other")
+    assert "k" not in engine.versions()
+    # Past the grace period, a write from before the delete is accepted again.
+    engine.apply_replication("set", {"key": "k", "value": "late", "version": old + 1})
+    assert engine.get("k") == "late"
+
+
+def test_quorum_read_repairs_stale_replica(tmp_path: Path, free_port, server_pool):
+    nodes = [NodeConfig(node_id, "127.0.0.1", free_port()) for node_id in range(1, 4)]
+    servers = []
+    for node in nodes:
+        config = ClusterConfig(
+            node_id=node.node_id,
+            host=node.host,
+            port=node.port,
+            data_dir=str(tmp_path / f"node_{node.node_id}"),
+            mode="dynamo",
+            peers=[peer for peer in nodes if peer.node_id != node.node_id],
+            replication_factor=3,
+        )
+        servers.append(server_pool.start(config))
+
+    client = KVClient(nodes[0].host, nodes[0].port)
+    client.set("k", "v1", w=3)
+    version = servers[0].engine.next_version()
+    for server in servers[:2]:
+        server.engine.apply_replication("set", {"key": "k", "value": "v2", "version": version})
+
+    assert client.get("k", r=3) == "v2"
+    deadline = time.time() + 3
+    while servers[2].engine.get("k") != "v2" and time.time() < deadline:
+        time.sleep(0.05)
+    assert servers[2].engine.get_versioned("k") == ("v2", version)